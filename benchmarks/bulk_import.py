@@ -0,0 +1,113 @@
+"""
+Throughput of POST /users/bulk against one POST /users per user.
+
+    python benchmarks/bulk_import.py --base-url http://localhost:8080 --users 5000
+    python benchmarks/bulk_import.py --users 20000 --batch-size 1000 --ndjson --concurrency 16
+
+Against a running API on a throwaway database (USERS_REPOSITORY=memory measures only the
+Python side: validation, hashing, serialization). Each mode creates --users new users
+with its own email prefix:
+
+- single: POST /users, --concurrency requests in flight.
+- bulk: POST /users/bulk in batches of --batch-size (JSON array, or NDJSON with --ndjson),
+  one batch at a time.
+
+Prints users/s for each mode and the speedup; --output saves it as JSON.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+
+import httpx
+
+
+def make_users(prefix, count):
+    return [
+        {
+            "name": "Bulk",
+            "surname": f"User{i}",
+            "password": "bulk-import-password",
+            "email": f"{prefix}-{i}@bulk.example.com",
+            "status": "active",
+            "role": "teacher" if i % 5 == 0 else "student",
+        }
+        for i in range(count)
+    ]
+
+
+async def run_single(client, users, concurrency):
+    queue = iter(users)
+    failures = []
+
+    async def worker():
+        for user in queue:
+            response = await client.post("/users", json=user)
+            if response.status_code != 201:
+                failures.append(response.status_code)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start, len(failures)
+
+
+async def run_bulk(client, users, batch_size, ndjson):
+    failures = 0
+    start = time.perf_counter()
+    for first in range(0, len(users), batch_size):
+        batch = users[first:first + batch_size]
+        if ndjson:
+            body = "".join(json.dumps(user) + "\n" for user in batch)
+            response = await client.post(
+                "/users/bulk", content=body, headers={"Content-Type": "application/x-ndjson"}
+            )
+        else:
+            response = await client.post("/users/bulk", json=batch)
+        response.raise_for_status()
+        failures += len(batch) - response.json()["data"].get("created", 0)
+    return time.perf_counter() - start, failures
+
+
+async def main_async(args):
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        run = uuid.uuid4().hex[:8]
+        report = {"users": args.users, "batch_size": args.batch_size, "ndjson": args.ndjson}
+        modes = [
+            ("single", run_single(client, make_users(f"{run}-single", args.users), args.concurrency)),
+            ("bulk", run_bulk(client, make_users(f"{run}-bulk", args.users), args.batch_size, args.ndjson)),
+        ]
+        for mode, coroutine in modes:
+            elapsed, failures = await coroutine
+            report[mode] = {"seconds": elapsed, "users_per_second": args.users / elapsed, "failures": failures}
+            print(f"{mode:>6}: {args.users} users in {elapsed:.2f}s "
+                  f"({args.users / elapsed:.0f} users/s, {failures} not created)")
+        report["speedup"] = report["bulk"]["users_per_second"] / report["single"]["users_per_second"]
+        print(f"speedup: x{report['speedup']:.1f}")
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8080")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=500, help="users per POST /users/bulk (<= BULK_MAX_USERS)")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight for POST /users")
+    parser.add_argument("--ndjson", action="store_true", help="send the batches as NDJSON")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="save the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    failed = report["single"]["failures"] + report["bulk"]["failures"]
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Load test: threaded WSGI (gunicorn, app.py) vs async ASGI (uvicorn, asgi_app.py).
+
+Start both servers against the same database, then:
+
+    python benchmarks/compare_server_modes.py \
+        --target wsgi=http://localhost:8080 --target asgi=http://localhost:8081 \
+        --path /users/teachers --path /users_check/<uuid> --concurrency 200 --duration 30
+
+Each target gets `concurrency` clients issuing requests back to back for `duration`
+seconds. Reports throughput, error rate and latency percentiles per target.
+"""
+
+import argparse
+import asyncio
+import itertools
+import time
+
+import httpx
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def _client(http, paths, deadline, latencies, errors):
+    for path in itertools.cycle(paths):
+        if time.perf_counter() >= deadline:
+            return
+        start = time.perf_counter()
+        try:
+            response = await http.get(path)
+            if response.status_code >= 500:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        latencies.append(time.perf_counter() - start)
+
+
+async def run_target(base_url, paths, concurrency, duration):
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as http:
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(
+            *(_client(http, paths, deadline, latencies, errors) for _ in range(concurrency))
+        )
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / duration,
+        "errors": len(errors),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", action="append", required=True, help="name=base_url")
+    parser.add_argument("--path", action="append", default=None)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=20)
+    args = parser.parse_args()
+    paths = args.path or ["/health"]
+
+    print(f"{'target':<10}{'requests':>10}{'rps':>10}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for target in args.target:
+        name, base_url = target.split("=", 1)
+        r = asyncio.run(run_target(base_url, paths, args.concurrency, args.duration))
+        print(
+            f"{name:<10}{r['requests']:>10}{r['rps']:>10.1f}{r['errors']:>8}"
+            f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,462 @@
+"""
+HTTP load test of the users API with realistic traffic mixes.
+
+    python benchmarks/load_test.py --base-url http://localhost:8080 --scenario morning_peak
+    python benchmarks/load_test.py --scenario all --concurrency 200 --duration 120 \
+        --server-pid $(pgrep -of "gunicorn.*app:users_app") --output results/load.json
+    python benchmarks/load_test.py --mix login=70,teachers=30
+
+1. SMTP and Google stand-ins start in this process (standins.py, --smtp-port and
+   --google-port) and the environment the server needs is printed: start (or restart)
+   the API with it against a throwaway database. The script waits for /health/ready.
+2. Setup, not measured: --accounts users sign up through the API (POST /users, the
+   confirmation PIN is read from the SMTP stand-in, PUT confirm-registration), 20% of
+   them teachers, plus --google-accounts through POST /users/signup/google.
+3. Load: --concurrency virtual users, each with its own connection, pick actions by the
+   scenario weights for --duration seconds (closed loop; --think-ms adds an exponential
+   pause between actions).
+4. Report per route: requests, throughput, p50/p95/p99, error rate (5xx and transport
+   errors) and unexpected statuses (other codes than the flow expects). "PIN email" is
+   the time from the confirmation request until the stand-in received the email. With
+   --server-pid, the CPU, RSS and threads of that process and its children (the gunicorn
+   workers) are sampled every second.
+
+The setup and the signup actions create real users: never point it at a shared database.
+"""
+
+import argparse
+import asyncio
+import collections
+import datetime
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from compare_server_modes import percentile  # noqa: E402
+from standins import GoogleStandIn, SmtpStandIn  # noqa: E402
+
+PASSWORD = "load-test-password"
+ROLES = ["student"] * 4 + ["teacher"]
+EMAIL_ROUTE = "PIN email"  # measured by the client, not an HTTP request
+
+# Action weights. Each action is one user intent (a signup is 3 requests + the email).
+SCENARIOS = {
+    # 7-9 am: students and teachers open the app, then look for teachers.
+    "morning_peak": {"login": 55, "login_google": 15, "teachers": 20, "user_check": 10},
+    # Start of term: new accounts (password and Google) while existing users keep logging in.
+    "signup_burst": {"signup": 60, "signup_google": 15, "login": 15, "teachers": 10},
+    # Students browsing the directory and opening teacher profiles.
+    "teacher_browsing": {"teachers": 50, "user_check": 45, "login": 5},
+    # Mobile clients reporting their position in the background.
+    "location_pings": {"location": 85, "user_check": 10, "login": 5},
+}
+
+
+class Stats:
+    """Latencies and status codes per route template ("POST /users/login")."""
+
+    def __init__(self):
+        self.latencies = collections.defaultdict(list)
+        self.statuses = collections.defaultdict(collections.Counter)
+        self.errors = collections.Counter()
+        self.unexpected = collections.Counter()
+
+    def record(self, route, seconds, status, expected):
+        self.latencies[route].append(seconds)
+        self.statuses[route][status] += 1
+        if not isinstance(status, int) or status >= 500:
+            self.errors[route] += 1
+        elif status not in expected:
+            self.unexpected[route] += 1
+
+    def total(self):
+        return sum(len(values) for route, values in self.latencies.items() if route != EMAIL_ROUTE)
+
+    def summary(self, elapsed):
+        rows = {}
+        for route, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            rows[route] = {
+                "requests": len(values),
+                "rps": round(len(values) / elapsed, 2),
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p95_ms": round(percentile(values, 95) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+                "error_rate": round(self.errors[route] / len(values), 4),
+                "unexpected_rate": round(self.unexpected[route] / len(values), 4),
+                "statuses": {str(status): count for status, count in self.statuses[route].most_common()},
+            }
+        return rows
+
+
+class Accounts:
+    """Users created by this run, shared by all the virtual users."""
+
+    def __init__(self, run_id):
+        self.run_id = run_id
+        self.password = []
+        self.google = []
+        self._counter = itertools.count()
+
+    def new_email(self, kind="user"):
+        return f"lt-{self.run_id}-{kind}{next(self._counter)}@load-test.local"
+
+    def any(self, rng):
+        index = rng.randrange(len(self.password) + len(self.google))
+        return self.password[index] if index < len(self.password) else self.google[index - len(self.password)]
+
+
+class Client:
+    """One virtual user: its own connection (and cookies) to the API."""
+
+    def __init__(self, http, stats, accounts, smtp, google, rng):
+        self.http = http
+        self.stats = stats
+        self.accounts = accounts
+        self.smtp = smtp
+        self.google = google
+        self.rng = rng
+
+    async def call(self, method, route, path, expected, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await self.http.request(method, path, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            response, status = None, type(e).__name__
+        self.stats.record(route, time.perf_counter() - start, status, expected)
+        return response if status in expected else None
+
+    def google_body(self, email, role=None):
+        body = {
+            "token": self.google.mint_token(email),
+            "email_verified": True,
+            "email": email,
+            "given_name": "Load",
+            "family_name": "Test",
+            "photo": "https://example.com/photo.png",
+        }
+        if role:
+            body["role"] = role
+        return body
+
+
+async def login(client):
+    account = client.rng.choice(client.accounts.password)
+    await client.call("POST", "POST /users/login", "/users/login", (200,),
+                      json={"email": account["email"], "password": PASSWORD})
+
+
+async def login_google(client):
+    account = client.rng.choice(client.accounts.google or client.accounts.password)
+    await client.call("POST", "POST /users/login/google", "/users/login/google", (200,),
+                      json=client.google_body(account["email"]))
+
+
+async def signup(client, role=None):
+    email = client.accounts.new_email()
+    role = role or client.rng.choice(ROLES)
+    body = {"name": "Load", "surname": "Test", "password": PASSWORD, "email": email, "status": "active", "role": role}
+    response = await client.call("POST", "POST /users", "/users", (201,), json=body)
+    if response is None:
+        return None
+    user_uuid = response.json()["data"]["uuid"]
+
+    start = time.perf_counter()
+    path = f"/users/{email}/confirm-registration"
+    if await client.call("POST", "POST /users/<email>/confirm-registration", path, (200,)) is None:
+        return None
+    pin = await client.smtp.wait_pin(email)
+    client.stats.record(EMAIL_ROUTE, time.perf_counter() - start, 200 if pin else "NoEmail", (200,))
+    if pin is None:
+        return None
+    if await client.call("PUT", "PUT /users/<email>/confirm-registration", path, (200,), json={"pin": pin}) is None:
+        return None
+
+    account = {"email": email, "uuid": user_uuid, "role": role}
+    client.accounts.password.append(account)
+    return account
+
+
+async def signup_google(client, role=None):
+    email = client.accounts.new_email("google")
+    role = role or client.rng.choice(ROLES)
+    response = await client.call("POST", "POST /users/signup/google", "/users/signup/google", (200,),
+                                 json=client.google_body(email, role))
+    if response is None:
+        return None
+    account = {"email": email, "uuid": response.json()["data"]["uuid"], "role": role}
+    client.accounts.google.append(account)
+    return account
+
+
+async def teachers(client):
+    await client.call("GET", "GET /users/teachers", "/users/teachers", (200,))
+
+
+async def user_check(client):
+    account = client.accounts.any(client.rng)
+    await client.call("GET", "GET /users_check/<uuid>", f"/users_check/{account['uuid']}", (200,))
+
+
+async def location(client):
+    account = client.accounts.any(client.rng)
+    body = {"latitude": client.rng.uniform(-55, -22), "longitude": client.rng.uniform(-73, -53)}
+    await client.call("PUT", "PUT /users/<uuid>/location", f"/users/{account['uuid']}/location", (200,), json=body)
+
+
+ACTIONS = {
+    "login": login,
+    "login_google": login_google,
+    "signup": signup,
+    "signup_google": signup_google,
+    "teachers": teachers,
+    "user_check": user_check,
+    "location": location,
+}
+
+
+class ResourceMonitor(threading.Thread):
+    """Samples CPU %, RSS and threads of `pid` plus its children (gunicorn workers)."""
+
+    def __init__(self, pid, interval=1.0):
+        super().__init__(name="resource-monitor", daemon=True)
+        import psutil
+
+        self._psutil = psutil
+        self.root = psutil.Process(pid)
+        self.interval = interval
+        self.samples = []
+        self._processes = {}
+        self._stop = threading.Event()
+
+    def _tree(self):
+        current = [self.root] + self.root.children(recursive=True)
+        for process in current:
+            if process.pid not in self._processes:
+                process.cpu_percent(None)  # the first call only sets the reference point
+                self._processes[process.pid] = process
+        return [self._processes[process.pid] for process in current]
+
+    def run(self):
+        self._tree()
+        while not self._stop.wait(self.interval):
+            cpu = rss = threads = 0
+            processes = self._tree()
+            for process in processes:
+                try:
+                    with process.oneshot():
+                        cpu += process.cpu_percent(None)
+                        rss += process.memory_info().rss
+                        threads += process.num_threads()
+                except self._psutil.NoSuchProcess:
+                    continue
+            self.samples.append({"cpu_percent": cpu, "rss_mb": rss / 2**20, "threads": threads, "processes": len(processes)})
+
+    def stop(self):
+        self._stop.set()
+        self.join()
+
+    def summary(self, requests):
+        if not self.samples:
+            return {}
+        cpu = [sample["cpu_percent"] for sample in self.samples]
+        mean_cpu = sum(cpu) / len(cpu)
+        busy_seconds = mean_cpu / 100 * len(self.samples) * self.interval
+        return {
+            "samples": len(self.samples),
+            "cpu_percent_mean": round(mean_cpu, 1),
+            "cpu_percent_max": round(max(cpu), 1),
+            "cpu_ms_per_request": round(busy_seconds / requests * 1000, 3) if requests else None,
+            "rss_mb_start": round(self.samples[0]["rss_mb"], 1),
+            "rss_mb_max": round(max(sample["rss_mb"] for sample in self.samples), 1),
+            "rss_mb_end": round(self.samples[-1]["rss_mb"], 1),
+            "threads_max": max(sample["threads"] for sample in self.samples),
+            "processes": self.samples[-1]["processes"],
+        }
+
+
+async def wait_ready(base_url, timeout):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url, timeout=5) as http:
+        while True:
+            try:
+                if (await http.get("/health/ready")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise SystemExit(f"{base_url} is not ready after {timeout}s")
+            await asyncio.sleep(1)
+
+
+async def setup(base_url, accounts, smtp, google, count, google_count, concurrency, seed):
+    """Create the accounts the scenarios log in with. Returns the (unreported) setup stats."""
+    stats = Stats()
+    limit = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as http:
+        client = Client(http, stats, accounts, smtp, google, random.Random(seed))
+
+        async def create(action, index):
+            async with limit:
+                await action(client, "teacher" if index % 5 == 0 else "student")
+
+        await asyncio.gather(
+            *(create(signup, i) for i in range(count)),
+            *(create(signup_google, i) for i in range(google_count)),
+        )
+    return stats
+
+
+async def run_scenario(base_url, weights, accounts, smtp, google, concurrency, duration, think_ms, seed):
+    stats = Stats()
+    names, values = list(weights), list(weights.values())
+    limits = httpx.Limits(max_connections=1, max_keepalive_connections=1)
+
+    async def virtual_user(index, deadline):
+        rng = random.Random(seed * 100_003 + index)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as http:
+            client = Client(http, stats, accounts, smtp, google, rng)
+            while time.perf_counter() < deadline:
+                await ACTIONS[rng.choices(names, values)[0]](client)
+                if think_ms:
+                    await asyncio.sleep(rng.expovariate(1000 / think_ms))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(virtual_user(i, start + duration) for i in range(concurrency)))
+    return stats, time.perf_counter() - start
+
+
+def print_report(name, rows, resources, elapsed):
+    print(f"\n== {name} ({elapsed:.1f}s)")
+    print(f"{'route':<42}{'requests':>9}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'err %':>7}{'unexp %':>8}")
+    for route, row in rows.items():
+        print(
+            f"{route:<42}{row['requests']:>9}{row['rps']:>9.1f}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}"
+            f"{row['p99_ms']:>9.1f}{row['error_rate'] * 100:>7.2f}{row['unexpected_rate'] * 100:>8.2f}"
+        )
+    total = sum(row["requests"] for route, row in rows.items() if route != EMAIL_ROUTE)
+    print(f"{'total':<42}{total:>9}{total / elapsed:>9.1f}")
+    if resources:
+        print(
+            f"server: cpu {resources['cpu_percent_mean']}% mean / {resources['cpu_percent_max']}% max"
+            f" ({resources['cpu_ms_per_request']} ms cpu/request), rss {resources['rss_mb_start']} -> "
+            f"{resources['rss_mb_end']} MB (max {resources['rss_mb_max']}), threads max {resources['threads_max']},"
+            f" processes {resources['processes']}"
+        )
+
+
+def parse_mix(text):
+    weights = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name not in ACTIONS:
+            raise SystemExit(f"unknown action {name!r}, expected one of {', '.join(ACTIONS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+async def main_async(args):
+    smtp = SmtpStandIn(args.standin_host, args.smtp_port).start()
+    google = GoogleStandIn(args.standin_host, args.google_port).start()
+    print("# start the API with:")
+    for key, value in {**smtp.env(), **google.env()}.items():
+        print(f"export {key}={value}")
+    sys.stdout.flush()
+
+    if args.mix:
+        scenarios = {"custom": parse_mix(args.mix)}
+    elif "all" in args.scenario:
+        scenarios = dict(SCENARIOS)
+    else:
+        scenarios = {name: SCENARIOS[name] for name in args.scenario}
+
+    try:
+        await wait_ready(args.base_url, args.ready_timeout)
+        accounts = Accounts(args.run_id or uuid.uuid4().hex[:8])
+        setup_stats = await setup(args.base_url, accounts, smtp, google, args.accounts, args.google_accounts,
+                                  args.setup_concurrency, args.seed)
+        print(f"setup: {len(accounts.password)} password and {len(accounts.google)} Google accounts")
+        if not accounts.password:
+            print_report("setup", setup_stats.summary(1), None, 1)
+            raise SystemExit("setup could not create any account")
+
+        report = {
+            "meta": {
+                "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "commit": _git_commit(),
+                "base_url": args.base_url,
+                "concurrency": args.concurrency,
+                "duration": args.duration,
+                "think_ms": args.think_ms,
+                "seed": args.seed,
+            },
+            "scenarios": {},
+        }
+        for name, weights in scenarios.items():
+            monitor = ResourceMonitor(args.server_pid) if args.server_pid else None
+            if monitor:
+                monitor.start()
+            stats, elapsed = await run_scenario(args.base_url, weights, accounts, smtp, google, args.concurrency,
+                                                args.duration, args.think_ms, args.seed)
+            if monitor:
+                monitor.stop()
+            rows = stats.summary(elapsed)
+            resources = monitor.summary(stats.total()) if monitor else None
+            print_report(name, rows, resources, elapsed)
+            report["scenarios"][name] = {"weights": weights, "elapsed": round(elapsed, 2), "routes": rows, "server": resources}
+    finally:
+        smtp.stop()
+        google.stop()
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"results: {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8080")
+    parser.add_argument("--scenario", action="append", choices=[*SCENARIOS, "all"], default=None)
+    parser.add_argument("--mix", help="custom weights instead of a scenario, e.g. login=70,teachers=30")
+    parser.add_argument("--concurrency", type=int, default=50, help="virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per scenario")
+    parser.add_argument("--think-ms", type=float, default=0, help="mean pause between actions of a virtual user")
+    parser.add_argument("--accounts", type=int, default=100, help="password accounts created before the load")
+    parser.add_argument("--google-accounts", type=int, default=20)
+    parser.add_argument("--setup-concurrency", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--run-id", help="prefix of the emails created (default: random)")
+    parser.add_argument("--server-pid", type=int, help="sample CPU/RSS of this process and its children")
+    parser.add_argument("--standin-host", default="127.0.0.1")
+    parser.add_argument("--smtp-port", type=int, default=2525)
+    parser.add_argument("--google-port", type=int, default=8025)
+    parser.add_argument("--ready-timeout", type=float, default=120, help="seconds to wait for /health/ready")
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args()
+    args.scenario = args.scenario or ["morning_peak"]
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Per-request logging cost, before and after the asynchronous level-gated pipeline.
+
+    python benchmarks/logging_cost.py                  # 5000 simulated requests
+    python benchmarks/logging_cost.py --requests 20000 --users 200
+
+A "request" logs what GET /users does today plus a 4xx error line: the user listing
+(`users is ...`, 50 users by default), one service line and one error. Both modes run in
+a fresh interpreter writing to /dev/null and time only the caller side, i.e. what the
+request thread pays:
+
+- before: the previous configuration (stdlib logger at DEBUG, structlog JSONRenderer
+  writing synchronously to stdout) with the previous eager f-string calls.
+- after: logger_config as configured now (LOG_LEVEL=INFO, queue + writer thread, orjson)
+  with lazy `%s` calls. Sampling is off unless LOG_SAMPLING=true is exported, so
+  every line is still written and the comparison is about the pipeline alone.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMMON = r"""
+import json, sys, time, uuid
+sys.path.insert(0, "src")
+from domain.user import User
+
+users = [
+    User(str(uuid.uuid4()), "Name", "Surname", "pbkdf2:sha256:600000$salt$" + "f" * 64,
+         f"user{i}@example.com", "active", "student", None, True, None)
+    for i in range(USERS)
+]
+"""
+
+BEFORE = COMMON + r"""
+import logging, structlog
+logging.basicConfig(format="%(message)s", stream=sys.stdout, level=logging.DEBUG)
+structlog.configure(
+    processors=[
+        structlog.stdlib.filter_by_level,
+        structlog.processors.TimeStamper(fmt="iso"),
+        lambda logger, method, event: {**event, "service": "users"},
+        structlog.processors.JSONRenderer(),
+    ],
+    context_class=dict,
+    logger_factory=structlog.stdlib.LoggerFactory(),
+    wrapper_class=structlog.stdlib.BoundLogger,
+    cache_logger_on_first_use=True,
+)
+logger = structlog.get_logger("api-users")
+
+def request():
+    logger.info(f"users is {users}")
+    logger.info(f"In service - create_users - user: {users[0]}")
+    logger.error(f"GET /users/123 - User not found: The user with uuid 123 was not found")
+
+start = time.perf_counter()
+for _ in range(REQUESTS):
+    request()
+elapsed = time.perf_counter() - start
+print(json.dumps({"us_per_request": elapsed / REQUESTS * 1e6}), file=sys.stderr)
+"""
+
+AFTER = COMMON + r"""
+import logger_config
+logger = logger_config.get_logger("api-users")
+
+def request():
+    logger.debug("users is %s", users)
+    logger.info("In service - create_users - user: %s", users[0])
+    logger.error("%s %s - %s: %s", "GET", "/users/123", "User not found", "The user with uuid 123 was not found")
+
+start = time.perf_counter()
+for _ in range(REQUESTS):
+    request()
+elapsed = time.perf_counter() - start
+logger_config.writer.drain(timeout=30)
+print(json.dumps({"us_per_request": elapsed / REQUESTS * 1e6, "dropped": logger_config.writer.dropped}), file=sys.stderr)
+"""
+
+
+def run(code, requests, users):
+    code = code.replace("REQUESTS", str(requests)).replace("USERS", str(users))
+    env = dict(os.environ, LOG_LEVEL="INFO", LOG_SAMPLING=os.getenv("LOG_SAMPLING", "false"), PYTHONPATH=os.pathsep.join([os.path.join(ROOT, "src"), ROOT]))
+    proc = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True,
+    )
+    return json.loads(proc.stderr.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+
+    before = run(BEFORE, args.requests, args.users)["us_per_request"]
+    after = run(AFTER, args.requests, args.users)
+    print(f"before: {before:.1f} us/request")
+    print(f"after:  {after['us_per_request']:.1f} us/request  ({before / after['us_per_request']:.1f}x faster, dropped lines: {after['dropped']})")
+
+
+if __name__ == "__main__":
+    main()
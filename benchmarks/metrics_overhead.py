@@ -0,0 +1,97 @@
+"""
+Cost of the metrics instrumentation on GET /users/<uuid>.
+
+    python benchmarks/metrics_overhead.py                     # 20000 requests x 5 rounds
+    python benchmarks/metrics_overhead.py --requests 50000 --rounds 7
+
+Runs the Flask app in-process (test client) against an in-memory fake connection, so only
+the Python code path is measured: this is the worst case, against a real database the
+instrumentation is an even smaller fraction. Each mode runs in its own interpreter with
+METRICS_ENABLED=true / false, alternating rounds so both see the same machine noise.
+The target is less than 2% overhead.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, sys, time, uuid
+from unittest.mock import patch
+sys.path.insert(0, "src")
+
+USER = {
+    "uuid": str(uuid.uuid4()), "name": "Test", "surname": "User", "password": "hash",
+    "email": "user.test@gmail.com", "status": "active", "role": "student",
+    "location": None, "notification": True, "id_biometric": None,
+}
+
+class FakeCursor:
+    def execute(self, query, params=None):
+        pass
+    def fetchone(self):
+        return (USER,)
+    def close(self):
+        pass
+
+class FakeConnection:
+    def cursor(self):
+        return FakeCursor()
+    def commit(self):
+        pass
+    def close(self):
+        pass
+
+with patch("psycopg.connect", return_value=FakeConnection()):
+    import app
+    client = app.users_app.test_client()
+    path = f"/users/{USER['uuid']}"
+    for _ in range(500):
+        client.get(path)
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        response = client.get(path)
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200, response.status_code
+print(json.dumps({"us_per_request": elapsed / REQUESTS * 1e6}))
+"""
+
+
+def run_once(enabled, requests):
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join([os.path.join(ROOT, "src"), ROOT]),
+        METRICS_ENABLED="true" if enabled else "false",
+        FLASK_ENV="testing",
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", CHILD.replace("REQUESTS", str(requests))],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])["us_per_request"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    on, off = [], []
+    for _ in range(args.rounds):
+        off.append(run_once(False, args.requests))
+        on.append(run_once(True, args.requests))
+
+    on_us, off_us = statistics.median(on), statistics.median(off)
+    overhead = (on_us - off_us) / off_us * 100
+    print(f"metrics off: {off_us:.1f} us/request  metrics on: {on_us:.1f} us/request  overhead: {overhead:+.2f}%")
+    sys.exit(0 if overhead < 2 else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Throwaway PostgreSQL for benchmarks, with the schema of initialize_users_db.sql.
+
+    with throwaway_postgres(dsn=None) as config:
+        ...  # DB_* env vars point to it, so DatabaseConfig / UsersRepository use it
+
+Where the server comes from, in order:
+1. `dsn` (e.g. a CI service container): the schema goes into a private schema
+   `bench_<pid>` (search_path set through PGOPTIONS) that is dropped afterwards,
+   so nothing of the existing database is touched.
+2. Local binaries (`initdb`/`pg_ctl` on PATH or in /usr/lib/postgresql/*/bin): a
+   cluster in a temp dir, unix socket only, fsync off.
+3. Docker: `postgres:16` on a random local port, removed at the end.
+"""
+
+import contextlib
+import glob
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+
+import psycopg
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA_FILE = os.path.join(ROOT, "initialize_users_db.sql")
+
+PASSWORD = "bench"
+
+
+def schema_statements(path=SCHEMA_FILE):
+    """
+    The statements of initialize_users_db.sql that run inside the users database:
+    everything after `\\c`, without the grants to the deployment role (user_db).
+    """
+    with open(path) as f:
+        text = f.read()
+    _bootstrap, _, body = text.partition("\\c classconnect_users")
+    body = body.split("\n", 1)[1]
+    lines = [line for line in body.splitlines() if not line.strip().startswith("--")]
+    statements = [s.strip() for s in "\n".join(lines).split(";")]
+    return [s for s in statements if s and "user_db" not in s]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(conninfo, timeout=60):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with psycopg.connect(conninfo, connect_timeout=2):
+                return
+        except psycopg.OperationalError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.5)
+
+
+def _pg_bin(name):
+    found = shutil.which(name)
+    if found:
+        return found
+    candidates = sorted(glob.glob(f"/usr/lib/postgresql/*/bin/{name}"))
+    return candidates[-1] if candidates else None
+
+
+def _start_local(workdir):
+    options = f"-k {workdir} -c listen_addresses='' -c fsync=off -c synchronous_commit=off -c full_page_writes=off"
+    subprocess.run([_pg_bin("pg_ctl"), "-D", os.path.join(workdir, "data"), "-o", options,
+                    "-l", os.path.join(workdir, "log"), "-w", "start"], check=True, capture_output=True)
+
+
+def _stop_local(workdir):
+    # immediate: as a crash, every session is cut at once.
+    subprocess.run([_pg_bin("pg_ctl"), "-D", os.path.join(workdir, "data"), "-m", "immediate", "stop"], capture_output=True)
+
+
+@contextlib.contextmanager
+def _local_cluster():
+    workdir = tempfile.mkdtemp(prefix="users-bench-pg-")
+    try:
+        subprocess.run([_pg_bin("initdb"), "-D", os.path.join(workdir, "data"), "-U", "postgres", "-A", "trust"],
+                       check=True, capture_output=True)
+        _start_local(workdir)
+        try:
+            yield {"DB_HOST": workdir, "DB_PORT": "5432", "DB_USER": "postgres", "DB_PASSWORD": PASSWORD, "DB_NAME": "postgres"}
+        finally:
+            _stop_local(workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+@contextlib.contextmanager
+def local_server_down(config):
+    """Kill the local cluster of `config` (throwaway_postgres without dsn or docker) and start it again on exit."""
+    _stop_local(config["DB_HOST"])
+    try:
+        yield
+    finally:
+        _start_local(config["DB_HOST"])
+
+
+@contextlib.contextmanager
+def _docker_container():
+    port = _free_port()
+    container = subprocess.run(
+        ["docker", "run", "-d", "--rm", "-e", f"POSTGRES_PASSWORD={PASSWORD}", "-p", f"127.0.0.1:{port}:5432",
+         "postgres:16", "-c", "fsync=off", "-c", "synchronous_commit=off"],
+        check=True, capture_output=True, text=True,
+    ).stdout.strip()
+    try:
+        yield {"DB_HOST": "127.0.0.1", "DB_PORT": str(port), "DB_USER": "postgres", "DB_PASSWORD": PASSWORD, "DB_NAME": "postgres"}
+    finally:
+        subprocess.run(["docker", "rm", "-f", container], capture_output=True)
+
+
+def _conninfo(config):
+    return f"dbname={config['DB_NAME']} user={config['DB_USER']} host={config['DB_HOST']} password={config['DB_PASSWORD']} port={config['DB_PORT']}"
+
+
+def _config_from_dsn(dsn):
+    params = psycopg.conninfo.conninfo_to_dict(dsn)
+    return {
+        "DB_HOST": params.get("host", "localhost"),
+        "DB_PORT": str(params.get("port", 5432)),
+        "DB_USER": params.get("user", ""),
+        "DB_PASSWORD": params.get("password", ""),
+        "DB_NAME": params.get("dbname", ""),
+    }
+
+
+@contextlib.contextmanager
+def throwaway_postgres(dsn=None):
+    """Yield the DB_* settings of a database with the users schema; they are also exported to os.environ."""
+    schema = None
+    if dsn:
+        server = contextlib.nullcontext(_config_from_dsn(dsn))
+        schema = f"bench_{os.getpid()}"
+    elif _pg_bin("initdb") and _pg_bin("pg_ctl"):
+        server = _local_cluster()
+    elif shutil.which("docker"):
+        server = _docker_container()
+    else:
+        raise RuntimeError("No PostgreSQL available: pass --dsn, install the server binaries or docker")
+
+    saved = {key: os.environ.get(key) for key in ("DB_HOST", "DB_PORT", "DB_USER", "DB_PASSWORD", "DB_NAME", "PGOPTIONS")}
+    with server as config:
+        conninfo = _conninfo(config)
+        _wait_ready(conninfo)
+        os.environ.update(config)
+        try:
+            with psycopg.connect(conninfo, autocommit=True) as conn:
+                if schema:
+                    conn.execute(f"CREATE SCHEMA {schema}")
+                    conn.execute(f"SET search_path TO {schema}, public")
+                    os.environ["PGOPTIONS"] = f"-c search_path={schema},public"
+                for statement in schema_statements():
+                    conn.execute(statement)
+            yield config
+        finally:
+            if schema:
+                with psycopg.connect(conninfo, autocommit=True) as conn:
+                    conn.execute(f"DROP SCHEMA {schema} CASCADE")
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
@@ -0,0 +1,241 @@
+"""
+UsersRepository benchmark against a real (throwaway) PostgreSQL.
+
+    python benchmarks/repository_benchmark.py                          # sizes 1000,10000,100000
+    python benchmarks/repository_benchmark.py --sizes 1000 --repeat 50
+    python benchmarks/repository_benchmark.py --dsn "host=localhost user=postgres password=x dbname=ci"
+    python benchmarks/repository_benchmark.py --save-baseline          # record a new baseline
+
+For each data size the tables are emptied and seeded (COPY) with N users by
+generate_users.py (default profile: ~60% of them with a location, a registration PIN and
+about one recovery PIN each), all derived from --seed so every run sees the same data. Then every public UsersRepository method is timed (median / p95 / mean). Methods
+that hash a password include the hashing, as in production.
+
+Results are written as JSON (--output) and compared with the baseline
+(benchmarks/baselines/repository.json): a method regresses when its median is more
+than --threshold slower *and* more than --min-ms slower. Exit code 1 on regressions.
+See postgres.py for where the database comes from.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path[:0] = [os.path.join(ROOT, "src"), ROOT, HERE]
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("METRICS_ENABLED", "false")
+os.environ.setdefault("TRACING_ENABLED", "false")
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+import generate_users  # noqa: E402
+from postgres import throwaway_postgres  # noqa: E402
+
+BASELINE = os.path.join(HERE, "baselines", "repository.json")
+RESULTS_DIR = os.path.join(HERE, "results")
+
+STATUSES = ["active", "inactive", "disabled"]
+
+
+
+def seed(conn, size, rng_seed, password_hash):
+    """Empty the tables and load `size` users (generate_users.py) with locations and PINs. Returns the users."""
+    conn.execute("TRUNCATE users CASCADE")
+    profile = generate_users.Profile(domain="bench.classconnect.com", password_hash=password_hash)
+    users, locations, pins = generate_users.chunk_rows(profile, rng_seed, 0, size)
+    with conn.cursor() as cur:
+        generate_users.copy_rows(cur, generate_users.COPY_USERS, users)
+        generate_users.copy_rows(cur, generate_users.COPY_LOCATIONS, locations)
+        generate_users.copy_rows(cur, generate_users.COPY_PINS, pins)
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.commit()
+    rows = conn.execute("SELECT uuid, email, status FROM users ORDER BY email").fetchall()
+    conn.commit()
+    return [{"uuid": uuid_, "email": email, "status": status} for uuid_, email, status in rows]
+
+
+def cases(repository, users, rng):
+    """(method name, setup() -> args). setup runs untimed before every call."""
+    counter = iter(range(10**9))
+
+    def any_user():
+        return rng.choice(users)
+
+    def fresh_pin():
+        user = any_user()
+        pin = f"{rng.randint(0, 999999):06d}"
+        repository.create_pin(str(user["uuid"]), pin, "registration")
+        return (user["email"], pin, "registration")
+
+    def new_user_params():
+        return ({
+            "name": "Bench", "surname": "User", "password": "bench-password",
+            "email": f"new{next(counter)}-{uuid.uuid4().hex[:8]}@bench.classconnect.com",
+            "status": "pending", "role": "student",
+        },)
+
+    def disposable_user():
+        params = new_user_params()
+        repository.insert_user(params[0])
+        return (repository.check_email(params[0]["email"]),)
+
+    return [
+        ("get_all_users", lambda: ()),
+        ("get_active_teachers", lambda: ()),
+        ("get_user", lambda: (any_user()["uuid"],)),
+        ("get_user_with_email", lambda: (any_user()["email"],)),
+        ("check_email", lambda: (any_user()["email"],)),
+        ("insert_user", new_user_params),
+        ("update_user", lambda: ({"name": "Bench", "surname": "Updated", "role": "student", "password": "bench-password"}, any_user()["uuid"])),
+        ("delete_users", disposable_user),
+        ("set_location", lambda: ({"uuid": any_user()["uuid"], "latitude": -34.6, "longitude": -58.4},)),
+        ("get_active_pin", lambda: (any_user()["uuid"], "registration")),
+        ("create_pin", lambda: (any_user()["uuid"], f"{rng.randint(0, 999999):06d}", "password_recovery")),
+        ("validate_and_use_pin", fresh_pin),
+        ("pin_in_progress", lambda: (str(any_user()["uuid"]),)),
+        ("pin_expired", lambda: (str(any_user()["uuid"]),)),
+        ("has_used_pin", lambda: (str(any_user()["uuid"]),)),
+        ("update_user_password", lambda: (any_user()["email"], "bench-password")),
+        ("invalidate_all_pins", lambda: (any_user()["uuid"],)),
+        ("activate_user", lambda: (any_user()["email"],)),
+        ("update_status", lambda: (any_user()["uuid"], rng.choice(STATUSES))),
+        ("update_notification", lambda: (any_user()["uuid"], rng.random() < 0.5)),
+        ("update_biometric_id", lambda: (any_user()["uuid"], uuid.uuid4().hex)),
+        ("missing_schema_columns", lambda: ()),
+    ]
+
+
+def time_method(method, setup, repeat, budget):
+    """Call `method(*setup())` up to `repeat` times (at least 3, at most `budget` seconds)."""
+    samples = []
+    method(*setup())  # warm up: plans, caches, the connection
+    deadline = time.perf_counter() + budget
+    while len(samples) < repeat and (len(samples) < 3 or time.perf_counter() < deadline):
+        args = setup()
+        start = time.perf_counter()
+        method(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(0.95 * len(samples)))], 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "iterations": len(samples),
+    }
+
+
+def run(sizes, repeat, budget, rng_seed, dsn):
+    from infrastructure.persistence.users_repository import UsersRepository
+
+    results = {}
+    with throwaway_postgres(dsn):
+        repository = UsersRepository()
+        conn = repository.conn
+        server_version = conn.execute("SHOW server_version").fetchone()[0]
+        password_hash = generate_password_hash("bench-password")
+        for size in sizes:
+            users = seed(conn, size, rng_seed, password_hash)
+            rng = random.Random(rng_seed)
+            results[str(size)] = {}
+            for name, setup in cases(repository, users, rng):
+                results[str(size)][name] = time_method(getattr(repository, name), setup, repeat, budget)
+                print(f"  {size:>8} {name:<24} {results[str(size)][name]['median_ms']:>10.3f} ms", file=sys.stderr)
+        repository.close()
+
+    return {
+        "meta": {
+            "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "postgres": server_version,
+            "sizes": sizes,
+            "repeat": repeat,
+            "seed": rng_seed,
+        },
+        "results": results,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def compare(current, baseline, threshold, min_ms):
+    """Rows (size, method, baseline ms, current ms, change %, regressed) for the methods in both runs."""
+    rows = []
+    for size, methods in current["results"].items():
+        for name, stats in methods.items():
+            before = baseline["results"].get(size, {}).get(name)
+            if before is None:
+                continue
+            old, new = before["median_ms"], stats["median_ms"]
+            change = (new - old) / old * 100 if old else 0.0
+            regressed = new > old * (1 + threshold) and new - old > min_ms
+            rows.append((size, name, old, new, change, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma separated user counts")
+    parser.add_argument("--repeat", type=int, default=30, help="timed calls per method and size")
+    parser.add_argument("--budget", type=float, default=10.0, help="max seconds per method and size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dsn", help="use this server (a private schema is created and dropped)")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/repository-<date>.json)")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.20, help="allowed median slowdown (0.20 = 20%%)")
+    parser.add_argument("--min-ms", type=float, default=0.5, help="ignore slowdowns smaller than this")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    current = run(sizes, args.repeat, args.budget, args.seed, args.dsn)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"repository-{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(current, f, indent=2)
+    print(f"results: {output}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"baseline saved: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare with (run with --save-baseline)")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    rows = compare(current, baseline, args.threshold, args.min_ms)
+    print(f"{'size':>8} {'method':<24} {'baseline':>10} {'current':>10} {'change':>8}")
+    for size, name, old, new, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{size:>8} {name:<24} {old:>10.3f} {new:>10.3f} {change:>+7.1f}%{flag}")
+    regressions = [row for row in rows if row[-1]]
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%} / {args.min_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
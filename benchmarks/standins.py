@@ -0,0 +1,274 @@
+"""
+Local stand-ins for the external services the API talks to, for load tests.
+
+- SmtpStandIn: a minimal SMTP server (EHLO, AUTH, MAIL, RCPT, DATA, QUIT, no TLS). It
+  keeps the last PIN sent to each recipient, so a test can finish a signup.
+  The API must run with SMTP_SERVER/SMTP_PORT pointing to it and SMTP_STARTTLS=false.
+- GoogleStandIn: serves the public certificate of a local RSA key at /certs and mints
+  Google-like ID tokens signed with it. The API must run with GOOGLE_CERTS_URL pointing
+  to it and GOOGLE_CLIENT_ID equal to the stand-in client id.
+
+    python benchmarks/standins.py --smtp-port 2525 --google-port 8025
+
+runs both and prints the environment for the API (useful to try the flows by hand).
+"""
+
+import argparse
+import asyncio
+import base64
+import datetime
+import email
+import http.server
+import json
+import re
+import threading
+import time
+import uuid
+
+_PIN = re.compile(r"<strong>\s*(\w+)\s*</strong>")
+
+CLIENT_ID = "load-test.apps.googleusercontent.com"
+
+
+class SmtpStandIn:
+    """SMTP server on its own event loop thread. `latency` is added to every DATA."""
+
+    def __init__(self, host="127.0.0.1", port=2525, latency=0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.messages = 0
+        self._pins = {}
+        self._lock = threading.Lock()
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._server = self._loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port))
+            self.port = self._server.sockets[0].getsockname()[1]
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="smtp-standin", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    def env(self):
+        return {"SMTP_SERVER": self.host, "SMTP_PORT": str(self.port), "SMTP_STARTTLS": "false",
+                "SMTP_USERNAME": "load-test", "SMTP_PASSWORD": "load-test", "EMAIL_FROM": "no-reply@load-test.local"}
+
+    def last_pin(self, recipient):
+        with self._lock:
+            return self._pins.get(recipient.lower())
+
+    def pop_pin(self, recipient):
+        with self._lock:
+            return self._pins.pop(recipient.lower(), None)
+
+    async def wait_pin(self, recipient, timeout=10.0):
+        """Wait (from any event loop) until a PIN for `recipient` arrives and take it."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            pin = self.pop_pin(recipient)
+            if pin is not None:
+                return pin
+            await asyncio.sleep(0.02)
+        return None
+
+    def _store(self, recipients, data):
+        message = email.message_from_bytes(data)
+        for part in message.walk():
+            payload = part.get_payload(decode=True)
+            if not payload:
+                continue
+            match = _PIN.search(payload.decode(part.get_content_charset() or "utf-8", errors="replace"))
+            if match:
+                with self._lock:
+                    self.messages += 1
+                    for recipient in recipients:
+                        self._pins[recipient.lower()] = match.group(1)
+                return
+
+    async def _handle(self, reader, writer):
+        recipients = []
+
+        async def reply(line):
+            writer.write(line.encode() + b"\r\n")
+            await writer.drain()
+
+        try:
+            await reply("220 load-test ESMTP")
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode(errors="replace").strip()
+                verb = command.split(" ", 1)[0].upper()
+                if verb in ("EHLO", "HELO"):
+                    await reply("250-load-test\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME")
+                elif verb == "AUTH":
+                    # Any credentials are accepted; only ask for what the client has not sent yet.
+                    mechanism, *initial = command.split()[1:]
+                    prompts = ["Username:", "Password:"] if mechanism.upper() == "LOGIN" else [""]
+                    for prompt in prompts[len(initial):]:
+                        await reply(f"334 {base64.b64encode(prompt.encode()).decode()}")
+                        await reader.readline()
+                    await reply("235 2.7.0 Authentication successful")
+                elif verb == "MAIL":
+                    recipients = []
+                    await reply("250 OK")
+                elif verb == "RCPT":
+                    recipients.append(command.partition(":")[2].strip().strip("<>"))
+                    await reply("250 OK")
+                elif verb == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    lines = []
+                    while True:
+                        data = await reader.readline()
+                        if data in (b".\r\n", b".\n", b""):
+                            break
+                        lines.append(data[1:] if data.startswith(b"..") else data)
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                    self._store(recipients, b"".join(lines))
+                    await reply("250 OK queued")
+                elif verb == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("250 OK")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+class GoogleStandIn:
+    """Certificate endpoint (GET /certs) on a thread plus a token minter with the matching key."""
+
+    KEY_ID = "load-test"
+
+    def __init__(self, host="127.0.0.1", port=8025, client_id=CLIENT_ID):
+        from cryptography import x509
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        from cryptography.x509.oid import NameOID
+        from google.auth import crypt
+
+        self.host = host
+        self.port = port
+        self.client_id = client_id
+        self.cert_requests = 0
+
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "load-test")])
+        now = datetime.datetime.now(datetime.timezone.utc)
+        certificate = (
+            x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(days=1)).not_valid_after(now + datetime.timedelta(days=1))
+            .sign(key, hashes.SHA256())
+        )
+        private_pem = key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+        self._signer = crypt.RSASigner.from_string(private_pem, key_id=self.KEY_ID)
+        self._certs = json.dumps(
+            {self.KEY_ID: certificate.public_bytes(serialization.Encoding.PEM).decode()}
+        ).encode()
+        self._server = None
+
+    def start(self):
+        standin = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/certs":
+                    self.send_error(404)
+                    return
+                standin.cert_requests += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(standin._certs)))
+                self.send_header("Cache-Control", "public, max-age=3600")
+                self.end_headers()
+                self.wfile.write(standin._certs)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="google-standin", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    @property
+    def certs_url(self):
+        return f"http://{self.host}:{self.port}/certs"
+
+    def env(self):
+        return {"GOOGLE_CERTS_URL": self.certs_url, "GOOGLE_CLIENT_ID": self.client_id}
+
+    def mint_token(self, email_address, given_name="Load", family_name="Test", lifetime=3600):
+        from google.auth import jwt
+
+        now = int(time.time())
+        payload = {
+            "iss": "https://accounts.google.com",
+            "aud": self.client_id,
+            "sub": str(uuid.uuid5(uuid.NAMESPACE_URL, email_address).int),
+            "email": email_address,
+            "email_verified": True,
+            "name": f"{given_name} {family_name}",
+            "given_name": given_name,
+            "family_name": family_name,
+            "picture": "https://example.com/photo.png",
+            "iat": now,
+            "exp": now + lifetime,
+        }
+        return jwt.encode(self._signer, payload).decode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--smtp-port", type=int, default=2525)
+    parser.add_argument("--google-port", type=int, default=8025)
+    parser.add_argument("--token-for", help="print an ID token for this email and keep serving")
+    args = parser.parse_args()
+
+    smtp = SmtpStandIn(args.host, args.smtp_port).start()
+    google = GoogleStandIn(args.host, args.google_port).start()
+    for key, value in {**smtp.env(), **google.env()}.items():
+        print(f"export {key}={value}")
+    if args.token_for:
+        print(f"# token: {google.mint_token(args.token_for)}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        smtp.stop()
+        google.stop()
+
+
+if __name__ == "__main__":
+    main()
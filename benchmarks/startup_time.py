@@ -0,0 +1,80 @@
+"""
+Cold start benchmark: time from interpreter start to the first /health response.
+
+    python benchmarks/startup_time.py                 # import app.py + test client, 10 runs
+    python benchmarks/startup_time.py --runs 20 --importtime
+
+Each run is a fresh interpreter, so nothing is cached between runs. It also reports the
+heavy modules that got imported during startup: with lazy initialization, authlib and
+google-auth must only appear once a federated route is hit, and no DB connection is opened.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, "src")
+import app
+response = app.users_app.test_client().get("/health")
+elapsed = time.perf_counter() - start
+heavy = [m for m in ("authlib", "google.oauth2", "google.auth", "psycopg_pool") if m in sys.modules]
+repository = app.user_controller.user_service.user_repository
+print(json.dumps({
+    "seconds": elapsed,
+    "status": response.status_code,
+    "heavy_modules": heavy,
+    "db_connections": getattr(repository, "open_connections", None),
+}))
+"""
+
+
+def run_once(importtime=False):
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", CHILD]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.join(ROOT, "src"), ROOT]))
+    proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    if importtime:
+        result["slowest_imports"] = _slowest_imports(proc.stderr)
+    return result
+
+
+def _slowest_imports(stderr, top=10):
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), name.strip()))
+    return [f"{name} {us / 1000:.1f} ms" for us, name in sorted(rows, reverse=True)[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--importtime", action="store_true", help="also list the slowest imports (last run)")
+    args = parser.parse_args()
+
+    results = [run_once() for _ in range(args.runs)]
+    times = sorted(r["seconds"] * 1000 for r in results)
+    print(f"runs: {args.runs}  median: {statistics.median(times):.1f} ms  min: {times[0]:.1f} ms  max: {times[-1]:.1f} ms")
+    print(f"/health status: {results[-1]['status']}  db connections at startup: {results[-1]['db_connections']}")
+    print(f"heavy modules imported at startup: {results[-1]['heavy_modules'] or 'none'}")
+
+    if args.importtime:
+        for line in run_once(importtime=True)["slowest_imports"]:
+            print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Export every user (with its location) to a file or stdout, straight from COPY TO.
+
+    python export_users.py > users.csv
+    python export_users.py --format ndjson --columns uuid,email,role,latitude,longitude --gzip -o users.ndjson.gz
+    python export_users.py --columns uuid,email,password   # credentials only when named
+
+Reads the database in DB_* (as generate_users.py) or --dsn. Memory stays constant
+whatever the number of users: the bytes PostgreSQL renders are written as they arrive.
+Same columns and formats as GET /users/export; password and id_biometric are not
+exported unless listed in --columns.
+"""
+
+import argparse
+import sys
+import time
+
+import psycopg
+
+from src.infrastructure.config.db_config import DatabaseConfig
+from src.infrastructure.persistence import users_export
+
+
+def export(conninfo, columns, fmt, out, compress=False):
+    """Write the export to the binary file `out`. Returns the bytes written."""
+    written = 0
+    with psycopg.connect(conninfo) as conn, conn.cursor() as cursor:
+        with cursor.copy(users_export.copy_query(columns, fmt)) as copy:
+            chunks = users_export.buffered(copy)
+            if compress:
+                chunks = users_export.gzipped(chunks)
+            for chunk in chunks:
+                out.write(chunk)
+                written += len(chunk)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--format", choices=users_export.FORMATS, default="csv")
+    parser.add_argument("--columns", default=None,
+                        help=f"comma separated, default {','.join(users_export.DEFAULT_COLUMNS)}")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("-o", "--output", help="default: stdout")
+    parser.add_argument("--dsn", help="default: DB_* environment variables")
+    args = parser.parse_args()
+
+    try:
+        columns = users_export.parse_columns(args.columns)
+    except ValueError as e:
+        parser.error(str(e))
+
+    conninfo = args.dsn or DatabaseConfig().connection_strings
+    start = time.perf_counter()
+    if args.output:
+        with open(args.output, "wb") as out:
+            written = export(conninfo, columns, args.format, out, compress=args.gzip)
+    else:
+        written = export(conninfo, columns, args.format, sys.stdout.buffer, compress=args.gzip)
+    print(f"{written:,} bytes en {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+Synthetic users for benchmarks and capacity planning.
+
+    python generate_users.py --users 1000000 --truncate
+    python generate_users.py --users 5000000 --jobs 8 --roles student=0.8,teacher=0.2 \
+        --statuses active=0.9,inactive=0.07,disabled=0.03 --locations 0.7 --pins 2 --seed 7
+
+Loads `users`, `user_locations` and `pins` of the database in DB_* (as create_first_admin.py)
+or --dsn. Everything is derived from --seed: the same arguments give the same rows (uuids
+included), whatever the number of --jobs (not of --chunk-size: each chunk has its own
+random stream), so benchmark runs are comparable.
+
+- Role, status and notification follow the given mix; --biometric of the users have an
+  id_biometric.
+- Locations (--locations share of the users) are clustered around cities (--clusters,
+  JSON [[lat, lon, weight, spread_km], ...]; default: the biggest Argentine cities).
+- Pins: a registration PIN per user (used unless the user is inactive) plus on average
+  --pins password recovery PINs, spread over the --history-days before --as-of (a fixed
+  date, not the clock, so that the rows do not change from one day to the next).
+- Every user has the password --password (hashed once: hashing millions of passwords
+  would take hours and the hash cost is not what is being measured). Emails are
+  user<N>@<--domain>, so a later run with --offset N adds users without collisions.
+
+Throughput: rows are rendered as COPY text in bulk (no per-row round trips), chunks of
+--chunk-size users load in parallel (--jobs connections, each chunk in one transaction
+with synchronous_commit off), and the secondary indexes of pins are dropped during the
+load and rebuilt at the end (--keep-indexes to leave them).
+"""
+
+import argparse
+import bisect
+import datetime
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import psycopg
+from werkzeug.security import generate_password_hash
+
+from src.infrastructure.config.db_config import DatabaseConfig
+
+FIRST_NAMES = [
+    "Ana", "Juan", "María", "Pedro", "Lucía", "Martín", "Sofía", "Diego", "Valentina", "Tomás",
+    "Camila", "Mateo", "Julieta", "Santiago", "Florencia", "Nicolás", "Agustina", "Facundo", "Paula", "Lautaro",
+]
+SURNAMES = [
+    "García", "Rodríguez", "González", "Fernández", "López", "Martínez", "Pérez", "Gómez",
+    "Díaz", "Sánchez", "Romero", "Sosa", "Álvarez", "Torres", "Ruiz", "Ramírez", "Flores", "Benítez",
+]
+
+# (latitude, longitude, weight, spread in km)
+DEFAULT_CLUSTERS = [
+    (-34.6037, -58.3816, 0.45, 15.0),  # Buenos Aires
+    (-31.4201, -64.1888, 0.12, 8.0),   # Córdoba
+    (-32.9442, -60.6505, 0.10, 6.0),   # Rosario
+    (-32.8895, -68.8458, 0.07, 6.0),   # Mendoza
+    (-34.9214, -57.9544, 0.06, 5.0),   # La Plata
+    (-26.8083, -65.2176, 0.05, 5.0),   # Tucumán
+    (-38.0055, -57.5426, 0.05, 5.0),   # Mar del Plata
+    (-31.6333, -60.7000, 0.04, 4.0),   # Santa Fe
+    (-24.7821, -65.4232, 0.03, 4.0),   # Salta
+    (-41.1335, -71.3103, 0.03, 3.0),   # Bariloche
+]
+KM_PER_DEGREE = 111.0
+
+COPY_USERS = "COPY users (uuid, name, surname, password, email, status, role, notification, id_biometric) FROM STDIN"
+COPY_LOCATIONS = "COPY user_locations (uuid, latitude, longitude) FROM STDIN"
+COPY_PINS = "COPY pins (pin_id, user_id, pin_code, pin_type, created_at, used) FROM STDIN"
+
+PIN_INDEXES = {
+    "idx_pins_user_id": "CREATE INDEX IF NOT EXISTS idx_pins_user_id ON pins(user_id)",
+    "idx_pins_pin_code": "CREATE INDEX IF NOT EXISTS idx_pins_pin_code ON pins(pin_code)",
+}
+
+FLUSH_BYTES = 1 << 20
+
+# PIN timestamps are relative to this date, not to the clock: same seed, same rows.
+AS_OF = datetime.datetime(2025, 6, 1, tzinfo=datetime.timezone.utc)
+
+
+class Profile:
+    """What the generated population looks like (see the module docstring)."""
+
+    def __init__(self, roles=None, statuses=None, notification=0.8, biometric=0.1, locations=0.6,
+                 clusters=None, pins=1.0, history_days=365, domain="synthetic.classconnect.com",
+                 password_hash=None, now=None):
+        self.roles = roles or {"student": 0.85, "teacher": 0.15}
+        self.statuses = statuses or {"active": 0.9, "inactive": 0.07, "disabled": 0.03}
+        self.notification = notification
+        self.biometric = biometric
+        self.locations = locations
+        self.clusters = clusters or DEFAULT_CLUSTERS
+        self.pins = pins
+        self.history_days = history_days
+        self.domain = domain
+        self.password_hash = password_hash or "synthetic"
+        self.now = now or AS_OF
+
+
+class _Picker:
+    """Weighted choice with one random() and a bisect (rng.choices is several times slower)."""
+
+    def __init__(self, items, weights):
+        self.items = list(items)
+        self.cumulative = list(itertools.accumulate(weights))
+        self.total = self.cumulative[-1]
+
+    def __call__(self, rng):
+        return self.items[bisect.bisect(self.cumulative, rng.random() * self.total)]
+
+
+def _uuid4(rng):
+    """uuid4 text from the seeded rng (str(uuid.UUID(...)) costs more than the rest of the row)."""
+    value = f"{rng.getrandbits(128) & _UUID_CLEAR | _UUID_SET:032x}"
+    return f"{value[:8]}-{value[8:12]}-{value[12:16]}-{value[16:20]}-{value[20:]}"
+
+
+_UUID_CLEAR = ~((0xF000 << 64) | (0xC000 << 48))
+_UUID_SET = (0x4000 << 64) | (0x8000 << 48)
+
+
+class _Timestamps:
+    """Seconds before `as_of` -> timestamptz text; the date part is cached per day."""
+
+    def __init__(self, as_of):
+        self.epoch = int(as_of.timestamp())
+        self._days = {}
+
+    def __call__(self, seconds_ago):
+        moment = self.epoch - seconds_ago
+        day, second = divmod(moment, 86400)
+        date = self._days.get(day)
+        if date is None:
+            date = self._days[day] = datetime.date.fromordinal(_EPOCH_ORDINAL + day).isoformat()
+        hour, second = divmod(second, 3600)
+        minute, second = divmod(second, 60)
+        return f"{date} {hour:02d}:{minute:02d}:{second:02d}+00"
+
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+def chunk_rows(profile, seed, first, count):
+    """
+    COPY text of users [first, first + count): (users, locations, pins).
+    Only depends on (profile, seed, first): chunk k of a run is the same in every run.
+    """
+    rng = random.Random(f"{seed}:{first}")
+    random_ = rng.random
+    role = _Picker(profile.roles, profile.roles.values())
+    status_of = _Picker(profile.statuses, profile.statuses.values())
+    cluster = _Picker(profile.clusters, [c[2] for c in profile.clusters])
+    timestamp = _Timestamps(profile.now)
+    history = max(1, profile.history_days * 86400)
+    max_recovery = int(round(2 * profile.pins))  # recovery PINs per user: 0..2*mean
+    password, domain = profile.password_hash, profile.domain
+
+    users, locations, pins = [], [], []
+    for index in range(first, first + count):
+        user_id = _uuid4(rng)
+        status = status_of(rng)
+        biometric = _uuid4(rng).replace("-", "") if random_() < profile.biometric else "\\N"
+        users.append(
+            f"{user_id}\t{rng.choice(FIRST_NAMES)}\t{rng.choice(SURNAMES)}\t{password}\tuser{index}@{domain}\t"
+            f"{status}\t{role(rng)}\t{'t' if random_() < profile.notification else 'f'}\t{biometric}\n"
+        )
+
+        if random_() < profile.locations:
+            latitude, longitude, _weight, spread_km = cluster(rng)
+            spread = spread_km / KM_PER_DEGREE
+            locations.append(f"{user_id}\t{rng.gauss(latitude, spread):.6f}\t{rng.gauss(longitude, spread):.6f}\n")
+
+        signed_up = rng.randrange(history)  # seconds before as_of
+        pins.append(
+            f"{_uuid4(rng)}\t{user_id}\t{rng.randrange(10000):04d}\tregistration\t{timestamp(signed_up)}\t"
+            f"{'f' if status == 'inactive' else 't'}\n"
+        )
+        for _ in range(rng.randint(0, max_recovery) if max_recovery else 0):
+            ago = int(signed_up * random_())
+            # 70% were used; the rest expired (or are still open, if from the last 10 minutes).
+            used = random_() < 0.7
+            pins.append(
+                f"{_uuid4(rng)}\t{user_id}\t{rng.randrange(10000):04d}\tpassword_recovery\t{timestamp(ago)}\t"
+                f"{'t' if used else 'f'}\n"
+            )
+    return users, locations, pins
+
+
+def copy_rows(cursor, statement, rows):
+    """COPY already rendered text rows, in ~1 MiB writes."""
+    with cursor.copy(statement) as copy:
+        buffer, size = [], 0
+        for row in rows:
+            buffer.append(row)
+            size += len(row)
+            if size >= FLUSH_BYTES:
+                copy.write("".join(buffer))
+                buffer, size = [], 0
+        if buffer:
+            copy.write("".join(buffer))
+
+
+def load_chunk(conninfo, profile, seed, first, count):
+    """Generate and load one chunk in its own transaction. Returns (users, locations, pins)."""
+    users, locations, pins = chunk_rows(profile, seed, first, count)
+    with psycopg.connect(conninfo) as conn:
+        conn.execute("SET synchronous_commit TO off")
+        with conn.cursor() as cursor:
+            copy_rows(cursor, COPY_USERS, users)
+            copy_rows(cursor, COPY_LOCATIONS, locations)
+            copy_rows(cursor, COPY_PINS, pins)
+    return len(users), len(locations), len(pins)
+
+
+def _load_chunk(args):
+    return load_chunk(*args)
+
+
+def generate(conninfo, profile, users, seed=42, offset=0, jobs=1, chunk_size=50_000,
+             truncate=False, keep_indexes=False, progress=None):
+    """Load `users` synthetic users (emails user<offset>..). Returns the totals per table."""
+    with psycopg.connect(conninfo, autocommit=True) as conn:
+        if truncate:
+            conn.execute("TRUNCATE users CASCADE")
+        if not keep_indexes:
+            for name in PIN_INDEXES:
+                conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+    chunks = [
+        (conninfo, profile, seed, first, min(chunk_size, offset + users - first))
+        for first in range(offset, offset + users, chunk_size)
+    ]
+    totals = [0, 0, 0]
+    try:
+        if jobs > 1:
+            # fork copies the imported modules: the workers only need the arguments.
+            with multiprocessing.get_context("fork").Pool(jobs) as pool:
+                results = pool.imap_unordered(_load_chunk, chunks)
+                for loaded in results:
+                    totals = [a + b for a, b in zip(totals, loaded)]
+                    if progress:
+                        progress(totals)
+        else:
+            for chunk in chunks:
+                totals = [a + b for a, b in zip(totals, load_chunk(*chunk))]
+                if progress:
+                    progress(totals)
+    finally:
+        with psycopg.connect(conninfo, autocommit=True) as conn:
+            if not keep_indexes:
+                for statement in PIN_INDEXES.values():
+                    conn.execute(statement)
+            conn.execute("ANALYZE users")
+            conn.execute("ANALYZE user_locations")
+            conn.execute("ANALYZE pins")
+    return {"users": totals[0], "user_locations": totals[1], "pins": totals[2]}
+
+
+def _date(text):
+    return datetime.datetime.strptime(text, "%Y-%m-%d").replace(tzinfo=datetime.timezone.utc)
+
+
+def parse_mix(text):
+    """'student=0.8,teacher=0.2' -> {'student': 0.8, 'teacher': 0.2}"""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight)
+    if not mix or any(weight < 0 for weight in mix.values()) or sum(mix.values()) <= 0:
+        raise argparse.ArgumentTypeError(f"invalid mix: {text}")
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, required=True)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--offset", type=int, default=0, help="first user number (emails user<N>@domain)")
+    parser.add_argument("--roles", type=parse_mix, default=None, help="default student=0.85,teacher=0.15")
+    parser.add_argument("--statuses", type=parse_mix, default=None, help="default active=0.9,inactive=0.07,disabled=0.03")
+    parser.add_argument("--notification", type=float, default=0.8, help="share with notifications on")
+    parser.add_argument("--biometric", type=float, default=0.1, help="share with id_biometric")
+    parser.add_argument("--locations", type=float, default=0.6, help="share with a location")
+    parser.add_argument("--clusters", type=json.loads, default=None, help="JSON [[lat, lon, weight, spread_km], ...]")
+    parser.add_argument("--pins", type=float, default=1.0, help="mean password recovery PINs per user")
+    parser.add_argument("--history-days", type=int, default=365)
+    parser.add_argument("--as-of", type=_date, default=AS_OF, help="end of the PIN history, YYYY-MM-DD (fixed for reproducibility)")
+    parser.add_argument("--domain", default="synthetic.classconnect.com")
+    parser.add_argument("--password", default="synthetic-password", help="password of every generated user")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="parallel connections")
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--truncate", action="store_true", help="empty the tables first (all their users!)")
+    parser.add_argument("--keep-indexes", action="store_true", help="do not drop the pins indexes during the load")
+    parser.add_argument("--dsn", help="default: DB_* environment variables")
+    args = parser.parse_args()
+
+    profile = Profile(
+        roles=args.roles, statuses=args.statuses, notification=args.notification, biometric=args.biometric,
+        locations=args.locations, clusters=[tuple(cluster) for cluster in args.clusters] if args.clusters else None,
+        pins=args.pins, history_days=args.history_days, domain=args.domain,
+        password_hash=generate_password_hash(args.password),
+        now=args.as_of,
+    )
+    conninfo = args.dsn or DatabaseConfig().connection_strings
+    start = time.perf_counter()
+
+    def progress(totals):
+        elapsed = time.perf_counter() - start
+        print(f"\r{totals[0]:>12,} usuarios  {totals[0] / elapsed:>10,.0f} usuarios/s", end="", file=sys.stderr)
+
+    try:
+        totals = generate(conninfo, profile, args.users, seed=args.seed, offset=args.offset, jobs=args.jobs,
+                          chunk_size=args.chunk_size, truncate=args.truncate, keep_indexes=args.keep_indexes,
+                          progress=progress)
+    except psycopg.Error as e:
+        print(f"\nError de base de datos: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    elapsed = time.perf_counter() - start
+    print(file=sys.stderr)
+    print(f"Éxito: {totals['users']:,} usuarios, {totals['user_locations']:,} ubicaciones y {totals['pins']:,} pins "
+          f"en {elapsed:.1f}s ({totals['users'] / elapsed:,.0f} usuarios/s)")
+
+
+if __name__ == "__main__":
+    main()
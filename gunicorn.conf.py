@@ -0,0 +1,78 @@
+"""
+Production server configuration.
+
+    gunicorn --config gunicorn.conf.py src.app:users_app
+
+Every setting can be overridden with environment variables so the same image
+can be sized per pod (WEB_CONCURRENCY workers x GUNICORN_THREADS threads).
+"""
+
+import os
+
+
+def _cpu_count():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+
+# One process per core, a few threads each: requests mostly wait on Postgres, SMTP or Google.
+workers = int(os.getenv("WEB_CONCURRENCY", _cpu_count()))
+# Twice the requests admission lets run (ADMISSION_MAX_IN_FLIGHT): the rest can queue or be shed.
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+
+# Import the app once in the master and fork it (faster start, shared memory pages).
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+# On SIGTERM workers stop accepting and get this long to finish in-flight requests.
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 25))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+# PINs in memory (PIN_STORE=memory) live in the worker: one worker, never recycled.
+PINS_IN_MEMORY = os.getenv("PIN_STORE", "postgres").lower() == "memory"
+
+# Recycle workers periodically to bound memory growth.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 0 if PINS_IN_MEMORY else 5000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 500))
+
+accesslog = None
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    """Master: refuse PIN_STORE=memory with several workers (each one would have its own PINs)."""
+    if PINS_IN_MEMORY and server.cfg.workers > 1:
+        raise RuntimeError(
+            f"PIN_STORE=memory needs a single worker (WEB_CONCURRENCY=1), not {server.cfg.workers}: "
+            "a PIN issued by one worker is unknown to the others"
+        )
+    if PINS_IN_MEMORY and server.cfg.max_requests:
+        server.log.warning("PIN_STORE=memory with GUNICORN_MAX_REQUESTS=%s: a recycled worker forgets its PINs",
+                           server.cfg.max_requests)
+
+
+def pre_fork(server, worker):
+    """Master: drop the resources the preloaded app opened (DB connections...)."""
+    from infrastructure import lifecycle
+
+    lifecycle.run_before_fork()
+
+
+def post_fork(server, worker):
+    """Worker: rebuild per-process resources (connections, caches, executors)."""
+    from infrastructure import lifecycle
+
+    lifecycle.run_after_fork()
+
+
+def worker_exit(server, worker):
+    """Worker: graceful drain finished, release resources."""
+    from infrastructure import lifecycle
+
+    lifecycle.run_shutdown()
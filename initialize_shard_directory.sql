@@ -0,0 +1,20 @@
+-- Directory of the sharded deployment (USERS_REPOSITORY=sharded). Lives in the DB_*
+-- database; the shards (DB_SHARD_HOSTS) have the schema of initialize_users_db.sql.
+-- `python reshard_users.py init` creates these tables.
+
+-- Owner of each of the 1024 slots (slot = first 32 bits of the uuid % 1024).
+-- state 'moving': reshard_users.py is copying the slot, writes to it wait.
+CREATE TABLE IF NOT EXISTS users_shard_slots (
+    slot INTEGER PRIMARY KEY,
+    shard TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'active' CHECK (state IN ('active', 'moving'))
+);
+
+-- email -> uuid (emails are not unique: one row per user). The shard comes from the slot.
+CREATE TABLE IF NOT EXISTS users_email_index (
+    uuid UUID PRIMARY KEY,
+    email TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_users_email_index_email ON users_email_index (email, created_at);
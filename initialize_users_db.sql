@@ -55,13 +55,33 @@ CREATE TABLE IF NOT EXISTS user_locations (
     FOREIGN KEY (uuid) REFERENCES users(uuid) ON DELETE CASCADE
 );
 
+-- Partitioned by day on created_at: `python maintain_pins.py` creates the daily
+-- partitions and drops the old ones. pins_default keeps inserts working meanwhile.
+-- Databases created before the partitioning: `python maintain_pins.py migrate`.
 CREATE TABLE IF NOT EXISTS pins (
-    pin_id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    pin_id UUID NOT NULL DEFAULT uuid_generate_v4(),
     user_id UUID NOT NULL,
     pin_code TEXT NOT NULL,
     pin_type TEXT NOT NULL CHECK (pin_type IN ('password_recovery', 'registration')),
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
     used BOOLEAN DEFAULT FALSE,
+    PRIMARY KEY (pin_id, created_at),
+    FOREIGN KEY (user_id) REFERENCES users(uuid) ON DELETE CASCADE
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE IF NOT EXISTS pins_default PARTITION OF pins DEFAULT;
+
+-- Users that used a PIN whose partition was dropped (has_used_pin).
+CREATE TABLE IF NOT EXISTS verified_users (
+    user_id UUID PRIMARY KEY,
+    verified_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    FOREIGN KEY (user_id) REFERENCES users(uuid) ON DELETE CASCADE
+);
+
+-- Users with an unconfirmed registration PIN whose partition was dropped (pin_expired).
+CREATE TABLE IF NOT EXISTS expired_registrations (
+    user_id UUID PRIMARY KEY,
+    expired_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
     FOREIGN KEY (user_id) REFERENCES users(uuid) ON DELETE CASCADE
 );
 
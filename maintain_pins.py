@@ -0,0 +1,63 @@
+"""
+Maintain the daily partitions of `pins` (see src/infrastructure/persistence/pin_partitions.py).
+
+    python maintain_pins.py             # create the coming days' partitions, drop the expired ones
+    python maintain_pins.py migrate     # partition the pins table of an existing database (once)
+    python maintain_pins.py explain     # partitions each PIN query reads (pruning check)
+
+Runs against the database in DB_* (or --dsn). `maintain` is idempotent: k8s runs it
+daily (k8s/pins-maintenance-cronjob.yaml). PIN_RETENTION_DAYS (default 30) and
+PIN_PARTITIONS_AHEAD (default 7), or --retention-days / --ahead.
+"""
+
+import argparse
+import os
+import sys
+import uuid
+
+import psycopg
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from infrastructure.config.db_config import DatabaseConfig  # noqa: E402
+from infrastructure.persistence import pin_partitions, users_queries  # noqa: E402
+
+# The PIN queries with sample parameters (the plan, not the rows, matters).
+PIN_QUERIES = {
+    "get_active_pin": (users_queries.GET_ACTIVE_PIN, (str(uuid.UUID(int=0)), "registration")),
+    "validate_and_use_pin": (users_queries.VALIDATE_AND_USE_PIN, ("user@example.com", "0000", "registration")),
+    "pin_in_progress": (users_queries.PIN_IN_PROGRESS, (str(uuid.UUID(int=0)),)),
+    "pin_expired": (users_queries.PIN_EXPIRED, {"user_id": str(uuid.UUID(int=0))}),
+    "has_used_pin": (users_queries.HAS_USED_PIN, {"user_id": str(uuid.UUID(int=0))}),
+}
+
+
+def explain(conn):
+    """{query: partitions its plan reads}"""
+    return {name: pin_partitions.scanned_partitions(conn, query, params) for name, (query, params) in PIN_QUERIES.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", nargs="?", choices=["maintain", "migrate", "explain"], default="maintain")
+    parser.add_argument("--dsn", help="default: DB_* environment variables")
+    parser.add_argument("--retention-days", type=int, default=pin_partitions.RETENTION_DAYS)
+    parser.add_argument("--ahead", type=int, default=pin_partitions.AHEAD_DAYS, help="days of partitions created in advance")
+    args = parser.parse_args()
+
+    with psycopg.connect(args.dsn or DatabaseConfig().connection_strings, autocommit=True) as conn:
+        if args.command == "migrate":
+            if not pin_partitions.migrate(conn, ahead=args.ahead, retention=args.retention_days):
+                print("pins is already partitioned")
+        elif args.command == "maintain":
+            summary = pin_partitions.maintain(conn, ahead=args.ahead, retention=args.retention_days)
+            print(f"created: {', '.join(summary['created']) or '-'} ({summary['moved']} rows moved from the default partition)")
+            print(f"dropped: {', '.join(summary['dropped']) or '-'} ({summary['verified']} users added to verified_users, "
+                  f"{summary['expired']} to expired_registrations)")
+        else:
+            for name, scanned in explain(conn).items():
+                print(f"{name:<22} {', '.join(scanned) or '(none)'}")
+
+
+if __name__ == "__main__":
+    main()
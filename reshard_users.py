@@ -0,0 +1,220 @@
+"""
+Manage the shards of USERS_REPOSITORY=sharded (see src/infrastructure/persistence/sharding.py).
+
+    python reshard_users.py init        # directory tables, every slot on the first shard, email index
+    python reshard_users.py rebalance   # spread the slots evenly over DB_SHARD_HOSTS, online
+    python reshard_users.py status
+    python reshard_users.py cleanup     # delete rows left on shards that do not own their slot
+
+The directory is the DB_* database (or --dsn); the shards are DB_SHARD_HOSTS (or
+--shard name=dsn, repeatable). Moving from one database to N shards: put the current
+database first in DB_SHARD_HOSTS, `init` (everything stays where it is) and `rebalance`.
+Adding a shard: append it to DB_SHARD_HOSTS, deploy, `rebalance`.
+
+Moving slots while the API serves traffic, --batch slots at a time:
+
+1. The slots are marked 'moving'. After --wait seconds (more than SHARD_MAP_REFRESH_SECONDS)
+   every worker has seen it: writes to those slots wait, reads keep going to the source.
+2. Their users, locations and PINs are copied to the destination (COPY TO -> COPY FROM,
+   in one transaction; leftovers of an interrupted move are deleted first).
+3. The slots change owner and become 'active': waiting writes go to the destination.
+4. After --wait seconds (no worker reads the source any more) the rows are deleted from
+   the source.
+
+Each batch blocks writes of 1/1024 of the users per slot for about --wait seconds.
+"""
+
+import argparse
+import collections
+import os
+import sys
+import time
+
+import psycopg
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from infrastructure.config.db_config import DatabaseConfig  # noqa: E402
+from infrastructure.persistence.sharding import MAP_REFRESH_SECONDS, SLOT_SQL, SLOTS  # noqa: E402
+from infrastructure.persistence.users_queries import REQUIRED_SCHEMA  # noqa: E402
+
+DIRECTORY_SCHEMA = os.path.join(ROOT, "initialize_shard_directory.sql")
+
+# Copied in this order (foreign keys), with the column that places each row.
+TABLES = [("users", "uuid"), ("user_locations", "uuid"), ("pins", "user_id"), ("verified_users", "user_id"),
+          ("expired_registrations", "user_id")]
+
+
+def plan(owners, shards):
+    """
+    Moves [(slot, source, destination)] that leave every shard in `shards` with SLOTS / len(shards)
+    slots (± 1), moving as few slots as possible. `owners`: {slot: shard}.
+    """
+    quota, extra = divmod(SLOTS, len(shards))
+    target = {shard: quota + (1 if i < extra else 0) for i, shard in enumerate(shards)}
+    by_shard = collections.defaultdict(list)
+    for slot in sorted(owners):
+        by_shard[owners[slot]].append(slot)
+
+    surplus = []  # (slot, source): slots of removed shards and of shards over their target
+    for shard, slots in by_shard.items():
+        keep = target.get(shard, 0)
+        surplus.extend((slot, shard) for slot in slots[keep:])
+    moves = []
+    for shard in shards:
+        missing = target[shard] - len(by_shard.get(shard, []))
+        for _ in range(max(missing, 0)):
+            slot, source = surplus.pop(0)
+            moves.append((slot, source, shard))
+    return moves
+
+
+def _slot_list(slots):
+    return ", ".join(str(int(slot)) for slot in slots)
+
+
+def copy_slots(source, destination, slots):
+    """Copy the rows of `slots` from the source connection to the destination (one transaction)."""
+    in_slots = _slot_list(slots)
+    with destination.transaction():
+        for table, column in reversed(TABLES):
+            destination.execute(f"DELETE FROM {table} WHERE {SLOT_SQL.format(column=column)} IN ({in_slots})")
+        for table, column in TABLES:
+            columns = ", ".join(REQUIRED_SCHEMA[table])
+            select = f"SELECT {columns} FROM {table} WHERE {SLOT_SQL.format(column=column)} IN ({in_slots})"
+            with source.cursor().copy(f"COPY ({select}) TO STDOUT") as out, \
+                    destination.cursor().copy(f"COPY {table} ({columns}) FROM STDIN") as into:
+                for data in out:
+                    into.write(data)
+
+
+def delete_slots(conn, slots):
+    # pins, user_locations, verified_users and expired_registrations go with their users (ON DELETE CASCADE).
+    with conn.transaction():
+        conn.execute(f"DELETE FROM users WHERE {SLOT_SQL.format(column='uuid')} IN ({_slot_list(slots)})")
+
+
+def move_slots(directory, shards, slots, source, destination, wait, log=print):
+    directory.execute("UPDATE users_shard_slots SET state = 'moving' WHERE slot = ANY(%s)", (slots,))
+    log(f"  {len(slots)} slots {source} -> {destination}: writes paused, waiting {wait}s")
+    time.sleep(wait)
+    copy_slots(shards[source], shards[destination], slots)
+    directory.execute(
+        "UPDATE users_shard_slots SET shard = %s, state = 'active' WHERE slot = ANY(%s)", (destination, slots)
+    )
+    log(f"  copied, owner changed; deleting from {source} in {wait}s")
+    time.sleep(wait)
+    delete_slots(shards[source], slots)
+
+
+def owners_of(directory):
+    return {slot: shard for slot, shard in directory.execute("SELECT slot, shard FROM users_shard_slots")}
+
+
+def init(directory, shards, first):
+    with open(DIRECTORY_SCHEMA) as f:
+        lines = [line for line in f.read().splitlines() if not line.strip().startswith("--")]
+    for statement in "\n".join(lines).split(";"):
+        if statement.strip():
+            directory.execute(statement)
+    if not owners_of(directory):
+        with directory.cursor().copy("COPY users_shard_slots (slot, shard) FROM STDIN") as copy:
+            for slot in range(SLOTS):
+                copy.write_row((slot, first))
+        print(f"{SLOTS} slots -> {first}")
+    for name, conn in shards.items():
+        directory.execute("CREATE TEMP TABLE IF NOT EXISTS email_import (uuid uuid, email text)")
+        with directory.transaction():
+            with conn.cursor().copy("COPY (SELECT uuid, email FROM users) TO STDOUT") as out, \
+                    directory.cursor().copy("COPY email_import (uuid, email) FROM STDIN") as into:
+                for data in out:
+                    into.write(data)
+            indexed = directory.execute(
+                "INSERT INTO users_email_index (uuid, email) SELECT uuid, email FROM email_import "
+                "WHERE email IS NOT NULL ON CONFLICT (uuid) DO NOTHING"
+            ).rowcount
+            directory.execute("TRUNCATE email_import")
+        print(f"{name}: {indexed} emails indexed")
+
+
+def status(directory, shards):
+    owners = owners_of(directory)
+    moving = [row[0] for row in directory.execute("SELECT slot FROM users_shard_slots WHERE state = 'moving'")]
+    for name, conn in shards.items():
+        owned = sum(1 for shard in owners.values() if shard == name)
+        users = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        print(f"{name:<30} {owned:>5} slots {users:>12,} users")
+    unknown = set(owners.values()) - set(shards)
+    if unknown:
+        print(f"slots on shards not configured: {', '.join(sorted(unknown))}")
+    if moving:
+        print(f"moving: {_slot_list(moving)}")
+
+
+def cleanup(directory, shards):
+    owners = owners_of(directory)
+    for name, conn in shards.items():
+        foreign = [slot for slot, shard in owners.items() if shard != name]
+        if not foreign:
+            continue
+        with conn.transaction():
+            deleted = conn.execute(
+                f"DELETE FROM users WHERE {SLOT_SQL.format(column='uuid')} IN ({_slot_list(foreign)})"
+            ).rowcount
+        print(f"{name}: {deleted} users of other shards deleted")
+
+
+def rebalance(directory, shards, batch, wait, dry_run):
+    # Slots left 'moving' by an interrupted run are still owned (and served) by their source.
+    directory.execute("UPDATE users_shard_slots SET state = 'active' WHERE state = 'moving'")
+    moves = plan(owners_of(directory), list(shards))
+    print(f"{len(moves)} slots to move")
+    if dry_run:
+        for pair, count in collections.Counter((source, destination) for _, source, destination in moves).items():
+            print(f"  {pair[0]} -> {pair[1]}: {count} slots")
+        return
+    by_pair = collections.defaultdict(list)
+    for slot, source, destination in moves:
+        by_pair[(source, destination)].append(slot)
+    for (source, destination), slots in by_pair.items():
+        if source not in shards:
+            sys.exit(f"{source} owns slots but is not configured: add it to DB_SHARD_HOSTS (or --shard) to move them")
+        for first in range(0, len(slots), batch):
+            move_slots(directory, shards, slots[first:first + batch], source, destination, wait)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["init", "rebalance", "status", "cleanup"])
+    parser.add_argument("--dsn", help="directory database; default: DB_* environment variables")
+    parser.add_argument("--shard", action="append", default=[], metavar="NAME=DSN",
+                        help="a shard (repeatable); default: DB_SHARD_HOSTS")
+    parser.add_argument("--batch", type=int, default=32, help="slots moved together")
+    parser.add_argument("--wait", type=float, default=MAP_REFRESH_SECONDS + 2,
+                        help="seconds for every worker to see a slot map change (> SHARD_MAP_REFRESH_SECONDS)")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    config = DatabaseConfig()
+    conninfos = dict(entry.split("=", 1) for entry in args.shard) or config.shard_connection_strings
+    if not conninfos:
+        parser.error("no shards: set DB_SHARD_HOSTS or pass --shard")
+
+    with psycopg.connect(args.dsn or config.connection_strings, autocommit=True) as directory:
+        shards = {name: psycopg.connect(conninfo, autocommit=True) for name, conninfo in conninfos.items()}
+        try:
+            if args.command == "init":
+                init(directory, shards, first=next(iter(shards)))
+            elif args.command == "rebalance":
+                rebalance(directory, shards, args.batch, args.wait, args.dry_run)
+            elif args.command == "cleanup":
+                cleanup(directory, shards)
+            status(directory, shards)
+        finally:
+            for conn in shards.values():
+                conn.close()
+
+
+if __name__ == "__main__":
+    main()
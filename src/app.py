@@ -1,20 +1,25 @@
 from datetime import timedelta
 import logging
 import os
-from flask import Flask, request, jsonify, g
-from authlib.integrations.flask_client import OAuth
+from flask import Flask, request, jsonify, g, has_request_context
 from flask_cors import CORS
 from flask_swagger_ui import get_swaggerui_blueprint
 
 from app_factory import AppFactory
+from application.health_service import HealthService
+from infrastructure import admission, metrics, profiler, tracing
+from infrastructure.persistence.pin_store import TtlPinStore
+import logger_config
 from logger_config import get_logger
+from presentation import http_admission, http_deadlines, http_metrics, http_read_your_writes, http_tracing
+from presentation.error_generator import get_error_json
 
 users_app = Flask(__name__)
 CORS(
     users_app,
     origins=["*"],
     supports_credentials=True,
-    allow_headers=["Content-Type", "Authorization", "X-User-Uuid"],
+    allow_headers=["Content-Type", "Authorization", "X-User-Uuid", "X-LSN"],
     methods=["GET", "POST", "OPTIONS", "PUT"],
 )
 
@@ -25,14 +30,68 @@ users_app.config.update(SESSION_COOKIE_SECURE=True, SESSION_COOKIE_SAMESITE="Non
 users_app.secret_key = os.getenv("SECRET_KEY_SESSION")
 users_app.permanent_session_lifetime = timedelta(minutes=5)
 
-# OAuth config
-oauth = OAuth(users_app)
+# OAuth config: authlib is imported (and Google registered) on the first federated request.
+def oauth_factory():
+    from authlib.integrations.flask_client import OAuth
 
-# Logger config
+    return OAuth(users_app)
+
+
+# Logger config: log sampling is keyed by event and route
 logger = get_logger("api-users")
 
+
+def current_route():
+    if has_request_context() and request.url_rule is not None:
+        return request.url_rule.rule
+    return None
+
+
+logger_config.set_route_provider(current_route)
+
 # Create layers
-user_controller = AppFactory.create(oauth)
+user_controller = AppFactory.create(oauth_factory)
+health_service = HealthService(user_controller.user_service.user_repository)
+
+# Admission control: per route class concurrency, short queue, then 503 + Retry-After
+# (installed first: the request metrics wrap it and count the 503s)
+http_admission.init_app(users_app, admission.create(int(os.getenv("GUNICORN_THREADS", 8))))
+# No database slot (db_limiter) or database unreachable (circuit breaker): 503 + Retry-After too
+http_admission.init_error_handlers(users_app)
+
+# Deadlines: X-Request-Deadline or the route's budget; statements past it are cancelled (504)
+http_deadlines.init_app(users_app)
+
+# Metrics config: request timing hooks + GET /metrics
+http_metrics.init_app(users_app)
+metrics.CallbackGauge(
+    "users_db_connections_open",
+    "Database connections open in this worker (one per serving thread).",
+    lambda: {(): user_controller.user_service.user_repository.open_connections},
+)
+
+# Tracing config: root span per request (continues the incoming traceparent)
+http_tracing.init_app(users_app)
+
+# Read replicas (DB_REPLICA_HOSTS): lag per replica + read-your-writes token in the session
+replicas = getattr(user_controller.user_service.user_repository, "replicas", None)
+if replicas is not None:
+    metrics.CallbackGauge(
+        "users_db_replica_lag_seconds",
+        "Replication lag of each replica at its last probe (-1: down).",
+        replicas.lag_by_replica,
+        ("replica",),
+    )
+http_read_your_writes.init_app(users_app, user_controller.user_service.user_repository)
+
+# PIN_STORE=memory: PINs (and unconfirmed registrations) held by this worker
+pin_store = user_controller.user_service.pin_store
+if isinstance(pin_store, TtlPinStore):
+    metrics.CallbackGauge(
+        "users_pin_store_entries",
+        "PINs held in memory by this worker (PIN_STORE=memory).",
+        lambda: {(): len(pin_store)},
+    )
 
 SWAGGER_URL = "/docs"
 API_URL = "/static/openapi.yaml"
@@ -46,8 +105,76 @@ users_app.register_blueprint(swaggerui_blueprint, url_prefix=SWAGGER_URL)
 
 
 @users_app.get("/health")
+@users_app.get("/health/live")
 def health_check():
-    return {"status": "ok"}, 200
+    """
+    Liveness: the process answers. Does not touch the database.
+    """
+    return health_service.liveness()
+
+
+@users_app.get("/health/ready")
+def readiness_check():
+    """
+    Readiness: database, schema and connections (cached a few seconds).
+    200: ok / degraded
+    503: unavailable
+    """
+    return health_service.readiness()
+
+
+@users_app.get("/debug/traces")
+def get_traces():
+    """
+    Most recent traces kept in memory by this worker (admin session required).
+    "limit" query param: number of traces. Default: 20.
+    """
+    is_session_expired = user_controller.is_session_valid()
+    if is_session_expired:
+        return is_session_expired["response"], is_session_expired["code_status"]
+    limit = request.args.get("limit", 20, type=int)
+    return {"traces": tracing.ring_buffer.traces(limit)}, 200
+
+
+@users_app.get("/debug/profile")
+def get_profile():
+    """
+    Profile this worker for "seconds" (default 10, max PROFILER_MAX_SECONDS) under the
+    traffic it is serving (admin session required).
+
+    "mode" query param:
+    - cpu (default): collapsed stacks of all threads, for flamegraph.pl or speedscope.
+      "interval_ms" (default 10) and "idle=true" (include parked threads).
+    - memory: tracemalloc diff of the allocations that grew. "top" (default 30).
+    409: a profile is already running.
+    """
+    is_session_expired = user_controller.is_session_valid()
+    if is_session_expired:
+        return is_session_expired["response"], is_session_expired["code_status"]
+
+    seconds = request.args.get("seconds", 10, type=float)
+    mode = request.args.get("mode", "cpu")
+    try:
+        if mode == "memory":
+            return profiler.memory_diff(seconds, top=request.args.get("top", 30, type=int)), 200
+        if mode != "cpu":
+            return get_error_json("Bad request", "mode must be 'cpu' or 'memory'", "/debug/profile"), 400
+        stacks, samples = profiler.sample_stacks(
+            seconds,
+            interval=request.args.get("interval_ms", 10, type=float) / 1000,
+            include_idle=request.args.get("idle", "false").lower() == "true",
+        )
+    except profiler.ProfilerBusy:
+        return get_error_json("Conflict", "A profile is already running", "/debug/profile"), 409
+
+    return users_app.response_class(
+        profiler.render_collapsed(stacks),
+        mimetype="text/plain",
+        headers={
+            "Content-Disposition": "attachment; filename=profile.folded",
+            "X-Profile-Samples": str(samples),
+        },
+    )
 
 
 @users_app.get("/users")
@@ -60,6 +187,19 @@ def get_users():
     return result["response"], result["code_status"]
 
 
+@users_app.get("/users/export")
+def export_users():
+    """
+    Stream every user (admin session required): CSV or NDJSON ("format"), "columns",
+    "gzip=true". password and id_biometric only when listed in "columns".
+    """
+    is_session_expired = user_controller.is_session_valid()
+    if is_session_expired:
+        return is_session_expired["response"], is_session_expired["code_status"]
+    result = user_controller.export_users(request)
+    return result["response"], result["code_status"]
+
+
 @users_app.get("/users/admin")
 def get_users_without_check_session():
     """
@@ -95,7 +235,7 @@ def get_active_teachers():
     """
     Get users with role=teacher and status=active.
     """
-    result = user_controller.get_active_teachers()
+    result = user_controller.get_active_teachers(request)
     return result["response"], result["code_status"]
 
 
@@ -118,6 +258,19 @@ def add_users():
     return result["response"], result["code_status"]
 
 
+@users_app.post("/users/bulk")
+def add_users_bulk():
+    """
+    Create many users at once (session required): JSON array or NDJSON
+    (application/x-ndjson). Returns one result per user.
+    """
+    is_session_expired = user_controller.is_session_valid()
+    if is_session_expired:
+        return is_session_expired["response"], is_session_expired["code_status"]
+    result = user_controller.create_users_bulk(request)
+    return result["response"], result["code_status"]
+
+
 @users_app.put("/users/<uuid:user_id>/location")
 def set_user_location(user_id):
     """
@@ -163,13 +316,13 @@ def login_user_with_google():
     Default: student.
     Ex: '?role=student' or '?role=teacher'.
     """
-    logger.info(f"In /users/login/google with request: {request}")
+    logger.info("In /users/login/google with request: %s", request)
     return user_controller.login_user_with_google(request)
 
 
 @users_app.get("/users/authorize")
 def authorize():
-    logger.debug(f"In GET /users/authorize with request: {request}")
+    logger.debug("In GET /users/authorize with request: %s", request)
     result = user_controller.authorize(request)
     return result["response"], result["code_status"]
 
@@ -183,7 +336,7 @@ def authorize_with_token():
     Default: student.
     Ex: '?role=student' or '?role=teacher'.
     """
-    logger.debug(f"In POST /users/authorize with request: {request}")
+    logger.debug("In POST /users/authorize with request: %s", request)
     result = user_controller.authorize_with_token(request)
     return result["response"], result["code_status"]
 
@@ -196,7 +349,7 @@ def post_signup_google():
 
     Create profile: POST /profiles --> TODO: Move to API gateway.
     """
-    logger.debug(f"In POST /users/signup/google with request: {request}")
+    logger.debug("In POST /users/signup/google with request: %s", request)
     result = user_controller.authorize_signup_token(request)
 
     return result["response"], result["code_status"]
@@ -211,7 +364,7 @@ def post_login_google():
 
     UPDATE /profiles with photo --> TODO: Move to API gateway.
     """
-    logger.debug(f"In POST /users/login/google with request: {request}")
+    logger.debug("In POST /users/login/google with request: %s", request)
     result = user_controller.authorize_login_token(request)
     return result["response"], result["code_status"]
 
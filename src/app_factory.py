@@ -1,17 +1,72 @@
+import os
+
 from application.google_service import GoogleService
 from application.email_service import EmailService
+from application.teacher_directory import create_teacher_directory
 from application.user_service import UserService
+from infrastructure import lifecycle
+from infrastructure.persistence.pin_store import create_pin_store
 from infrastructure.persistence.users_repository import UsersRepository
 from presentation.user_controller import UserController
+from presentation.user_flows import UserRequestHelpers
 
 
 class AppFactory:
     """Each class is instantiate: presentation, infrastructure, controller."""
     @staticmethod
-    def create(oauth):
-        user_repository = UsersRepository()
-        google = GoogleService(oauth)
+    def create(oauth_factory):
+        user_repository = AppFactory.create_users_repository()
+        google = GoogleService(oauth_factory)
         email_service = EmailService()
-        user_service = UserService(user_repository, google, email_service)
+        pin_store = create_pin_store(user_repository)
+        teacher_directory = create_teacher_directory(user_repository.get_active_teachers,
+                                                     UserRequestHelpers().encode_teachers)
+        user_service = UserService(user_repository, google, email_service, pin_store, teacher_directory)
         user_controller = UserController(user_service)
+
+        # Preforking server: each worker needs its own DB connections.
+        lifecycle.before_fork(user_repository.close)
+        lifecycle.after_fork(user_repository.reset_after_fork)
+        lifecycle.after_fork(pin_store.reset_after_fork)
+        lifecycle.on_shutdown(user_repository.close)
+        if teacher_directory is not None:
+            lifecycle.after_fork(teacher_directory.reset_after_fork)
+            lifecycle.on_shutdown(teacher_directory.close)
         return user_controller
+
+    @staticmethod
+    def create_users_repository():
+        """
+        USERS_REPOSITORY: "postgres" (default), "memory" (no database: tests and load
+        tests of the upper layers; the data lives in each worker process) or "sharded"
+        (users spread over DB_SHARD_HOSTS, directory in DB_*).
+        """
+        engine = os.getenv("USERS_REPOSITORY", "postgres").lower()
+        if engine == "memory":
+            from infrastructure.persistence.in_memory_users_repository import InMemoryUsersRepository
+
+            return InMemoryUsersRepository()
+        if engine == "sharded":
+            from infrastructure.persistence.sharded_users_repository import ShardedUsersRepository
+
+            return ShardedUsersRepository.from_config()
+        if engine != "postgres":
+            raise ValueError(f"Unknown USERS_REPOSITORY: {engine}")
+        return UsersRepository()
+
+    @staticmethod
+    def create_async(oauth_factory):
+        """
+        Async layers for asgi_app. The connection pool is opened by the app lifespan
+        (inside each worker's event loop), so nothing needs to be rebuilt after fork.
+        """
+        from application.async_google_service import AsyncGoogleService
+        from application.async_user_service import AsyncUserService
+        from infrastructure.persistence.async_users_repository import AsyncUsersRepository
+        from presentation.async_user_controller import AsyncUserController
+
+        user_repository = AsyncUsersRepository()
+        google = AsyncGoogleService(oauth_factory)
+        email_service = EmailService()
+        user_service = AsyncUserService(user_repository, google, email_service)
+        return AsyncUserController(user_service)
@@ -0,0 +1,34 @@
+import asyncio
+import os
+
+from application.google_service import GoogleService, USERINFO_URL
+from infrastructure import tracing
+from logger_config import get_logger
+
+logger = get_logger("api-users")
+
+
+@tracing.traced_methods
+class AsyncGoogleService(GoogleService):
+    """
+    GoogleService for the ASGI app.
+    `oauth` is authlib's Starlette registry: its client methods are coroutines and
+    take the request (the OAuth state lives in the request session).
+    Token verification is blocking (google-auth), so it runs in a thread.
+    """
+
+    async def authorize_redirect(self, request, role):
+        logger.info("In google service - role: %s", role)
+        redirect_uri = os.getenv("OAUTH_REDIRECT_URI")
+        return await self.google.authorize_redirect(request, redirect_uri, state=role)
+
+    async def authorize_access_token(self, request):
+        return await self.google.authorize_access_token(request)
+
+    async def get_user_info(self, token):
+        response = await self.google.get(USERINFO_URL, token=token)
+        logger.info("In google service - get_user_info - response: %s", response)
+        return response.json()
+
+    async def verify_google_token(self, id_token_str):
+        return await asyncio.to_thread(super().verify_google_token, id_token_str)
@@ -0,0 +1,119 @@
+from application import flows
+from application.user_use_cases import UserUseCases
+from infrastructure.persistence.async_users_repository import AsyncUsersRepository
+from infrastructure.persistence.pin_store import RepositoryPinStore
+from logger_config import get_logger
+
+logger = get_logger("api-users")
+
+"""
+Async variant of UserService for the ASGI app (asgi_app.py).
+The use cases are the same code (application/user_use_cases.py): here every repository
+call is awaited and the blocking SMTP client runs in a thread, so one worker can keep
+many requests in flight.
+"""
+
+
+class AsyncUserService(UserUseCases):
+    def __init__(self, user_repository: AsyncUsersRepository, google, email_service):
+        self.google = google
+        self.user_repository = user_repository
+        self.email_service = email_service
+        self.pin_store = RepositoryPinStore(user_repository)
+
+    async def get_users(self):
+        """Get all users."""
+        return await self.user_repository.get_all_users()
+
+    async def get_active_teachers(self):
+        """Get active teachers."""
+        return await self.user_repository.get_active_teachers()
+
+    async def get_specific_users(self, uuid):
+        """Get specific user."""
+        return await self.user_repository.get_user(uuid)
+
+    async def delete(self, uuid):
+        """Delete user."""
+        await flows.run_async(self._delete(uuid))
+
+    async def create(self, request):
+        """Create a users."""
+        return await flows.run_async(self._create(request))
+
+    async def set_location(self, uuid, latitude, longitude):
+        """Add location."""
+        await self.user_repository.set_location(
+            {"uuid": uuid, "latitude": latitude, "longitude": longitude}
+        )
+
+    async def mail_exists(self, email):
+        return await self.user_repository.get_user_with_email(email)
+
+    async def pin_in_progress(self, uuid):
+        logger.debug("[SERVICE] uuid check if pin in progress: %s", uuid)
+        return await self.pin_store.pin_in_progress(uuid)
+
+    async def pin_expired(self, uuid):
+        logger.debug("[SERVICE] uuid check if pin expired: %s", uuid)
+        return await self.pin_store.pin_expired(uuid)
+
+    async def update_user(self, user, uuid):
+        return await flows.run_async(self._update_user(user, uuid))
+
+    async def login_user_with_google(self, request, role):
+        """Login a user with google."""
+        logger.info("In service - login_user_with_google - role: %s", role)
+        return await self.google.authorize_redirect(request, role)
+
+    async def authorize(self, request):
+        token = await self.google.authorize_access_token(request)
+        logger.info("In service - authorize - token: %s", token)
+        return await self.google.get_user_info(token)
+
+    async def create_users_if_not_exist(self, user_info):
+        return await flows.run_async(self._create_users_if_not_exist(user_info))
+
+    async def verify_user_existence(self, user_info):
+        user = await self.user_repository.get_user_with_email(user_info["email"])
+        logger.info("In service - create_users_if_not_exist - user: %s", user)
+        return user
+
+    async def create_users_federate(self, user_info):
+        return await flows.run_async(self._create_users_federate(user_info))
+
+    async def verify_google_token(self, token):
+        return await self.google.verify_google_token(token)
+
+    async def initiate_password_recovery(self, email):
+        """Iniciar el proceso de recuperación de contraseña"""
+        return await flows.run_async(self._initiate_password_recovery(email))
+
+    async def validate_recovery_pin(self, email: str, pin_code: str) -> dict:
+        """Valida un PIN de recuperación de contraseña"""
+        return await flows.run_async(self._validate_recovery_pin(email, pin_code))
+
+    async def update_password(self, email, new_password):
+        """Actualiza la contraseña de un usuario"""
+        return await flows.run_async(self._update_password(email, new_password))
+
+    async def initiate_registration_confirmation(self, email):
+        """Iniciar el proceso de confirmación de registro"""
+        return await flows.run_async(self._initiate_registration_confirmation(email))
+
+    async def validate_registration_pin(self, email, pin_code):
+        """Valida un PIN de confirmación de registro"""
+        return await flows.run_async(self._validate_registration_pin(email, pin_code))
+
+    async def user_is_validated(self, uuid):
+        """Returns whether a user is validated or not, this is seen if they use their PIN"""
+        return await self.pin_store.has_used_pin(uuid)
+
+    async def update_status(self, uuid, new_status):
+        await flows.run_async(self._update_status(uuid, new_status))
+
+    async def update_notification(self, uuid, new_notification_status):
+        return await flows.run_async(self._update_notification(uuid, new_notification_status))
+
+    async def update_biometric_id(self, user_id, id_biometric):
+        return await self.user_repository.update_biometric_id(user_id, id_biometric)
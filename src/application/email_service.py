@@ -2,11 +2,13 @@ import smtplib
 from email.mime.text import MIMEText
 import os
 
+from infrastructure import tracing
 from logger_config import get_logger
 
 logger = get_logger("api-users")
 
 
+@tracing.traced_methods
 class EmailService:
     def __init__(self):
         self.smtp_server = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
@@ -14,6 +16,8 @@ class EmailService:
         self.sender_email = os.getenv('EMAIL_FROM')
         self.smtp_username = os.getenv('SMTP_USERNAME')
         self.smtp_password = os.getenv('SMTP_PASSWORD')
+        # false only for plain local relays (e.g. the load-test stand-in)
+        self.smtp_starttls = os.getenv('SMTP_STARTTLS', 'true').lower() != 'false'
 
     def send_pin_email(self, recipient_email: str, pin_code: str, is_registration: bool):
         try:
@@ -31,12 +35,13 @@ class EmailService:
             msg['To'] = recipient_email
 
             with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
+                if self.smtp_starttls:
+                    server.starttls()
                 server.login(self.smtp_username, self.smtp_password)
                 server.send_message(msg)
 
-            logger.info(f"Email sent to {recipient_email}")
+            logger.info("Email sent to %s", recipient_email)
             return True
         except Exception as e:
-            logger.error(f"Error sending email: {str(e)}")
+            logger.error("Error sending email: %s", e)
             return False
@@ -0,0 +1,65 @@
+"""
+Use cases written once for the sync (Flask) and async (ASGI) apps.
+
+A flow is a generator with the logic of a use case. Where it needs I/O it yields what
+the call returned, and gets back the result:
+
+    user = yield self.user_repository.get_user_with_email(email)
+
+With the sync classes the call has already run: run() sends the value straight back.
+With the async ones the call returned an awaitable: run_async() awaits it and sends
+the result, or throws the exception into the flow, at the call. Blocking work that is
+not an awaitable call (password hashes, the SMTP client) is yielded as blocking(...):
+run() calls it in place, run_async() in a thread so the event loop keeps serving.
+"""
+
+import asyncio
+import inspect
+
+
+class Blocking:
+    __slots__ = ("function", "args", "kwargs")
+
+    def __init__(self, function, args, kwargs):
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+
+
+def blocking(function, *args, **kwargs):
+    """`function(*args, **kwargs)`, to be yielded by a flow."""
+    return Blocking(function, args, kwargs)
+
+
+def run(flow):
+    """Run a flow whose calls are synchronous. Returns what the flow returns."""
+    send, value = flow.send, None
+    while True:
+        try:
+            step = send(value)
+        except StopIteration as done:
+            return done.value
+        send, value = flow.send, step
+        if isinstance(step, Blocking):
+            try:
+                value = step.function(*step.args, **step.kwargs)
+            except Exception as e:
+                send, value = flow.throw, e
+
+
+async def run_async(flow):
+    """Run a flow whose calls return awaitables. Returns what the flow returns."""
+    send, value = flow.send, None
+    while True:
+        try:
+            step = send(value)
+        except StopIteration as done:
+            return done.value
+        send, value = flow.send, step
+        try:
+            if isinstance(step, Blocking):
+                value = await asyncio.to_thread(step.function, *step.args, **step.kwargs)
+            elif inspect.isawaitable(step):
+                value = await step
+        except Exception as e:
+            send, value = flow.throw, e
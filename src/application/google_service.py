@@ -1,7 +1,7 @@
 import os
-from google.oauth2 import id_token
-from google.auth.transport import requests
+import threading
 
+from infrastructure import tracing
 from logger_config import get_logger
 
 logger = get_logger("api-users")
@@ -9,21 +9,40 @@ logger = get_logger("api-users")
 USERINFO_URL = "https://openidconnect.googleapis.com/v1/userinfo"
 
 
+@tracing.traced_methods
 class GoogleService:
-    def __init__(self, oauth):
+    """
+    `oauth_factory` returns the authlib OAuth registry. Nothing Google related is
+    imported or registered until a federated route is first hit (fast cold start).
+    """
+
+    def __init__(self, oauth_factory):
         self.client_id = os.getenv("GOOGLE_CLIENT_ID")
-        self.google = oauth.register(
-            name="google",
-            client_id=self.client_id,
-            client_secret=os.getenv("GOOGLE_CLIENT_SECRET"),
-            server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
-            client_kwargs={"scope": "openid email profile"},
-        )
+        self._oauth_factory = oauth_factory
+        self._google = None
+        # Public keys that sign the ID tokens; default: Google's. Overridden by the load test stand-in.
+        self.certs_url = os.getenv("GOOGLE_CERTS_URL")
+        self._transport = None
+        self._lock = threading.Lock()
+
+    @property
+    def google(self):
+        if self._google is None:
+            with self._lock:
+                if self._google is None:
+                    self._google = self._oauth_factory().register(
+                        name="google",
+                        client_id=self.client_id,
+                        client_secret=os.getenv("GOOGLE_CLIENT_SECRET"),
+                        server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
+                        client_kwargs={"scope": "openid email profile"},
+                    )
+        return self._google
 
     def authorize_redirect(self, role):
-        logger.info(f"In google service - role: {role}")
+        logger.info("In google service - role: %s", role)
         redirect_uri = os.getenv("OAUTH_REDIRECT_URI")
-        logger.info(f"In google service - redirect_uri: {redirect_uri}")
+        logger.info("In google service - redirect_uri: %s", redirect_uri)
         return self.google.authorize_redirect(redirect_uri, state=role)
 
     def authorize_access_token(self):
@@ -31,17 +50,28 @@ class GoogleService:
 
     def get_user_info(self):
         response = self.google.get(USERINFO_URL)
-        logger.info(f"In google service - get_user_info - response: {response}")
+        logger.info("In google service - get_user_info - response: %s", response)
         return response.json()
 
     def verify_google_token(self, id_token_str):
         """
         This method validates the token, decodes it and returns the user info
         """
+        from google.oauth2 import id_token
+        from google.auth.transport import requests
+
+        if self._transport is None:
+            self._transport = requests.Request()
+
         try:
-            id_info = id_token.verify_oauth2_token(
-                id_token_str, requests.Request(), audience=self.client_id
-            )
+            if self.certs_url:
+                id_info = id_token.verify_token(
+                    id_token_str, self._transport, audience=self.client_id, certs_url=self.certs_url
+                )
+            else:
+                id_info = id_token.verify_oauth2_token(
+                    id_token_str, self._transport, audience=self.client_id
+                )
 
             if id_info["email_verified"]:
                 email = id_info["email"]
@@ -60,5 +90,5 @@ class GoogleService:
                 raise ValueError("Unverified email")
 
         except ValueError as e:
-            logger.error(f"Invalid token: {e}")
+            logger.error("Invalid token: %s", e)
             return None
@@ -0,0 +1,149 @@
+import asyncio
+import datetime
+import os
+import threading
+import time
+
+from logger_config import get_logger
+
+logger = get_logger("api-users")
+
+OK = "ok"
+DEGRADED = "degraded"
+UNAVAILABLE = "unavailable"
+
+_SEVERITY = {OK: 0, DEGRADED: 1, UNAVAILABLE: 2}
+
+
+class HealthService:
+    """
+    Liveness / readiness of the process.
+
+    - Liveness only says the process answers (never touches dependencies).
+    - Readiness checks the database (round trip latency), the schema (required columns,
+      i.e. migrations applied) and the connections in use. The result is cached for
+      READINESS_CACHE_SECONDS so Kubernetes probes add no DB load; while one thread
+      refreshes it the others get the previous result instead of waiting.
+
+    Status: "ok" and "degraded" (slow DB, pool saturated) are ready (200),
+    "unavailable" is not (503).
+    """
+
+    def __init__(self, user_repository):
+        self.user_repository = user_repository
+        self.ttl = float(os.getenv("READINESS_CACHE_SECONDS", 5))
+        self.slow_ms = float(os.getenv("READINESS_SLOW_MS", 250))
+        self._cached = None
+        self._checked_at = 0.0
+        self._schema_ok = False
+        self._lock = threading.Lock()
+
+    def liveness(self):
+        return {"status": OK}, 200
+
+    def readiness(self):
+        if self._is_stale():
+            # Only the first probe ever waits; later ones reuse the last result.
+            if self._lock.acquire(blocking=self._cached is None):
+                try:
+                    if self._is_stale():
+                        self._store(self._probe())
+                finally:
+                    self._lock.release()
+        return self._response()
+
+    def _is_stale(self):
+        return self._cached is None or time.monotonic() - self._checked_at >= self.ttl
+
+    def _store(self, checks):
+        self._cached = {
+            "status": self._overall(checks),
+            "checks": checks,
+            "checked_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        }
+        self._checked_at = time.monotonic()
+        if self._cached["status"] != OK:
+            logger.warning("Readiness %s: %s", self._cached["status"], checks)
+
+    def _response(self):
+        code = 503 if self._cached["status"] == UNAVAILABLE else 200
+        return self._cached, code
+
+    def _overall(self, checks):
+        return max((check["status"] for check in checks.values()), key=_SEVERITY.get, default=OK)
+
+    def _database_check(self, ping):
+        start = time.perf_counter()
+        try:
+            ping()
+        except Exception as e:
+            return {"status": UNAVAILABLE, "error": str(e)}
+        return self._latency_check(start)
+
+    def _latency_check(self, start):
+        latency_ms = (time.perf_counter() - start) * 1000
+        status = DEGRADED if latency_ms > self.slow_ms else OK
+        return {"status": status, "latency_ms": round(latency_ms, 1)}
+
+    def _schema_check(self, missing_columns):
+        if missing_columns:
+            return {"status": UNAVAILABLE, "missing_columns": missing_columns}
+        # The schema does not go backwards: once verified it is not queried again.
+        self._schema_ok = True
+        return {"status": OK}
+
+    def _probe(self):
+        checks = {"database": self._database_check(self.user_repository.ping)}
+        if checks["database"]["status"] != UNAVAILABLE:
+            if self._schema_ok:
+                checks["schema"] = {"status": OK}
+            else:
+                try:
+                    checks["schema"] = self._schema_check(self.user_repository.missing_schema_columns())
+                except Exception as e:
+                    checks["schema"] = {"status": UNAVAILABLE, "error": str(e)}
+        checks["connections"] = {"status": OK, "open": self.user_repository.open_connections}
+        return checks
+
+
+class AsyncHealthService(HealthService):
+    """HealthService for the ASGI app: async probes and a real pool to look at."""
+
+    def __init__(self, user_repository):
+        super().__init__(user_repository)
+        self._async_lock = asyncio.Lock()
+
+    async def readiness(self):
+        if self._is_stale():
+            if self._cached is None or not self._async_lock.locked():
+                async with self._async_lock:
+                    if self._is_stale():
+                        self._store(await self._probe())
+        return self._response()
+
+    async def _probe(self):
+        start = time.perf_counter()
+        try:
+            await self.user_repository.ping()
+            checks = {"database": self._latency_check(start)}
+        except Exception as e:
+            checks = {"database": {"status": UNAVAILABLE, "error": str(e)}}
+
+        if checks["database"]["status"] != UNAVAILABLE:
+            if self._schema_ok:
+                checks["schema"] = {"status": OK}
+            else:
+                try:
+                    checks["schema"] = self._schema_check(await self.user_repository.missing_schema_columns())
+                except Exception as e:
+                    checks["schema"] = {"status": UNAVAILABLE, "error": str(e)}
+
+        stats = self.user_repository.pool_stats()
+        saturated = stats.get("pool_available", 0) == 0 and stats.get("requests_waiting", 0) > 0
+        checks["pool"] = {
+            "status": DEGRADED if saturated else OK,
+            "size": stats.get("pool_size", 0),
+            "available": stats.get("pool_available", 0),
+            "waiting": stats.get("requests_waiting", 0),
+        }
+        return checks
@@ -0,0 +1,132 @@
+"""
+Directory of active teachers: an immutable snapshot of GET /users/teachers, already
+encoded (JSON bytes plus ETag), rebuilt by a background thread.
+
+The thread rebuilds it every TEACHER_DIRECTORY_REFRESH_SECONDS, and right away when a
+change that can alter the list happens in this worker (UserService: create, delete,
+status updates). Readers take the current snapshot: they never wait for a rebuild.
+Changes made by other workers are seen at the next scheduled rebuild.
+
+A snapshot older than TEACHER_DIRECTORY_MAX_STALENESS_SECONDS (rebuilds failing, e.g.
+the database is down) is not served: readers fall back to querying the repository.
+"""
+
+import hashlib
+import os
+import threading
+import time
+
+from infrastructure import metrics
+from logger_config import get_logger
+
+logger = get_logger("api-users")
+
+ENABLED = os.getenv("TEACHER_DIRECTORY_ENABLED", "true").lower() == "true"
+REFRESH_SECONDS = float(os.getenv("TEACHER_DIRECTORY_REFRESH_SECONDS", 10))
+MAX_STALENESS_SECONDS = float(os.getenv("TEACHER_DIRECTORY_MAX_STALENESS_SECONDS", 30))
+
+rebuilds = metrics.Counter(
+    "users_teacher_directory_rebuilds_total",
+    "Teacher directory rebuilds by trigger (start, schedule, change) and outcome (ok, failed).",
+    ("trigger", "outcome"),
+)
+
+
+class Snapshot:
+    __slots__ = ("body", "etag", "teachers", "built_at")
+
+    def __init__(self, body, etag, teachers, built_at):
+        self.body = body  # bytes of the response
+        self.etag = etag  # unquoted
+        self.teachers = teachers  # how many
+        self.built_at = built_at  # time.monotonic() when the rows were read
+
+
+class TeacherDirectory:
+    def __init__(self, load, encode, refresh=REFRESH_SECONDS, max_staleness=MAX_STALENESS_SECONDS,
+                 clock=time.monotonic):
+        """`load()`: the active teachers (domain users); `encode(teachers)`: the response body (bytes)."""
+        self.load = load
+        self.encode = encode
+        self.refresh = refresh
+        self.max_staleness = max_staleness
+        self.clock = clock
+        self._snapshot = None
+        self._reset_state()
+
+    def _reset_state(self):
+        self._lock = threading.Lock()
+        self._changed = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def snapshot(self):
+        """The current Snapshot, or None (not built yet, or too stale: query the repository)."""
+        if self._thread is None:
+            self._start()
+        snapshot = self._snapshot
+        if snapshot is None or self.clock() - snapshot.built_at > self.max_staleness:
+            return None
+        return snapshot
+
+    def age(self):
+        """Seconds since the current snapshot's rows were read (-1: none yet)."""
+        snapshot = self._snapshot
+        return -1 if snapshot is None else self.clock() - snapshot.built_at
+
+    def changed(self):
+        """The list may have changed: rebuild now (in the background)."""
+        self._changed.set()
+
+    def rebuild(self, trigger="schedule"):
+        started = self.clock()
+        try:
+            teachers = self.load()
+            body = self.encode(teachers)
+        except Exception as e:
+            rebuilds.inc(trigger, "failed")
+            logger.warning("Teacher directory rebuild failed, serving the previous one: %s", e)
+            return
+        etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+        self._snapshot = Snapshot(body, etag, len(teachers), started)
+        rebuilds.inc(trigger, "ok")
+
+    def _start(self):
+        # Lazily, on first read: the thread must be started in the worker, not in the master.
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, args=(self._stop, self._changed),
+                                                name="teacher-directory", daemon=True)
+                self._thread.start()
+
+    def _run(self, stop, changed):
+        self.rebuild("start")
+        while not stop.is_set():
+            trigger = "change" if changed.wait(self.refresh) else "schedule"
+            if stop.is_set():
+                return
+            # Cleared before reading: a change during the rebuild triggers another one.
+            changed.clear()
+            self.rebuild(trigger)
+
+    def close(self):
+        self._stop.set()
+        self._changed.set()
+
+    def reset_after_fork(self):
+        # The thread does not exist in the child (and the parent never served: no snapshot to keep).
+        self._snapshot = None
+        self._reset_state()
+
+
+def create_teacher_directory(load, encode):
+    """The directory, or None with TEACHER_DIRECTORY_ENABLED=false (every read queries the repository)."""
+    if not ENABLED:
+        return None
+    directory = TeacherDirectory(load, encode)
+    metrics.CallbackGauge(
+        "users_teacher_directory_age_seconds",
+        "Age of the teacher directory snapshot served by this worker (-1: none yet).",
+        lambda: {(): directory.age()},
+    )
+    return directory
@@ -1,8 +1,10 @@
-import random
-import string
-
+from infrastructure.persistence import read_your_writes
+from infrastructure.persistence.pin_store import RepositoryPinStore
+from infrastructure.single_flight import SingleFlight
 from infrastructure.persistence.users_repository import UsersRepository
+from application import flows
 from application.email_service import EmailService
+from application.user_use_cases import UserUseCases, loggable
 from logger_config import get_logger
 
 logger = get_logger("api-users")
@@ -22,11 +24,23 @@ This layer can include:
 """
 
 
-class UserService:
-    def __init__(self, user_repository: UsersRepository, google, email_service):
+class UserService(UserUseCases):
+    def __init__(self, user_repository: UsersRepository, google, email_service, pin_store=None,
+                 teacher_directory=None):
         self.google = google
         self.user_repository = user_repository
         self.email_service = email_service
+        # PINs: in the repository by default, or in memory (infrastructure/persistence/pin_store.py).
+        self.pin_store = pin_store if pin_store is not None else RepositoryPinStore(user_repository)
+        # Identical reads that arrive together (class start) share one query. The key
+        # includes the process's write generation (a read that starts after a write, its
+        # own or another request's, never gets the result of a query started before it)
+        # and the LSN the read must see (a token from another worker or pod never joins a
+        # flight that may read a lagging replica).
+        self._teachers_flight = SingleFlight("teachers")
+        self._user_flight = SingleFlight("user")
+        # Pre-encoded GET /users/teachers, rebuilt in the background (application/teacher_directory.py).
+        self.teacher_directory = teacher_directory
 
     def get_users(self):
         """Get all users."""
@@ -34,24 +48,53 @@ class UserService:
         return users
     
     def get_active_teachers(self):
-        """Get active teachers."""
-        users = self.user_repository.get_active_teachers()
+        """Get active teachers (shared with concurrent callers: do not mutate)."""
+        users = self._teachers_flight.do(
+            (read_your_writes.generation(), read_your_writes.required_lsn()), self.user_repository.get_active_teachers
+        )
         return users
 
     def get_specific_users(self, uuid):
-        """Get specific user."""
-        user = self.user_repository.get_user(uuid)
+        """Get specific user (shared with concurrent callers: do not mutate)."""
+        user = self._user_flight.do(
+            (str(uuid), read_your_writes.generation(), read_your_writes.required_lsn()),
+            lambda: self.user_repository.get_user(uuid),
+        )
         return user
 
+    def teacher_snapshot(self):
+        """Encoded active teachers (teacher_directory.Snapshot), or None: use get_active_teachers."""
+        if self.teacher_directory is None:
+            return None
+        return self.teacher_directory.snapshot()
+
+
     def delete(self, uuid):
         """Delete user."""
-        self.user_repository.delete_users(uuid)
-        return
+        flows.run(self._delete(uuid))
 
     def create(self, request):
         """Create a users."""
-        self.user_repository.insert_user(request)
-        return self.user_repository.get_user_with_email(request["email"])
+        return flows.run(self._create(request))
+
+    def can_import_bulk(self):
+        """
+        The bulk merge finds unconfirmed registrations in the repository's PINs: with
+        PIN_STORE=memory they are in the workers, so it would never take one over.
+        """
+        return isinstance(self.pin_store, RepositoryPinStore)
+
+    def create_bulk(self, users):
+        """Create many users at once (POST /users/bulk). One (status, uuid) per user, in order."""
+        logger.info("In service - create_bulk - users: %s", len(users))
+        results = self.user_repository.insert_users_bulk(users)
+        self._teachers_changed()
+        return results
+
+    def export_users(self, columns, fmt):
+        """Stream of bytes with every user (GET /users/export)."""
+        logger.info("In service - export_users - format: %s, columns: %s", fmt, columns)
+        return self.user_repository.export_users(columns, fmt)
 
     def set_location(self, uuid, latitude, longitude):
         """Add location."""
@@ -65,240 +108,86 @@ class UserService:
         return self.user_repository.get_user_with_email(email)
     
     def pin_in_progress(self, uuid):
-        logger.debug(f"[SERVICE] uuid check if pin in progress: {uuid}")
-        return self.user_repository.pin_in_progress(uuid)
+        logger.debug("[SERVICE] uuid check if pin in progress: %s", uuid)
+        return self.pin_store.pin_in_progress(uuid)
     
     def pin_expired(self, uuid):
-        logger.debug(f"[SERVICE] uuid check if pin expired: {uuid}")
-        return self.user_repository.pin_expired(uuid)
+        logger.debug("[SERVICE] uuid check if pin expired: %s", uuid)
+        return self.pin_store.pin_expired(uuid)
 
     def update_user(self, user, uuid):
-        return self.user_repository.update_user(user, uuid)
+        return flows.run(self._update_user(user, uuid))
 
     def login_user_with_google(self, role):
         """Login a user with google."""
-        logger.info(f"In service - login_user_with_google - role: {role}")
+        logger.info("In service - login_user_with_google - role: %s", role)
         return self.google.authorize_redirect(role)
 
     def authorize(self):
         token = self.google.authorize_access_token()
-        logger.info(f"In service - authorize - token: {token}")
+        logger.info("In service - authorize - token: %s", token)
         return self.google.get_user_info()
 
     def create_users_if_not_exist(self, user_info):
-        user = self.user_repository.get_user_with_email(user_info["email"])
-        logger.info(f"In service - create_users_if_not_exist - user: {user}")
-        if user != None:
-            return user
-
-        logger.info(
-            f"User does not exist. Create user with the following parameters: {user_info}"
-        )
-
-        self.user_repository.insert_user(user_info)
-        user = self.user_repository.get_user_with_email(user_info["email"])
-        return user
+        return flows.run(self._create_users_if_not_exist(user_info))
 
     def verify_user_existence(self, user_info):
         user = self.user_repository.get_user_with_email(user_info["email"])
-        logger.info(f"In service - create_users_if_not_exist - user: {user}")
+        logger.info("In service - create_users_if_not_exist - user: %s", user)
         return user
 
     def create_users(self, user_info):
         user = self.user_repository.get_user_with_email(user_info["email"])
-        logger.info(f"In service - create_users - user: {user}")
+        logger.info("In service - create_users - user: %s", user)
         if user != None:
             return user
 
-        logger.info(
-            f"User does not exist. Create user with the following parameters: {user_info}"
-        )
+        logger.info("User does not exist. Create user with the following parameters: %s", loggable(user_info))
 
         self.user_repository.insert_user(user_info)
+        self._teachers_changed()
         user = self.user_repository.get_user_with_email(user_info["email"])
         return user
     
     def create_users_federate(self, user_info):
-        user = self.user_repository.get_user_with_email(user_info["email"])
-        logger.info(f"In service - create_users - user: {user}")
-        if user != None:
-            return {"user": user, "exist": True}
-
-        logger.info(
-            f"User does not exist. Create user with the following parameters: {user_info}"
-        )
-
-        self.user_repository.insert_user(user_info)
-        user = self.user_repository.get_user_with_email(user_info["email"])
-        return {"user": user, "exist": False}
+        return flows.run(self._create_users_federate(user_info))
 
     def verify_google_token(self, token):
         return self.google.verify_google_token(token)
 
     def initiate_password_recovery(self, email):
         """Iniciar el proceso de recuperación de contraseña"""
-        user = self.user_repository.get_user_with_email(email)
-        if not user:
-            return {"message": "No user found with this email", "code": 404}
-
-        # Verificar si ya existe un PIN activo
-        existing_pin = self.user_repository.get_active_pin(
-            user.uuid, "password_recovery")
-        if existing_pin:
-            return {
-                "message": "There's already an active PIN for this user. Please wait 10 minutes.",
-                "code": 429
-            }
-
-        # Generar PIN de 6 dígitos
-        pin_code = ''.join(random.choices(string.digits, k=4))
-
-        # Guardar el PIN
-        self.user_repository.create_pin(user.uuid, pin_code, "password_recovery")
-
-        # En producción aquí iría el envío del email
-        logger.info(f"PIN generated for {email}: {pin_code}")
-
-        # Enviar email
-        email_sent = self.email_service.send_pin_email(
-            recipient_email=email,
-            pin_code=pin_code,
-            is_registration=False
-        )
-
-        if not email_sent:
-            return {"message": "Failed to send email", "code": 500}
-
-        return {
-            "message": "Password recovery process initiated",
-            "code": 200
-        }
+        return flows.run(self._initiate_password_recovery(email))
 
     def validate_recovery_pin(self, email: str, pin_code: str) -> dict:
         """Valida un PIN de recuperación de contraseña"""
-        if not email or not pin_code:
-            return {"message": "Email and PIN are required", "code": 400}
-
-        user = self.user_repository.get_user_with_email(email)
-        if not user:
-            return {"message": "No user found with this email", "code": 404}
-
-
-        is_valid = self.user_repository.validate_and_use_pin(
-            email=email,
-            pin_code=pin_code,
-            pin_type="password_recovery"
-        )
-
-        if not is_valid:
-            return {
-                "message": "Invalid or expired PIN. Please generate a new one",
-                "code": 401
-            }
-
-        return {"message": "PIN validated successfully", "code": 200}
+        return flows.run(self._validate_recovery_pin(email, pin_code))
 
     def update_password(self, email, new_password):
         """Actualiza la contraseña de un usuario"""
-        if not email or not new_password:
-            return {"message": "Email and new password are required", "code": 400}
-
-        # Verificar que el usuario existe
-        user = self.user_repository.get_user_with_email(email)
-        if not user:
-            return {"message": "No user found with this email", "code": 404}
-
-        # Actualizar contraseña
-        success = self.user_repository.update_user_password(email, new_password)
-        if not success:
-            return {"message": "Failed to update password", "code": 500}
-
-        # Invalidar todos los PINs existentes
-        self.user_repository.invalidate_all_pins(user.uuid)
-
-        return {"message": "Password updated successfully", "code": 200}
+        return flows.run(self._update_password(email, new_password))
 
     def initiate_registration_confirmation(self, email):
         """Iniciar el proceso de confirmación de registro"""
-        user = self.user_repository.get_user_with_email(email)
-        if not user:
-            return {"message": "No user found with this email", "code": 404}
-
-        # Verificar si ya existe un PIN activo
-        existing_pin = self.user_repository.get_active_pin(
-            user.uuid, "registration")
-        if existing_pin:
-            return {
-                "message": "There's already an active registration PIN for this user. Please wait 10 minutes.",
-                "code": 429
-            }
-
-        # Generar PIN de 6 dígitos
-        pin_code = ''.join(random.choices(string.digits, k=4))
-
-        # Guardar el PIN
-        self.user_repository.create_pin(user.uuid, pin_code, "registration")
-
-        # Enviar email
-        email_sent = self.email_service.send_pin_email(
-            recipient_email=email,
-            pin_code=pin_code,
-            is_registration=True
-        )
-
-        if not email_sent:
-            return {"message": "Failed to send email", "code": 500}
-
-        return {
-            "message": "Registration confirmation PIN generated",
-            "code": 200
-        }
+        return flows.run(self._initiate_registration_confirmation(email))
 
     def validate_registration_pin(self, email, pin_code):
         """Valida un PIN de confirmación de registro"""
-        if not email or not pin_code:
-            return {"error": "Email and PIN are required", "code": 400, "message": "Email and PIN are required"}
+        return flows.run(self._validate_registration_pin(email, pin_code))
 
-        # Verificar que el usuario existe
-        user = self.user_repository.get_user_with_email(email)
-        if not user:
-            return {"error": "No user found with this email", "code": 404, "message": "No user found with this email"}
-
-        # Validar el PIN
-        is_valid = self.user_repository.validate_and_use_pin(
-            email=email,
-            pin_code=pin_code,
-            pin_type="registration"
-        )
-
-        if not is_valid:
-            return {
-                "error": "Invalid or expired registration PIN. Please request a new one",
-                "code": 401
-            }
-
-        self.user_repository.activate_user(email)
-
-        return {"message": "Account verified successfully", "code": 200, "user": user}
-    
     def user_is_validated(self, uuid):
         """Returns whether a user is validated or not, this is seen if they use their PIN"""
-        return self.user_repository.has_used_pin(uuid)
+        return self.pin_store.has_used_pin(uuid)
 
     def update_status(self, uuid, new_status):
         """
         Changes the status to the indicated one.
         If this is not possible, an error is generated.
         """
-        result = self.user_repository.update_status(uuid, new_status)
-        if not result:
-            raise ValueError("Status could not be updated.")
-
-    def update_notification(self, uuid, new_notification_status): 
-        result = self.user_repository.update_notification(uuid, new_notification_status)
-        if not result:
-            raise ValueError("'notification' could not be updated.")
-        return result
+        flows.run(self._update_status(uuid, new_status))
+
+    def update_notification(self, uuid, new_notification_status):
+        return flows.run(self._update_notification(uuid, new_notification_status))
 
     def login_biometric(self, email: str, id_biometric: str) -> dict:
         """
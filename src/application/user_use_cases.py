@@ -0,0 +1,233 @@
+"""
+Use cases shared by UserService (Flask) and AsyncUserService (ASGI), as flows
+(application/flows.py): each service runs them with its own I/O, sync or awaited.
+"""
+
+import random
+import string
+
+from application import flows
+from logger_config import get_logger
+
+logger = get_logger("api-users")
+
+
+def loggable(user_info):
+    """`user_info` without the password, for the logs."""
+    return {key: value for key, value in user_info.items() if key != "password"}
+
+
+class UserUseCases:
+    """
+    Needs `user_repository`, `pin_store`, `email_service` and `teacher_directory`
+    (None: nothing to rebuild) from the service.
+    """
+
+    teacher_directory = None
+
+    def _teachers_changed(self):
+        if self.teacher_directory is not None:
+            self.teacher_directory.changed()
+
+    def _delete(self, uuid):
+        yield self.user_repository.delete_users(uuid)
+        self._teachers_changed()
+
+    def _create(self, request):
+        yield self.user_repository.insert_user(request)
+        self._teachers_changed()
+        return (yield self.user_repository.get_user_with_email(request["email"]))
+
+    def _update_user(self, user, uuid):
+        updated = yield self.user_repository.update_user(user, uuid)
+        self._teachers_changed()  # the role may have changed
+        return updated
+
+    def _create_users_if_not_exist(self, user_info):
+        user = yield self.user_repository.get_user_with_email(user_info["email"])
+        logger.info("In service - create_users_if_not_exist - user: %s", user)
+        if user is not None:
+            return user
+
+        logger.info("User does not exist. Create user with the following parameters: %s", loggable(user_info))
+
+        yield self.user_repository.insert_user(user_info)
+        self._teachers_changed()
+        return (yield self.user_repository.get_user_with_email(user_info["email"]))
+
+    def _create_users_federate(self, user_info):
+        user = yield self.user_repository.get_user_with_email(user_info["email"])
+        logger.info("In service - create_users - user: %s", user)
+        if user is not None:
+            return {"user": user, "exist": True}
+
+        logger.info("User does not exist. Create user with the following parameters: %s", loggable(user_info))
+
+        yield self.user_repository.insert_user(user_info)
+        self._teachers_changed()
+        user = yield self.user_repository.get_user_with_email(user_info["email"])
+        return {"user": user, "exist": False}
+
+    def _initiate_password_recovery(self, email):
+        """Iniciar el proceso de recuperación de contraseña"""
+        user = yield self.user_repository.get_user_with_email(email)
+        if not user:
+            return {"message": "No user found with this email", "code": 404}
+
+        # Verificar si ya existe un PIN activo
+        existing_pin = yield self.pin_store.get_active_pin(user.uuid, "password_recovery")
+        if existing_pin:
+            return {
+                "message": "There's already an active PIN for this user. Please wait 10 minutes.",
+                "code": 429
+            }
+
+        # Generar PIN de 4 dígitos
+        pin_code = ''.join(random.choices(string.digits, k=4))
+
+        # Guardar el PIN
+        yield self.pin_store.create_pin(user.uuid, pin_code, "password_recovery")
+
+        # En producción aquí iría el envío del email
+        logger.info("PIN generated for %s: %s", email, pin_code)
+
+        # Enviar email
+        email_sent = yield flows.blocking(
+            self.email_service.send_pin_email,
+            recipient_email=email,
+            pin_code=pin_code,
+            is_registration=False
+        )
+
+        if not email_sent:
+            return {"message": "Failed to send email", "code": 500}
+
+        return {
+            "message": "Password recovery process initiated",
+            "code": 200
+        }
+
+    def _validate_recovery_pin(self, email, pin_code):
+        """Valida un PIN de recuperación de contraseña"""
+        if not email or not pin_code:
+            return {"message": "Email and PIN are required", "code": 400}
+
+        user = yield self.user_repository.get_user_with_email(email)
+        if not user:
+            return {"message": "No user found with this email", "code": 404}
+
+        is_valid = yield self.pin_store.validate_and_use_pin(
+            user.uuid,
+            email=email,
+            pin_code=pin_code,
+            pin_type="password_recovery"
+        )
+
+        if not is_valid:
+            return {
+                "message": "Invalid or expired PIN. Please generate a new one",
+                "code": 401
+            }
+
+        return {"message": "PIN validated successfully", "code": 200}
+
+    def _update_password(self, email, new_password):
+        """Actualiza la contraseña de un usuario"""
+        if not email or not new_password:
+            return {"message": "Email and new password are required", "code": 400}
+
+        # Verificar que el usuario existe
+        user = yield self.user_repository.get_user_with_email(email)
+        if not user:
+            return {"message": "No user found with this email", "code": 404}
+
+        # Actualizar contraseña
+        success = yield self.user_repository.update_user_password(email, new_password)
+        if not success:
+            return {"message": "Failed to update password", "code": 500}
+
+        # Invalidar todos los PINs existentes
+        yield self.pin_store.invalidate_all_pins(user.uuid)
+
+        return {"message": "Password updated successfully", "code": 200}
+
+    def _initiate_registration_confirmation(self, email):
+        """Iniciar el proceso de confirmación de registro"""
+        user = yield self.user_repository.get_user_with_email(email)
+        if not user:
+            return {"message": "No user found with this email", "code": 404}
+
+        # Verificar si ya existe un PIN activo
+        existing_pin = yield self.pin_store.get_active_pin(user.uuid, "registration")
+        if existing_pin:
+            return {
+                "message": "There's already an active registration PIN for this user. Please wait 10 minutes.",
+                "code": 429
+            }
+
+        # Generar PIN de 4 dígitos
+        pin_code = ''.join(random.choices(string.digits, k=4))
+
+        # Guardar el PIN
+        yield self.pin_store.create_pin(user.uuid, pin_code, "registration")
+
+        # Enviar email
+        email_sent = yield flows.blocking(
+            self.email_service.send_pin_email,
+            recipient_email=email,
+            pin_code=pin_code,
+            is_registration=True
+        )
+
+        if not email_sent:
+            return {"message": "Failed to send email", "code": 500}
+
+        return {
+            "message": "Registration confirmation PIN generated",
+            "code": 200
+        }
+
+    def _validate_registration_pin(self, email, pin_code):
+        """Valida un PIN de confirmación de registro"""
+        if not email or not pin_code:
+            return {"error": "Email and PIN are required", "code": 400, "message": "Email and PIN are required"}
+
+        # Verificar que el usuario existe
+        user = yield self.user_repository.get_user_with_email(email)
+        if not user:
+            return {"error": "No user found with this email", "code": 404, "message": "No user found with this email"}
+
+        # Validar el PIN
+        is_valid = yield self.pin_store.validate_and_use_pin(
+            user.uuid,
+            email=email,
+            pin_code=pin_code,
+            pin_type="registration"
+        )
+
+        if not is_valid:
+            return {
+                "error": "Invalid or expired registration PIN. Please request a new one",
+                "code": 401
+            }
+
+        yield self.user_repository.activate_user(email)
+        self._teachers_changed()
+
+        return {"message": "Account verified successfully", "code": 200, "user": user}
+
+    def _update_status(self, uuid, new_status):
+        """
+        Changes the status to the indicated one.
+        If this is not possible, an error is generated.
+        """
+        result = yield self.user_repository.update_status(uuid, new_status)
+        if not result:
+            raise ValueError("Status could not be updated.")
+        self._teachers_changed()
+
+    def _update_notification(self, uuid, new_notification_status):
+        result = yield self.user_repository.update_notification(uuid, new_notification_status)
+        if not result:
+            raise ValueError("'notification' could not be updated.")
+        return result
@@ -0,0 +1,334 @@
+"""
+ASGI variant of app.py: the same user routes and JSON bodies, served by an event loop.
+
+    uvicorn --app-dir src asgi_app:users_asgi_app --host 0.0.0.0 --port 8080 --workers 4
+
+Every DB call goes through an async connection pool, so one worker keeps many
+requests in flight while they wait on Postgres, SMTP or Google.
+Differences with the Flask app:
+
+- Not served: POST /users/bulk and GET /users/export (their COPY runs on the sync
+  repository), GET /debug/profile and the Swagger UI at /docs (/static/openapi.yaml is).
+- The session cookie is Starlette's (not interchangeable with Flask's).
+- PINs always in the pins table, no read replicas, admission control or request
+  deadlines: those are WSGI only (README).
+"""
+
+import contextlib
+import datetime
+import decimal
+import json
+import os
+import uuid as uuid_lib
+
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.sessions import SessionMiddleware
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+
+from app_factory import AppFactory
+from application.health_service import AsyncHealthService
+from infrastructure import metrics, tracing
+from logger_config import get_logger
+from presentation.http_tracing import TracingMiddleware
+
+logger = get_logger("api-users")
+
+# OAuth config (Starlette client: the OAuth state is kept in request.session).
+# Imported and registered on the first federated request.
+def oauth_factory():
+    from authlib.integrations.starlette_client import OAuth
+
+    return OAuth()
+
+
+# Create layers
+user_controller = AppFactory.create_async(oauth_factory)
+health_service = AsyncHealthService(user_controller.user_service.user_repository)
+metrics.CallbackGauge(
+    "users_db_pool_connections",
+    "Async pool connections by state (size, available, waiting requests).",
+    lambda: _pool_gauges(user_controller.user_service.user_repository.pool_stats()),
+    ("state",),
+)
+
+
+def _pool_gauges(stats):
+    return {
+        ("size",): stats.get("pool_size", 0),
+        ("available",): stats.get("pool_available", 0),
+        ("waiting",): stats.get("requests_waiting", 0),
+    }
+
+
+class AsyncRequest:
+    """Flask-like view of a Starlette request with its body already read."""
+
+    def __init__(self, starlette_request, body):
+        self.starlette_request = starlette_request
+        self.args = starlette_request.query_params
+        self.session = starlette_request.session
+        self._body = body
+
+    @classmethod
+    async def read(cls, starlette_request):
+        return cls(starlette_request, await starlette_request.body())
+
+    @property
+    def is_json(self):
+        mimetype = self.starlette_request.headers.get("content-type", "")
+        mimetype = mimetype.split(";")[0].strip().lower()
+        return mimetype == "application/json" or (
+            mimetype.startswith("application/") and mimetype.endswith("+json")
+        )
+
+    def get_json(self):
+        """Same failures as Flask: 415 if the body is not JSON, 400 if it cannot be decoded."""
+        if not self.is_json:
+            raise HTTPException(415, "Did not attempt to load JSON data because the request Content-Type was not 'application/json'.")
+        try:
+            return json.loads(self._body)
+        except ValueError:
+            raise HTTPException(400, "Failed to decode JSON object")
+
+    def __repr__(self):
+        return f"<Request '{self.starlette_request.url}' [{self.starlette_request.method}]>"
+
+
+def _json_default(o):
+    # Same extra types as Flask's JSON provider.
+    if isinstance(o, (datetime.date, datetime.datetime)):
+        return o.isoformat()
+    if isinstance(o, (decimal.Decimal, uuid_lib.UUID)):
+        return str(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def json_response(body, status_code=200):
+    """Encode like Flask's jsonify (sorted keys, compact, trailing newline)."""
+    if status_code == 204:
+        return Response(status_code=204)
+    content = json.dumps(
+        body, default=_json_default, ensure_ascii=True, sort_keys=True, separators=(",", ":")
+    )
+    return Response(content + "\n", status_code, media_type="application/json")
+
+
+def _result(result):
+    return json_response(result["response"], result["code_status"])
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    repository = user_controller.user_service.user_repository
+    await repository.open()
+    yield
+    await repository.close()
+
+
+# Endpoints:
+
+
+async def health_check(request):
+    return json_response(*health_service.liveness())
+
+
+async def readiness_check(request):
+    return json_response(*await health_service.readiness())
+
+
+async def metrics_endpoint(request):
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+async def get_traces(request):
+    is_session_expired = user_controller.is_session_valid(request)
+    if is_session_expired:
+        return _result(is_session_expired)
+    try:
+        limit = int(request.query_params.get("limit", 20))
+    except ValueError:
+        limit = 20
+    return json_response({"traces": tracing.ring_buffer.traces(limit)})
+
+
+async def get_users(request):
+    return _result(await user_controller.get_users(await AsyncRequest.read(request)))
+
+
+async def get_users_without_check_session(request):
+    return _result(await user_controller.get_users_without_check_session())
+
+
+async def get_specific_users(request):
+    uuid = request.path_params["uuid"]
+    return _result(await user_controller.get_specific_users(await AsyncRequest.read(request), uuid))
+
+
+async def get_specific_users_in_check(request):
+    return _result(await user_controller.get_specific_users_in_check(request.path_params["uuid"]))
+
+
+async def get_active_teachers(request):
+    return _result(await user_controller.get_active_teachers())
+
+
+async def delete_specific_users(request):
+    uuid = request.path_params["uuid"]
+    return _result(await user_controller.delete_specific_users(await AsyncRequest.read(request), uuid))
+
+
+async def add_users(request):
+    return _result(await user_controller.create_users(await AsyncRequest.read(request)))
+
+
+async def set_user_location(request):
+    user_id = request.path_params["user_id"]
+    return _result(await user_controller.set_user_location(await AsyncRequest.read(request), user_id))
+
+
+async def login_users(request):
+    return _result(await user_controller.login_users(await AsyncRequest.read(request)))
+
+
+async def add_admin(request):
+    return _result(await user_controller.create_admin_user(await AsyncRequest.read(request)))
+
+
+async def login_admin(request):
+    return _result(await user_controller.login_admin(await AsyncRequest.read(request)))
+
+
+async def login_user_with_google(request):
+    return await user_controller.login_user_with_google(await AsyncRequest.read(request))
+
+
+async def authorize(request):
+    return _result(await user_controller.authorize(await AsyncRequest.read(request)))
+
+
+async def authorize_with_token(request):
+    return _result(await user_controller.authorize_with_token(await AsyncRequest.read(request)))
+
+
+async def post_signup_google(request):
+    return _result(await user_controller.authorize_signup_token(await AsyncRequest.read(request)))
+
+
+async def post_login_google(request):
+    return _result(await user_controller.authorize_login_token(await AsyncRequest.read(request)))
+
+
+async def password_recovery(request):
+    user_email = request.path_params["user_email"]
+    return _result(await user_controller.initiate_password_recovery(user_email))
+
+
+async def validate_recovery_pin(request):
+    data = (await AsyncRequest.read(request)).get_json()
+    if not data or "pin" not in data:
+        return json_response({"error": "Se requiere el campo 'pin'"}, 400)
+
+    user_email = request.path_params["user_email"]
+    return _result(await user_controller.validate_recovery_pin(user_email, data["pin"]))
+
+
+async def update_password(request):
+    data = (await AsyncRequest.read(request)).get_json()
+    if not data or "new_password" not in data:
+        return json_response({"error": "Se requiere el campo 'new_password'"}, 400)
+
+    user_email = request.path_params["user_email"]
+    return _result(await user_controller.update_password(user_email, data["new_password"]))
+
+
+async def registration_confirmation(request):
+    user_email = request.path_params["user_email"]
+    return _result(await user_controller.initiate_registration_confirmation(user_email))
+
+
+async def validate_registration_pin(request):
+    data = (await AsyncRequest.read(request)).get_json()
+    if not data or "pin" not in data:
+        return json_response({"error": "Se requiere el campo 'pin'"}, 400)
+
+    user_email = request.path_params["user_email"]
+    return _result(await user_controller.validate_registration_pin(user_email, data["pin"]))
+
+
+async def admin_change_user_status(request):
+    return _result(await user_controller.admin_change_user_status(await AsyncRequest.read(request)))
+
+
+async def update_user_notification(request):
+    user_id = request.path_params["user_id"]
+    return _result(await user_controller.update_notification(await AsyncRequest.read(request), user_id))
+
+
+async def login_biometric(request):
+    return _result(await user_controller.login_biometric(await AsyncRequest.read(request)))
+
+
+async def update_biometric_id(request):
+    user_id = request.path_params["user_id"]
+    return _result(await user_controller.update_biometric_id(await AsyncRequest.read(request), user_id))
+
+
+routes = [
+    Route("/health", health_check, methods=["GET"]),
+    Route("/health/live", health_check, methods=["GET"]),
+    Route("/health/ready", readiness_check, methods=["GET"]),
+    Route("/metrics", metrics_endpoint, methods=["GET"]),
+    Route("/debug/traces", get_traces, methods=["GET"]),
+    Route("/users", get_users, methods=["GET"]),
+    Route("/users", add_users, methods=["POST"]),
+    Route("/users/admin", get_users_without_check_session, methods=["GET"]),
+    Route("/users/admin", add_admin, methods=["POST"]),
+    Route("/users/admin/login", login_admin, methods=["POST"]),
+    Route("/users/admin/status", admin_change_user_status, methods=["PUT"]),
+    Route("/users/teachers", get_active_teachers, methods=["GET"]),
+    Route("/users/login", login_users, methods=["POST"]),
+    Route("/users/login/google", login_user_with_google, methods=["GET"]),
+    Route("/users/login/google", post_login_google, methods=["POST"]),
+    Route("/users/login/biometric", login_biometric, methods=["POST"]),
+    Route("/users/authorize", authorize, methods=["GET"]),
+    Route("/users/authorize", authorize_with_token, methods=["POST"]),
+    Route("/users/signup/google", post_signup_google, methods=["POST"]),
+    Route("/users/{uuid:uuid}", get_specific_users, methods=["GET"]),
+    Route("/users/{uuid:uuid}", delete_specific_users, methods=["DELETE"]),
+    Route("/users_check/{uuid:uuid}", get_specific_users_in_check, methods=["GET"]),
+    Route("/users/{user_id:uuid}/location", set_user_location, methods=["PUT"]),
+    Route("/users/{user_id:uuid}/notification", update_user_notification, methods=["PUT"]),
+    Route("/users/{user_id:uuid}/biometric", update_biometric_id, methods=["PUT"]),
+    Route("/users/{user_email:str}/password-recovery", password_recovery, methods=["POST"]),
+    Route("/users/{user_email:str}/password-recovery", validate_recovery_pin, methods=["PUT"]),
+    Route("/users/{user_email:str}/password", update_password, methods=["PUT"]),
+    Route("/users/{user_email:str}/confirm-registration", registration_confirmation, methods=["POST"]),
+    Route("/users/{user_email:str}/confirm-registration", validate_registration_pin, methods=["PUT"]),
+    Mount("/static", StaticFiles(directory=os.path.join(os.path.dirname(__file__), "static")), name="static"),
+]
+
+middleware = [
+    Middleware(TracingMiddleware),
+    Middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_headers=["Content-Type", "Authorization", "X-User-Uuid"],
+        allow_methods=["GET", "POST", "OPTIONS", "PUT"],
+    ),
+    # Session config: same cookie policy and lifetime (5 minutes) as the Flask app.
+    Middleware(
+        SessionMiddleware,
+        secret_key=os.getenv("SECRET_KEY_SESSION", ""),
+        max_age=5 * 60,
+        same_site="none",
+        https_only=True,
+    ),
+]
+
+users_asgi_app = Starlette(routes=routes, middleware=middleware, lifespan=lifespan)
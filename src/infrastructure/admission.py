@@ -0,0 +1,168 @@
+"""
+Admission control: how many requests of each route class run at once in this worker.
+
+When the database slows down, requests would otherwise keep piling up on the serving
+threads. Here a request runs only if its class is under its limit and the worker is
+under ADMISSION_MAX_IN_FLIGHT. Otherwise it waits in its class' queue, which is short
+(ADMISSION_QUEUES) and bounded in time (ADMISSION_MAX_WAIT_MS). When the queue is full
+or the wait ends it is shed: the caller answers 503 with Retry-After right away.
+
+A freed slot goes to the waiting request of the highest-priority class (PRIORITY):
+logins and PIN flows get through before listings and bulk jobs. The per-class limits
+keep a share of the worker for auth: by default writes and reads can take all the slots
+but one.
+
+A queued request holds a serving thread, so the defaults leave threads over the limit:
+half of them run requests and the rest can wait, with no class alone able to take every
+waiting thread. A request over that still reaches the app and is shed at once, instead
+of waiting unseen in gunicorn's backlog.
+"""
+
+import collections
+import os
+import threading
+import time
+
+from infrastructure import lifecycle, metrics
+from logger_config import get_logger
+
+logger = get_logger("api-users")
+
+# Highest priority first.
+PRIORITY = ("auth", "admin", "writes", "reads", "bulk")
+
+ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_MS", 200)) / 1000
+RETRY_AFTER_SECONDS = int(os.getenv("ADMISSION_RETRY_AFTER", 1))
+
+shed_requests = metrics.Counter(
+    "users_http_shed_total",
+    "Requests answered 503 by admission control (queue_full: no room to wait, timeout: waited too long).",
+    ("route_class", "reason"),
+)
+admission_wait = metrics.Histogram(
+    "users_http_admission_wait_seconds",
+    "Time admitted requests spent queued for a slot.",
+    ("route_class",),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+
+def parse_per_class(text, default):
+    """"auth=8,reads=4" -> {class: int} for every class in PRIORITY (missing ones: default(class))."""
+    values = {route_class: default(route_class) for route_class in PRIORITY}
+    for item in filter(None, (part.strip() for part in (text or "").split(","))):
+        name, _, value = item.partition("=")
+        if name not in values:
+            raise ValueError(f"Unknown route class {name!r}: expected one of {', '.join(PRIORITY)}")
+        values[name] = int(value)
+    return values
+
+
+class _Waiter:
+    __slots__ = ("event", "admitted")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.admitted = False
+
+
+class Admission:
+    def __init__(self, max_in_flight, limits, queues, max_wait=MAX_WAIT_SECONDS, retry_after=RETRY_AFTER_SECONDS,
+                 clock=time.monotonic):
+        self.max_in_flight = max_in_flight
+        self.limits = limits
+        self.queues = queues
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+        self.clock = clock
+        self._reset_state()
+
+    @classmethod
+    def from_env(cls, threads):
+        """Limits for a worker with `threads` serving threads (see README, Admisión)."""
+        total = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", max(1, threads // 2)))
+        defaults = {"auth": total, "admin": max(1, total // 2), "writes": max(1, total - 1),
+                    "reads": max(1, total - 1), "bulk": 1}
+        limits = parse_per_class(os.getenv("ADMISSION_LIMITS"), defaults.get)
+        queue = max(1, (threads - total) // 2)
+        queues = parse_per_class(os.getenv("ADMISSION_QUEUES"), lambda route_class: queue)
+        return cls(total, limits, queues)
+
+    def _reset_state(self):
+        self._lock = threading.Lock()
+        self._in_flight = dict.fromkeys(PRIORITY, 0)
+        self._total = 0
+        self._waiting = {route_class: collections.deque() for route_class in PRIORITY}
+
+    def _can_run(self, route_class):
+        return self._total < self.max_in_flight and self._in_flight[route_class] < self.limits[route_class]
+
+    def _start(self, route_class):
+        self._in_flight[route_class] += 1
+        self._total += 1
+
+    def _dispatch(self):
+        # Called with the lock held: hand free slots to waiters, highest priority first.
+        for route_class in PRIORITY:
+            waiting = self._waiting[route_class]
+            while waiting and self._can_run(route_class):
+                waiter = waiting.popleft()
+                waiter.admitted = True
+                self._start(route_class)
+                waiter.event.set()
+
+    def acquire(self, route_class):
+        """None when admitted (call release() afterwards), else the reason it was shed."""
+        with self._lock:
+            if not self._waiting[route_class] and self._can_run(route_class):
+                self._start(route_class)
+                return None
+            if len(self._waiting[route_class]) >= self.queues[route_class]:
+                shed_requests.inc(route_class, "queue_full")
+                return "queue_full"
+            waiter = _Waiter()
+            self._waiting[route_class].append(waiter)
+
+        start = self.clock()
+        waiter.event.wait(self.max_wait)
+        with self._lock:
+            if not waiter.admitted:
+                self._waiting[route_class].remove(waiter)
+                shed_requests.inc(route_class, "timeout")
+                return "timeout"
+        admission_wait.observe(self.clock() - start, route_class)
+        return None
+
+    def release(self, route_class):
+        with self._lock:
+            self._in_flight[route_class] -= 1
+            self._total -= 1
+            self._dispatch()
+
+    def in_flight(self):
+        """{(route_class,): requests running} (metrics)."""
+        return {(route_class,): count for route_class, count in self._in_flight.items()}
+
+    def reset_after_fork(self):
+        # The master served nothing: each worker starts empty with a fresh lock.
+        self._reset_state()
+
+
+def create(threads):
+    """The worker's Admission, or None with ADMISSION_ENABLED=false."""
+    if not ENABLED:
+        return None
+    admission = Admission.from_env(threads)
+    lifecycle.after_fork(admission.reset_after_fork)
+    metrics.CallbackGauge(
+        "users_http_admitted_in_flight",
+        "Requests admitted and running, by route class.",
+        admission.in_flight,
+        ("route_class",),
+    )
+    logger.info(
+        "Admission control: %s in flight, limits %s, queues %s, wait %sms",
+        admission.max_in_flight, admission.limits, admission.queues, int(admission.max_wait * 1000),
+    )
+    return admission
@@ -18,7 +18,32 @@ class DatabaseConfig:
         self.host = os.environ.get("DB_HOST")
         self.password = os.environ.get("DB_PASSWORD")
         self.port = os.environ.get("DB_PORT")
+        # Read replicas: "host[:port],host[:port]" (same database and credentials).
+        self.replica_hosts = os.environ.get("DB_REPLICA_HOSTS", "")
+        # Shards (USERS_REPOSITORY=sharded): "host[:port],host[:port]", same database and credentials.
+        self.shard_hosts = os.environ.get("DB_SHARD_HOSTS", "")
 
     @property
     def connection_strings(self) -> str:
         return f"dbname={self.database} user={self.user} host={self.host} password={self.password} port={self.port}"
+
+    @property
+    def replica_connection_strings(self) -> list:
+        return list(self._connection_strings_for(self.replica_hosts).values())
+
+    @property
+    def shard_connection_strings(self) -> dict:
+        """{"host:port": connection string}: the name identifies the shard in the slot map."""
+        return self._connection_strings_for(self.shard_hosts)
+
+    def _connection_strings_for(self, hosts):
+        result = {}
+        for entry in hosts.split(","):
+            if not entry.strip():
+                continue
+            host, _, port = entry.strip().partition(":")
+            port = port or self.port
+            result[f"{host}:{port}"] = (
+                f"dbname={self.database} user={self.user} host={host} password={self.password} port={port}"
+            )
+        return result
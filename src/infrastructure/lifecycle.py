@@ -0,0 +1,53 @@
+"""
+Process lifecycle hooks for preforking servers (see gunicorn.conf.py).
+
+With app preloading, everything AppFactory builds is created once in the master process
+and inherited by every worker through fork(). Sockets, locks, caches and thread pools do not
+survive a fork safely, so each component registers how to drop and rebuild its state here.
+"""
+
+from logger_config import get_logger
+
+logger = get_logger("api-users")
+
+_before_fork = []
+_after_fork = []
+_on_shutdown = []
+
+
+def before_fork(callback):
+    """Run in the master before each worker is forked (release inherited resources)."""
+    _before_fork.append(callback)
+    return callback
+
+
+def after_fork(callback):
+    """Run in every worker right after the fork (rebuild per-process resources)."""
+    _after_fork.append(callback)
+    return callback
+
+
+def on_shutdown(callback):
+    """Run in every worker when it exits (graceful drain finished)."""
+    _on_shutdown.append(callback)
+    return callback
+
+
+def _run(callbacks, phase):
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception as e:
+            logger.error("Lifecycle hook %s failed in %s: %s", phase, callback, e)
+
+
+def run_before_fork():
+    _run(_before_fork, "before_fork")
+
+
+def run_after_fork():
+    _run(_after_fork, "after_fork")
+
+
+def run_shutdown():
+    _run(_on_shutdown, "shutdown")
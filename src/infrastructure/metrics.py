@@ -0,0 +1,248 @@
+"""
+Minimal Prometheus metrics (text exposition format 0.0.4) with no lock on the hot path.
+
+Every metric keeps one shard (a plain dict) per thread: a thread only ever writes its own
+shard, so incrementing needs no lock, and a scrape sums the shards (dict.copy() is atomic
+under the GIL). Under asyncio everything runs in one thread, so it is one shard.
+
+Values are per process: each series carries a `pid` label so the workers of a preforked
+server never overwrite each other (sum by the other labels to aggregate a pod).
+
+Set METRICS_ENABLED=false to turn instrumentation off entirely.
+"""
+
+import bisect
+import functools
+import inspect
+import os
+import threading
+import time
+
+from infrastructure import lifecycle
+
+ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        _registry.append(self)
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            self._shards.append(shard)  # list.append is atomic
+        return shard
+
+    def reset(self):
+        self._local = threading.local()
+        self._shards = []
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labelvalues, amount=1):
+        shard = self._shard()
+        shard[labelvalues] = shard.get(labelvalues, 0) + amount
+
+    def values(self):
+        totals = {}
+        for shard in list(self._shards):
+            for key, value in shard.copy().items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def render(self, pid):
+        lines = self._header()
+        for key, value in sorted(self.values().items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key, pid)} {_number(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """Up/down gauge (e.g. in-flight requests): inc/dec are summed across threads."""
+
+    kind = "gauge"
+
+    def dec(self, *labelvalues, amount=1):
+        self.inc(*labelvalues, amount=-amount)
+
+
+class CallbackGauge(_Metric):
+    """Gauge read at scrape time: `callback()` returns {labelvalues tuple: value}."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, callback, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def render(self, pid):
+        lines = self._header()
+        try:
+            values = self.callback()
+        except Exception:
+            values = {}
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key, pid)} {_number(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labelvalues):
+        shard = self._shard()
+        counts = shard.get(labelvalues)
+        if counts is None:
+            # one slot per bucket (+Inf included), then sum
+            counts = shard[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def values(self):
+        totals = {}
+        for shard in list(self._shards):
+            for key, counts in shard.copy().items():
+                total = totals.setdefault(key, [0] * len(counts[:-1]) + [0.0])
+                for i, count in enumerate(counts):
+                    total[i] += count
+        return totals
+
+    def render(self, pid):
+        lines = self._header()
+        for key, counts in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts[:-1]):
+                cumulative += count
+                le = (("le", _number(bound)),)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, pid + le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key, pid)} {_number(counts[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key, pid)} {cumulative}")
+        return lines
+
+
+def render():
+    """All registered metrics in Prometheus text format."""
+    pid = (("pid", os.getpid()),)
+    lines = []
+    for metric in list(_registry):
+        lines.extend(metric.render(pid))
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    """Drop every value (after fork: the worker must not report the master's numbers)."""
+    for metric in _registry:
+        metric.reset()
+
+
+lifecycle.after_fork(reset)
+
+
+# Metrics shared by the app
+
+http_request_duration = Histogram(
+    "users_http_request_duration_seconds",
+    "HTTP request latency by route and status.",
+    ("method", "route", "status"),
+)
+http_requests_in_flight = Gauge(
+    "users_http_requests_in_flight",
+    "HTTP requests being served.",
+    ("route",),
+)
+db_query_duration = Histogram(
+    "users_db_query_duration_seconds",
+    "Repository method latency (count = calls).",
+    ("method",),
+)
+db_query_errors = Counter(
+    "users_db_query_errors_total",
+    "Repository methods that raised.",
+    ("method",),
+)
+
+
+def timed_methods(histogram, errors):
+    """
+    Class decorator: time every public method defined on the class (sync or async)
+    into `histogram`, labelled with the method name; exceptions also count in `errors`.
+    """
+
+    def decorate(cls):
+        if not ENABLED:
+            return cls
+        for name, method in list(vars(cls).items()):
+            if name.startswith("_") or not inspect.isfunction(method):
+                continue
+            setattr(cls, name, _timed(method, name, histogram, errors))
+        return cls
+
+    return decorate
+
+
+def _timed(method, name, histogram, errors):
+    perf_counter = time.perf_counter
+
+    if inspect.iscoroutinefunction(method):
+
+        @functools.wraps(method)
+        async def async_wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            except Exception:
+                errors.inc(name)
+                raise
+            finally:
+                histogram.observe(perf_counter() - start, name)
+
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return method(*args, **kwargs)
+        except Exception:
+            errors.inc(name)
+            raise
+        finally:
+            histogram.observe(perf_counter() - start, name)
+
+    return wrapper
@@ -0,0 +1,62 @@
+import os
+
+from psycopg_pool import AsyncConnectionPool
+
+from infrastructure.config.db_config import DatabaseConfig
+from logger_config import get_logger
+
+logger = get_logger("api-users")
+
+
+class AsyncBaseEntity:
+    """
+    Async counterpart of BaseEntity.
+    All the tasks of the event loop share a pool of psycopg AsyncConnections; each
+    statement borrows a connection only for its own duration.
+    The pool must be opened inside the running loop (see asgi_app lifespan).
+    """
+
+    def __init__(self):
+        self.pool = AsyncConnectionPool(
+            DatabaseConfig().connection_strings,
+            min_size=int(os.getenv("DB_POOL_MIN_SIZE", 2)),
+            max_size=int(os.getenv("DB_POOL_MAX_SIZE", 20)),
+            open=False,
+        )
+
+    async def open(self, wait=False, timeout=15):
+        """
+        Open the pool. By default connections are established in the background so the
+        worker starts serving (e.g. /health) without waiting on the database.
+        """
+        try:
+            await self.pool.open(wait=wait, timeout=timeout)
+        except Exception as e:
+            logger.error("Database connection error: %s", e)
+            raise RuntimeError("Database connection error.")
+
+    async def close(self):
+        await self.pool.close()
+
+    async def ping(self, timeout=2):
+        """Round trip on a pooled connection; fails after `timeout` if none is available."""
+        async with self.pool.connection(timeout=timeout) as conn:
+            await conn.execute("SELECT 1")
+
+    def pool_stats(self):
+        return self.pool.get_stats()
+
+    async def fetchone(self, query, params=None):
+        async with self.pool.connection() as conn:
+            cursor = await conn.execute(query, params)
+            return await cursor.fetchone()
+
+    async def fetchall(self, query, params=None):
+        async with self.pool.connection() as conn:
+            cursor = await conn.execute(query, params)
+            return await cursor.fetchall()
+
+    async def execute(self, query, params=None):
+        """Run a statement without result rows (committed when the connection is returned)."""
+        async with self.pool.connection() as conn:
+            await conn.execute(query, params)
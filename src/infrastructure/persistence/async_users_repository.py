@@ -0,0 +1,124 @@
+import asyncio
+
+from infrastructure import metrics, tracing
+from infrastructure.persistence import users_queries
+from infrastructure.persistence.async_base_entity import AsyncBaseEntity
+from infrastructure.persistence.users_repository import UserRowMapper
+from logger_config import get_logger
+
+logger = get_logger("api-users")
+
+
+@tracing.traced_methods
+@metrics.timed_methods(metrics.db_query_duration, metrics.db_query_errors)
+class AsyncUsersRepository(UserRowMapper, AsyncBaseEntity):
+    """
+    Same interface and return shapes as UsersRepository, with coroutines.
+    Password hashing is CPU bound, so it runs in a thread to keep the loop free.
+    """
+
+    def __init__(self):
+        super().__init__()
+
+    async def missing_schema_columns(self):
+        rows = await self.fetchall(users_queries.SCHEMA_COLUMNS, (list(users_queries.REQUIRED_SCHEMA),))
+        return self._missing_columns(rows)
+
+    async def get_all_users(self):
+        users = await self.fetchall(users_queries.GET_ALL_USERS)
+        logger.debug("users is %s", users)
+        return [self._parse_user(user[0]) for user in users]
+
+    async def get_active_teachers(self):
+        users = await self.fetchall(users_queries.GET_ACTIVE_TEACHERS)
+        logger.debug("teachers are %s", users)
+        return [self._parse_user(user[0]) for user in users]
+
+    async def get_user(self, user_id):
+        user = await self.fetchone(users_queries.GET_USER, (str(user_id),))
+        if not user:
+            return user
+        return self._parse_user(user[0])
+
+    async def get_user_with_email(self, email):
+        user = await self.fetchone(users_queries.GET_USER_WITH_EMAIL, (str(email),))
+        if not user:
+            return None
+        return self._parse_user(user[0])
+
+    async def insert_user(self, params_new_user):
+        params = await asyncio.to_thread(self._get_params_to_insert, params_new_user)
+        await self.execute(users_queries.INSERT_USER, params)
+
+    async def update_user(self, user_data, user_uuid):
+        password = await asyncio.to_thread(self._hash_password, user_data.get("password"))
+        params = (user_data.get("name"), user_data.get("surname"), user_data.get("role"), password, user_uuid)
+        await self.execute(users_queries.UPDATE_USER, params)
+        return await self.get_user(user_uuid)
+
+    async def delete_users(self, user_id):
+        await self.execute(users_queries.DELETE_USER, (str(user_id),))
+
+    async def set_location(self, params_new_user):
+        params = (
+            params_new_user["uuid"],
+            params_new_user["latitude"],
+            params_new_user["longitude"],
+        )
+        await self.execute(users_queries.SET_LOCATION, params)
+
+    async def check_email(self, email):
+        user = await self.fetchone(users_queries.CHECK_EMAIL, (email,))
+        if user:
+            return user[0]
+        return None
+
+    async def get_active_pin(self, user_id, pin_type):
+        return await self.fetchone(users_queries.GET_ACTIVE_PIN, (str(user_id), pin_type))
+
+    async def create_pin(self, user_id, pin_code, pin_type):
+        await self.execute(users_queries.CREATE_PIN, (str(user_id), pin_code, pin_type))
+
+    async def validate_and_use_pin(self, email: str, pin_code: str, pin_type: str) -> bool:
+        result = await self.fetchone(users_queries.VALIDATE_AND_USE_PIN, (email, pin_code, pin_type))
+        return bool(result)
+
+    async def pin_in_progress(self, uuid):
+        result = await self.fetchone(users_queries.PIN_IN_PROGRESS, (uuid,))
+        logger.debug("[REPOSITORY] uuid: %s - RESULT %s", uuid, result)
+        return bool(result)
+
+    async def pin_expired(self, uuid):
+        result = await self.fetchone(users_queries.PIN_EXPIRED, {"user_id": str(uuid)})
+        logger.debug("[REPOSITORY] uuid: %s - RESULT %s", uuid, result)
+        return bool(result)
+
+    async def has_used_pin(self, user_id: str) -> bool:
+        result = await self.fetchone(users_queries.HAS_USED_PIN, {"user_id": str(user_id)})
+        return bool(result)
+
+    async def update_user_password(self, email, new_password):
+        hashed_password = await asyncio.to_thread(self._hash_password, new_password)
+        result = await self.fetchone(users_queries.UPDATE_USER_PASSWORD, (hashed_password, email))
+        return bool(result)
+
+    async def invalidate_all_pins(self, user_id):
+        await self.execute(users_queries.INVALIDATE_ALL_PINS, (str(user_id),))
+
+    async def activate_user(self, email):
+        result = await self.fetchone(users_queries.ACTIVATE_USER, (email,))
+        return bool(result)
+
+    async def update_status(self, uuid, new_status):
+        result = await self.fetchone(users_queries.UPDATE_STATUS, (new_status, str(uuid)))
+        return bool(result)
+
+    async def update_notification(self, uuid, new_notif_status):
+        result = await self.fetchone(users_queries.UPDATE_NOTIFICATION, (new_notif_status, str(uuid)))
+        if result:
+            return result[0]
+        return None
+
+    async def update_biometric_id(self, user_id, id_biometric):
+        result = await self.fetchone(users_queries.UPDATE_BIOMETRIC_ID, (id_biometric, str(user_id)))
+        return bool(result)
@@ -1,33 +1,257 @@
+import contextvars
+import functools
+import threading
 import psycopg
-import time
 
+from infrastructure import metrics
 from infrastructure.config.db_config import DatabaseConfig
+from infrastructure.persistence import deadlines, read_your_writes
+from infrastructure.persistence.circuit_breaker import CONNECT_TIMEOUT, CircuitBreaker, DatabaseUnavailable, server_name
+from infrastructure.persistence.replicas import Replica, ReplicaRouter, db_reads
 from logger_config import get_logger
 
 logger = get_logger("api-users")
 
-class BaseEntity:
+CURRENT_WAL_LSN = "SELECT pg_current_wal_lsn()::text"
+
+# Server of the repository call in progress: None (untagged: primary), PRIMARY or a Replica.
+_route = contextvars.ContextVar("db_route", default=None)
+PRIMARY = "primary"
+
+read_retries = metrics.Counter(
+    "users_db_read_retries_total",
+    "Reads retried on a new connection after the previous one was lost.",
+    ("method",),
+)
 
-    def __init__(self):
-        self.conn = self.connect_with_retries()
-        self.cursor = self.conn.cursor()
 
-    def connect_with_retries(self, retries=5, delay=3):
-        """Retry connecting to the DB until it is available."""
-        for attempt in range(retries):
+def reads(method):
+    """
+    Repository method that only reads: with replicas (DB_REPLICA_HOSTS) it runs on one
+    that has replayed the request's read-your-writes LSN, else on the primary. It is
+    retried on the primary if the replica fails, and once more on a new connection if
+    the primary's connection was lost meanwhile (reads are idempotent). Inside another
+    tagged call (a write that reads back what it wrote) it stays where it is.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if _route.get() is not None:
+            return method(self, *args, **kwargs)
+        replica = self.replicas.choose(read_your_writes.required_lsn()) if self.replicas is not None else None
+        if replica is not None:
+            token = _route.set(replica)
+            replica.in_flight += 1
+            try:
+                result = method(self, *args, **kwargs)
+                db_reads.inc(replica.name)
+                return result
+            except psycopg.OperationalError as e:
+                replica.failed(e)
+            finally:
+                replica.in_flight -= 1
+                _route.reset(token)
+        token = _route.set(PRIMARY)
+        try:
             try:
-                connection_string = DatabaseConfig().connection_strings
-                return psycopg.connect(connection_string)
-            except psycopg.OperationalError:
-                time.sleep(delay)
-        logger.error("Database connection error.")
-        raise RuntimeError("Database connection error.")
+                result = method(self, *args, **kwargs)
+            except psycopg.OperationalError as e:
+                if not self._connection_lost():
+                    raise
+                logger.warning("Connection lost during %s, retrying on a new one: %s", method.__name__, e)
+                read_retries.inc(method.__name__)
+                result = method(self, *args, **kwargs)
+            if self.replicas is not None:
+                db_reads.inc(PRIMARY)
+            return result
+        finally:
+            _route.reset(token)
+
+    return wrapper
+
+
+def writes(method):
+    """
+    Repository method that writes (always on the primary). With replicas, the WAL
+    position it reached is recorded for read_your_writes once it returns, and in
+    every case the process's write generation moves on.
+    Methods without a tag also run on the primary, with no LSN bookkeeping: schema
+    checks and PIN reads, which decide on security and must never see stale rows.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            if self.replicas is None or _route.get() is not None:
+                return method(self, *args, **kwargs)
+            token = _route.set(PRIMARY)
+            try:
+                result = method(self, *args, **kwargs)
+            finally:
+                _route.reset(token)
+            self._record_write_lsn()
+            return result
+        finally:
+            # Even if it failed: part of it may have committed.
+            read_your_writes.wrote_locally()
+
+    return wrapper
+
+
+def _open(conninfo):
+    return psycopg.connect(conninfo or DatabaseConfig().connection_strings, connect_timeout=CONNECT_TIMEOUT)
+
+
+def _probe(conninfo):
+    _open(conninfo).close()
+
+
+class BaseEntity:
+    """
+    Each thread gets its own connection and cursor.
+    A threaded worker serves requests concurrently and a psycopg cursor must not be
+    shared between threads (one thread could fetch the rows of another's query).
+
+    Connections are opened lazily, on first use (or by warm_up), so importing the
+    app never waits on the database. A connection found closed (server restarted,
+    network cut) is replaced by a new one on the next use; while the server is down
+    the circuit breaker fails fast and reconnects in the background (circuit_breaker.py).
+    """
+
+    def __init__(self, conninfo=None):
+        """`conninfo`: a specific server (a shard); default DB_* (with its replicas)."""
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self.conninfo = conninfo
+        self.replicas = None
+        # Not a bound method: the breaker must not keep the entity alive (__del__ closes its connections).
+        self.breaker = CircuitBreaker(server_name(conninfo) if conninfo else PRIMARY, functools.partial(_probe, conninfo))
+        if conninfo is None:
+            self.replicas = ReplicaRouter.from_conninfos(DatabaseConfig().replica_connection_strings)
+
+    @property
+    def conn(self):
+        route = _route.get()
+        if isinstance(route, Replica):
+            return deadlines.track(route.conn)
+        return deadlines.track(self._connection())
+
+    def _connection(self):
+        """The calling thread's primary connection, opened (or reopened) if needed."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and conn.closed:
+            self._drop_connection()
+            conn = None
+        if conn is None:
+            conn = self._bind(self.connect())
+        return conn
+
+    def _bind(self, conn):
+        """Make `conn` the calling thread's connection."""
+        cursor = conn.cursor()
+        self._local.conn = conn
+        self._local.cursor = cursor
+        with self._connections_lock:
+            self._connections.append((conn, cursor))
+        return conn
+
+    def _drop_connection(self):
+        """Forget the calling thread's connection (closed or broken): the next use opens a new one."""
+        conn = self._local.conn
+        del self._local.conn, self._local.cursor
+        with self._connections_lock:
+            self._connections = [(c, cursor) for c, cursor in self._connections if c is not conn]
+        try:
+            conn.close()
+        except psycopg.Error:
+            pass
+
+    def _connection_lost(self):
+        conn = getattr(self._local, "conn", None)
+        return conn is not None and conn.closed
+
+    @property
+    def cursor(self):
+        route = _route.get()
+        if isinstance(route, Replica):
+            deadlines.starting(route.conn)
+            return route.cursor
+        deadlines.starting(self._connection())
+        return self._local.cursor
+
+    def _record_write_lsn(self):
+        self.cursor.execute(CURRENT_WAL_LSN)
+        lsn = self.cursor.fetchone()[0]
+        self.conn.commit()
+        read_your_writes.wrote(read_your_writes.parse_lsn(lsn))
+
+    def warm_up(self):
+        """Open the calling thread's connection now (readiness phase) instead of on first query."""
+        return self.conn is not None
+
+    def ping(self):
+        """
+        Round trip on the calling thread's connection (readiness probe).
+        Fails at once while the breaker is open.
+        """
+        self.cursor.execute("SELECT 1")
+        self.cursor.fetchone()
+        self.conn.commit()
+
+    @property
+    def open_connections(self):
+        return len(self._connections)
+
+    def connect(self):
+        """
+        A new connection, in one attempt: the caller never sleeps. Raises
+        DatabaseUnavailable when it fails or while the breaker is open.
+        """
+        self.breaker.check()
+        try:
+            conn = _open(self.conninfo)
+        except psycopg.OperationalError as e:
+            logger.error("Database connection error: %s", e)
+            self.breaker.failure(e)
+            raise DatabaseUnavailable("Database connection error.") from e
+        self.breaker.success()
+        return conn
 
     def commit(self):
         self.cursor.commit()
 
+    def close(self):
+        """Close every connection opened by this entity (any thread)."""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn, cursor in connections:
+            try:
+                cursor.close()
+                conn.close()
+            except psycopg.Error as e:
+                logger.warning("Error closing connection: %s", e)
+        self._local = threading.local()
+        self.breaker.close()
+        if self.replicas is not None:
+            self.replicas.close()
+
+    def reset_after_fork(self):
+        """
+        Forget the connections inherited from the parent process.
+        They are not closed here: closing (or letting them be garbage collected) would
+        terminate the parent's session too, so they are kept referenced.
+        The next use in this process opens a fresh connection.
+        """
+        self._inherited_connections = self._connections
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._local = threading.local()
+        self.breaker.reset_after_fork()
+        if self.replicas is not None:
+            self.replicas.reset_after_fork()
+
     def __del__(self):
-        if hasattr(self, "cursor"):
-            self.cursor.close()
-        if hasattr(self, "conn"):
-            self.conn.close()
+        for conn, cursor in getattr(self, "_connections", []):
+            cursor.close()
+            conn.close()
@@ -0,0 +1,128 @@
+"""
+Circuit breaker of a database server for BaseEntity, with reconnection in the background.
+
+Request threads connect with a single attempt (DB_CONNECT_TIMEOUT), never sleeping.
+After DB_BREAKER_FAILURES failed attempts in a row the breaker opens: connecting fails
+at once with DatabaseUnavailable, and one background thread tries to reach the server
+with exponential backoff and full jitter (a random wait between 0 and
+DB_RECONNECT_BASE_MS * 2^attempt, at most DB_RECONNECT_MAX_MS), so the workers of every
+pod do not hit a recovering server in lockstep. When it gets through, the breaker closes
+and request threads open their connections again.
+"""
+
+import os
+import random
+import threading
+import weakref
+
+import psycopg
+
+from infrastructure import metrics
+from logger_config import get_logger
+
+logger = get_logger("api-users")
+
+FAILURES = int(os.getenv("DB_BREAKER_FAILURES", 3))
+CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", 3))
+RECONNECT_BASE_SECONDS = float(os.getenv("DB_RECONNECT_BASE_MS", 250)) / 1000
+RECONNECT_MAX_SECONDS = float(os.getenv("DB_RECONNECT_MAX_MS", 30000)) / 1000
+
+_breakers = weakref.WeakSet()
+
+rejected = metrics.Counter(
+    "users_db_breaker_rejected_total",
+    "Connections refused at once because the server's breaker is open.",
+    ("server",),
+)
+reconnects = metrics.Counter(
+    "users_db_reconnect_attempts_total",
+    "Background reconnection attempts while a breaker is open (outcome: ok, failed).",
+    ("server", "outcome"),
+)
+metrics.CallbackGauge(
+    "users_db_breaker_open",
+    "1 while the server's breaker is open (database unreachable).",
+    lambda: {(breaker.name,): int(breaker.is_open) for breaker in list(_breakers)},
+    ("server",),
+)
+
+
+class DatabaseUnavailable(RuntimeError):
+    pass
+
+
+def server_name(conninfo):
+    """"host:port" of a connection string (metrics and logs)."""
+    params = psycopg.conninfo.conninfo_to_dict(conninfo)
+    return f"{params.get('host', 'localhost')}:{params.get('port', 5432)}"
+
+
+def backoff(attempt, base=RECONNECT_BASE_SECONDS, cap=RECONNECT_MAX_SECONDS):
+    """Full jitter: uniform between 0 and min(cap, base * 2^attempt)."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    def __init__(self, name, probe, failures=FAILURES, base=RECONNECT_BASE_SECONDS, cap=RECONNECT_MAX_SECONDS):
+        """`probe()`: opens and closes a connection to the server (raises psycopg.Error when down)."""
+        self.name = name
+        self.probe = probe
+        self.failures = failures
+        self.base = base
+        self.cap = cap
+        self._reset_state()
+        _breakers.add(self)
+
+    def _reset_state(self):
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._failed = 0
+        self.is_open = False
+
+    def check(self):
+        """Raise DatabaseUnavailable while open (instead of waiting on a connect timeout)."""
+        if self.is_open:
+            rejected.inc(self.name)
+            raise DatabaseUnavailable(f"Database {self.name} unavailable, reconnecting in the background")
+
+    def success(self):
+        self._failed = 0
+
+    def failure(self, error):
+        with self._lock:
+            self._failed += 1
+            if self.is_open or self._failed < self.failures:
+                return
+            self.is_open = True
+        logger.error("Database %s unreachable (%s failed connections): %s", self.name, self._failed, error)
+        threading.Thread(target=self._reconnect, args=(self._stop,), name=f"db-reconnect-{self.name}",
+                         daemon=True).start()
+
+    def _reconnect(self, stop):
+        attempt = 0
+        while not stop.wait(backoff(attempt, self.base, self.cap)):
+            try:
+                self.probe()
+            except psycopg.Error as e:
+                reconnects.inc(self.name, "failed")
+                attempt += 1
+                logger.debug("Database %s still unreachable: %s", self.name, e)
+                continue
+            reconnects.inc(self.name, "ok")
+            with self._lock:
+                self._failed = 0
+                self.is_open = False
+            logger.info("Database %s reachable again after %s attempts", self.name, attempt + 1)
+            return
+
+    def close(self):
+        """Stop the background reconnection; the next failures start over (closed)."""
+        with self._lock:
+            self._stop.set()
+            self._stop = threading.Event()
+            self._failed = 0
+            self.is_open = False
+
+    def reset_after_fork(self):
+        # The reconnection thread does not exist in the child: start closed, as a new worker.
+        self._reset_state()
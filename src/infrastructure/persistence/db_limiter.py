@@ -0,0 +1,204 @@
+"""
+Adaptive limit on the database calls this process runs at once (AIMD on latency).
+
+Each serving thread has its own connection, so the number of threads is the only cap on
+concurrent queries: too low at peak, too high when the database degrades (every slow
+query is another session competing for the same CPU and locks). Here every UsersRepository
+call takes a slot first; the number of slots (the limit) adapts to the latency observed:
+
+- A call slower than DB_LIMIT_TOLERANCE times the usual latency of its method (plus
+  DB_LIMIT_SLACK_MS), or that failed with an OperationalError, cuts the limit by
+  DB_LIMIT_BACKOFF. Calls that started before the last cut do not cut it again: they
+  were admitted under the old limit (one cut per round trip, as TCP does).
+- A fast call while at least half the slots are in use adds 1/limit: about one more
+  slot per `limit` calls.
+
+The usual latency of a method is its lowest recent latency: it follows a faster call at
+once and drifts slowly towards slower ones. A call waits DB_LIMIT_MAX_WAIT_MS at most
+for a slot, then fails with DbOverloaded (503). It never waits past its request's
+deadline: the slot is taken before the deadline checks of the call itself, so the wait
+checks it and fails with DeadlineExceeded (504).
+"""
+
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+
+import psycopg
+
+from infrastructure import lifecycle, metrics
+from infrastructure.persistence import deadlines
+from logger_config import get_logger
+
+logger = get_logger("api-users")
+
+ENABLED = os.getenv("DB_LIMIT_ENABLED", "true").lower() == "true"
+INITIAL_LIMIT = int(os.getenv("DB_LIMIT_INITIAL", 8))
+MIN_LIMIT = int(os.getenv("DB_LIMIT_MIN", 1))
+MAX_LIMIT = int(os.getenv("DB_LIMIT_MAX", 64))
+MAX_WAIT_SECONDS = float(os.getenv("DB_LIMIT_MAX_WAIT_MS", 1000)) / 1000
+TOLERANCE = float(os.getenv("DB_LIMIT_TOLERANCE", 2.0))
+SLACK_SECONDS = float(os.getenv("DB_LIMIT_SLACK_MS", 5)) / 1000
+BACKOFF = float(os.getenv("DB_LIMIT_BACKOFF", 0.9))
+BASELINE_DRIFT = 0.01  # share of a slower latency the baseline moves towards
+
+queue_wait = metrics.Histogram(
+    "users_db_limit_wait_seconds",
+    "Time repository calls waited for a database slot.",
+    ("method",),
+    buckets=(0.0001, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+rejected = metrics.Counter(
+    "users_db_limit_rejected_total",
+    "Repository calls that found no database slot within DB_LIMIT_MAX_WAIT_MS.",
+    ("method",),
+)
+
+# Set while the calling thread holds a slot: nested repository calls reuse it.
+_holding = contextvars.ContextVar("db_limit_holding", default=False)
+
+
+class DbOverloaded(RuntimeError):
+    pass
+
+
+class AimdLimiter:
+    def __init__(self, initial=INITIAL_LIMIT, min_limit=MIN_LIMIT, max_limit=MAX_LIMIT, max_wait=MAX_WAIT_SECONDS,
+                 tolerance=TOLERANCE, slack=SLACK_SECONDS, backoff=BACKOFF, clock=time.monotonic):
+        self.initial = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_wait = max_wait
+        self.tolerance = tolerance
+        self.slack = slack
+        self.backoff = backoff
+        self.clock = clock
+        self._reset_state()
+
+    def _reset_state(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._limit = float(self.initial)
+        self._in_flight = 0
+        self._baseline = {}  # method -> seconds
+        self._cut_at = float("-inf")
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def acquire(self, name):
+        """Wait for a slot (up to max_wait, and not past the request's deadline); returns when the call started."""
+        start = self.clock()
+        deadline = deadlines.current()
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                remaining = start + self.max_wait - self.clock()
+                left = None if deadline is None else deadline.remaining()
+                if left is not None and left < remaining:
+                    if left <= 0:
+                        deadlines.expired_calls.inc(name)
+                        deadline.exceeded = True
+                        raise deadlines.DeadlineExceeded(f"Request deadline exceeded waiting for a database slot for {name}")
+                    remaining = left
+                elif remaining <= 0:
+                    rejected.inc(name)
+                    raise DbOverloaded(f"No database slot for {name} in {self.max_wait:.3f}s (limit {self.limit})")
+                self._condition.wait(remaining)
+            self._in_flight += 1
+        started = self.clock()
+        queue_wait.observe(started - start, name)
+        return started
+
+    def release(self, name, started, failed=False):
+        """Give the slot back and adapt the limit to the call's latency."""
+        now = self.clock()
+        with self._condition:
+            in_use = self._in_flight
+            self._in_flight -= 1
+            if self._slow(name, now - started) or failed:
+                if started >= self._cut_at:
+                    self._limit = max(self.min_limit, self._limit * self.backoff)
+                    self._cut_at = now
+            elif in_use * 2 >= self._limit:
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+            self._condition.notify(max(1, int(self._limit) - self._in_flight))
+
+    def _slow(self, name, latency):
+        # Called with the lock held.
+        baseline = self._baseline.get(name)
+        if baseline is None or latency < baseline:
+            self._baseline[name] = latency
+            return False
+        self._baseline[name] = baseline + (latency - baseline) * BASELINE_DRIFT
+        return latency > baseline * self.tolerance + self.slack
+
+    def reset_after_fork(self):
+        # The master ran no queries: each worker starts from the initial limit.
+        self._reset_state()
+
+
+def limited_methods(limiter):
+    """
+    Class decorator: every public method defined on the class runs in a slot of
+    `limiter` (None: unchanged). A method called from another one reuses its slot.
+    """
+
+    def decorate(cls):
+        if limiter is None:
+            return cls
+        for name, method in list(vars(cls).items()):
+            if name.startswith("_") or not inspect.isfunction(method):
+                continue
+            setattr(cls, name, _limited(method, name, limiter))
+        return cls
+
+    return decorate
+
+
+def _limited(method, name, limiter):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        if _holding.get():
+            return method(*args, **kwargs)
+        started = limiter.acquire(name)
+        token = _holding.set(True)
+        failed = False
+        try:
+            return method(*args, **kwargs)
+        except psycopg.OperationalError:
+            failed = True
+            raise
+        finally:
+            _holding.reset(token)
+            limiter.release(name, started, failed)
+
+    return wrapper
+
+
+def create():
+    """The process limiter, or None with DB_LIMIT_ENABLED=false."""
+    if not ENABLED:
+        return None
+    limiter = AimdLimiter()
+    lifecycle.after_fork(limiter.reset_after_fork)
+    metrics.CallbackGauge(
+        "users_db_concurrency_limit",
+        "Database calls this worker lets run at once (adaptive).",
+        lambda: {(): limiter.limit},
+    )
+    metrics.CallbackGauge(
+        "users_db_calls_in_flight",
+        "Database calls running in this worker.",
+        lambda: {(): limiter.in_flight},
+    )
+    return limiter
+
+
+limiter = create()
@@ -0,0 +1,236 @@
+"""
+Request deadline, and cancellation of the statements that outlive it.
+
+presentation.http_deadlines begins each request with its deadline (X-Request-Deadline
+or the route's default). Every UsersRepository call checks it. A call that starts
+after the deadline fails at once, and so does its next statement once the deadline
+has passed (never its commit: a write whose statements finished in time commits). A
+statement still running when the deadline passes is cancelled on the server by one
+watchdog thread per process (psycopg cancel_safe), so PostgreSQL stops working for a
+client that has given up. Either way the call raises DeadlineExceeded, its transaction
+is rolled back and the request answers 504.
+
+The statement is cancelled rather than run with a per-call `SET statement_timeout`:
+that would add a round trip to every call to save the rare slow one.
+"""
+
+import contextvars
+import functools
+import heapq
+import inspect
+import itertools
+import os
+import threading
+import time
+
+import psycopg
+
+from infrastructure import lifecycle, metrics
+from logger_config import get_logger
+
+logger = get_logger("api-users")
+
+CANCEL_TIMEOUT = float(os.getenv("DB_CANCEL_TIMEOUT", 2))
+
+cancelled_statements = metrics.Counter(
+    "users_db_statements_cancelled_total",
+    "Statements cancelled on the server because the request's deadline passed.",
+    ("method",),
+)
+expired_calls = metrics.Counter(
+    "users_db_calls_expired_total",
+    "Repository calls not started because the request's deadline had already passed.",
+    ("method",),
+)
+
+_deadline = contextvars.ContextVar("request_deadline", default=None)
+# The repository call being watched: its statements are cancelled at its deadline.
+_call = contextvars.ContextVar("deadline_call", default=None)
+
+
+class DeadlineExceeded(RuntimeError):
+    pass
+
+
+class Deadline:
+    __slots__ = ("at", "exceeded")
+
+    def __init__(self, at):
+        self.at = at  # time.monotonic()
+        self.exceeded = False  # a call ran out of time (the request answers 504)
+
+    def remaining(self):
+        return self.at - time.monotonic()
+
+
+def begin(seconds):
+    """Start of a request with `seconds` left (None: no deadline). Returns the token for end()."""
+    return _deadline.set(Deadline(time.monotonic() + seconds) if seconds is not None else None)
+
+
+def end(token):
+    _deadline.reset(token)
+
+
+def current():
+    """This request's Deadline, or None."""
+    return _deadline.get()
+
+
+class _Call:
+    __slots__ = ("deadline", "conn", "active", "cancelled", "cancelling")
+
+    def __init__(self, deadline):
+        self.deadline = deadline
+        self.conn = None
+        self.active = True
+        self.cancelled = False
+        self.cancelling = None  # Event set once the watchdog's cancel of this call is done
+
+
+class Watchdog:
+    """One thread that sleeps until the nearest deadline and cancels the statement of that call."""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._reset_state()
+
+    def _reset_state(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._heap = []  # (deadline, seq, _Call); finished calls are skipped when they come up
+        self._seq = itertools.count()
+        self._thread = None
+
+    def watch(self, deadline):
+        call = _Call(deadline)
+        with self._condition:
+            heapq.heappush(self._heap, (deadline.at, next(self._seq), call))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="db-deadlines", daemon=True)
+                self._thread.start()
+            elif self._heap[0][2] is call:
+                self._condition.notify()
+        return call
+
+    def unwatch(self, call):
+        # A statement is never cancelled once its call has returned (the connection may
+        # already run the next call's statement): either the watchdog has not taken the
+        # call yet and never will, or this call waits for its cancel to be done.
+        with self._condition:
+            call.active = False
+            cancelling = call.cancelling
+        if cancelling is not None:
+            cancelling.wait()
+
+    def _next_expired(self):
+        """(call, conn): the next call past its deadline that has a connection (blocks until there is one)."""
+        with self._condition:
+            while True:
+                while self._heap and not self._heap[0][2].active:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                delay = self._heap[0][0] - self.clock()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                _, _, call = heapq.heappop(self._heap)
+                call.active = False
+                if call.conn is not None:
+                    call.cancelled = True
+                    call.cancelling = threading.Event()
+                    return call, call.conn
+
+    def _run(self):
+        while True:
+            call, conn = self._next_expired()
+            # Outside the lock: a slow cancel (degraded database) only holds up its own call.
+            try:
+                conn.cancel_safe(timeout=CANCEL_TIMEOUT)
+            except psycopg.Error as e:
+                logger.warning("Could not cancel a statement past its deadline: %s", e)
+            finally:
+                call.cancelling.set()
+
+    def reset_after_fork(self):
+        # The watchdog thread does not exist in the child.
+        self._reset_state()
+
+
+watchdog = Watchdog()
+lifecycle.after_fork(watchdog.reset_after_fork)
+
+
+def track(conn):
+    """
+    BaseEntity hands over the connection a watched call uses: it is the one cancelled
+    at the deadline, and rolled back if the call fails. No deadline check here: commit()
+    and rollback() go through it, and a write whose last statement finished must be able
+    to commit (or be rolled back) whatever the time.
+    """
+    call = _call.get()
+    if call is not None:
+        call.conn = conn
+    return conn
+
+
+def starting(conn):
+    """Like track(), right before a statement: a call that reaches a new statement after the deadline stops here."""
+    call = _call.get()
+    if call is None:
+        return conn
+    if call.cancelled or call.deadline.remaining() <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    call.conn = conn
+    return conn
+
+
+def deadline_methods(cls):
+    """Class decorator: every public method defined on the class honours the request's deadline."""
+    for name, method in list(vars(cls).items()):
+        if name.startswith("_") or not inspect.isfunction(method):
+            continue
+        setattr(cls, name, _with_deadline(method, name))
+    return cls
+
+
+def _with_deadline(method, name):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        deadline = _deadline.get()
+        if deadline is None or _call.get() is not None:
+            return method(*args, **kwargs)
+        if deadline.remaining() <= 0:
+            deadline.exceeded = True
+            expired_calls.inc(name)
+            raise DeadlineExceeded(f"Request deadline exceeded before {name}")
+        call = watchdog.watch(deadline)
+        token = _call.set(call)
+        try:
+            return method(*args, **kwargs)
+        except Exception as e:
+            # Whatever failed, the call's transaction is not left open: the connection is
+            # reused by the next request, whose commit() would persist this one's writes.
+            if call.conn is not None:
+                _rollback(call.conn)
+            if not isinstance(e, (psycopg.errors.QueryCanceled, DeadlineExceeded)):
+                raise
+            if not (call.cancelled or deadline.remaining() <= 0):
+                raise  # cancelled by something else (e.g. statement_timeout set by an admin)
+            deadline.exceeded = True
+            if call.cancelled:
+                cancelled_statements.inc(name)
+            raise DeadlineExceeded(f"Request deadline exceeded in {name}") from e
+        finally:
+            watchdog.unwatch(call)
+            _call.reset(token)
+
+    return wrapper
+
+
+def _rollback(conn):
+    try:
+        conn.rollback()
+    except psycopg.Error as e:
+        logger.warning("Rollback after a failed call failed: %s", e)
@@ -0,0 +1,332 @@
+import datetime
+import threading
+import uuid
+
+import psycopg
+
+from infrastructure import metrics, tracing
+from infrastructure.persistence import users_export
+from infrastructure.persistence.users_repository import UserRowMapper
+from logger_config import get_logger
+
+logger = get_logger("api-users")
+
+# Same window as the SQL (`created_at > NOW() - INTERVAL '10 minutes'`).
+PIN_TTL = datetime.timedelta(minutes=10)
+
+
+def _utcnow():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class _Pin:
+    __slots__ = ("pin_id", "user_id", "pin_code", "pin_type", "created_at", "used")
+
+    def __init__(self, user_id, pin_code, pin_type, created_at):
+        self.pin_id = uuid.uuid4()
+        self.user_id = user_id
+        self.pin_code = pin_code
+        self.pin_type = pin_type
+        self.created_at = created_at
+        self.used = False
+
+
+class InMemoryEntity:
+    """BaseEntity's connection interface (lifecycle hooks, health, metrics) with nothing behind it."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+
+    @property
+    def open_connections(self):
+        return 0
+
+    def warm_up(self):
+        return True
+
+    def ping(self):
+        return None
+
+    def close(self):
+        return None
+
+    def reset_after_fork(self):
+        # Workers keep the data loaded before the fork; from then on each has its own copy.
+        self._lock = threading.RLock()
+
+
+@tracing.traced_methods
+@metrics.timed_methods(metrics.db_query_duration, metrics.db_query_errors)
+class InMemoryUsersRepository(UserRowMapper, InMemoryEntity):
+    """
+    UsersRepository without PostgreSQL (USERS_REPOSITORY=memory): same methods, same
+    return shapes (domain objects built from the ROW_TO_JSON-like dicts, uuid.UUID where
+    psycopg returns one) and the same errors for broken foreign keys. Meant for tests and
+    for load testing the controller/service/serialization layers on their own: password
+    hashing is kept (it is part of those layers' cost), the database round trips are not.
+
+    Rows live in dicts indexed by uuid and by email (the email column is not unique, so
+    the index keeps every uuid in insertion order). PINs expire PIN_TTL after creation,
+    measured with `clock`. One lock makes each method atomic, as one statement is.
+
+    The data is per process: with several gunicorn workers each one has its own users.
+    """
+
+    def __init__(self, clock=_utcnow):
+        super().__init__()
+        self.clock = clock
+        self._users = {}  # uuid (str) -> row dict (users columns)
+        self._by_email = {}  # email -> [uuid, ...]
+        self._locations = {}  # uuid -> {"latitude", "longitude"}
+        self._pins = {}  # uuid -> [_Pin, ...]
+        self._verified = set()  # uuids in verified_users
+
+    def missing_schema_columns(self):
+        return []
+
+    # Helpers
+
+    def _row_with_location(self, row):
+        location = self._locations.get(row["uuid"], {"latitude": None, "longitude": None})
+        return {**row, "location": dict(location)}
+
+    def _first_with_email(self, email):
+        uuids = self._by_email.get(email)
+        return self._users[uuids[0]] if uuids else None
+
+    def _alive(self, pin, now):
+        return pin.created_at > now - PIN_TTL
+
+    # Users
+
+    def get_all_users(self):
+        with self._lock:
+            users = [self._row_with_location(row) for row in self._users.values()]
+        logger.debug("users is %s", users)
+        return [self._parse_user(user) for user in users]
+
+    def get_active_teachers(self):
+        with self._lock:
+            users = [dict(row) for row in self._users.values() if row["role"] == "teacher" and row["status"] == "active"]
+        logger.debug("teachers are %s", users)
+        return [self._parse_user(user) for user in users]
+
+    def get_user(self, user_id):
+        with self._lock:
+            row = self._users.get(str(user_id))
+            if row is None:
+                return None
+            user = self._row_with_location(row)
+        return self._parse_user(user)
+
+    def get_user_with_email(self, email):
+        with self._lock:
+            row = self._first_with_email(str(email))
+            if row is None:
+                return None
+            user = self._row_with_location(row)
+        return self._parse_user(user)
+
+    def _insert_row(self, params, user_id=None):
+        name, surname, password, email, status, role, notification = params
+        row = {
+            "uuid": str(user_id or uuid.uuid4()),
+            "name": name,
+            "surname": surname,
+            "password": password,
+            "email": email,
+            "status": status,
+            "role": role,
+            "notification": notification,
+            "id_biometric": None,
+        }
+        self._users[row["uuid"]] = row
+        self._by_email.setdefault(email, []).append(row["uuid"])
+        return row["uuid"]
+
+    def insert_user(self, params_new_user, user_id=None):
+        params = self._get_params_to_insert(params_new_user)
+        with self._lock:
+            self._insert_row(params, user_id)
+        return
+
+    def insert_users_bulk(self, users, user_ids=None):
+        """Same merge rules and results as UsersRepository.insert_users_bulk."""
+        rows = self._get_params_to_insert_many(users)
+        results = []
+        with self._lock:
+            for params, user_id in zip(rows, user_ids or [None] * len(rows)):
+                name, surname, password, email, _status, role, _notification = params
+                existing = self._by_email.get(email)
+                if not existing:
+                    results.append(("created", self._insert_row(params, user_id)))
+                    continue
+                first = existing[0]  # as get_user_with_email
+                if not self._registration_pins(first):
+                    results.append(("exists", None))
+                    continue
+                self._users[first].update(name=name, surname=surname, role=role, password=password)
+                results.append(("updated", first))
+        return results
+
+    def export_users(self, columns, fmt):
+        """Same bytes as UsersRepository.export_users (rows copied under the lock, rendered outside)."""
+        users_export.copy_query(columns, fmt)  # same validation
+        with self._lock:
+            rows = [{**row, **self._row_with_location(row)["location"]} for row in self._users.values()]
+        chunks = users_export.buffered(users_export.render_rows(rows, columns, fmt))
+        return users_export.Stream(chunks, chunks.close)
+
+    def update_user(self, user_data, user_uuid):
+        password = self._hash_password(user_data.get("password"))
+        with self._lock:
+            row = self._users.get(str(user_uuid))
+            if row is not None:
+                row.update(name=user_data.get("name"), surname=user_data.get("surname"),
+                           role=user_data.get("role"), password=password)
+        return self.get_user(user_uuid)
+
+    def delete_users(self, user_id):
+        with self._lock:
+            row = self._users.pop(str(user_id), None)
+            if row is None:
+                return
+            uuids = self._by_email[row["email"]]
+            uuids.remove(row["uuid"])
+            if not uuids:
+                del self._by_email[row["email"]]
+            # ON DELETE CASCADE
+            self._locations.pop(row["uuid"], None)
+            self._pins.pop(row["uuid"], None)
+            self._verified.discard(row["uuid"])
+        return
+
+    def set_location(self, params_new_user):
+        """Insert or update (upsert) the user's location."""
+        user_id = str(params_new_user["uuid"])
+        with self._lock:
+            if user_id not in self._users:
+                raise psycopg.errors.ForeignKeyViolation(
+                    f'insert or update on table "user_locations" violates foreign key constraint: uuid {user_id}'
+                )
+            self._locations[user_id] = {
+                "latitude": params_new_user["latitude"],
+                "longitude": params_new_user["longitude"],
+            }
+        return
+
+    def check_email(self, email):
+        """
+        Function that check if a mail is valid on the database
+        returns the id of the user if it exists
+        else returns None
+        """
+        with self._lock:
+            row = self._first_with_email(email)
+        return uuid.UUID(row["uuid"]) if row else None
+
+    def update_user_password(self, email, new_password):
+        """Actualiza la contraseña de un usuario"""
+        hashed_password = self._hash_password(new_password)
+        with self._lock:
+            uuids = self._by_email.get(email, [])
+            for user_id in uuids:
+                self._users[user_id]["password"] = hashed_password
+        return bool(uuids)
+
+    def activate_user(self, email):
+        """Activa un usuario en la base de datos"""
+        with self._lock:
+            uuids = self._by_email.get(email, [])
+            for user_id in uuids:
+                self._users[user_id]["status"] = "active"
+        return bool(uuids)
+
+    def _update(self, user_id, column, value):
+        with self._lock:
+            row = self._users.get(str(user_id))
+            if row is None:
+                return None
+            row[column] = value
+            return uuid.UUID(row["uuid"])
+
+    def update_status(self, uuid, new_status):
+        return bool(self._update(uuid, "status", new_status))
+
+    def update_notification(self, uuid, new_notif_status):
+        return self._update(uuid, "notification", new_notif_status)
+
+    def update_biometric_id(self, user_id, id_biometric):
+        return bool(self._update(user_id, "id_biometric", id_biometric))
+
+    # Pins
+
+    def get_active_pin(self, user_id, pin_type):
+        """Obtener un PIN activo no usado y no expirado"""
+        now = self.clock()
+        with self._lock:
+            for pin in reversed(self._pins.get(str(user_id), [])):
+                if pin.pin_type == pin_type and not pin.used and self._alive(pin, now):
+                    return (pin.pin_code, pin.created_at)
+        return None
+
+    def create_pin(self, user_id, pin_code, pin_type):
+        """Crear un nuevo PIN en la base de datos"""
+        user_id = str(user_id)
+        if pin_type not in ("password_recovery", "registration"):
+            raise psycopg.errors.CheckViolation(f'new row for relation "pins" violates check constraint: {pin_type}')
+        with self._lock:
+            if user_id not in self._users:
+                raise psycopg.errors.ForeignKeyViolation(
+                    f'insert or update on table "pins" violates foreign key constraint: user_id {user_id}'
+                )
+            self._pins.setdefault(user_id, []).append(_Pin(user_id, pin_code, pin_type, self.clock()))
+
+    def validate_and_use_pin(self, email: str, pin_code: str, pin_type: str) -> bool:
+        """Valida un PIN y lo marca como usado si es válido"""
+        now = self.clock()
+        used = False
+        with self._lock:
+            for user_id in self._by_email.get(email, []):
+                for pin in self._pins.get(user_id, []):
+                    if (pin.pin_code == pin_code and pin.pin_type == pin_type
+                            and not pin.used and self._alive(pin, now)):
+                        pin.used = used = True
+        return used
+
+    def _registration_pins(self, user_id):
+        return [pin for pin in self._pins.get(str(user_id), []) if pin.pin_type == "registration" and not pin.used]
+
+    def pin_in_progress(self, uuid):
+        now = self.clock()
+        with self._lock:
+            result = any(pin.created_at >= now - PIN_TTL for pin in self._registration_pins(uuid))
+        logger.debug("[REPOSITORY] uuid: %s - RESULT %s", uuid, result)
+        return result
+
+    def pin_expired(self, uuid):
+        now = self.clock()
+        with self._lock:
+            result = any(pin.created_at < now - PIN_TTL for pin in self._registration_pins(uuid))
+        logger.debug("[REPOSITORY] uuid: %s - RESULT %s", uuid, result)
+        return result
+
+    def has_used_pin(self, user_id: str) -> bool:
+        """Verifica si el usuario tiene algún PIN marcado como usado"""
+        with self._lock:
+            return str(user_id) in self._verified or any(pin.used for pin in self._pins.get(str(user_id), []))
+
+    def mark_pin_verified(self, user_id):
+        """Registra que el usuario validó un PIN (has_used_pin), sin guardar el PIN"""
+        with self._lock:
+            if str(user_id) not in self._users:
+                raise psycopg.errors.ForeignKeyViolation(
+                    f'insert or update on table "verified_users" violates foreign key constraint: user_id {user_id}'
+                )
+            self._verified.add(str(user_id))
+
+    def invalidate_all_pins(self, user_id):
+        """Marca todos los PINs de un usuario como usados"""
+        with self._lock:
+            for pin in self._pins.get(str(user_id), []):
+                pin.used = True
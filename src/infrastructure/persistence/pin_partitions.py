@@ -0,0 +1,275 @@
+"""
+Daily partitions of `pins` (PARTITION BY RANGE (created_at), see initialize_users_db.sql).
+
+A PIN is valid for 10 minutes, so the PIN queries only read today's partition (and
+yesterday's around midnight): the planner prunes the rest. Old PINs go away a whole
+partition at a time (DETACH + DROP) instead of with row-level DELETEs. maintain_pins.py
+(run daily by k8s/pins-maintenance-cronjob.yaml) keeps:
+
+- one partition per UTC day, from PIN_RETENTION_DAYS ago to PIN_PARTITIONS_AHEAD days
+  ahead. Rows that landed in the default partition meanwhile are moved to theirs.
+- partitions older than PIN_RETENTION_DAYS detached and dropped. Their users with a used
+  PIN are recorded in verified_users first, so has_used_pin keeps answering for them, and
+  those with an unused registration PIN in expired_registrations, so pin_expired does
+  (POST /users lets them register again instead of answering 409).
+"""
+
+import datetime
+import os
+import re
+
+from psycopg import ClientCursor, sql
+
+from logger_config import get_logger
+
+logger = get_logger("api-users")
+
+RETENTION_DAYS = int(os.getenv("PIN_RETENTION_DAYS", 30))
+AHEAD_DAYS = int(os.getenv("PIN_PARTITIONS_AHEAD", 7))
+# DDL waits this long for the table lock, then gives up until the next run (instead of
+# queueing every PIN query behind it).
+LOCK_TIMEOUT = os.getenv("PIN_MAINTENANCE_LOCK_TIMEOUT", "5s")
+
+PARTITIONS = """
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'pins'::regclass
+        ORDER BY c.relname
+        """
+
+IS_PARTITIONED = "SELECT relkind = 'p' FROM pg_class WHERE oid = 'pins'::regclass"
+
+VERIFIED_USERS_TABLE = """
+        CREATE TABLE IF NOT EXISTS verified_users (
+            user_id UUID PRIMARY KEY,
+            verified_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+            FOREIGN KEY (user_id) REFERENCES users(uuid) ON DELETE CASCADE
+        )
+        """
+
+EXPIRED_REGISTRATIONS_TABLE = """
+        CREATE TABLE IF NOT EXISTS expired_registrations (
+            user_id UUID PRIMARY KEY,
+            expired_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+            FOREIGN KEY (user_id) REFERENCES users(uuid) ON DELETE CASCADE
+        )
+        """
+
+# What has_used_pin and pin_expired need from PINs about to be deleted (`old`: user_id, pin_type, used).
+RECORD_DELETED_PINS = """
+        verified AS (
+            INSERT INTO verified_users (user_id) SELECT DISTINCT user_id FROM old WHERE used
+            ON CONFLICT (user_id) DO NOTHING RETURNING 1
+        ),
+        expired AS (
+            INSERT INTO expired_registrations (user_id)
+            SELECT DISTINCT user_id FROM old WHERE NOT used AND pin_type = 'registration'
+            ON CONFLICT (user_id) DO NOTHING RETURNING 1
+        )
+        SELECT (SELECT COUNT(*) FROM verified), (SELECT COUNT(*) FROM expired)
+        """
+
+_BOUNDS = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+
+def _bound(value):
+    value = value.strip("'")
+    if value in ("MINVALUE", "MAXVALUE"):
+        return None
+    return datetime.datetime.fromisoformat(value)
+
+
+def parse_bounds(expression):
+    """(lower, upper) of a partition bound expression; None for MINVALUE / MAXVALUE. None for DEFAULT."""
+    match = _BOUNDS.search(expression)
+    if match is None:
+        return None
+    return _bound(match.group(1)), _bound(match.group(2))
+
+
+def day_start(day):
+    return datetime.datetime.combine(day, datetime.time(), tzinfo=datetime.timezone.utc)
+
+
+def partition_name(day):
+    return f"pins_{day:%Y%m%d}"
+
+
+def plan(existing, today, ahead=AHEAD_DAYS, retention=RETENTION_DAYS):
+    """
+    (days to create, partitions to drop). `existing`: {name: (lower, upper)}.
+    Days already covered by a partition (e.g. the one of migrate) are not created.
+    """
+    cutoff = day_start(today - datetime.timedelta(days=retention))
+    to_drop = sorted(name for name, (_lower, upper) in existing.items() if upper is not None and upper <= cutoff)
+    kept = [bounds for name, bounds in existing.items() if name not in to_drop]
+
+    def covered(start, end):
+        return any((lower is None or lower < end) and (upper is None or upper > start) for lower, upper in kept)
+
+    to_create = []
+    for offset in range(-retention, ahead + 1):
+        day = today + datetime.timedelta(days=offset)
+        if not covered(day_start(day), day_start(day + datetime.timedelta(days=1))):
+            to_create.append(day)
+    return to_create, to_drop
+
+
+def partitions(conn):
+    """({name: (lower, upper)}, name of the default partition or None)."""
+    ranges, default = {}, None
+    for name, expression in conn.execute(PARTITIONS).fetchall():
+        bounds = parse_bounds(expression)
+        if bounds is None:
+            default = name
+        else:
+            ranges[name] = bounds
+    return ranges, default
+
+
+def create_partition(conn, day, default=None):
+    """
+    Partition of `day`, attached after moving into it the rows of that day that are in
+    the default partition (CREATE ... PARTITION OF would fail if there were any).
+    Returns the rows moved.
+    """
+    name = sql.Identifier(partition_name(day))
+    start, end = day_start(day), day_start(day + datetime.timedelta(days=1))
+    moved = 0
+    with conn.transaction():
+        conn.execute(sql.SQL("CREATE TABLE {} (LIKE pins INCLUDING DEFAULTS INCLUDING CONSTRAINTS)").format(name))
+        if default is not None:
+            moved = conn.execute(
+                sql.SQL(
+                    "WITH moved AS (DELETE FROM {} WHERE created_at >= %s AND created_at < %s RETURNING *) "
+                    "INSERT INTO {} SELECT * FROM moved"
+                ).format(sql.Identifier(default), name),
+                (start, end),
+            ).rowcount
+        conn.execute(
+            sql.SQL("ALTER TABLE pins ATTACH PARTITION {} FOR VALUES FROM ({}) TO ({})").format(
+                name, sql.Literal(start), sql.Literal(end)
+            )
+        )
+    return moved
+
+
+def drop_partition(conn, name):
+    """
+    Detach and drop a partition, recording its users in verified_users and
+    expired_registrations. Returns how many were recorded in each: (verified, expired).
+    """
+    table = sql.Identifier(name)
+    with conn.transaction():
+        conn.execute(sql.SQL("ALTER TABLE pins DETACH PARTITION {}").format(table))
+        recorded = conn.execute(
+            sql.SQL("WITH old AS (SELECT user_id, pin_type, used FROM {}), " + RECORD_DELETED_PINS).format(table)
+        ).fetchone()
+        conn.execute(sql.SQL("DROP TABLE {}").format(table))
+    return recorded
+
+
+def purge_default(conn, default, cutoff):
+    """
+    Rows older than the retention in the default partition (loaded with old dates) are
+    deleted, recorded as drop_partition does. Returns (verified, expired).
+    """
+    with conn.transaction():
+        return conn.execute(
+            sql.SQL(
+                "WITH old AS (DELETE FROM {} WHERE created_at < %s RETURNING user_id, pin_type, used), "
+                + RECORD_DELETED_PINS
+            ).format(sql.Identifier(default)),
+            (cutoff,),
+        ).fetchone()
+
+
+def _prepare(conn):
+    conn.execute("SET TIME ZONE 'UTC'")
+    conn.execute(sql.SQL("SET lock_timeout = {}").format(sql.Literal(LOCK_TIMEOUT)))
+
+
+def maintain(conn, today=None, ahead=AHEAD_DAYS, retention=RETENTION_DAYS):
+    """Create the missing partitions and drop the expired ones (autocommit connection). Returns a summary."""
+    _prepare(conn)
+    today = today or datetime.datetime.now(datetime.timezone.utc).date()
+    existing, default = partitions(conn)
+    to_create, to_drop = plan(existing, today, ahead, retention)
+    summary = {"created": [], "moved": 0, "dropped": [], "verified": 0, "expired": 0}
+    recorded = []
+    for day in to_create:
+        summary["moved"] += create_partition(conn, day, default)
+        summary["created"].append(partition_name(day))
+    for name in to_drop:
+        recorded.append(drop_partition(conn, name))
+        summary["dropped"].append(name)
+    if default is not None:
+        recorded.append(purge_default(conn, default, day_start(today - datetime.timedelta(days=retention))))
+    for verified, expired in recorded:
+        summary["verified"] += verified
+        summary["expired"] += expired
+    logger.info(
+        "pins partitions: %s created (%s rows moved from the default partition), %s dropped "
+        "(%s users verified, %s registrations expired)",
+        len(summary["created"]), summary["moved"], len(summary["dropped"]), summary["verified"], summary["expired"],
+    )
+    return summary
+
+
+def migrate(conn, today=None, ahead=AHEAD_DAYS, retention=RETENTION_DAYS):
+    """
+    Turn an unpartitioned `pins` (databases created before the partitioning) into the
+    partitioned table, in one transaction that blocks PIN queries while it runs: the
+    PINs of the retention window are copied, the users of the older ones are recorded
+    (verified_users, expired_registrations) and the old table is dropped. Returns False if it was already partitioned.
+    """
+    if conn.execute(IS_PARTITIONED).fetchone()[0]:
+        return False
+    conn.execute("SET TIME ZONE 'UTC'")
+    cutoff = day_start(today or datetime.datetime.now(datetime.timezone.utc).date()) - datetime.timedelta(days=retention)
+    with conn.transaction():
+        conn.execute("LOCK TABLE pins IN ACCESS EXCLUSIVE MODE")
+        conn.execute("ALTER TABLE pins RENAME TO pins_unpartitioned")
+        # Index names are unique per schema: the partitioned table takes them over.
+        conn.execute("ALTER TABLE pins_unpartitioned DROP CONSTRAINT IF EXISTS pins_pkey")
+        conn.execute("DROP INDEX IF EXISTS idx_pins_user_id, idx_pins_pin_code")
+        conn.execute(
+            "CREATE TABLE pins (LIKE pins_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS, "
+            "PRIMARY KEY (pin_id, created_at), "
+            "FOREIGN KEY (user_id) REFERENCES users(uuid) ON DELETE CASCADE) "
+            "PARTITION BY RANGE (created_at)"
+        )
+        conn.execute("CREATE TABLE pins_default PARTITION OF pins DEFAULT")
+        conn.execute("CREATE INDEX idx_pins_user_id ON pins(user_id)")
+        conn.execute("CREATE INDEX idx_pins_pin_code ON pins(pin_code)")
+        conn.execute(VERIFIED_USERS_TABLE)
+        conn.execute(EXPIRED_REGISTRATIONS_TABLE)
+        conn.execute(
+            "WITH old AS (SELECT user_id, pin_type, used FROM pins_unpartitioned WHERE created_at < %s), "
+            + RECORD_DELETED_PINS,
+            (cutoff,),
+        )
+        copied = conn.execute(
+            "INSERT INTO pins SELECT * FROM pins_unpartitioned WHERE created_at >= %s", (cutoff,)
+        ).rowcount
+        conn.execute("DROP TABLE pins_unpartitioned")
+    logger.info("pins partitioned: %s PINs of the last %s days kept", copied, retention)
+    maintain(conn, today, ahead, retention)
+    return True
+
+
+def scanned_partitions(conn, query, params):
+    """Partitions of pins the plan of `query` reads, after pruning (at planning and at executor startup)."""
+    cursor = ClientCursor(conn)
+    cursor.execute(f"EXPLAIN (FORMAT JSON) {query}", params)
+    plan_tree = cursor.fetchone()[0][0]["Plan"]
+    names = set()
+    pending = [plan_tree]
+    while pending:
+        node = pending.pop()
+        relation = node.get("Relation Name", "")
+        if relation.startswith("pins_"):
+            names.add(relation)
+        pending.extend(node.get("Plans", []))
+    return sorted(names)
@@ -0,0 +1,239 @@
+"""
+Where UserService keeps the PINs (PIN_STORE):
+
+- "postgres" (default): RepositoryPinStore, the `pins` table through the users
+  repository, as before.
+- "memory": TtlPinStore, a dict with an expiry wheel. Issuing and checking a PIN never
+  touch the database. The only thing written is the outcome that must outlive the PIN:
+  "this user verified a PIN" (verified_users, read by has_used_pin at login), always, so
+  a restart or the retention never locks a verified user out. The PINs themselves live
+  in each worker process: a PIN issued by one
+  worker is unknown to the others, and a recycled worker forgets its PINs. Use it with
+  one worker per pod (gunicorn.conf.py refuses more, and stops recycling it) and, with
+  several pods, sticky routing by email.
+"""
+
+import os
+import threading
+import time
+
+from logger_config import get_logger
+
+logger = get_logger("api-users")
+
+PIN_TTL_SECONDS = 10 * 60  # as the SQL window (`created_at > NOW() - INTERVAL '10 minutes'`)
+# Unconfirmed registration PINs are kept this long after expiring, for pin_expired (an
+# unconfirmed email can be registered again), and verified users are answered from memory
+# this long after verifying (then from verified_users).
+RETENTION_SECONDS = float(os.getenv("PIN_STORE_RETENTION_SECONDS", 24 * 3600))
+
+# Wheel key type of a verified user: (user_id, _VERIFIED).
+_VERIFIED = "verified"
+
+
+class RepositoryPinStore:
+    """PINs in the users repository (the pins table with UsersRepository). With
+    AsyncUsersRepository every method returns the repository's awaitable."""
+
+    def __init__(self, repository):
+        self.repository = repository
+
+    def get_active_pin(self, user_id, pin_type):
+        return self.repository.get_active_pin(user_id, pin_type)
+
+    def create_pin(self, user_id, pin_code, pin_type):
+        return self.repository.create_pin(user_id, pin_code, pin_type)
+
+    def validate_and_use_pin(self, user_id, email, pin_code, pin_type):
+        return self.repository.validate_and_use_pin(email=email, pin_code=pin_code, pin_type=pin_type)
+
+    def pin_in_progress(self, user_id):
+        return self.repository.pin_in_progress(user_id)
+
+    def pin_expired(self, user_id):
+        return self.repository.pin_expired(user_id)
+
+    def has_used_pin(self, user_id):
+        return self.repository.has_used_pin(user_id)
+
+    def invalidate_all_pins(self, user_id):
+        return self.repository.invalidate_all_pins(user_id)
+
+    def reset_after_fork(self):
+        return None
+
+
+class ExpiryWheel:
+    """
+    Hashed timing wheel: scheduling is O(1) and advancing visits only the buckets of the
+    ticks that passed. A deadline further than slots * resolution waits its round in its
+    bucket. Keys come out at most one tick late; rescheduling a key leaves the old entry
+    behind (the caller checks the real deadline of what comes out).
+    """
+
+    def __init__(self, now, slots=1024, resolution=1.0):
+        self.resolution = resolution
+        self._buckets = [{} for _ in range(slots)]  # key -> deadline
+        self._next_tick = int(now // resolution)
+
+    def schedule(self, key, deadline):
+        self._buckets[int(deadline // self.resolution) % len(self._buckets)][key] = deadline
+
+    def advance(self, now):
+        """Keys whose deadline is in a tick that ended before `now`."""
+        current = int(now // self.resolution)
+        first = max(self._next_tick, current - len(self._buckets))
+        expired = []
+        for tick in range(first, current):
+            bucket = self._buckets[tick % len(self._buckets)]
+            due = [key for key, deadline in bucket.items() if deadline // self.resolution <= tick]
+            for key in due:
+                del bucket[key]
+            expired.extend(due)
+        self._next_tick = max(self._next_tick, current)
+        return expired
+
+
+class _Pin:
+    __slots__ = ("pin_code", "created_at")
+
+    def __init__(self, pin_code, created_at):
+        self.pin_code = pin_code
+        self.created_at = created_at
+
+
+class TtlPinStore:
+    """
+    PINs in a dict keyed by (user, type): the last PIN issued (a new one is only issued
+    when none is active). A PIN is valid PIN_TTL_SECONDS; a used or invalidated PIN is
+    removed and its user is recorded in verified_users (mark_pin_verified) and cached as
+    verified for RETENTION_SECONDS. Unconfirmed registration PINs stay RETENTION_SECONDS
+    more (pin_expired); the wheel frees both as time goes by.
+
+    has_used_pin asks the repository for users not verified in this process recently
+    (users verified before the switch, by other workers, before a restart or more than
+    RETENTION_SECONDS ago).
+    """
+
+    def __init__(self, repository, ttl=PIN_TTL_SECONDS, retention=RETENTION_SECONDS, clock=time.monotonic):
+        self.repository = repository
+        self.ttl = ttl
+        self.retention = retention
+        self.clock = clock
+        self._pins = {}  # (user_id, pin_type) -> _Pin
+        self._verified = {}  # user_id -> when it verified a PIN
+        self._wheel = ExpiryWheel(clock())
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._pins)
+
+    def _expire(self, now):
+        # Called with the lock held.
+        for key in self._wheel.advance(now):
+            if key[1] == _VERIFIED:
+                verified_at = self._verified.get(key[0])
+                if verified_at is not None and now >= verified_at + self.retention:
+                    del self._verified[key[0]]
+                continue
+            pin = self._pins.get(key)
+            if pin is not None and now >= pin.created_at + self._lifetime(key[1]):
+                del self._pins[key]
+
+    def _lifetime(self, pin_type):
+        return self.ttl + self.retention if pin_type == "registration" else self.ttl
+
+    def _active(self, key, now):
+        pin = self._pins.get(key)
+        return pin if pin is not None and now < pin.created_at + self.ttl else None
+
+    def _verify(self, user_id, now):
+        # Called with the lock held, once the outcome is in verified_users.
+        self._verified[user_id] = now
+        self._wheel.schedule((user_id, _VERIFIED), now + self.retention)
+
+    def _persist_verified(self, user_id, used):
+        """
+        Record the verification in verified_users, outside the lock. If it fails the used
+        PINs are given back (unless a new one was issued meanwhile) and the error raised:
+        the user can try again instead of being left unverified in the database.
+        """
+        try:
+            self.repository.mark_pin_verified(user_id)
+        except Exception:
+            with self._lock:
+                for key, pin in used:
+                    self._pins.setdefault(key, pin)
+            raise
+        now = self.clock()
+        with self._lock:
+            self._verify(user_id, now)
+
+    def get_active_pin(self, user_id, pin_type):
+        now = self.clock()
+        with self._lock:
+            self._expire(now)
+            pin = self._active((str(user_id), pin_type), now)
+            return (pin.pin_code, pin.created_at) if pin else None
+
+    def create_pin(self, user_id, pin_code, pin_type):
+        now = self.clock()
+        key = (str(user_id), pin_type)
+        with self._lock:
+            self._expire(now)
+            self._pins[key] = _Pin(pin_code, now)
+            self._wheel.schedule(key, now + self._lifetime(pin_type))
+
+    def validate_and_use_pin(self, user_id, email, pin_code, pin_type):
+        now = self.clock()
+        key = (str(user_id), pin_type)
+        with self._lock:
+            self._expire(now)
+            pin = self._active(key, now)
+            if pin is None or pin.pin_code != pin_code:
+                return False
+            del self._pins[key]
+        self._persist_verified(str(user_id), [(key, pin)])
+        return True
+
+    def pin_in_progress(self, user_id):
+        now = self.clock()
+        with self._lock:
+            return self._active((str(user_id), "registration"), now) is not None
+
+    def pin_expired(self, user_id):
+        now = self.clock()
+        with self._lock:
+            self._expire(now)
+            pin = self._pins.get((str(user_id), "registration"))
+            return pin is not None and now >= pin.created_at + self.ttl
+
+    def has_used_pin(self, user_id):
+        verified_at = self._verified.get(str(user_id))
+        if verified_at is not None and self.clock() < verified_at + self.retention:
+            return True
+        return self.repository.has_used_pin(user_id)
+
+    def invalidate_all_pins(self, user_id):
+        """As marking every PIN of the user used: they are removed and the user counts as verified."""
+        now = self.clock()
+        keys = ((str(user_id), "password_recovery"), (str(user_id), "registration"))
+        with self._lock:
+            self._expire(now)
+            removed = [(key, self._pins.pop(key)) for key in keys if key in self._pins]
+        if removed:
+            self._persist_verified(str(user_id), removed)
+
+    def reset_after_fork(self):
+        self._lock = threading.Lock()
+
+
+def create_pin_store(repository):
+    """The store selected by PIN_STORE ("postgres" or "memory")."""
+    backend = os.getenv("PIN_STORE", "postgres").lower()
+    if backend == "memory":
+        logger.info("PINs in memory (verified users in verified_users)")
+        return TtlPinStore(repository)
+    if backend != "postgres":
+        raise ValueError(f"Unknown PIN_STORE: {backend}")
+    return RepositoryPinStore(repository)
@@ -0,0 +1,67 @@
+"""
+Read-your-writes token: the WAL position (LSN) a reader must see.
+
+A write on the primary records the LSN it reached; the token travels with the user's
+session (and the X-LSN header) so that their next reads only go to a replica that has
+replayed up to it. Both values are per request: presentation.http_read_your_writes
+calls begin() with the incoming token and reads written() at the end.
+
+The write generation is per process instead: it counts the writes completed in this
+worker, with or without replicas, so that a read started after a write never shares
+the result of a query started before it (infrastructure/single_flight.py).
+"""
+
+import contextvars
+import threading
+
+_required = contextvars.ContextVar("required_lsn", default=0)
+_written = contextvars.ContextVar("written_lsn", default=0)
+_generation_lock = threading.Lock()
+_generation = 0
+
+
+def parse_lsn(text):
+    """"16/B374D848" -> int (0 for None, "" or garbage: a token must never break a request)."""
+    try:
+        high, low = str(text).split("/")
+        return (int(high, 16) << 32) | int(low, 16)
+    except (TypeError, ValueError):
+        return 0
+
+
+def format_lsn(value):
+    return f"{value >> 32:X}/{value & 0xFFFFFFFF:X}"
+
+
+def begin(*tokens):
+    """Start of a request: the reads must see the newest of `tokens`."""
+    _required.set(max((parse_lsn(token) for token in tokens if token), default=0))
+    _written.set(0)
+
+
+def required_lsn():
+    """LSN the next read must see: the incoming token or this request's own writes."""
+    return max(_required.get(), _written.get())
+
+
+def wrote(lsn):
+    """Record that this request's write reached `lsn` (int)."""
+    if lsn > _written.get():
+        _written.set(lsn)
+
+
+def written():
+    """Newest LSN written in this request (0: none)."""
+    return _written.get()
+
+
+def wrote_locally():
+    """A write finished in this process (BaseEntity's @writes)."""
+    global _generation
+    with _generation_lock:
+        _generation += 1
+
+
+def generation():
+    """Writes finished in this process so far."""
+    return _generation
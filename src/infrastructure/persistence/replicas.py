@@ -0,0 +1,230 @@
+"""
+Read replicas for BaseEntity: lag-aware choice of a replica per read.
+
+Every replica is probed (replayed LSN and lag) at most every REPLICA_CHECK_SECONDS, by
+whichever request thread finds the probe stale. A read goes to a replica that:
+
+- is not down: a broken connection takes it out, and a background thread (not a request
+  thread) probes it with the circuit breaker's backoff, waiting at most
+  REPLICA_DOWN_SECONDS between attempts, until it answers again,
+- lags at most DB_REPLICA_MAX_LAG_SECONDS behind the primary,
+- has replayed the LSN the request requires (read_your_writes).
+
+Among those, two are drawn at random and the one with less load (reads in flight,
+weighted by its lag) wins: the power of two choices spreads reads without a global
+view. When none qualifies the read goes to the primary.
+"""
+
+import os
+import random
+import threading
+import time
+
+import psycopg
+
+from infrastructure import metrics
+from infrastructure.persistence.circuit_breaker import backoff
+from infrastructure.persistence.read_your_writes import parse_lsn
+from logger_config import get_logger
+
+logger = get_logger("api-users")
+
+MAX_LAG_SECONDS = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", 5))
+CHECK_SECONDS = float(os.getenv("REPLICA_CHECK_SECONDS", 1))
+DOWN_SECONDS = float(os.getenv("REPLICA_DOWN_SECONDS", 10))
+CONNECT_TIMEOUT = int(os.getenv("REPLICA_CONNECT_TIMEOUT", 2))
+
+# Lag is 0 while the replica has replayed everything it received (an idle primary does
+# not make it look late).
+STATUS = """
+        SELECT pg_last_wal_replay_lsn()::text,
+        CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp()), 0)
+        END
+        """
+
+db_reads = metrics.Counter(
+    "users_db_reads_total",
+    "Repository reads by the server that answered them (primary or replica name).",
+    ("target",),
+)
+
+
+class Replica:
+    """One replica: per-thread autocommit connections (a read never holds a transaction open) and its last probe."""
+
+    def __init__(self, name, conninfo):
+        self.name = name
+        self.conninfo = conninfo
+        self.replay_lsn = 0
+        self.lag = 0.0
+        self.checked_at = float("-inf")
+        self.down = False  # until the background probe reaches it again
+        self.in_flight = 0
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or conn.closed:  # closed: by close(), from another thread
+            conn = psycopg.connect(self.conninfo, autocommit=True, connect_timeout=CONNECT_TIMEOUT)
+            self._local.conn = conn
+            self._local.cursor = conn.cursor()
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @property
+    def cursor(self):
+        self.conn
+        return self._local.cursor
+
+    def probe(self, now):
+        """Refresh replay_lsn and lag (one thread at a time; the others keep the last values)."""
+        if not self._probe_lock.acquire(blocking=False):
+            return
+        try:
+            self.cursor.execute(STATUS)
+            lsn, lag = self.cursor.fetchone()
+            self.replay_lsn = parse_lsn(lsn)
+            self.lag = float(lag)
+            self.checked_at = now
+        except psycopg.Error as e:
+            self.mark_down(e)
+        finally:
+            self._probe_lock.release()
+
+    def failed(self, error):
+        """A read failed here (it is retried on the primary). A broken connection takes the replica out."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or conn.closed or conn.broken:
+            self.mark_down(error)
+        else:
+            # e.g. a query cancelled by a recovery conflict: the replica itself is fine.
+            logger.warning("Read on replica %s failed, retried on the primary: %s", self.name, error)
+
+    def mark_down(self, error):
+        """Take the replica out of the reads and probe it in the background until it answers."""
+        self.drop_connection()
+        with self._lock:
+            if self.down:
+                return
+            self.down = True
+            self.checked_at = float("-inf")
+            stop = self._stop
+        logger.warning("Replica %s unavailable, probing it in the background: %s", self.name, error)
+        threading.Thread(target=self._recover, args=(stop,), name=f"replica-probe-{self.name}", daemon=True).start()
+
+    def _recover(self, stop):
+        attempt = 0
+        while not stop.wait(backoff(attempt, CHECK_SECONDS, DOWN_SECONDS)):
+            try:
+                with psycopg.connect(self.conninfo, autocommit=True, connect_timeout=CONNECT_TIMEOUT) as conn:
+                    conn.execute(STATUS).fetchone()
+            except psycopg.Error as e:
+                attempt += 1
+                logger.debug("Replica %s still unavailable: %s", self.name, e)
+                continue
+            # checked_at stays stale: the next read probes it on its own connection.
+            self.down = False
+            logger.info("Replica %s reachable again after %s attempts", self.name, attempt + 1)
+            return
+
+    def drop_connection(self):
+        """Forget the calling thread's connection (broken): its next use opens a new one."""
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = self._local.cursor = None
+        if conn is None:
+            return
+        with self._lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        try:
+            conn.close()
+        except psycopg.Error:
+            pass
+
+    def close(self):
+        """Close every thread's connection (each thread opens a new one on its next use) and stop the background probe."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._stop.set()
+            self._stop = threading.Event()
+            self.down = False
+        for conn in connections:
+            try:
+                conn.close()
+            except psycopg.Error as e:
+                logger.warning("Error closing connection: %s", e)
+
+    def reset_after_fork(self):
+        # As BaseEntity.reset_after_fork: the parent's connections are not closed here.
+        # The child has only the forking thread, so every thread-local goes, and no
+        # background probe: it starts up, as a new worker.
+        self._inherited_connections = self._connections
+        self._connections = []
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._local = threading.local()
+        self.down = False
+        self.in_flight = 0
+
+
+class ReplicaRouter:
+    def __init__(self, replicas, max_lag=MAX_LAG_SECONDS, check_interval=CHECK_SECONDS, clock=time.monotonic):
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.clock = clock
+
+    @classmethod
+    def from_conninfos(cls, conninfos):
+        """None without replicas (everything goes to the primary)."""
+        conninfos = list(conninfos)
+        if not conninfos:
+            return None
+        return cls([Replica(f"replica-{i}", conninfo) for i, conninfo in enumerate(conninfos)])
+
+    def choose(self, required_lsn=0):
+        """A replica for the next read, or None (use the primary)."""
+        now = self.clock()
+        eligible = []
+        for replica in self.replicas:
+            if replica.down:
+                continue
+            age = now - replica.checked_at
+            behind = replica.replay_lsn < required_lsn
+            # A replica behind the token has probably caught up within milliseconds:
+            # probing it again is cheaper than sending the read to the primary.
+            if age >= self.check_interval or (behind and age >= self.check_interval / 20):
+                replica.probe(now)
+            if not replica.down and replica.lag <= self.max_lag and replica.replay_lsn >= required_lsn:
+                eligible.append(replica)
+        if not eligible:
+            return None
+        if len(eligible) == 1:
+            return eligible[0]
+        first, second = random.sample(eligible, 2)
+        return min((first, second), key=self._load)
+
+    def _load(self, replica):
+        # in_flight is updated without a lock: an approximate count is enough to balance.
+        lag_weight = 1 + replica.lag / self.max_lag if self.max_lag else 1
+        return (replica.in_flight + 1) * lag_weight
+
+    def lag_by_replica(self):
+        """{(name,): lag in seconds at the last probe, -1 while down} (metrics)."""
+        return {(r.name,): (-1 if r.down else r.lag) for r in self.replicas}
+
+    def close(self):
+        for replica in self.replicas:
+            replica.close()
+
+    def reset_after_fork(self):
+        for replica in self.replicas:
+            replica.reset_after_fork()
@@ -0,0 +1,296 @@
+import contextvars
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from infrastructure.config.db_config import DatabaseConfig
+from infrastructure.persistence import users_export
+from infrastructure.persistence.sharding import ShardDirectory, SlotMap, slot_of
+from infrastructure.persistence.users_repository import UserRowMapper, UsersRepository
+from logger_config import get_logger
+
+logger = get_logger("api-users")
+
+FANOUT_THREADS = int(os.getenv("SHARD_FANOUT_THREADS", 2))
+
+
+class ShardedEntity:
+    """Connection interface of BaseEntity (lifecycle hooks, health, metrics) over the directory and every shard."""
+
+    def __init__(self, directory, shards, slot_map):
+        self.directory = directory
+        self.shards = shards  # name -> repository
+        self.slot_map = slot_map
+        self._executors = {}
+        self._executors_lock = threading.Lock()
+
+    @property
+    def open_connections(self):
+        return self.directory.open_connections + sum(shard.open_connections for shard in self.shards.values())
+
+    def warm_up(self):
+        return all([self.directory.warm_up()] + [shard.warm_up() for shard in self.shards.values()])
+
+    def ping(self):
+        self.directory.ping()
+        for shard in self.shards.values():
+            shard.ping()
+
+    def close(self):
+        with self._executors_lock:
+            executors, self._executors = self._executors, {}
+        for executor in executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        self.directory.close()
+        for shard in self.shards.values():
+            shard.close()
+
+    def reset_after_fork(self):
+        # The pools' threads do not exist in the child.
+        self._executors = {}
+        self._executors_lock = threading.Lock()
+        self.slot_map.reset_after_fork()
+        self.directory.reset_after_fork()
+        for shard in self.shards.values():
+            shard.reset_after_fork()
+
+    def _executor(self, name):
+        executor = self._executors.get(name)
+        if executor is None:
+            with self._executors_lock:
+                executor = self._executors.get(name)
+                if executor is None:
+                    executor = self._executors[name] = ThreadPoolExecutor(
+                        max_workers=FANOUT_THREADS, thread_name_prefix=f"shard-{name}"
+                    )
+        return executor
+
+
+class ShardedUsersRepository(UserRowMapper, ShardedEntity):
+    """
+    UsersRepository over several PostgreSQL servers (USERS_REPOSITORY=sharded, see
+    sharding.py): same methods and return shapes. A call about one user goes to the
+    shard of its uuid; a lookup by email asks the directory for the uuids first, so it
+    also goes to one shard; listings ask every shard in parallel (SHARD_FANOUT_THREADS
+    connections per shard) and merge the users in uuid order, the same order whatever
+    the number of shards.
+
+    New users get their uuid here (uuid4), are indexed by email in the directory and
+    inserted on their shard. Not instrumented itself: the calls to each shard are
+    timed and traced by its UsersRepository.
+    """
+
+    def __init__(self, directory, shards, slot_map=None):
+        super().__init__(directory, shards, slot_map or SlotMap(directory))
+
+    @classmethod
+    def from_config(cls):
+        conninfos = DatabaseConfig().shard_connection_strings
+        if not conninfos:
+            raise ValueError("USERS_REPOSITORY=sharded needs DB_SHARD_HOSTS")
+        return cls(ShardDirectory(), {name: UsersRepository(conninfo) for name, conninfo in conninfos.items()})
+
+    # Routing
+
+    def _shard(self, name):
+        shard = self.shards.get(name)
+        if shard is None:
+            raise RuntimeError(f"Shard {name} is in the slot map but not in DB_SHARD_HOSTS")
+        return shard
+
+    def _for_read(self, user_id):
+        return self._shard(self.slot_map.shard_for_read(user_id))
+
+    def _for_write(self, user_id):
+        return self._shard(self.slot_map.shard_for_write(user_id))
+
+    def _with_email(self, email):
+        """Shards with users of this email (in directory order, without repeats)."""
+        names = dict.fromkeys(self.slot_map.shard_for_read(user_id) for user_id in self.directory.lookup_email(email))
+        return [self._shard(name) for name in names]
+
+    def _fan_out(self, method, *args):
+        """{shard name: shard.method(*args)}, every shard in parallel (each call in a copy of the caller's context: spans nest)."""
+        futures = {
+            name: self._executor(name).submit(contextvars.copy_context().run, getattr(shard, method), *args)
+            for name, shard in self.shards.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+    def _merged_users(self, method):
+        # A slot being moved is on two shards for a while: each user counts on its owner only.
+        results = self._fan_out(method)
+        owners = self.slot_map.owners()
+        users = [
+            user
+            for name, shard_users in results.items()
+            for user in shard_users
+            if owners[slot_of(user.uuid)] == name
+        ]
+        users.sort(key=lambda user: str(user.uuid))
+        return users
+
+    # Users
+
+    def missing_schema_columns(self):
+        return [
+            f"{name}:{column}"
+            for name, columns in self._fan_out("missing_schema_columns").items()
+            for column in columns
+        ]
+
+    def get_all_users(self):
+        return self._merged_users("get_all_users")
+
+    def get_active_teachers(self):
+        return self._merged_users("get_active_teachers")
+
+    def get_user(self, user_id):
+        return self._for_read(user_id).get_user(user_id)
+
+    def get_user_with_email(self, email):
+        for user_id in self.directory.lookup_email(str(email)):
+            user = self.get_user(user_id)
+            if user is not None:
+                return user
+        return None
+
+    def insert_user(self, params_new_user, user_id=None):
+        user_id = user_id or uuid.uuid4()
+        shard = self._for_write(user_id)
+        self.directory.add_emails([(user_id, params_new_user["email"])])
+        try:
+            shard.insert_user(params_new_user, user_id)
+        except Exception:
+            self.directory.remove_email(user_id)
+            raise
+
+    def insert_users_bulk(self, users, user_ids=None):
+        """
+        Same results as UsersRepository.insert_users_bulk. Emails that already exist are
+        merged on the shard of their first user (where the "updated" / "exists" rule
+        applies); new users are indexed and then inserted, one batch per shard.
+        """
+        existing = self.directory.lookup_emails([user["email"] for user in users])
+        user_ids = user_ids or [uuid.uuid4() for _ in users]
+        batches = {}  # shard name -> [(position, user, uuid)]
+        new = {}  # position -> (uuid, email) of the users to index
+        for position, (user, user_id) in enumerate(zip(users, user_ids)):
+            if user["email"] in existing:
+                name = self.slot_map.shard_for_write(existing[user["email"]][0])
+            else:
+                name = self.slot_map.shard_for_write(user_id)
+                new[position] = (user_id, user["email"])
+            batches.setdefault(name, []).append((position, user, user_id))
+
+        self.directory.add_emails(new.values())
+        results = [None] * len(users)
+        try:
+            for name, batch in batches.items():
+                stored = self._shard(name).insert_users_bulk(
+                    [user for _, user, _ in batch], [user_id for _, _, user_id in batch]
+                )
+                for (position, _, _), result in zip(batch, stored):
+                    results[position] = result
+        finally:
+            # Index entries of users that were not created (a failed shard, or an email
+            # inserted concurrently elsewhere) are removed.
+            for position, (user_id, _email) in new.items():
+                if results[position] is None or results[position][0] != "created":
+                    self.directory.remove_email(user_id)
+        return results
+
+    def export_users(self, columns, fmt):
+        """The shards' exports one after the other (one CSV header). A slot being moved may appear twice."""
+        streams = []
+
+        def close():
+            for stream in streams:
+                stream.close()
+
+        try:
+            for shard in self.shards.values():
+                streams.append(shard.export_users(columns, fmt))
+        except BaseException:
+            close()
+            raise
+        return users_export.Stream(self._concatenate(streams, skip_header=fmt == "csv"), close)
+
+    def _concatenate(self, streams, skip_header):
+        for number, stream in enumerate(streams):
+            header_pending = skip_header and number > 0
+            for chunk in stream:
+                if header_pending:
+                    _header, newline, chunk = chunk.partition(b"\n")
+                    header_pending = not newline
+                if chunk:
+                    yield chunk
+
+    def update_user(self, user_data, user_uuid):
+        return self._for_write(user_uuid).update_user(user_data, user_uuid)
+
+    def delete_users(self, user_id):
+        self._for_write(user_id).delete_users(user_id)
+        self.directory.remove_email(user_id)
+
+    def set_location(self, params_new_user):
+        self._for_write(params_new_user["uuid"]).set_location(params_new_user)
+
+    def check_email(self, email):
+        """
+        Function that check if a mail is valid on the database
+        returns the id of the user if it exists
+        else returns None
+        """
+        user_ids = self.directory.lookup_email(email)
+        return uuid.UUID(user_ids[0]) if user_ids else None
+
+    def update_user_password(self, email, new_password):
+        """Actualiza la contraseña de un usuario"""
+        return any([shard.update_user_password(email, new_password) for shard in self._with_email(email)])
+
+    def activate_user(self, email):
+        """Activa un usuario en la base de datos"""
+        return any([shard.activate_user(email) for shard in self._with_email(email)])
+
+    def update_status(self, uuid, new_status):
+        return self._for_write(uuid).update_status(uuid, new_status)
+
+    def update_notification(self, uuid, new_notif_status):
+        return self._for_write(uuid).update_notification(uuid, new_notif_status)
+
+    def update_biometric_id(self, user_id, id_biometric):
+        return self._for_write(user_id).update_biometric_id(user_id, id_biometric)
+
+    # Pins: on the shard of their user
+
+    def get_active_pin(self, user_id, pin_type):
+        """Obtener un PIN activo no usado y no expirado"""
+        return self._for_read(user_id).get_active_pin(user_id, pin_type)
+
+    def create_pin(self, user_id, pin_code, pin_type):
+        """Crear un nuevo PIN en la base de datos"""
+        return self._for_write(user_id).create_pin(user_id, pin_code, pin_type)
+
+    def validate_and_use_pin(self, email: str, pin_code: str, pin_type: str) -> bool:
+        """Valida un PIN y lo marca como usado si es válido"""
+        return any([shard.validate_and_use_pin(email, pin_code, pin_type) for shard in self._with_email(email)])
+
+    def pin_in_progress(self, uuid):
+        return self._for_read(uuid).pin_in_progress(uuid)
+
+    def pin_expired(self, uuid):
+        return self._for_read(uuid).pin_expired(uuid)
+
+    def has_used_pin(self, user_id: str) -> bool:
+        """Verifica si el usuario tiene algún PIN marcado como usado"""
+        return self._for_read(user_id).has_used_pin(user_id)
+
+    def mark_pin_verified(self, user_id):
+        """Registra que el usuario validó un PIN (has_used_pin), sin guardar el PIN"""
+        self._for_write(user_id).mark_pin_verified(user_id)
+
+    def invalidate_all_pins(self, user_id):
+        """Marca todos los PINs de un usuario como usados"""
+        return self._for_write(user_id).invalidate_all_pins(user_id)
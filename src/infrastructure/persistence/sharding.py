@@ -0,0 +1,141 @@
+"""
+Placement of users across shards (USERS_REPOSITORY=sharded).
+
+A user lives on one shard with its location and PINs. Its place comes from its uuid:
+slot = first 32 bits of the uuid % SLOTS (uuid4 bits are random, so slots are even),
+and the slot map (users_shard_slots, in the DB_* database: the directory) says which
+shard owns each slot. Moving a slot moves 1/SLOTS of the users without touching the
+others (reshard_users.py). The directory also keeps email -> uuid, so a lookup by email
+goes to the right shard instead of asking all of them.
+"""
+
+import os
+import threading
+import time
+
+from infrastructure import metrics, tracing
+from infrastructure.persistence.base_entity import BaseEntity
+from logger_config import get_logger
+
+logger = get_logger("api-users")
+
+SLOTS = 1024
+MAP_REFRESH_SECONDS = float(os.getenv("SHARD_MAP_REFRESH_SECONDS", 5))
+MOVE_WAIT_SECONDS = float(os.getenv("SHARD_MOVE_WAIT_SECONDS", 30))
+
+# slot_of() in SQL, for the resharding tool.
+SLOT_SQL = f"(('x' || LEFT(REPLACE({{column}}::text, '-', ''), 8))::bit(32)::bigint % {SLOTS})"
+
+GET_SLOTS = "SELECT slot, shard, state FROM users_shard_slots"
+
+LOOKUP_EMAIL = "SELECT uuid FROM users_email_index WHERE email = %s ORDER BY created_at, uuid"
+
+LOOKUP_EMAILS = "SELECT email, uuid FROM users_email_index WHERE email = ANY(%s) ORDER BY created_at, uuid"
+
+ADD_EMAIL = "INSERT INTO users_email_index (uuid, email) VALUES (%s, %s) ON CONFLICT (uuid) DO NOTHING"
+
+REMOVE_EMAIL = "DELETE FROM users_email_index WHERE uuid = %s"
+
+
+class ShardMoving(Exception):
+    """A write hit a slot that reshard_users.py is moving, for longer than SHARD_MOVE_WAIT_SECONDS."""
+
+
+def slot_of(user_id):
+    return int(str(user_id).replace("-", "")[:8], 16) % SLOTS
+
+
+@tracing.traced_methods
+@metrics.timed_methods(metrics.db_query_duration, metrics.db_query_errors)
+class ShardDirectory(BaseEntity):
+    """Slot map and email index, in the DB_* database."""
+
+    def slots(self):
+        """[(slot, shard, state)]"""
+        self.cursor.execute(GET_SLOTS)
+        rows = self.cursor.fetchall()
+        self.conn.commit()
+        return rows
+
+    def lookup_email(self, email):
+        """uuids with this email, oldest first (as the single database returns them)."""
+        self.cursor.execute(LOOKUP_EMAIL, (email,))
+        rows = self.cursor.fetchall()
+        self.conn.commit()
+        return [str(row[0]) for row in rows]
+
+    def lookup_emails(self, emails):
+        """{email: [uuid, ...]} for the emails that exist."""
+        self.cursor.execute(LOOKUP_EMAILS, (list(emails),))
+        result = {}
+        for email, user_id in self.cursor.fetchall():
+            result.setdefault(email, []).append(str(user_id))
+        self.conn.commit()
+        return result
+
+    def add_emails(self, pairs):
+        """Index [(uuid, email)] (before the users are inserted: a user never exists unindexed)."""
+        self.cursor.executemany(ADD_EMAIL, [(str(user_id), email) for user_id, email in pairs])
+        self.conn.commit()
+
+    def remove_email(self, user_id):
+        self.cursor.execute(REMOVE_EMAIL, (str(user_id),))
+        self.conn.commit()
+
+
+class SlotMap:
+    """
+    The slot map, cached for SHARD_MAP_REFRESH_SECONDS. Writes to a slot being moved
+    wait (re-reading the map) until the move finishes.
+    """
+
+    def __init__(self, directory, refresh=MAP_REFRESH_SECONDS, move_wait=MOVE_WAIT_SECONDS, clock=time.monotonic):
+        self.directory = directory
+        self.refresh = refresh
+        self.move_wait = move_wait
+        self.clock = clock
+        self._owners = None
+        self._moving = frozenset()
+        self._loaded_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def _load(self, force=False):
+        with self._lock:
+            if not force and self.clock() - self._loaded_at < self.refresh:
+                return
+            rows = self.directory.slots()
+            owners = [None] * SLOTS
+            for slot, shard, _state in rows:
+                owners[slot] = shard
+            missing = owners.count(None)
+            if missing:
+                raise RuntimeError(f"{missing} slots without a shard: run reshard_users.py init")
+            self._owners = owners
+            self._moving = frozenset(slot for slot, _shard, state in rows if state == "moving")
+            self._loaded_at = self.clock()
+
+    def owners(self):
+        """Owner shard of every slot (index: slot)."""
+        self._load()
+        return self._owners
+
+    def shard_for_read(self, user_id):
+        return self.owners()[slot_of(user_id)]
+
+    def shard_for_write(self, user_id):
+        self._load()
+        slot = slot_of(user_id)
+        deadline = self.clock() + self.move_wait
+        while slot in self._moving:
+            if self.clock() > deadline:
+                raise ShardMoving(f"slot {slot} is being moved")
+            time.sleep(0.2)
+            self._load(force=True)
+        return self._owners[slot]
+
+    def shards(self):
+        self._load()
+        return sorted(set(self._owners))
+
+    def reset_after_fork(self):
+        self._lock = threading.Lock()
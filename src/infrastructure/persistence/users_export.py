@@ -0,0 +1,139 @@
+"""
+Streaming export of users (with their location) for analytics and backups.
+
+The rows come straight from `COPY (SELECT ...) TO STDOUT`: PostgreSQL renders the CSV or
+the JSON and the app only forwards bytes, in CHUNK_SIZE pieces, so memory does not grow
+with the number of users. Used by GET /users/export and by export_users.py.
+"""
+
+import csv
+import io
+import json
+import zlib
+
+# Exportable columns -> SQL over `users u LEFT JOIN user_locations l`.
+COLUMNS = {
+    "uuid": "u.uuid",
+    "name": "u.name",
+    "surname": "u.surname",
+    "email": "u.email",
+    "status": "u.status",
+    "role": "u.role",
+    "notification": "u.notification",
+    "latitude": "l.latitude",
+    "longitude": "l.longitude",
+    "password": "u.password",
+    "id_biometric": "u.id_biometric",
+}
+
+# Credentials are only exported when asked for by name.
+SENSITIVE_COLUMNS = ("password", "id_biometric")
+DEFAULT_COLUMNS = [column for column in COLUMNS if column not in SENSITIVE_COLUMNS]
+
+FORMATS = ("csv", "ndjson")
+
+CHUNK_SIZE = 64 * 1024
+
+_FROM = "FROM users u LEFT JOIN user_locations l ON l.uuid = u.uuid"
+
+
+def parse_columns(text):
+    """"uuid,email" -> ["uuid", "email"]; None or "" -> DEFAULT_COLUMNS. ValueError on unknown columns."""
+    if not text:
+        return list(DEFAULT_COLUMNS)
+    columns = [column.strip() for column in text.split(",") if column.strip()]
+    unknown = [column for column in columns if column not in COLUMNS]
+    if unknown or not columns:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}. Available: {', '.join(COLUMNS)}")
+    return columns
+
+
+def copy_query(columns, fmt):
+    """COPY TO STDOUT statement for `columns` (already validated) in `fmt`."""
+    if fmt == "csv":
+        select = ", ".join(f"{COLUMNS[column]} AS {column}" for column in columns)
+        return f"COPY (SELECT {select} {_FROM}) TO STDOUT WITH (FORMAT csv, HEADER true)"
+    if fmt == "ndjson":
+        pairs = ", ".join(f"'{column}', {COLUMNS[column]}" for column in columns)
+        # CSV with quote/delimiter characters that JSON never contains unescaped: the
+        # text is written as is (text format would double every backslash).
+        return (
+            f"COPY (SELECT JSON_BUILD_OBJECT({pairs})::text {_FROM}) "
+            "TO STDOUT WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')"
+        )
+    raise ValueError(f"Unknown format: {fmt}. Available: {', '.join(FORMATS)}")
+
+
+def buffered(chunks, size=CHUNK_SIZE):
+    """Join the small pieces COPY yields (about one per row) into `size` byte chunks."""
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        if len(buffer) >= size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+class Stream:
+    """
+    An export's bytes plus what produces them (a connection, a COPY in progress), released
+    by close(): when the iteration ends, or when the response is closed (call_on_close)
+    even if it never started. A generator's `finally` would not run in that case.
+    """
+
+    def __init__(self, chunks, close):
+        self._chunks = chunks
+        self._close = close
+
+    def __iter__(self):
+        try:
+            yield from self._chunks
+        finally:
+            self.close()
+
+    def close(self):
+        close, self._close = self._close, None
+        if close is not None:
+            close()
+
+
+def gzipped(chunks):
+    """Compress a byte stream on the fly (gzip container, one chunk in, at most one out)."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return value
+
+
+def render_rows(rows, columns, fmt):
+    """
+    The bytes COPY would produce for `rows` (dicts with COLUMNS keys), for the
+    repositories without PostgreSQL. Booleans and NULLs are written as PostgreSQL does.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}. Available: {', '.join(FORMATS)}")
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    if fmt == "csv":
+        writer.writerow(columns)
+        yield out.getvalue().encode()
+    for row in rows:
+        out.seek(0)
+        out.truncate()
+        if fmt == "csv":
+            writer.writerow([_csv_value(row[column]) for column in columns])
+        else:
+            out.write(json.dumps({column: row[column] for column in columns}, ensure_ascii=False) + "\n")
+        yield out.getvalue().encode()
@@ -0,0 +1,241 @@
+"""
+SQL used by the users repositories (sync and async share the same statements).
+"""
+
+# Columns the code relies on (the last ALTERs of initialize_users_db.sql included).
+REQUIRED_SCHEMA = {
+    "users": ["uuid", "name", "surname", "password", "email", "status", "role", "notification", "id_biometric"],
+    "user_locations": ["uuid", "latitude", "longitude"],
+    "pins": ["pin_id", "user_id", "pin_code", "pin_type", "created_at", "used"],
+    "verified_users": ["user_id", "verified_at"],
+    "expired_registrations": ["user_id", "expired_at"],
+}
+
+SCHEMA_COLUMNS = """
+        SELECT table_name, column_name
+        FROM information_schema.columns
+        WHERE table_schema = current_schema()
+        AND table_name = ANY(%s)
+        """
+
+_USER_WITH_LOCATION = """
+        SELECT ROW_TO_JSON(user_data)
+        FROM (
+            SELECT
+                u.uuid,
+                u.name,
+                u.surname,
+                u.password,
+                u.email,
+                u.status,
+                u.role,
+                u.notification,
+                u.id_biometric,
+                JSON_BUILD_OBJECT(
+                    'latitude', l.latitude,
+                    'longitude', l.longitude
+                ) AS location
+            FROM users u
+            LEFT JOIN user_locations l ON u.uuid = l.uuid
+            {where}
+        ) AS user_data;
+        """
+
+GET_ALL_USERS = _USER_WITH_LOCATION.format(where="")
+
+GET_USER = _USER_WITH_LOCATION.format(where="WHERE u.uuid = %s")
+
+GET_USER_WITH_EMAIL = _USER_WITH_LOCATION.format(where="WHERE u.email = %s")
+
+GET_ACTIVE_TEACHERS = """
+        SELECT ROW_TO_JSON(u)
+        FROM users u
+        WHERE u.role = 'teacher'
+        AND u.status = 'active';
+        """
+
+INSERT_USER = "INSERT INTO users (name, surname, password, email, status, role, notification) VALUES (%s, %s, %s, %s, %s, %s, %s)"
+
+INSERT_USER_WITH_UUID = "INSERT INTO users (uuid, name, surname, password, email, status, role, notification) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"
+
+UPDATE_USER = "UPDATE users SET name=%s, surname=%s, role=%s, password=%s WHERE uuid=%s"
+
+DELETE_USER = "DELETE FROM users WHERE uuid = %s"
+
+SET_LOCATION = """
+        INSERT INTO user_locations (uuid, latitude, longitude)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (uuid)
+        DO UPDATE SET
+            latitude = EXCLUDED.latitude,
+            longitude = EXCLUDED.longitude;
+        """
+
+CHECK_EMAIL = "SELECT * FROM users u WHERE email = %s"
+
+# pins is partitioned by day on created_at (pin_partitions.py). The upper bound of the
+# 10 minute window always holds (created_at defaults to NOW()), but with it the planner
+# also skips the default partition and the future ones: only today's partition (and
+# yesterday's, around midnight) is read.
+GET_ACTIVE_PIN = """
+        SELECT pin_code, created_at
+        FROM pins
+        WHERE user_id = %s
+        AND pin_type = %s
+        AND used = FALSE
+        AND created_at > NOW() - INTERVAL '10 minutes'
+        AND created_at <= NOW() + INTERVAL '1 minute'
+        LIMIT 1
+        """
+
+CREATE_PIN = """
+        INSERT INTO pins (user_id, pin_code, pin_type)
+        VALUES (%s, %s, %s)
+        """
+
+VALIDATE_AND_USE_PIN = """
+        UPDATE pins p
+        SET used = TRUE
+        FROM users u
+        WHERE p.user_id = u.uuid
+        AND u.email = %s
+        AND p.pin_code = %s
+        AND p.pin_type = %s
+        AND p.used = FALSE
+        AND p.created_at > NOW() - INTERVAL '10 minutes'
+        AND p.created_at <= NOW() + INTERVAL '1 minute'
+        RETURNING p.pin_id
+        """
+
+PIN_IN_PROGRESS = """
+        SELECT *
+        FROM pins p
+        WHERE p.user_id = %s
+        AND p.pin_type = 'registration'
+        AND p.used = FALSE
+        AND p.created_at >= NOW() - INTERVAL '10 minutes'
+        AND p.created_at <= NOW() + INTERVAL '1 minute'
+        """
+
+# Users whose expired registration PINs were in a dropped partition are in expired_registrations.
+PIN_EXPIRED = """
+        SELECT 1
+        FROM expired_registrations
+        WHERE user_id = %(user_id)s
+        UNION ALL
+        SELECT 1
+        FROM pins p
+        WHERE p.user_id = %(user_id)s
+        AND p.pin_type = 'registration'
+        AND p.used = FALSE
+        AND p.created_at < NOW() - INTERVAL '10 minutes'
+        LIMIT 1
+        """
+
+# Users whose used PINs were in a dropped partition are in verified_users.
+HAS_USED_PIN = """
+        SELECT 1
+        FROM verified_users
+        WHERE user_id = %(user_id)s
+        UNION ALL
+        SELECT 1
+        FROM pins
+        WHERE user_id = %(user_id)s
+        AND used = TRUE
+        LIMIT 1
+        """
+
+# PIN_STORE=memory: the outcome of a validated PIN, without the PIN.
+MARK_PIN_VERIFIED = "INSERT INTO verified_users (user_id) VALUES (%s) ON CONFLICT (user_id) DO NOTHING"
+
+UPDATE_USER_PASSWORD = """
+        UPDATE users
+        SET password = %s
+        WHERE email = %s
+        RETURNING uuid
+        """
+
+INVALIDATE_ALL_PINS = """
+        UPDATE pins
+        SET used = TRUE
+        WHERE user_id = %s
+        """
+
+ACTIVATE_USER = """
+        UPDATE users
+        SET status = 'active'
+        WHERE email = %s
+        RETURNING uuid
+        """
+
+UPDATE_STATUS = """
+        UPDATE users
+        SET status = %s
+        WHERE uuid = %s
+        RETURNING uuid
+        """
+
+UPDATE_NOTIFICATION = """
+        UPDATE users
+        SET notification = %s
+        WHERE uuid = %s
+        RETURNING uuid
+        """
+
+UPDATE_BIOMETRIC_ID = """
+        UPDATE users
+        SET id_biometric = %s
+        WHERE uuid = %s
+        RETURNING uuid
+        """
+
+# Bulk import: rows are COPYed into a per-connection staging table and merged with two
+# set-based statements, under a lock that serializes concurrent imports.
+CREATE_IMPORT_TABLE = """
+        CREATE TEMP TABLE IF NOT EXISTS users_import (
+            ord integer,
+            uuid uuid,
+            name text,
+            surname text,
+            password text,
+            email text,
+            status text,
+            role text,
+            notification boolean
+        ) ON COMMIT DELETE ROWS
+        """
+
+LOCK_IMPORT = "SELECT pg_advisory_xact_lock(hashtext('users_import'))"
+
+COPY_IMPORT = "COPY users_import (ord, uuid, name, surname, password, email, status, role, notification) FROM STDIN"
+
+# Same rule as POST /users: an email whose registration was never confirmed (unused
+# registration PIN, in progress or expired, also in a dropped partition: as PIN_EXPIRED)
+# is taken over by the new data. Emails are not unique: as POST /users
+# (get_user_with_email), only the first user with the email is considered.
+MERGE_IMPORT_UPDATE = """
+        UPDATE users u
+        SET name = s.name, surname = s.surname, role = s.role, password = s.password
+        FROM users_import s
+        WHERE u.uuid = (SELECT f.uuid FROM users f WHERE f.email = s.email LIMIT 1)
+        AND (
+            EXISTS (
+                SELECT 1
+                FROM pins p
+                WHERE p.user_id = u.uuid
+                AND p.pin_type = 'registration'
+                AND p.used = FALSE
+            )
+            OR EXISTS (SELECT 1 FROM expired_registrations e WHERE e.user_id = u.uuid)
+        )
+        RETURNING s.ord, u.uuid
+        """
+
+MERGE_IMPORT_INSERT = """
+        INSERT INTO users (uuid, name, surname, password, email, status, role, notification)
+        SELECT COALESCE(s.uuid, uuid_generate_v4()), s.name, s.surname, s.password, s.email, s.status, s.role, s.notification
+        FROM users_import s
+        WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.email = s.email)
+        ORDER BY s.ord
+        RETURNING uuid, email
+        """
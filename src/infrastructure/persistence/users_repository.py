@@ -1,15 +1,19 @@
+import contextlib
+
 from werkzeug.security import generate_password_hash
 
 from domain.location import Location
-from infrastructure.persistence.base_entity import BaseEntity
+from infrastructure import metrics, password_hashing, tracing
+from infrastructure.persistence import db_limiter, deadlines, users_export, users_queries
+from infrastructure.persistence.base_entity import BaseEntity, reads, writes
 from domain.user import User
 from logger_config import get_logger
 
 logger = get_logger("api-users")
 
-class UsersRepository(BaseEntity):
-    def __init__(self):
-        super().__init__()
+
+class UserRowMapper:
+    """Row <-> domain conversions shared by the sync and async repositories."""
 
     def _parse_user(self, user_params):
         location = None
@@ -32,31 +36,77 @@ class UsersRepository(BaseEntity):
             user_params.get("id_biometric")
         )
 
+    def _hash_password(self, password):
+        with tracing.span("password.hash"):
+            return generate_password_hash(password)
+
+    def _get_params_to_insert(self, params_new_user):
+        return self._insert_params(params_new_user, self._hash_password(self._secret(params_new_user)))
+
+    def _get_params_to_insert_many(self, users):
+        """_get_params_to_insert for a batch, hashing the passwords in parallel."""
+        hashes = password_hashing.hash_many(self._hash_password, [self._secret(user) for user in users])
+        return [self._insert_params(user, hashed) for user, hashed in zip(users, hashes)]
+
+    def _secret(self, params_new_user):
+        if "password" in params_new_user:
+            return params_new_user["password"]
+        return params_new_user["token"]
+
+    def _insert_params(self, params_new_user, password):
+        if "email_verified" in params_new_user:  # log in with google
+            name = params_new_user["given_name"]
+            surname = params_new_user["family_name"]
+        else:
+            name = params_new_user["name"]
+            surname = params_new_user["surname"]
+
+        if "notification" in params_new_user:
+            notification = params_new_user["notification"]
+        else:
+            notification = True
+
+        return (
+            name,
+            surname,
+            password,
+            params_new_user["email"],
+            params_new_user["status"],
+            params_new_user["role"],
+            notification,
+        )
+
+
+    def _missing_columns(self, rows):
+        existing = {(table, column) for table, column in rows}
+        return [
+            f"{table}.{column}"
+            for table, columns in users_queries.REQUIRED_SCHEMA.items()
+            for column in columns
+            if (table, column) not in existing
+        ]
+
+
+@tracing.traced_methods
+@db_limiter.limited_methods(db_limiter.limiter)
+@deadlines.deadline_methods
+@metrics.timed_methods(metrics.db_query_duration, metrics.db_query_errors)
+class UsersRepository(UserRowMapper, BaseEntity):
+    def __init__(self, conninfo=None):
+        super().__init__(conninfo)
+
+    def missing_schema_columns(self):
+        """Required columns (table.column) that do not exist yet: pending migrations."""
+        self.cursor.execute(users_queries.SCHEMA_COLUMNS, (list(users_queries.REQUIRED_SCHEMA),))
+        rows = self.cursor.fetchall()
+        self.conn.commit()
+        return self._missing_columns(rows)
+
+    @reads
     def get_all_users(self):
-        query = """
-        SELECT ROW_TO_JSON(user_data) 
-        FROM (
-            SELECT 
-                u.uuid,
-                u.name,
-                u.surname,
-                u.password,
-                u.email,
-                u.status,
-                u.role,
-                u.notification,
-                u.id_biometric,
-                JSON_BUILD_OBJECT(
-                    'latitude', l.latitude,
-                    'longitude', l.longitude
-                ) AS location
-            FROM users u
-            LEFT JOIN user_locations l ON u.uuid = l.uuid
-        ) AS user_data;
-        """
-        self.cursor.execute(query)
+        self.cursor.execute(users_queries.GET_ALL_USERS)
         users = self.cursor.fetchall()
-        logger.info(f"users is {users}")
+        logger.debug("users is %s", users)
 
         # Returns an instance of the domain:
         result = []
@@ -64,165 +114,146 @@ class UsersRepository(BaseEntity):
             result.append(self._parse_user(user[0]))
         return result
     
+    @reads
     def get_active_teachers(self):
-        query = """
-        SELECT ROW_TO_JSON(u) 
-        FROM users u
-        WHERE u.role = 'teacher'
-        AND u.status = 'active';
-        """
-        self.cursor.execute(query)
+        self.cursor.execute(users_queries.GET_ACTIVE_TEACHERS)
         users = self.cursor.fetchall()
-        logger.info(f"teachers are {users}")
+        # Ends the transaction: the teacher directory thread keeps its connection between
+        # rebuilds, and must not sit idle in transaction holding a lock on users.
+        self.conn.commit()
+        logger.debug("teachers are %s", users)
 
         result = []
         for user in users:
             result.append(self._parse_user(user[0]))
         return result
 
+    @reads
     def get_user(self, user_id):
-        query = """
-        SELECT ROW_TO_JSON(user_data) 
-        FROM (
-            SELECT 
-                u.uuid,
-                u.name,
-                u.surname,
-                u.password,
-                u.email,
-                u.status,
-                u.role,
-                u.notification,
-                u.id_biometric,
-                JSON_BUILD_OBJECT(
-                    'latitude', l.latitude,
-                    'longitude', l.longitude
-                ) AS location
-            FROM users u
-            LEFT JOIN user_locations l ON u.uuid = l.uuid
-            WHERE u.uuid = %s
-        ) AS user_data;
-        """
         params = (str(user_id),)
-        self.cursor.execute(query, params=params)
+        self.cursor.execute(users_queries.GET_USER, params=params)
         user = self.cursor.fetchone()
         if not user:
             return user
         return self._parse_user(user[0])
 
+    @reads
     def get_user_with_email(self, email):
-        query = """
-        SELECT ROW_TO_JSON(user_data) 
-        FROM (
-            SELECT 
-                u.uuid,
-                u.name,
-                u.surname,
-                u.password,
-                u.email,
-                u.status,
-                u.role,
-                u.notification,
-                u.id_biometric,
-                JSON_BUILD_OBJECT(
-                    'latitude', l.latitude,
-                    'longitude', l.longitude
-                ) AS location
-            FROM users u
-            LEFT JOIN user_locations l ON u.uuid = l.uuid
-            WHERE u.email = %s
-        ) AS user_data;
-        """
         params = (str(email),)
-        self.cursor.execute(query, params=params)
+        self.cursor.execute(users_queries.GET_USER_WITH_EMAIL, params=params)
         user = self.cursor.fetchone()
         if not user:
             return None
         return self._parse_user(user[0])
 
-    def insert_user(self, params_new_user):
-        query = "INSERT INTO users (name, surname, password, email, status, role, notification) VALUES (%s, %s, %s, %s, %s, %s, %s)"
+    @writes
+    def insert_user(self, params_new_user, user_id=None):
+        """`user_id`: uuid chosen by the caller (sharding places the user by it); default: the database's."""
         params = self._get_params_to_insert(params_new_user)
 
-        self.cursor.execute(query, params=params)
+        if user_id is None:
+            self.cursor.execute(users_queries.INSERT_USER, params=params)
+        else:
+            self.cursor.execute(users_queries.INSERT_USER_WITH_UUID, params=(str(user_id), *params))
         self.conn.commit()
         return
     
+    @writes
+    def insert_users_bulk(self, users, user_ids=None):
+        """
+        Insert `users` (emails unique within the batch) in one transaction: COPY into a
+        staging table, then a set-based merge (see users_queries). Passwords are hashed
+        in parallel. Returns one (status, uuid) per user, in order: "created", "updated"
+        (unconfirmed registration taken over, as POST /users does) or "exists" (uuid None).
+        `user_ids`: uuids of the created users, as in insert_user.
+        """
+        rows = self._get_params_to_insert_many(users)
+        user_ids = user_ids or [None] * len(rows)
+        try:
+            self.cursor.execute(users_queries.CREATE_IMPORT_TABLE)
+            self.cursor.execute(users_queries.LOCK_IMPORT)
+            with self.cursor.copy(users_queries.COPY_IMPORT) as copy:
+                for index, (row, user_id) in enumerate(zip(rows, user_ids)):
+                    copy.write_row((index, None if user_id is None else str(user_id), *row))
+            self.cursor.execute(users_queries.MERGE_IMPORT_UPDATE)
+            updated = {index: str(user_id) for index, user_id in self.cursor.fetchall()}
+            self.cursor.execute(users_queries.MERGE_IMPORT_INSERT)
+            created = {email: str(user_id) for user_id, email in self.cursor.fetchall()}
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+        results = []
+        for index, row in enumerate(rows):
+            email = row[3]
+            if index in updated:
+                results.append(("updated", updated[index]))
+            elif email in created:
+                results.append(("created", created[email]))
+            else:
+                results.append(("exists", None))
+        return results
+
+    def export_users(self, columns, fmt):
+        """
+        Every user with its location as `fmt` bytes (see users_export), streamed from
+        COPY TO. The COPY starts here, on a connection of its own: a slow download does
+        not hold the thread's connection. The returned users_export.Stream owns that
+        connection until it is closed (the response closes it, read to the end or not).
+        """
+        query = users_export.copy_query(columns, fmt)
+        conn = self.connect()
+        resources = contextlib.ExitStack()
+        resources.callback(conn.close)
+        try:
+            cursor = resources.enter_context(conn.cursor())
+            copy = resources.enter_context(cursor.copy(query))
+        except BaseException:
+            resources.close()
+            raise
+        return users_export.Stream(users_export.buffered(copy), resources.close)
+
+    @writes
     def update_user(self, user_data, user_uuid):
-        query = "UPDATE users SET name=%s, surname=%s, role=%s, password=%s WHERE uuid=%s"
-        params = (user_data.get("name"), user_data.get("surname"), user_data.get("role"), generate_password_hash(user_data.get("password")), user_uuid)
+        params = (user_data.get("name"), user_data.get("surname"), user_data.get("role"), self._hash_password(user_data.get("password")), user_uuid)
 
-        self.cursor.execute(query, params=params)
+        self.cursor.execute(users_queries.UPDATE_USER, params=params)
         self.conn.commit()
         return self.get_user(user_uuid)
 
-    def _get_params_to_insert(self, params_new_user):
-        if "email_verified" in params_new_user:  # log in with google
-            name = params_new_user["given_name"]
-            surname = params_new_user["family_name"]
-        else:
-            name = params_new_user["name"]
-            surname = params_new_user["surname"]
-
-        if "password" in params_new_user:
-            password = generate_password_hash(params_new_user["password"])
-        else:
-            password = generate_password_hash(params_new_user["token"])
-
-        if "notification" in params_new_user:
-            notification = params_new_user["notification"]
-        else:
-            notification = True
-
-        return (
-            name,
-            surname,
-            password,
-            params_new_user["email"],
-            params_new_user["status"],
-            params_new_user["role"],
-            notification,
-        )
-
+    @writes
     def delete_users(self, user_id):
-        query = "DELETE FROM users WHERE uuid = %s"
         params = (str(user_id),)
-        self.cursor.execute(query, params=params)
+        self.cursor.execute(users_queries.DELETE_USER, params=params)
         self.conn.commit()
         return
 
+    @writes
     def set_location(self, params_new_user):
         """
         Try inserting a new row into the user_locations table.
         If the UUID already exists (primary key conflict), then update the latitude and longitude.
         """
-        query = """
-        INSERT INTO user_locations (uuid, latitude, longitude)
-        VALUES (%s, %s, %s)
-        ON CONFLICT (uuid)
-        DO UPDATE SET
-            latitude = EXCLUDED.latitude,
-            longitude = EXCLUDED.longitude;
-        """
         params = (
             params_new_user["uuid"],
             params_new_user["latitude"],
             params_new_user["longitude"],
         )
-        self.cursor.execute(query, params=params)
+        self.cursor.execute(users_queries.SET_LOCATION, params=params)
         self.conn.commit()
         return
 
+    @reads
     def check_email(self, email):
         """ 
         Function that check if a mail is valid on the database
         returns the id of the user if it exists
         else returns None
         """
-        query = "SELECT * FROM users u WHERE email = %s"
         params = (email,)
 
-        self.cursor.execute(query, params=params)
+        self.cursor.execute(users_queries.CHECK_EMAIL, params=params)
 
         user = self.cursor.fetchone()
 
@@ -234,163 +265,99 @@ class UsersRepository(BaseEntity):
 
     def get_active_pin(self, user_id, pin_type):
         """Obtener un PIN activo no usado y no expirado"""
-        query = """
-        SELECT pin_code, created_at
-        FROM pins
-        WHERE user_id = %s
-        AND pin_type = %s
-        AND used = FALSE
-        AND created_at > NOW() - INTERVAL '10 minutes'
-        LIMIT 1
-        """
-        self.cursor.execute(query, (str(user_id), pin_type))
-        return self.cursor.fetchone()
+        self.cursor.execute(users_queries.GET_ACTIVE_PIN, (str(user_id), pin_type))
+        result = self.cursor.fetchone()
+        # Ends the transaction: an idle connection must not keep pins locked (partition maintenance).
+        self.conn.commit()
+        return result
 
 
+    @writes
     def create_pin(self, user_id, pin_code, pin_type):
         """Crear un nuevo PIN en la base de datos"""
-        query = """
-        INSERT INTO pins (user_id, pin_code, pin_type)
-        VALUES (%s, %s, %s)
-        """
-        self.cursor.execute(query, (str(user_id), pin_code, pin_type))
+        self.cursor.execute(users_queries.CREATE_PIN, (str(user_id), pin_code, pin_type))
         self.conn.commit()
 
+    @writes
     def validate_and_use_pin(self, email: str, pin_code: str, pin_type: str) -> bool:
         """Valida un PIN y lo marca como usado si es válido"""
-        query = """
-        UPDATE pins p
-        SET used = TRUE
-        FROM users u
-        WHERE p.user_id = u.uuid
-        AND u.email = %s
-        AND p.pin_code = %s
-        AND p.pin_type = %s
-        AND p.used = FALSE
-        AND p.created_at > NOW() - INTERVAL '10 minutes'
-        RETURNING p.pin_id
-        """
-        self.cursor.execute(query, (email, pin_code, pin_type))
+        self.cursor.execute(users_queries.VALIDATE_AND_USE_PIN, (email, pin_code, pin_type))
         result = self.cursor.fetchone()
         self.conn.commit()
         return bool(result)
     
     def pin_in_progress(self, uuid):
-        query = """
-        SELECT *
-        FROM pins p
-        WHERE p.user_id = %s
-        AND p.pin_type = 'registration'
-        AND p.used = FALSE
-        AND p.created_at >= NOW() - INTERVAL '10 minutes'
-        """
-        self.cursor.execute(query, (uuid,))
+        self.cursor.execute(users_queries.PIN_IN_PROGRESS, (uuid,))
         result = self.cursor.fetchone()
         self.conn.commit()
-        logger.debug(f"[REPOSITORY] uuid: {uuid} - RESULT {result}")
+        logger.debug("[REPOSITORY] uuid: %s - RESULT %s", uuid, result)
         return bool(result)
     
     def pin_expired(self, uuid):
-        query = """
-        SELECT *
-        FROM pins p
-        WHERE p.user_id = %s
-        AND p.pin_type = 'registration'
-        AND p.used = FALSE
-        AND p.created_at < NOW() - INTERVAL '10 minutes'
-        """
-        self.cursor.execute(query, (uuid,))
+        self.cursor.execute(users_queries.PIN_EXPIRED, {"user_id": str(uuid)})
         result = self.cursor.fetchone()
         self.conn.commit()
-        logger.debug(f"[REPOSITORY] uuid: {uuid} - RESULT {result}")
+        logger.debug("[REPOSITORY] uuid: %s - RESULT %s", uuid, result)
         return bool(result)
     
 
     def has_used_pin(self, user_id: str) -> bool:
         """Verifica si el usuario tiene algún PIN marcado como usado"""
-        query = """
-        SELECT 1
-        FROM pins
-        WHERE user_id = %s
-        AND used = TRUE
-        LIMIT 1
-        """
-        self.cursor.execute(query, (user_id,))
+        self.cursor.execute(users_queries.HAS_USED_PIN, {"user_id": str(user_id)})
         result = self.cursor.fetchone()
+        # Ends the transaction: an idle connection must not keep pins locked (partition maintenance).
+        self.conn.commit()
         return bool(result)
 
+    @writes
+    def mark_pin_verified(self, user_id):
+        """Registra que el usuario validó un PIN (has_used_pin), sin guardar el PIN"""
+        self.cursor.execute(users_queries.MARK_PIN_VERIFIED, (str(user_id),))
+        self.conn.commit()
+
+    @writes
     def update_user_password(self, email, new_password):
         """Actualiza la contraseña de un usuario"""
-        query = """
-        UPDATE users
-        SET password = %s
-        WHERE email = %s
-        RETURNING uuid
-        """
-        hashed_password = generate_password_hash(new_password)
-        self.cursor.execute(query, (hashed_password, email))
+        hashed_password = self._hash_password(new_password)
+        self.cursor.execute(users_queries.UPDATE_USER_PASSWORD, (hashed_password, email))
         result = self.cursor.fetchone()
         self.conn.commit()
         return bool(result)
 
 
+    @writes
     def invalidate_all_pins(self, user_id):
         """Marca todos los PINs de un usuario como usados"""
-        query = """
-        UPDATE pins
-        SET used = TRUE
-        WHERE user_id = %s
-        """
-        self.cursor.execute(query, (str(user_id),))
+        self.cursor.execute(users_queries.INVALIDATE_ALL_PINS, (str(user_id),))
         self.conn.commit()
 
+    @writes
     def activate_user(self, email):
         """Activa un usuario en la base de datos"""
-        query = """
-        UPDATE users
-        SET status = 'active'
-        WHERE email = %s
-        RETURNING uuid
-        """
-        self.cursor.execute(query, (email,))
+        self.cursor.execute(users_queries.ACTIVATE_USER, (email,))
         result = self.cursor.fetchone()
         self.conn.commit()
         return bool(result)
 
+    @writes
     def update_status(self, uuid, new_status):
-        query = """
-        UPDATE users
-        SET status = %s
-        WHERE uuid = %s
-        RETURNING uuid
-        """
-        self.cursor.execute(query, (new_status, str(uuid),))
+        self.cursor.execute(users_queries.UPDATE_STATUS, (new_status, str(uuid),))
         result = self.cursor.fetchone()
         self.conn.commit()
         return bool(result)
 
+    @writes
     def update_notification(self, uuid, new_notif_status):
-        query = """
-        UPDATE users
-        SET notification = %s
-        WHERE uuid = %s
-        RETURNING uuid
-        """
-        self.cursor.execute(query, (new_notif_status, str(uuid),))
+        self.cursor.execute(users_queries.UPDATE_NOTIFICATION, (new_notif_status, str(uuid),))
         result = self.cursor.fetchone()
         self.conn.commit()
         if result:
             return result[0]
         return None
     
+    @writes
     def update_biometric_id(self, user_id, id_biometric):
-        query = """
-        UPDATE users
-        SET id_biometric = %s
-        WHERE uuid = %s
-        RETURNING uuid
-        """
-        self.cursor.execute(query, (id_biometric, str(user_id)))
+        self.cursor.execute(users_queries.UPDATE_BIOMETRIC_ID, (id_biometric, str(user_id)))
         result = self.cursor.fetchone()
         self.conn.commit()
         return bool(result)
@@ -0,0 +1,110 @@
+"""
+On-demand profiling of the running worker (served by /debug/profile).
+
+- cpu: statistical sampler. Every `interval` it reads the Python stack of every other
+  thread with sys._current_frames(); nothing is installed in the profiled threads
+  (no sys.setprofile), so request threads run at full speed and the cost is one
+  stack walk per thread per sample. The result is collapsed stacks ("a;b;c 42"), the
+  input of flamegraph.pl and speedscope.
+- memory: tracemalloc snapshot diff. Tracing is started for the window (if it was not
+  already on) and the allocations still alive at the end are grouped by line.
+
+Only one profile runs at a time per process.
+"""
+
+import collections
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", 60))
+MIN_INTERVAL = 0.001
+
+# Leaf frames in these modules mean the thread is parked (waiting for a request,
+# a queue item or a lock), not working.
+_IDLE_MODULES = ("threading.py", "selectors.py", "queue.py", "socketserver.py")
+
+_running = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """Another profile is already running in this process."""
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_idle(frame):
+    return frame.f_code.co_filename.endswith(_IDLE_MODULES)
+
+
+def sample_stacks(seconds, interval=0.01, include_idle=False):
+    """
+    Sample every thread but the caller for `seconds`.
+    Returns (Counter of root-first stack tuples, number of samples taken).
+    """
+    if not _running.acquire(blocking=False):
+        raise ProfilerBusy()
+    try:
+        me = threading.get_ident()
+        interval = max(interval, MIN_INTERVAL)
+        stacks = collections.Counter()
+        samples = 0
+        deadline = time.monotonic() + min(seconds, MAX_SECONDS)
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == me or (not include_idle and _is_idle(frame)):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                stacks[tuple(reversed(stack))] += 1
+            samples += 1
+            time.sleep(interval)
+        return stacks, samples
+    finally:
+        _running.release()
+
+
+def render_collapsed(stacks):
+    """Brendan Gregg's folded format: one "root;...;leaf count" line per stack."""
+    return "".join(f"{';'.join(stack)} {count}\n" for stack, count in stacks.most_common())
+
+
+def memory_diff(seconds, top=30):
+    """Allocations that grew during the window, biggest first (sizes in KiB)."""
+    if not _running.acquire(blocking=False):
+        raise ProfilerBusy()
+    started = not tracemalloc.is_tracing()
+    try:
+        if started:
+            tracemalloc.start()
+        ignore = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__))
+        before = tracemalloc.take_snapshot().filter_traces(ignore)
+        time.sleep(min(seconds, MAX_SECONDS))
+        after = tracemalloc.take_snapshot().filter_traces(ignore)
+    finally:
+        if started:
+            tracemalloc.stop()
+        _running.release()
+
+    stats = after.compare_to(before, "lineno")
+    return {
+        "seconds": min(seconds, MAX_SECONDS),
+        "total_diff_kb": round(sum(stat.size_diff for stat in stats) / 1024, 1),
+        "top": [
+            {
+                "file": stat.traceback[0].filename,
+                "line": stat.traceback[0].lineno,
+                "size_diff_kb": round(stat.size_diff / 1024, 1),
+                "size_kb": round(stat.size / 1024, 1),
+                "count_diff": stat.count_diff,
+            }
+            for stat in stats[:top]
+        ],
+    }
@@ -0,0 +1,99 @@
+"""
+Single flight: concurrent identical reads share one computation.
+
+The first caller of a key (the leader) runs it; the callers of the same key that arrive
+while it runs (followers) wait and get the same result, or the same exception. Nothing is
+kept once it returns: the next caller starts a new flight, so a result is never older
+than the query that was already running when its caller arrived.
+
+A follower waits no longer than its own request's deadline. The leader's deadline is
+not the follower's: if the leader ran out of time (DeadlineExceeded, or its statement
+was cancelled), its followers run the call themselves instead of failing with it.
+
+Results are shared objects: callers must not mutate them.
+
+Set SINGLE_FLIGHT_ENABLED=false to run every call on its own.
+"""
+
+import os
+import threading
+
+import psycopg
+
+from infrastructure import metrics
+from infrastructure.persistence import deadlines
+
+ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+calls = metrics.Counter(
+    "users_singleflight_calls_total",
+    "Coalesced reads by role (leader: ran the query, follower: shared its result).",
+    ("group", "role"),
+)
+waiters = metrics.Histogram(
+    "users_singleflight_waiters",
+    "Followers that shared each flight (one observation per key computed).",
+    ("group",),
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100),
+)
+
+# The leader's own failures: its followers have their own deadlines.
+_LEADER_ONLY = (deadlines.DeadlineExceeded, psycopg.errors.QueryCanceled)
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, group, enabled=ENABLED):
+        self.group = group
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._flights = {}  # key -> _Flight
+
+    def do(self, key, compute):
+        """compute(), shared with the concurrent callers of the same key."""
+        if not self.enabled:
+            return compute()
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                flight.waiters += 1
+
+        if not leader:
+            calls.inc(self.group, "follower")
+            deadline = deadlines.current()
+            if not flight.done.wait(None if deadline is None else max(deadline.remaining(), 0)):
+                deadline.exceeded = True
+                raise deadlines.DeadlineExceeded(f"Request deadline exceeded waiting for {self.group}")
+            if isinstance(flight.error, _LEADER_ONLY):
+                return compute()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        calls.inc(self.group, "leader")
+        try:
+            flight.result = compute()
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            waiters.observe(flight.waiters, self.group)
+            flight.done.set()
+
+    def in_flight(self):
+        return len(self._flights)
@@ -0,0 +1,262 @@
+"""
+Lightweight per-request tracing.
+
+A span times one operation (a repository method, an SMTP send, a Google call, a password
+hash) and knows its parent, so a slow login can be broken down call by call. The current
+span lives in a ContextVar: nesting works across threads started with asyncio.to_thread
+and across awaits. A request continues the trace of an incoming W3C `traceparent` header.
+
+Finished spans go to the registered exporters:
+- `ring_buffer`: the last TRACE_BUFFER_SIZE spans in memory (served by /debug/traces).
+- New Relic: when the agent is installed and NEW_RELIC_CONFIG_FILE points to a file,
+  every span is also recorded as a function trace of the current New Relic transaction.
+
+Set TRACING_ENABLED=false to turn spans off entirely.
+"""
+
+import collections
+import contextlib
+import contextvars
+import functools
+import inspect
+import os
+import secrets
+import time
+
+from infrastructure import lifecycle
+from logger_config import get_logger
+
+logger = get_logger("api-users")
+
+ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_exporters = []
+
+
+class Span:
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_id", "attributes",
+        "start_time", "duration_ms", "error", "bridge", "_start",
+    )
+
+    def __init__(self, name, trace_id, parent_id, attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_time = time.time()
+        self.duration_ms = None
+        self.error = None
+        self.bridge = None  # exporter specific state (e.g. the New Relic trace)
+        self._start = time.perf_counter()
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def finish(self):
+        self.duration_ms = round((time.perf_counter() - self._start) * 1000, 3)
+
+    @property
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+def parse_traceparent(header):
+    """(trace_id, parent span_id) of a W3C traceparent header, None if it is not valid."""
+    parts = header.strip().lower().split("-")
+    if len(parts) < 4 or len(parts[0]) != 2 or parts[0] == "ff":
+        return None
+    trace_id, parent_id = parts[1], parts[2]
+    if len(trace_id) != 32 or len(parent_id) != 16:
+        return None
+    try:
+        int(trace_id, 16), int(parent_id, 16)
+    except ValueError:
+        return None
+    if not int(trace_id, 16) or not int(parent_id, 16):
+        return None
+    return trace_id, parent_id
+
+
+def current_span():
+    return _current_span.get()
+
+
+@contextlib.contextmanager
+def span(name, traceparent=None, **attributes):
+    """
+    Time the block as a child of the current span. Without a current span a new trace
+    starts, continuing `traceparent` (the incoming header) when it is valid.
+    """
+    if not ENABLED:
+        yield None
+        return
+
+    parent = _current_span.get()
+    if parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    else:
+        remote = parse_traceparent(traceparent) if traceparent else None
+        trace_id, parent_id = remote or (secrets.token_hex(16), None)
+
+    current = Span(name, trace_id, parent_id, attributes)
+    token = _current_span.set(current)
+    _export("on_start", current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.finish()
+        _current_span.reset(token)
+        _export("on_end", current)
+
+
+def _export(hook, current):
+    for exporter in _exporters:
+        try:
+            getattr(exporter, hook)(current)
+        except Exception as e:
+            # A broken exporter must never fail the request.
+            logger.error("Span exporter %s.%s failed: %s", type(exporter).__name__, hook, e)
+
+
+def traced_methods(cls):
+    """
+    Class decorator: one span per call of every public method defined on the class
+    (sync or async), named "<Class>.<method>". Arguments are not recorded (PII).
+    """
+    if not ENABLED:
+        return cls
+    for name, method in list(vars(cls).items()):
+        if name.startswith("_") or not inspect.isfunction(method):
+            continue
+        setattr(cls, name, _traced(method, f"{cls.__name__}.{name}"))
+    return cls
+
+
+def _traced(method, span_name):
+    if inspect.iscoroutinefunction(method):
+
+        @functools.wraps(method)
+        async def async_wrapper(*args, **kwargs):
+            with span(span_name):
+                return await method(*args, **kwargs)
+
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with span(span_name):
+            return method(*args, **kwargs)
+
+    return wrapper
+
+
+# Exporters
+
+
+class SpanExporter:
+    """Base exporter: override the hooks you need."""
+
+    def on_start(self, span):
+        pass
+
+    def on_end(self, span):
+        pass
+
+
+class RingBufferExporter(SpanExporter):
+    """Keeps the last `capacity` finished spans (deque.append is thread safe)."""
+
+    def __init__(self, capacity):
+        self.spans = collections.deque(maxlen=capacity)
+
+    def on_end(self, span):
+        self.spans.append(span)
+
+    def clear(self):
+        self.spans.clear()
+
+    def traces(self, limit=20):
+        """The `limit` most recent traces, newest first, each with its spans in start order."""
+        traces = {}
+        for finished in reversed(list(self.spans)):
+            if finished.trace_id not in traces:
+                if len(traces) == limit:
+                    continue
+                traces[finished.trace_id] = []
+            traces[finished.trace_id].append(finished)
+        return [
+            {
+                "trace_id": trace_id,
+                "duration_ms": max(s.duration_ms for s in spans),
+                "spans": [s.to_dict() for s in sorted(spans, key=lambda s: s.start_time)],
+            }
+            for trace_id, spans in traces.items()
+        ]
+
+
+class NewRelicExporter(SpanExporter):
+    """Mirrors each span as a FunctionTrace of the running New Relic transaction."""
+
+    def __init__(self, agent):
+        self.agent = agent
+
+    def on_start(self, span):
+        if self.agent.current_transaction() is None:
+            return
+        trace = self.agent.FunctionTrace(span.name, group="Span")
+        trace.__enter__()
+        span.bridge = trace
+
+    def on_end(self, span):
+        if span.bridge is not None:
+            span.bridge.__exit__(None, None, None)
+            span.bridge = None
+
+
+def new_relic_exporter():
+    """NewRelicExporter if the agent is installed and configured (newrelic.ini), else None."""
+    config_file = os.getenv("NEW_RELIC_CONFIG_FILE")
+    if not config_file or not os.path.exists(config_file):
+        return None
+    try:
+        import newrelic.agent
+    except ImportError:
+        return None
+    return NewRelicExporter(newrelic.agent)
+
+
+def add_exporter(exporter):
+    _exporters.append(exporter)
+    return exporter
+
+
+def remove_exporter(exporter):
+    _exporters.remove(exporter)
+
+
+ring_buffer = add_exporter(RingBufferExporter(int(os.getenv("TRACE_BUFFER_SIZE", 2000))))
+
+_new_relic = new_relic_exporter()
+if _new_relic is not None:
+    add_exporter(_new_relic)
+
+# Spans recorded in the master (preload) do not belong to any worker.
+lifecycle.after_fork(ring_buffer.clear)
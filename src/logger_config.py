@@ -1,8 +1,40 @@
+"""
+Structured JSON logs, one line per event, written to stdout by a background thread.
+
+- Level gated: LOG_LEVEL (default INFO). Calls below the level are a no-op, and
+  positional arguments are only formatted when the event is emitted, so hot paths log
+  with `logger.debug("users is %s", users)` instead of building an f-string every time.
+- Non blocking: the request thread only renders the line and enqueues it; the writer
+  thread batches the queue into stdout. If the queue is full (LOG_QUEUE_SIZE) lines
+  are dropped and counted, never waited on. LOG_ASYNC=false writes synchronously.
+- String values longer than LOG_MAX_VALUE_LENGTH characters are truncated.
+- Rendered with orjson when installed (falls back to the json module).
+- Sampled: per event template and route, the first LOG_SAMPLE_FIRST events of each
+  LOG_SAMPLE_WINDOW_SECONDS window are kept, then 1 in LOG_SAMPLE_EVERY; a summary line
+  reports how many were suppressed. LOG_SAMPLING_RULES overrides the numbers for events
+  starting with a given text, e.g. '{"PIN generated": {"first": 5, "every": 1000}}'.
+  Only levels below LOG_SAMPLE_BELOW (default WARNING) are sampled: warnings and errors
+  are always kept unless it is raised to ERROR or CRITICAL. LOG_SAMPLING=false keeps everything.
+"""
+
+import atexit
+import json
+import logging
 import os
+import queue
 import sys
-import logging
+import threading
+import time
+
 import structlog
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+MAX_VALUE_LENGTH = int(os.getenv("LOG_MAX_VALUE_LENGTH", 2000))
+
 
 def add_service_tag(logger, method_name, event_dict):
     """Add tag in each log."""
@@ -10,24 +42,319 @@ def add_service_tag(logger, method_name, event_dict):
     event_dict["service"] = service
     return event_dict
 
+
+def truncate_values(logger, method_name, event_dict):
+    """Cap long strings (a whole user listing, a request body) to MAX_VALUE_LENGTH."""
+    for key, value in event_dict.items():
+        if isinstance(value, str) and len(value) > MAX_VALUE_LENGTH:
+            event_dict[key] = f"{value[:MAX_VALUE_LENGTH]}... [{len(value) - MAX_VALUE_LENGTH} more chars]"
+    return event_dict
+
+
+if orjson is not None:
+
+    def _dumps(event_dict):
+        return orjson.dumps(event_dict, default=str)
+
+else:
+
+    def _dumps(event_dict):
+        return json.dumps(event_dict, default=str).encode()
+
+
+def render_json(logger, method_name, event_dict):
+    return _dumps(event_dict)
+
+
+class BackgroundWriter:
+    """
+    Bytes sink whose write() only enqueues; a daemon thread writes to `stream` in batches.
+    Fork safe: the queue is drained before fork() and rebuilt (with its thread) in the child.
+    """
+
+    def __init__(self, stream, max_queue_size=10000, asynchronous=True):
+        self.stream = stream
+        self.max_queue_size = max_queue_size
+        self.asynchronous = asynchronous
+        self.dropped = 0
+        self._io_lock = threading.Lock()
+        self._start()
+
+    def _start(self):
+        self._queue = queue.Queue(self.max_queue_size)
+        if self.asynchronous:
+            self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+            self._thread.start()
+
+    def write(self, line):
+        if not self.asynchronous:
+            self._write([line])
+            return
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            batch.extend(self._pending())
+            count = len(batch)
+            self._write(batch)
+            self._done(count)
+
+    def _done(self, count):
+        for _ in range(count):
+            self._queue.task_done()
+
+    def _pending(self):
+        lines = []
+        while True:
+            try:
+                lines.append(self._queue.get_nowait())
+            except queue.Empty:
+                return lines
+
+    def _write(self, lines):
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            lines.append(_dumps({"event": "Log lines dropped (queue full)", "dropped": dropped, "level": "warning"}) + b"\n")
+        with self._io_lock:
+            try:
+                self.stream.write(b"".join(lines))
+                self.stream.flush()
+            except (OSError, ValueError):
+                pass  # stdout closed: nothing else to do with the lines
+
+    def drain(self, timeout=1.0):
+        """Write whatever is still queued and wait for the batch in flight (at exit, before fork)."""
+        lines = self._pending()
+        if lines:
+            count = len(lines)
+            self._write(lines)
+            self._done(count)
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._queue.all_tasks_done.wait(remaining):
+                    break
+
+    def reset_after_fork(self):
+        # The parent's writer thread does not exist here, and its queue lock may be held.
+        self._io_lock = threading.Lock()
+        self._start()
+
+
+class QueueLogger:
+    """structlog logger: every level just hands the rendered line to the writer."""
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    def msg(self, message):
+        self.writer.write(message + b"\n")
+
+    log = debug = info = warn = warning = msg
+    fatal = failure = err = error = critical = exception = msg
+
+
+class Sampler:
+    """
+    Keep-first-N-then-1-in-M sampling per (event, route) and time window.
+    `event` is the template ("users is %s"), so every call site is one key.
+    """
+
+    def __init__(self, first=20, every=100, window=60.0, rules=None, clock=time.monotonic):
+        self.first = first
+        self.every = max(every, 1)
+        self.window = window
+        self.rules = rules or {}
+        self.clock = clock
+        self._windows = {}  # (event, route) -> [start, seen, suppressed, level]
+        self._last_sweep = clock()
+        self._lock = threading.Lock()
+
+    def _rule(self, event):
+        for prefix, rule in self.rules.items():
+            if event.startswith(prefix):
+                return rule.get("first", self.first), max(rule.get("every", self.every), 1)
+        return self.first, self.every
+
+    def allow(self, level, event, route):
+        """
+        (sample_rate, summaries): sample_rate is None when the event is dropped, 1 when
+        it is within the first N, M when it is the 1-in-M sample. `summaries` are the
+        suppressed counts of the windows that just closed, to be logged.
+        """
+        key = (event, route)
+        now = self.clock()
+        summaries = []
+        with self._lock:
+            if now - self._last_sweep >= self.window:
+                self._sweep(now, summaries)
+            state = self._windows.get(key)
+            if state is None or now - state[0] >= self.window:
+                if state is not None and state[2]:
+                    summaries.append(self._summary(key, state))
+                state = self._windows[key] = [now, 0, 0, level]
+            state[1] += 1
+            first, every = self._rule(event)
+            seen = state[1]
+            if seen <= first:
+                return 1, summaries
+            if (seen - first) % every == 0:
+                return every, summaries
+            state[2] += 1
+            return None, summaries
+
+    def _sweep(self, now, summaries):
+        # Closes idle windows: their summaries are not lost and the dict stays small.
+        for key, state in list(self._windows.items()):
+            if now - state[0] >= self.window:
+                if state[2]:
+                    summaries.append(self._summary(key, state))
+                del self._windows[key]
+        self._last_sweep = now
+
+    def _summary(self, key, state):
+        return state[3], {"sampled_event": key[0], "route": key[1], "suppressed": state[2], "window_seconds": self.window}
+
+
+def _no_route():
+    return None
+
+
+_route_provider = _no_route
+
+
+def set_route_provider(provider):
+    """`provider()` returns the route template of the current request (None outside one)."""
+    global _route_provider
+    _route_provider = provider
+
+
+def _route():
+    try:
+        return _route_provider()
+    except Exception:
+        return None
+
+
+_SAMPLED_LEVELS = {"debug": logging.DEBUG, "info": logging.INFO, "warning": logging.WARNING, "error": logging.ERROR}
+
+
+def make_sampled_bound_logger(min_level, sampler, sample_below=logging.WARNING):
+    """
+    Filtering bound logger (no-op below `min_level`) whose enabled methods below
+    `sample_below` go through `sampler` before the event is formatted. By default
+    warnings and errors are always kept; exception/critical are never sampled.
+    """
+    base = structlog.make_filtering_bound_logger(min_level)
+
+    def make_method(name):
+        emit = getattr(base, name)
+
+        def meth(self, event, *args, **kw):
+            sample_rate, summaries = sampler.allow(name, event, _route())
+            for level, summary in summaries:
+                getattr(base, level)(self, "Log events sampled", **summary)
+            if sample_rate is None:
+                return None
+            if sample_rate > 1:
+                kw["sample_rate"] = sample_rate
+            return emit(self, event, *args, **kw)
+
+        meth.__name__ = name
+        return meth
+
+    methods = {name: make_method(name) for name, level in _SAMPLED_LEVELS.items() if min_level <= level < sample_below}
+    if "warning" in methods:
+        methods["warn"] = methods["warning"]
+    if "error" in methods:
+        methods["err"] = methods["error"]
+    return type(f"Sampled{base.__name__}", (base,), methods)
+
+
+def _sampler_from_env():
+    return Sampler(
+        first=int(os.getenv("LOG_SAMPLE_FIRST", 20)),
+        every=int(os.getenv("LOG_SAMPLE_EVERY", 100)),
+        window=float(os.getenv("LOG_SAMPLE_WINDOW_SECONDS", 60)),
+        rules=json.loads(os.getenv("LOG_SAMPLING_RULES", "{}")),
+    )
+
+
+class _TextStream:
+    """Text view of the writer, for the stdlib handler (authlib, psycopg, werkzeug...)."""
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    def write(self, text):
+        self.writer.write(text.encode())
+
+    def flush(self):
+        pass
+
+
+def _stdout_buffer():
+    return getattr(sys.stdout, "buffer", None) or _TextToBytes(sys.stdout)
+
+
+class _TextToBytes:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, data):
+        self.stream.write(data.decode())
+
+    def flush(self):
+        self.stream.flush()
+
+
+writer = None
+sampler = None
+
+
 def configure_logging():
+    global writer, sampler
+
+    level = logging.getLevelName(os.getenv("LOG_LEVEL", "INFO").upper())
+    writer = BackgroundWriter(
+        _stdout_buffer(),
+        max_queue_size=int(os.getenv("LOG_QUEUE_SIZE", 10000)),
+        asynchronous=os.getenv("LOG_ASYNC", "true").lower() == "true",
+    )
+    atexit.register(writer.drain)
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(before=writer.drain, after_in_child=writer.reset_after_fork)
+
     logging.basicConfig(
         format="%(message)s",
-        stream=sys.stdout,
-        level=logging.DEBUG,
+        stream=_TextStream(writer),
+        level=level,
+        force=True,
     )
 
+    wrapper_class = structlog.make_filtering_bound_logger(level)
+    if os.getenv("LOG_SAMPLING", "true").lower() == "true":
+        sampler = _sampler_from_env()
+        sample_below = logging.getLevelName(os.getenv("LOG_SAMPLE_BELOW", "WARNING").upper())
+        wrapper_class = make_sampled_bound_logger(level, sampler, sample_below)
+
     structlog.configure(
         processors=[
-            structlog.stdlib.filter_by_level,
+            structlog.processors.add_log_level,
             structlog.processors.TimeStamper(fmt="iso"),
             add_service_tag,
-            structlog.processors.JSONRenderer()
-
+            structlog.processors.format_exc_info,
+            truncate_values,
+            render_json,
         ],
         context_class=dict,
-        logger_factory=structlog.stdlib.LoggerFactory(),
-        wrapper_class=structlog.stdlib.BoundLogger,
+        logger_factory=lambda *args: QueueLogger(writer),
+        wrapper_class=wrapper_class,
         cache_logger_on_first_use=True
     )
 
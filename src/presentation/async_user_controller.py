@@ -0,0 +1,174 @@
+from application import flows
+from application.async_user_service import AsyncUserService
+from presentation.user_flows import UserFlows
+
+
+class AsyncUserController(UserFlows):
+    """
+    Async counterpart of UserController: the same handlers (presentation/user_flows.py),
+    with every service call awaited.
+
+    - "response" is a plain dict: asgi_app encodes it like Flask's jsonify.
+    - `request` is asgi_app.AsyncRequest (Flask-like is_json/get_json/args) and
+      carries the session, since there is no global `session` outside Flask.
+    """
+
+    def __init__(self, user_service: AsyncUserService):
+        self.user_service = user_service
+
+    async def _run(self, flow):
+        return await flows.run_async(flow)
+
+    async def get_users(self, request):
+        """
+        Get all users.
+        Check session.
+        """
+        is_session_expired = self.is_session_valid(request)
+        if is_session_expired:
+            return is_session_expired
+
+        return await self._run(self._get_users())
+
+    async def get_users_without_check_session(self):
+        return await self._run(self._get_users())
+
+    async def get_active_teachers(self):
+        """
+        Get users with role=teacher and status=active.
+        """
+        return await self._run(self._get_active_teachers())
+
+    async def get_specific_users_in_check(self, uuid):
+        """
+        Get specific user.
+        Without session check.
+        """
+        return await self._run(self._get_specific_users(uuid))
+
+    async def get_specific_users(self, request, uuid):
+        """
+        Get specific user.
+        """
+        is_session_expired = self.is_session_valid(request)
+        if is_session_expired:
+            return is_session_expired
+
+        return await self._run(self._get_specific_users(uuid))
+
+    async def delete_specific_users(self, request, uuid):
+        """
+        Delete user.
+        """
+        found = (await self.get_specific_users(request, uuid))["code_status"] == 200
+        return await self._run(self._delete_specific_users(uuid, found))
+
+    async def create_users(self, request):
+        """
+        Create a users.
+        """
+        return await self._run(self._create_users(request))
+
+    async def set_user_location(self, request, user_id):
+        """Add location."""
+        latitude, longitude, error = self._location_error(request)
+        if error:
+            return error
+        found = (await self.get_specific_users(request, user_id))["code_status"] == 200
+        return await self._run(self._set_user_location(user_id, latitude, longitude, found))
+
+    async def login_users(self, request):
+        """
+        Login users.
+        """
+        return await self._run(self._login_users(request, request.session))
+
+    async def create_admin_user(self, request):
+        """
+        Create an admin user.
+        Authenticates the requester as an admin via email/password.
+        """
+        return await self._run(self._create_admin_user(request))
+
+    async def login_admin(self, request):
+        """
+        Login específico para administradores.
+        """
+        return self._login_admin(await self.login_users(request), request.session)
+
+    def is_session_valid(self, request):
+        """
+        Same rules as UserController.is_session_valid, on the request's session.
+        Returns the 401 result, or None when the session is valid.
+        """
+        return self._session_error(request.session)
+
+    async def login_user_with_google(self, request):
+        """
+        Login a user with google (returns the redirect response).
+        """
+        role = request.args.get("role", "student")
+        return await self.user_service.login_user_with_google(request.starlette_request, role)
+
+    async def authorize(self, request):
+        user_info = await self.user_service.authorize(request.starlette_request)
+        return await self._run(self._authorize(request, user_info, request.session))
+
+    async def authorize_with_token(self, request):
+        return await self._run(self._authorize_with_token(request))
+
+    async def authorize_signup_token(self, request):
+        """
+        request should have: token, role, email_verified, email, given_name, family_name, photo
+        """
+        return await self._run(self._authorize_signup_token(request))
+
+    async def authorize_login_token(self, request):
+        """
+        request should have: token, email_verified, email, given_name, family_name, photo.
+        If the status is "disabled" in db, user is not returned. User locked error is returned.
+        """
+        return await self._run(self._authorize_login_token(request))
+
+    async def initiate_password_recovery(self, email):
+        """Controller for password recovery startup"""
+        return await self._run(self._initiate_password_recovery(email))
+
+    async def validate_recovery_pin(self, email: str, pin_code: str) -> dict:
+        """PIN validation controller"""
+        return await self._run(self._validate_recovery_pin(email, pin_code))
+
+    async def update_password(self, email, new_password):
+        """Controller for password update"""
+        return await self._run(self._update_password(email, new_password))
+
+    async def initiate_registration_confirmation(self, email: str) -> dict:
+        """Controller for registration confirmation start"""
+        return await self._run(self._initiate_registration_confirmation(email))
+
+    async def validate_registration_pin(self, email, pin_code):
+        """Controller for registration PIN validation"""
+        return await self._run(self._validate_registration_pin(email, pin_code))
+
+    async def admin_change_user_status(self, request):
+        """
+        Changes the status.
+        If this is not possible, an error is generated.
+        Authenticates the requester as an admin via email/password.
+        """
+        return await self._run(self._admin_change_user_status(request))
+
+    async def update_notification(self, request, user_id):
+        """
+        Update the 'notification' field of a user.
+        """
+        return await self._run(self._update_notification(user_id, request))
+
+    async def login_biometric(self, request):
+        """
+        Biometric login handler
+        """
+        return await self._run(self._login_biometric(request, request.session))
+
+    async def update_biometric_id(self, request, user_id):
+        return await self._run(self._update_biometric_id(user_id, request))
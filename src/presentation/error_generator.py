@@ -4,14 +4,16 @@ from logger_config import get_logger
 
 logger = get_logger("api-users")
 
+def get_error(title, detail, url, method="GET"):
+    """Error body as a dict (used as-is by the ASGI app)."""
+    logger.error("%s %s - %s: %s", method, url, title, detail)
+    return {
+        "type": "about:blank",
+        "title": title,
+        "status": 0,
+        "detail": f"{title}: {detail}",
+        "instance": url,
+    }
+
 def get_error_json(title, detail, url, method="GET"):
-    logger.error(f"{method} {url} - {title}: {detail}")
-    return jsonify(
-        {
-            "type": "about:blank",
-            "title": title,
-            "status": 0,
-            "detail": f"{title}: {detail}",
-            "instance": url,
-        }
-    )
+    return jsonify(get_error(title, detail, url, method))
@@ -0,0 +1,120 @@
+from flask import request
+
+from infrastructure.admission import RETRY_AFTER_SECONDS
+from infrastructure.persistence.circuit_breaker import DatabaseUnavailable
+from infrastructure.persistence.db_limiter import DbOverloaded
+from presentation.error_generator import get_error_json
+
+SERVICE_UNAVAILABLE = "Service Unavailable"
+
+# Route classes of infrastructure/admission.py, by URL rule (and method where it matters).
+# Routes not listed are "reads"; EXEMPT ones (probes, metrics, docs) are never shed.
+AUTH = {
+    ("POST", "/users"),
+    ("POST", "/users/login"),
+    ("POST", "/users/admin/login"),
+    ("GET", "/users/login/google"),
+    ("POST", "/users/login/google"),
+    ("GET", "/users/authorize"),
+    ("POST", "/users/authorize"),
+    ("POST", "/users/signup/google"),
+    ("POST", "/users/login/biometric"),
+    ("POST", "/users/<string:user_email>/password-recovery"),
+    ("PUT", "/users/<string:user_email>/password-recovery"),
+    ("PUT", "/users/<string:user_email>/password"),
+    ("POST", "/users/<string:user_email>/confirm-registration"),
+    ("PUT", "/users/<string:user_email>/confirm-registration"),
+}
+ADMIN = {
+    ("GET", "/users/admin"),
+    ("POST", "/users/admin"),
+    ("PUT", "/users/admin/status"),
+    ("DELETE", "/users/<uuid:uuid>"),
+    ("GET", "/debug/traces"),
+    ("GET", "/debug/profile"),
+}
+WRITES = {
+    ("PUT", "/users/<uuid:user_id>/location"),
+    ("PUT", "/users/<uuid:user_id>/notification"),
+    ("PUT", "/users/<uuid:user_id>/biometric"),
+}
+BULK = {
+    ("POST", "/users/bulk"),
+    ("GET", "/users/export"),
+}
+EXEMPT_PREFIXES = ("/health", "/metrics", "/docs", "/static")
+
+
+def classify(method, rule):
+    """Class of a request by its URL rule, or None (not subject to admission)."""
+    if rule is None or rule.startswith(EXEMPT_PREFIXES) or method == "OPTIONS":
+        return None
+    key = (method, rule)
+    if key in AUTH:
+        return "auth"
+    if key in ADMIN:
+        return "admin"
+    if key in WRITES:
+        return "writes"
+    if key in BULK:
+        return "bulk"
+    return "reads"
+
+
+def init_app(app, admission):
+    """
+    Run every request through `admission` (None: disabled). A shed request gets 503 with
+    Retry-After, through the app's after_request hooks (CORS, session). Installed before
+    http_metrics, so shed requests show up in the request metrics with their 503.
+
+    As in http_metrics, full_dispatch_request is wrapped instead of using hooks.
+
+    Streamed responses (GET /users/export) keep their slot until the response is closed
+    (sent, or the client went away): the export holds its database connection until then.
+    """
+    if admission is None:
+        return
+    dispatch = app.full_dispatch_request
+
+    def full_dispatch_request():
+        url_rule = request.url_rule
+        route_class = classify(request.method, url_rule.rule if url_rule is not None else None)
+        if route_class is None:
+            return dispatch()
+        shed = admission.acquire(route_class)
+        if shed is not None:
+            response = unavailable(f"overloaded ({route_class}: {shed}), retry later", admission.retry_after)
+            return app.finalize_request(response, from_error_handler=True)
+        try:
+            response = dispatch()
+        except BaseException:
+            admission.release(route_class)
+            raise
+        if response.is_streamed:
+            response.call_on_close(lambda: admission.release(route_class))
+        else:
+            admission.release(route_class)
+        return response
+
+    app.full_dispatch_request = full_dispatch_request
+
+
+def init_error_handlers(app, retry_after=RETRY_AFTER_SECONDS):
+    """
+    A request that found no database slot (DbOverloaded) or the database unreachable
+    (DatabaseUnavailable, breaker open) answers 503 with Retry-After, like a shed one:
+    the client can retry it, nothing failed on its side.
+    """
+
+    def database_unavailable(error):
+        return unavailable(str(error), retry_after)
+
+    app.register_error_handler(DbOverloaded, database_unavailable)
+    app.register_error_handler(DatabaseUnavailable, database_unavailable)
+
+
+def unavailable(detail, retry_after):
+    response = get_error_json(SERVICE_UNAVAILABLE, detail, request.path, request.method)
+    response.status_code = 503
+    response.headers["Retry-After"] = str(retry_after)
+    return response
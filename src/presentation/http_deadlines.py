@@ -0,0 +1,81 @@
+import os
+import time
+
+from flask import request
+
+from infrastructure.persistence import deadlines
+from presentation.error_generator import get_error_json
+from presentation.http_admission import EXEMPT_PREFIXES
+
+GATEWAY_TIMEOUT = "Gateway Timeout"
+DEADLINE_HEADER = "X-Request-Deadline"
+
+DEFAULT_MS = int(os.getenv("REQUEST_DEADLINE_MS", 10000))
+# Budget of a route by URL rule and method (ms); None: no deadline unless the header sets one.
+ROUTE_DEFAULTS_MS = {
+    ("GET", "/users"): 5000,
+    ("GET", "/users/teachers"): 3000,
+    ("POST", "/users/bulk"): 60000,
+    ("GET", "/users/export"): None,  # streamed: the download outlives any request budget
+}
+
+
+def parse_deadline(value, now=None):
+    """
+    X-Request-Deadline (absolute Unix time in milliseconds, as the gateway sets it)
+    -> seconds left, or None when missing or malformed (a header never breaks a request).
+    """
+    if not value:
+        return None
+    try:
+        at = float(value) / 1000
+    except ValueError:
+        return None
+    return at - (time.time() if now is None else now)
+
+
+def budget(method, rule, header=None):
+    """Seconds this request has (the header can only shorten the route's default), or None."""
+    if rule is None or rule.startswith(EXEMPT_PREFIXES):
+        return None
+    default_ms = ROUTE_DEFAULTS_MS.get((method, rule), DEFAULT_MS)
+    default = default_ms / 1000 if default_ms else None
+    requested = parse_deadline(header)
+    if requested is None:
+        return default
+    return requested if default is None else min(requested, default)
+
+
+def init_app(app):
+    """
+    Give every request its deadline (see infrastructure/persistence/deadlines.py). A
+    request that arrives with its deadline already past, or whose repository calls ran
+    out of time, answers 504. Installed after admission: time spent queued counts.
+    """
+    dispatch = app.full_dispatch_request
+
+    def full_dispatch_request():
+        url_rule = request.url_rule
+        seconds = budget(request.method, url_rule.rule if url_rule is not None else None,
+                         request.headers.get(DEADLINE_HEADER))
+        if seconds is None:
+            return dispatch()
+        if seconds <= 0:
+            return app.finalize_request(_timeout("deadline already passed on arrival"), from_error_handler=True)
+        token = deadlines.begin(seconds)
+        try:
+            response = dispatch()
+            if deadlines.current().exceeded and response.status_code >= 500:
+                return app.finalize_request(_timeout("deadline exceeded, the database work was cancelled"),
+                                            from_error_handler=True)
+            return response
+        finally:
+            deadlines.end(token)
+
+    app.full_dispatch_request = full_dispatch_request
+
+
+def _timeout(detail):
+    response = get_error_json(GATEWAY_TIMEOUT, detail, request.path, request.method)
+    response.status_code = 504
+    return response
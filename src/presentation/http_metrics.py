@@ -0,0 +1,48 @@
+import time
+
+from flask import Response, request
+
+from infrastructure import metrics
+
+
+def init_app(app):
+    """
+    Time every request into users_http_request_duration_seconds{method,route,status}
+    (route is the URL rule, e.g. /users/<uuid:uuid>, so the cardinality stays bounded),
+    keep the in-flight gauge and serve GET /metrics.
+
+    full_dispatch_request is wrapped instead of registering before/after/teardown hooks:
+    Flask resolves every hook through ensure_sync() on each request, and three hooks
+    cost more than the metrics themselves.
+    """
+    app.add_url_rule("/metrics", "metrics", metrics_endpoint, methods=["GET"])
+    if not metrics.ENABLED:
+        return
+
+    perf_counter = time.perf_counter
+    duration = metrics.http_request_duration
+    in_flight = metrics.http_requests_in_flight
+    dispatch = app.full_dispatch_request
+
+    def full_dispatch_request():
+        url_rule = request.url_rule
+        route = url_rule.rule if url_rule is not None else "unmatched"
+        status = 500  # if an unhandled exception escapes
+        in_flight.inc(route)
+        start = perf_counter()
+        try:
+            response = dispatch()
+            status = response.status_code
+            return response
+        finally:
+            duration.observe(perf_counter() - start, request.method, route, status)
+            in_flight.dec(route)
+
+    app.full_dispatch_request = full_dispatch_request
+
+
+def metrics_endpoint():
+    """
+    Prometheus metrics of this worker process (the `pid` label tells workers apart).
+    """
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
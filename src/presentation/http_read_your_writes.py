@@ -0,0 +1,33 @@
+from flask import request, session
+
+from infrastructure.persistence import read_your_writes
+
+LSN_HEADER = "X-LSN"
+SESSION_KEY = "lsn"
+
+
+def init_app(app, repository):
+    """
+    Carry the read-your-writes token between a user's requests: after a write the LSN
+    it reached is stored in the session (and returned in X-LSN, for clients without the
+    cookie, which send it back in the same header), and the next requests only read from
+    replicas that replayed it. Only installed when the repository has replicas: without
+    them every read is on the primary.
+    """
+    if getattr(repository, "replicas", None) is None:
+        return
+    app.before_request(_begin)
+    app.after_request(_remember_writes)
+
+
+def _begin():
+    read_your_writes.begin(request.headers.get(LSN_HEADER), session.get(SESSION_KEY))
+
+
+def _remember_writes(response):
+    written = read_your_writes.written()
+    if written:
+        token = read_your_writes.format_lsn(written)
+        session[SESSION_KEY] = token
+        response.headers[LSN_HEADER] = token
+    return response
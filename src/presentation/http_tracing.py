@@ -0,0 +1,60 @@
+from flask import request
+
+from infrastructure import tracing
+
+TRACE_ID_HEADER = "X-Trace-Id"
+
+
+def init_app(app):
+    """
+    Open the root span of every request ("GET /users/<uuid:uuid>"), continuing the
+    incoming `traceparent` header, and return its trace id in X-Trace-Id.
+    """
+    if not tracing.ENABLED:
+        return
+
+    dispatch = app.full_dispatch_request
+
+    def full_dispatch_request():
+        url_rule = request.url_rule
+        route = url_rule.rule if url_rule is not None else "unmatched"
+        with tracing.span(f"{request.method} {route}", traceparent=request.headers.get("traceparent")) as root:
+            response = dispatch()
+            root.set_attribute("status", response.status_code)
+            response.headers[TRACE_ID_HEADER] = root.trace_id
+            return response
+
+    app.full_dispatch_request = full_dispatch_request
+
+
+class TracingMiddleware:
+    """
+    ASGI version of init_app. The route is only known once the router ran, so the
+    span is named after the endpoint ("GET get_specific_users").
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracing.ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        traceparent = headers.get(b"traceparent", b"").decode("latin-1") or None
+        with tracing.span(scope["method"], traceparent=traceparent) as root:
+
+            async def send_with_trace_id(message):
+                if message["type"] == "http.response.start":
+                    root.set_attribute("status", message["status"])
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (TRACE_ID_HEADER.lower().encode("latin-1"), root.trace_id.encode("latin-1"))
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_trace_id)
+            finally:
+                endpoint = scope.get("endpoint")
+                root.name = f"{scope['method']} {getattr(endpoint, '__name__', 'unmatched')}"
@@ -0,0 +1,1024 @@
+"""
+Request handling shared by UserController (Flask) and AsyncUserController (ASGI).
+
+The handlers that call the service are flows (application/flows.py): generators that
+yield every service call and get its result back, so the same validations, bodies and
+status codes run with the sync service or awaiting the async one. Conventions:
+
+- A handler takes plain data: the request, the session (Flask's `session` or the ASGI
+  request's), ids, and what the controller works out before calling it (whether the
+  user exists, the login result, Google's user info). Never a callable or an awaitable:
+  what goes through the controller's own methods (get_specific_users with its session
+  check, login_users) is called by the controller, which passes the outcome in.
+- A flow only yields service calls (`yield self.user_service.x(...)`) or flows.blocking().
+- A handler without service calls (_login_admin, _location_error) is a plain method.
+- They return {"response": dict, "code_status"}; each controller turns the dict into
+  its response (jsonify, or asgi_app's json_response).
+"""
+
+import json
+import os
+
+from werkzeug.security import check_password_hash
+
+from headers import (
+    BAD_REQUEST,
+    DELETE,
+    NOT_USER,
+    PUT_LOCATION,
+    STATUS_UPDATED,
+    USER_ALREADY_EXISTS,
+    WRONG_PASSWORD,
+    ADMIN_AUTH_FAILED,
+    ADMIN_CREATED,
+    ADMIN_LOGIN_SUCCESS,
+    ADMIN_LOGIN_FAILED,
+)
+from application import flows
+from infrastructure import tracing
+from presentation.error_generator import get_error
+from logger_config import get_logger
+
+logger = get_logger("api-users")
+
+
+class UserRequestHelpers:
+    """Serialization and validation shared by the sync (Flask) and async (ASGI) controllers."""
+
+    def _serialize_user(self, user):
+        return {
+            "uuid": user.uuid,
+            "name": user.name,
+            "surname": user.surname,
+            "password": user.password,
+            "email": user.email,
+            "status": user.status,
+            "role": user.role,
+            "location": (
+                None
+                if user.location is None
+                else (
+                    {
+                        "latitude": user.location.latitude,
+                        "longitude": user.location.longitude,
+                    }
+                    if user.location.latitude is not None
+                    and user.location.longitude is not None
+                    else None
+                )
+            ),
+            "notification": user.notification,
+            "id_biometric": user.id_biometric
+        }
+
+    def encode_teachers(self, teachers):
+        """Body of GET /users/teachers as jsonify writes it (teacher directory snapshots)."""
+        payload = {"data": [self._serialize_user(teacher) for teacher in teachers]}
+        return (json.dumps(payload, separators=(",", ":"), sort_keys=True, default=str) + "\n").encode()
+
+    def _check_location(self, latitude, longitude):
+        if latitude is None or longitude is None:
+            return False, "Location is required"
+
+        try:
+            lat = float(latitude)
+            lon = float(longitude)
+
+            if not (-90 <= lat <= 90):
+                raise ValueError(
+                    f"Invalid latitude: {lat}. Must be between -90 and 90."
+                )
+
+            if not (-180 <= lon <= 180):
+                raise ValueError(
+                    f"Invalid longitude: {lon}. Must be between -180 and 180."
+                )
+
+            return True, "Ok."
+
+        except (TypeError, ValueError) as e:
+            msg = f"Invalid location data: {e}"
+            return False, msg
+
+    def _check_create_user_params(self, user_params):
+        missing_params = []
+
+        for param in ["name", "surname", "password", "email", "status", "role"]:
+            if (not param in user_params) or (user_params[param] is None):
+                missing_params.append(param)
+
+        if len(missing_params) > 0:
+            msg = f"Missing params: {', '.join(missing_params)}"
+            return False, msg
+
+        return True, "Ok."
+
+    def _check_bulk_users(self, users):
+        """
+        Validate a bulk import as POST /users validates one user.
+        Returns (results, valid): one result per user ({"index", "email", "status"}, with
+        "error" for the rejected ones) and the (index, user) pairs to insert. Only the
+        first occurrence of an email is imported.
+        """
+        results, valid, seen = [], [], set()
+        for index, user in enumerate(users):
+            email = user.get("email") if isinstance(user, dict) else None
+            result = {"index": index, "email": email, "status": "invalid"}
+            results.append(result)
+            if not isinstance(user, dict):
+                result["error"] = "Each user must be a JSON object"
+                continue
+            if user.get("role") == "admin":
+                result["error"] = "Use /users/admin endpoint to create admins"
+                continue
+            ok, msg = self._check_create_user_params(user)
+            if not ok:
+                result["error"] = msg
+                continue
+            if email in seen:
+                result["status"] = "duplicate"
+                result["error"] = f"The email {email} appears earlier in the request"
+                continue
+            seen.add(email)
+            valid.append((index, user))
+        return results, valid
+
+    def _check_password(self, password_hash, password):
+        with tracing.span("password.check"):
+            return check_password_hash(password_hash, password)
+
+    def _validate_request(self, request, params):
+        for param in params:
+            if param not in request:
+                return False
+        True
+
+
+class UserFlows(UserRequestHelpers):
+    """
+    The handlers as flows. Needs `user_service`; the controller may override how a
+    session is made permanent and how a response it returned is read back (login_admin).
+    """
+
+    def _is_permanent(self, session):
+        return session.get("permanent")
+
+    def _make_permanent(self, session):
+        session["permanent"] = True
+
+    def _json_body(self, response):
+        """Body of a response returned by one of the controller's public methods."""
+        return response
+
+    def _session_error(self, session):
+        """
+        Private function: This function checks if the session is still valid
+        In case it isnt valid, it returns the 401 result, else None
+        """
+        env = os.getenv("FLASK_ENV")
+        if env == "testing":
+            logger.debug("In TEST, without session expiration.")
+            return None
+        else:
+            logger.warning("Check if the session has expired.")
+
+        if "user" not in session or not self._is_permanent(session):
+            logger.warning("Session not valid.")
+            return {
+                "response": get_error("Unauthorized", "Session expired", "/users"),
+                "code_status": 401,
+            }
+        return None
+
+    def _get_users(self):
+        """
+        Get all users.
+        """
+        users = yield self.user_service.get_users()  # list of instance of Users() (domain)
+        users = [self._serialize_user(user) for user in users]
+
+        return {"response": {"data": users}, "code_status": 200}
+
+    def _get_active_teachers(self):
+        teachers = yield self.user_service.get_active_teachers()
+        teachers = [self._serialize_user(teacher) for teacher in teachers]
+
+        return {"response": {"data": teachers}, "code_status": 200}
+
+    def _get_specific_users(self, uuid):
+        """
+        Get specific user.
+        """
+        user = yield self.user_service.get_specific_users(uuid)  # instance of Users() (domain)
+
+        if user:
+            return {"response": {"data": self._serialize_user(user)}, "code_status": 200}
+
+        return {
+            "response": get_error(
+                NOT_USER,
+                f"The user with uuid {uuid} was not found",
+                f"/users/<uuid:uuid>",
+            ),
+            "code_status": 404,
+        }
+
+    def _delete_specific_users(self, uuid, found):
+        """
+        Delete user. `found`: the controller's get_specific_users answered 200 (with the session check).
+        """
+        if found:
+            yield self.user_service.delete(uuid)
+            return {"response": {"result": DELETE}, "code_status": 204}
+
+        return {
+            "response": get_error(
+                NOT_USER,
+                f"The users with uuid {uuid} was not found",
+                f"/users/<uuid:uuid>",
+                "DELETE",
+            ),
+            "code_status": 404,
+        }
+
+    def _create_users(self, request):
+        """
+        Create a users.
+        """
+        url = "/users"
+
+        if request.is_json:
+            user = request.get_json()
+            if not user or "role" not in user:
+                return {
+                    "response": get_error(
+                        "[CONTROLLER] Missing parameter",
+                        "email and password required",
+                        url,
+                        "POST"
+                    ),
+                    "code_status": 400,
+                }
+
+            # Block manual assignment of the 'admin' role
+            if user.get("role") == "admin":
+                return {
+                    "response": get_error(
+                        "Forbidden",
+                        "Use /users/admin endpoint to create admins",
+                        url,
+                        "POST",
+                    ),
+                    "code_status": 403,
+                }
+
+            result, msg = self._check_create_user_params(user)
+            if result == False:
+                return {
+                    "response": get_error(BAD_REQUEST, msg, url, "POST"),
+                    "code_status": 400,
+                }
+
+            # HOTFIX we cannot create a user with the same email
+            users_mail_exists = yield self.user_service.mail_exists(user["email"])
+
+            if users_mail_exists is not None:
+                # Pin enviado hace menos de 10min y no usado:
+                if (yield self.user_service.pin_in_progress(users_mail_exists.uuid)):
+                    yield self.user_service.update_user(user, users_mail_exists.uuid)
+                    return {
+                        "response": get_error(
+                            USER_ALREADY_EXISTS,
+                            f"The email {user['email']} already exists with validate pin in progress",
+                            url,
+                            "POST",
+                        ),
+                        "code_status": 307,
+                    }
+                elif (yield self.user_service.pin_expired(users_mail_exists.uuid)):
+                    user_updated = yield self.user_service.update_user(user, users_mail_exists.uuid)
+                    return {
+                        "response": {"data": self._serialize_user(user_updated)},
+                        "code_status": 201
+                    }
+                else:
+                    return {
+                        "response": get_error(
+                            USER_ALREADY_EXISTS,
+                            f"The email {user['email']} already exists",
+                            url,
+                            "POST",
+                        ),
+                        "code_status": 409,
+                    }
+
+            user = yield self.user_service.create(user)
+            return {"response": {"data": self._serialize_user(user)}, "code_status": 201}
+
+        return {
+            "response": get_error(
+                BAD_REQUEST, f"with body: {request}", url, "POST"
+            ),
+            "code_status": 400,
+        }
+
+    def _location_error(self, request):
+        """(latitude, longitude, None) or (None, None, the 400 result)."""
+        data = request.get_json()
+        latitude = data.get("latitude")
+        longitude = data.get("longitude")
+
+        result, msg = self._check_location(latitude, longitude)
+        if result == False:
+            return None, None, {
+                "response": get_error(
+                    BAD_REQUEST, msg, f"/users/<uuid:user_id>/location", "POST"
+                ),
+                "code_status": 400,
+            }
+        return latitude, longitude, None
+
+    def _set_user_location(self, user_id, latitude, longitude, found):
+        """
+        Add location (already validated by _location_error). `found`: the controller's
+        get_specific_users answered 200 (with the session check).
+        """
+        if found:
+            logger.info("User exists")
+            yield self.user_service.set_location(user_id, latitude, longitude)
+            return {"response": {"result": PUT_LOCATION}, "code_status": 200}
+
+        logger.info("User not exists")
+        return {
+            "response": get_error(
+                NOT_USER,
+                f"uuid {user_id} was not found",
+                f"/users/<uuid:user_id>/location",
+                "POST",
+            ),
+            "code_status": 404,
+        }
+
+    def _login_users(self, request, session):
+        """
+        Login users.
+        """
+        url = "/users/login"
+        if request.is_json:
+            data = request.get_json()
+            if not data or "email" not in data or "password" not in data:
+                return {
+                    "response": get_error("[CONTROLLER] Missing parameter", "email and password required", "/users/authorize"),
+                    "code_status": 400,
+                }
+
+            email = data["email"]  # This contains mail
+            password = data["password"]  # This contains password
+
+            # Check if the email and password are in the request
+            # If this exists, this bring us the id of the user
+            user_exists = yield self.user_service.mail_exists(email)
+
+            if user_exists is None:
+                return {
+                    "response": get_error(
+                        NOT_USER, f"The email {email} was not found", url, "POST"
+                    ),
+                    "code_status": 404,
+                }
+
+            if not (yield self.user_service.user_is_validated(user_exists.uuid)) and user_exists.role != "admin":
+                return {
+                    "response": get_error(
+                        "[CONTROLLER] User not validated", f"User {user_exists.uuid}", url, "POST"
+                    ),
+                    "code_status": 401
+                }
+
+            user_serialized_from_db = self._serialize_user(
+                (yield self.user_service.get_specific_users(user_exists.uuid))
+            )
+
+            # First admin:
+            if (
+                user_serialized_from_db["role"] == "admin"
+                and user_serialized_from_db["password"] == password
+            ):
+                session["user"] = email
+
+                return {
+                    "response": {"data": user_serialized_from_db},
+                    "code_status": 200,
+                }
+
+            # The hash check is CPU bound: in a thread with the async app.
+            if (yield flows.blocking(self._check_password, user_serialized_from_db["password"], password)):
+                # We save the session for this email
+                session["user"] = email
+
+                return {
+                    "response": {"data": user_serialized_from_db},
+                    "code_status": 200,
+                }
+            else:
+                return {
+                    "response": get_error(
+                        WRONG_PASSWORD, "The password is not correct", url, "POST"
+                    ),
+                    "code_status": 403,
+                }
+
+        return {
+            "response": get_error(
+                BAD_REQUEST, f"with body: {request}", url, "POST"
+            ),
+            "code_status": 400,
+        }
+
+    def _create_admin_user(self, request):
+        """
+        Create an admin user.
+        Authenticates the requester as an admin via email/password.
+        """
+        url = "/users/admin"
+        if not request.is_json:
+            return {
+                "response": get_error(
+                    BAD_REQUEST, f"{request} is not json", url, "POST"
+                ),
+                "code_status": 400,
+            }
+
+        data = request.get_json()
+
+        required_fields = [
+            "admin_email",
+            "admin_password",
+            "name",
+            "surname",
+            "email",
+            "password",
+        ]
+        missing_fields = [field for field in required_fields if field not in data]
+        if missing_fields:
+            return {
+                "response": get_error(
+                    f"[CONTROLLER] {BAD_REQUEST}",
+                    f"Missing fields: {', '.join(missing_fields)}",
+                    url,
+                    "POST",
+                ),
+                "code_status": 400,
+            }
+
+        # Autentica al admin existente
+        admin = yield self.user_service.mail_exists(data["admin_email"])
+        if not admin or (admin.password != data["admin_password"]):
+            return {
+                "response": get_error(
+                    ADMIN_AUTH_FAILED,
+                    "not admin or not check password hash",
+                    url,
+                    "POST",
+                ),
+                "code_status": 403,
+            }
+
+        # Verifica que el autenticador sea admin
+        if admin.role != "admin":
+            return {
+                "response": get_error(
+                    ADMIN_AUTH_FAILED, f"role {admin.role} is not admin", url, "POST"
+                ),
+                "code_status": 403,
+            }
+
+        # Crea el nuevo admin
+        new_user_data = {
+            "name": data["name"],
+            "surname": data["surname"],
+            "email": data["email"],
+            "password": data["password"],
+            "status": "active",
+            "role": "admin",
+        }
+
+        valid, msg = self._check_create_user_params(new_user_data)
+        if not valid:
+            return {
+                "response": get_error("Error in params", msg, url, "POST"),
+                "code_status": 400,
+            }
+
+        try:
+            yield self.user_service.create(new_user_data)
+            return {"response": {"message": ADMIN_CREATED}, "code_status": 201}
+        except Exception as e:
+            return {
+                "response": get_error(
+                    "Error in: user service - create", str(e), url, "POST"
+                ),
+                "code_status": 500,
+            }
+
+    def _login_admin(self, login_result, session):
+        """
+        Login específico para administradores. `login_result`: what the controller's
+        login_users returned for the same request.
+        """
+        if login_result["code_status"] != 200:
+            return login_result
+
+        user_data = self._json_body(login_result["response"]).get("data")
+
+        # Verifica si es admin
+        if user_data["role"] == "admin":
+            # Session created, we assign whatever for this session, we dont care
+            session["user"] = user_data
+            self._make_permanent(session)  # this sets the session permanent
+            return {
+                "response": {"message": ADMIN_LOGIN_SUCCESS, "data": user_data},
+                "code_status": 200,
+            }
+        else:
+            return {
+                "response": get_error(
+                    ADMIN_LOGIN_FAILED,
+                    f"role {user_data} is not 'admin'",
+                    "/users/admin/login",
+                    "POST",
+                ),
+                "code_status": 403,
+            }
+
+    def _authorize(self, request, user_info, session):
+        """`user_info`: what the service's authorize() returned (Google user info)."""
+        if user_info:
+            user_info["role"] = request.args.get("state", "student")
+            user_info["status"] = "active"
+            user = yield self.user_service.create_users_if_not_exist(user_info)
+            user = self._serialize_user(user)
+
+            session["user"] = user["email"]
+            return {"response": {"data": user}, "code_status": 200}
+
+        return {
+            "response": get_error(
+                NOT_USER, "User not authorized by Google", "/users/authorize"
+            ),
+            "code_status": 404,
+        }
+
+    def _authorize_with_token(self, request):
+        data = request.get_json()
+        if not data or "token" not in data:
+            return {
+                "response": get_error("[CONTROLLER] Missing parameter", "token required", "/users/authorize"),
+                "code_status": 400,
+            }
+
+        user_info = yield self.user_service.verify_google_token(data.get("token"))
+        if not user_info:
+            return {
+                "response": get_error(
+                    NOT_USER, "Token inválido", "/users/authorize"
+                ),
+                "code_status": 401,
+            }
+
+        data["role"] = data.get("role", "student")
+        data["status"] = data.get("status", "active")
+        user = yield self.user_service.create_users_if_not_exist(data)
+
+        return {"response": {"data": self._serialize_user(user)}, "code_status": 200}
+
+    def _authorize_signup_token(self, request):
+        """
+        request should have: token, role, email_verified, email, given_name, family_name, photo
+        """
+        params = [
+            "token",
+            "email_verified",
+            "email",
+            "given_name",
+            "family_name",
+            "photo",
+            "role",
+        ]
+        data = request.get_json()
+        if self._validate_request(data, params) == False:
+            logger.warning("[CONTROLLER] User not federate: %s", data)
+            return {
+                "response": get_error(
+                    f"[CONTROLLER] {BAD_REQUEST}", "Request should have {params}", "/users/signup/google", params
+                ),
+                "code_status": 401,
+            }
+
+        user_info = yield self.user_service.verify_google_token(data.get("token"))
+        if not user_info:
+            logger.warning("[CONTROLLER] Token invalid: %s", data)
+            return {
+                "response": get_error(
+                    NOT_USER, "Token invalid", "/users/signup/google"
+                ),
+                "code_status": 401,
+            }
+
+        data["role"] = data.get("role", "student")
+        data["status"] = data.get("status", "active")
+
+        result = yield self.user_service.create_users_federate(data)
+        pin_validated = yield self.user_service.user_is_validated(result["user"].uuid)
+        if result["exist"] and pin_validated:
+            logger.warning("[CONTROLLER] User exist and has profile: %s", result)
+            code_status = 204
+        else:
+            logger.warning("[CONTROLLER] User has not exist has not profile: %s", result)
+            code_status = 200
+
+        user = self._serialize_user(result["user"])
+
+        logger.debug("[CONTROLLER] User federate: %s", user)
+
+        return {"response": {"data": user}, "code_status": code_status}
+
+    def _authorize_login_token(self, request):
+        """
+        request should have: token, email_verified, email, given_name, family_name, photo.
+        If the status is "disabled" in db, user is not returned. User locked error is returned.
+        """
+        params = [
+            "token",
+            "email_verified",
+            "email",
+            "given_name",
+            "family_name",
+            "photo",
+        ]
+        data = request.get_json()
+        logger.debug("Data: %s", data)
+
+        if self._validate_request(data, params) == False:
+            return {
+                "response": get_error(
+                    f"[CONTROLLER] {BAD_REQUEST}", "Request should have {params}", "/users/login/google"
+                ),
+                "code_status": 401,
+            }
+
+        user_info = yield self.user_service.verify_google_token(data.get("token"))
+        if user_info:
+            user = yield self.user_service.verify_user_existence(data)
+            if user is not None:
+                if user.status == "active":
+                    return {"response": {"data": self._serialize_user(user)}, "code_status": 200}
+                else:
+                    detail = "User desabled"
+            else:
+                detail = "User not exist"
+        else:
+            detail = "Token invalid"
+
+        return {
+            "response": get_error(NOT_USER, detail, "/users/login/google"),
+            "code_status": 401,
+        }
+
+    def _initiate_password_recovery(self, email):
+        """Controller for password recovery startup"""
+        try:
+            result = yield self.user_service.initiate_password_recovery(email)
+            return {
+                "response": {"message": result["message"]},
+                "code_status": result["code"]
+            }
+        except Exception as e:
+            return {
+                "response": get_error(
+                    "[SERVICE] Password recovery error",
+                    f"An error occurred while processing the request: {str(e)}",
+                    "/users/<string:user_email>/password-recovery",
+                    "POST"
+                ),
+                "code_status": 500,
+            }
+
+    def _validate_recovery_pin(self, email, pin_code):
+        """PIN validation controller"""
+        try:
+            result = yield self.user_service.validate_recovery_pin(email, pin_code)
+            return {
+                "response": (
+                    {"message": result["message"]}
+                    if "message" in result
+                    else {"error": result["error"]}
+                ),
+                "code_status": result["code"],
+            }
+        except Exception as e:
+            return {
+                "response": get_error(
+                    "[SERVICE] Error validating PIN",
+                    str(e),
+                    "/users/<string:user_email>/password-recovery",
+                    "PUT"
+                ),
+                "code_status": 500,
+            }
+
+    def _update_password(self, email, new_password):
+        """Controller for password update"""
+        try:
+            result = yield self.user_service.update_password(email, new_password)
+            return {
+                "response": (
+                    {"message": result["message"]}
+                    if "message" in result
+                    else {"error": result["error"]}
+                ),
+                "code_status": result["code"],
+            }
+        except Exception as e:
+            return {
+                "response": get_error(
+                    "[SERVICE] Error updating password",
+                    str(e),
+                    "/users/<string:user_email>/password",
+                    "PUT"
+                ),
+                "code_status": 500,
+            }
+
+    def _initiate_registration_confirmation(self, email):
+        """Controller for registration confirmation start"""
+        try:
+            result = yield self.user_service.initiate_registration_confirmation(email)
+            return {
+                "response": {"message": result["message"]},
+                "code_status": result["code"]
+            }
+        except Exception as e:
+            return {
+                "response": get_error(
+                    "[SERVICE] Error in registration confirmation",
+                    str(e),
+                    "/users/<string:user_email>/confirm-registration",
+                    "POST"
+                ),
+                "code_status": 500,
+            }
+
+    def _validate_registration_pin(self, email, pin_code):
+        """Controller for registration PIN validation"""
+        try:
+            result = yield self.user_service.validate_registration_pin(email, pin_code)
+            user = self._serialize_user(result["user"])
+            if "message" in result:
+                response = {
+                    "message": result["message"],
+                    "user": user
+                }
+            else:
+                response = {"error": result["error"]}
+            return {
+                "response": response,
+                "code_status": result["code"],
+            }
+        except Exception as e:
+            return {
+                "response": get_error(
+                    "[SERVICE] Error validating registration PIN",
+                    str(e),
+                    "/users/<string:user_email>/confirm-registration",
+                    "PUT"
+                ),
+                "code_status": 500,
+            }
+
+    def _admin_change_user_status(self, request):
+        """
+        Changes the status.
+        If this is not possible, an error is generated.
+        Authenticates the requester as an admin via email/password.
+        """
+        url = "/users/admin/status"
+        method = "PUT"
+        if not request.is_json:
+            return {
+                "response": get_error(
+                    f"[CONTROLLER] {BAD_REQUEST}", f"{request} is not json", url, method
+                ),
+                "code_status": 400,
+            }
+
+        data = request.get_json()
+
+        required_fields = [
+            "admin_email",
+            "admin_password",
+            "uuid"
+        ]
+        missing_fields = [field for field in required_fields if field not in data]
+        if missing_fields:
+            return {
+                "response": get_error(
+                    f"[CONTROLLER] {BAD_REQUEST}",
+                    f"Missing fields: {', '.join(missing_fields)}",
+                    url,
+                    "POST",
+                ),
+                "code_status": 400,
+            }
+
+        # Authentication if the administrator exists
+        admin = yield self.user_service.mail_exists(data["admin_email"])
+        if not admin or (admin.password != data["admin_password"]) or admin.role != "admin":
+            return {
+                "response": get_error(
+                    f"[CONTROLLER] {ADMIN_AUTH_FAILED}",
+                    "not admin or not check password",
+                    url,
+                    method,
+                ),
+                "code_status": 403,
+            }
+
+        uuid = data["uuid"]
+        user = yield self.user_service.get_specific_users(uuid)
+        if not user:
+            return {
+                "response": get_error("[CONTROLLER] uuid not exists", f"{uuid}", url, method),
+                "code_status": 400,
+            }
+
+        if user.status == "active":
+            new_status = "inactive"
+        else:
+            new_status = "active"
+
+        try:
+            yield self.user_service.update_status(uuid, new_status)
+            return {
+                "response": {"message": f"{STATUS_UPDATED}: {uuid} now has status {new_status}"},
+                "code_status": 201
+            }
+        except Exception as e:
+            return {
+                "response": get_error(
+                    "[SERVICE]", str(e), url, method
+                ),
+                "code_status": 500,
+            }
+
+    def _update_notification(self, user_id, request):
+        """
+        Update the 'notification' field of a user.
+        """
+        method = "PUT"
+        url = f"/users/{user_id}/notification"
+        if not request.is_json:
+            return {
+                "response": get_error(
+                    "[CONTROLLER] error", "Request must be JSON", url, method
+                ),
+                "code_status": 400,
+            }
+
+        data = request.get_json()
+        notification = data.get("notification", None)
+
+        if notification is None or not isinstance(notification, bool):
+            return {
+                "response": get_error(
+                    "[CONTROLLER] error", "'notification' must be a boolean", url, method
+                ),
+                "code_status": 400,
+            }
+
+        user = yield self.user_service.get_specific_users(user_id)
+
+        if user is None:
+            return {
+                "response": get_error(
+                    "[CONTROLLER] UserNotFound", f"User with id {user_id} not found", url, method
+                ),
+                "code_status": 404,
+            }
+
+        updated_user = yield self.user_service.update_notification(user_id, notification)
+        return {
+            "response": {"data": {"uuid": updated_user}},
+            "code_status": 200,
+        }
+
+    def _login_biometric(self, request, session):
+        """
+        Biometric login handler
+        """
+        url = "/users/login/biometric"
+        if not request.is_json:
+            return {
+                "response": get_error(
+                    BAD_REQUEST, "Request must be JSON", url, "POST"
+                ),
+                "code_status": 400,
+            }
+
+        data = request.get_json()
+        email = data.get("email", None)
+        id_biometric = data.get("id_biometric", None)
+
+        if not email or not id_biometric:
+            return {
+                "response": get_error(
+                    BAD_REQUEST, "Email and id_biometric are required", url, "POST"
+                ),
+                "code_status": 400,
+            }
+
+        user = yield self.user_service.mail_exists(email)
+        if not user:
+            return {
+                "response": get_error(
+                    NOT_USER, f"The email {email} was not found", url, "POST"
+                ),
+                "code_status": 404,
+            }
+
+        if user.status == "disabled":
+            return {
+                "response": get_error(
+                    "User blocked", "This account has been disabled", url, "POST"
+                ),
+                "code_status": 403,
+            }
+
+        if user.id_biometric != id_biometric:
+            return {
+                "response": get_error(
+                    "Biometric mismatch", "Invalid biometric credentials", url, "POST"
+                ),
+                "code_status": 401,
+            }
+
+        session["user"] = email
+
+        return {
+            "response": {
+                "message": "Biometric login successful",
+                "data": self._serialize_user(user)
+            },
+            "code_status": 200
+        }
+
+    def _update_biometric_id(self, user_id, request):
+        if not request.is_json:
+            return {
+                "response": get_error(
+                    BAD_REQUEST,
+                    "Request must be JSON",
+                    f"/users/{user_id}/biometric",
+                    "PUT"
+                ),
+                "code_status": 400
+            }
+
+        data = request.get_json()
+        if "id_biometric" not in data:
+            return {
+                "response": get_error(
+                    BAD_REQUEST,
+                    "id_biometric is required",
+                    f"/users/{user_id}/biometric",
+                    "PUT"
+                ),
+                "code_status": 400
+            }
+
+        try:
+            success = yield self.user_service.update_biometric_id(user_id, data["id_biometric"])
+            if success:
+                return {
+                    "response": {"message": "Biometric ID updated successfully"},
+                    "code_status": 200
+                }
+            return {
+                "response": get_error(
+                    "Update failed",
+                    "User not found or update failed",
+                    f"/users/{user_id}/biometric",
+                    "PUT"
+                ),
+                "code_status": 404
+            }
+        except Exception as e:
+            return {
+                "response": get_error(
+                    "Server Error",
+                    str(e),
+                    f"/users/{user_id}/biometric",
+                    "PUT"
+                ),
+                "code_status": 500
+            }
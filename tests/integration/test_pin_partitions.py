@@ -0,0 +1,98 @@
+"""
+Partitioned pins against a local PostgreSQL (benchmarks/postgres.py: local initdb/pg_ctl
+binaries or Docker): pruning of the PIN queries, rolling the window and the migration of
+an unpartitioned table.
+"""
+
+import datetime
+import shutil
+
+import psycopg
+import pytest
+
+import maintain_pins
+from benchmarks.postgres import _conninfo, _pg_bin, throwaway_postgres
+from infrastructure.persistence import pin_partitions
+from infrastructure.persistence.users_repository import UsersRepository
+
+pytestmark = pytest.mark.skipif(
+    not ((_pg_bin("initdb") and _pg_bin("pg_ctl")) or shutil.which("docker")),
+    reason="needs PostgreSQL server binaries or Docker",
+)
+
+
+@pytest.fixture
+def conninfo():
+    with throwaway_postgres() as config:
+        yield _conninfo(config)
+
+
+def today():
+    return datetime.datetime.now(datetime.timezone.utc).date()
+
+
+def test_pin_queries_read_only_the_current_partitions(conninfo):
+    with psycopg.connect(conninfo, autocommit=True) as conn:
+        pin_partitions.maintain(conn, ahead=3, retention=5)
+        scanned = maintain_pins.explain(conn)
+
+    current = {pin_partitions.partition_name(today()), pin_partitions.partition_name(today() - datetime.timedelta(days=1))}
+    for query in ("get_active_pin", "validate_and_use_pin", "pin_in_progress"):
+        assert scanned[query] and set(scanned[query]) <= current, query
+    # Expired PINs are in the older partitions: only the future ones are skipped.
+    assert pin_partitions.partition_name(today() + datetime.timedelta(days=1)) not in scanned["pin_expired"]
+    # Used PINs of any day count: has_used_pin reads every partition, but it runs.
+    assert scanned["has_used_pin"]
+
+
+def test_expired_partitions_are_dropped_and_verified_users_kept(conninfo):
+    repository = UsersRepository(conninfo)
+    repository.insert_user({"name": "Ana", "surname": "P", "password": "pw", "email": "ana@example.com",
+                            "status": "active", "role": "student", "notification": True})
+    repository.insert_user({"name": "Bea", "surname": "P", "password": "pw", "email": "bea@example.com",
+                            "status": "active", "role": "student", "notification": True})
+    user = repository.get_user_with_email("ana@example.com")
+    unconfirmed = repository.get_user_with_email("bea@example.com")
+    old = pin_partitions.day_start(today() - datetime.timedelta(days=10))
+    with psycopg.connect(conninfo, autocommit=True) as conn:
+        pin_partitions.maintain(conn, ahead=1, retention=15)
+        conn.execute("INSERT INTO pins (user_id, pin_code, pin_type, created_at, used) VALUES "
+                     "(%s, '1234', 'registration', %s, TRUE), (%s, '4321', 'registration', %s, FALSE)",
+                     (user.uuid, old, unconfirmed.uuid, old))
+
+        summary = pin_partitions.maintain(conn, ahead=1, retention=5)
+
+        assert pin_partitions.partition_name(old.date()) in summary["dropped"]
+        assert summary["verified"] == 1 and summary["expired"] == 1
+        assert conn.execute("SELECT COUNT(*) FROM pins").fetchone()[0] == 0
+    assert repository.has_used_pin(user.uuid) is True
+    assert repository.pin_expired(unconfirmed.uuid) is True
+    assert repository.pin_expired(user.uuid) is False
+
+    repository.create_pin(user.uuid, "5678", "password_recovery")
+    assert repository.validate_and_use_pin("ana@example.com", "5678", "password_recovery") is True
+    repository.close()
+
+
+def test_migrate_partitions_an_existing_table(conninfo):
+    with psycopg.connect(conninfo, autocommit=True) as conn:
+        user_id = conn.execute("SELECT uuid FROM users LIMIT 1").fetchone()[0]
+        conn.execute("DROP TABLE pins, verified_users, expired_registrations")
+        conn.execute(
+            "CREATE TABLE pins (pin_id UUID PRIMARY KEY DEFAULT uuid_generate_v4(), user_id UUID NOT NULL, "
+            "pin_code TEXT NOT NULL, pin_type TEXT NOT NULL CHECK (pin_type IN ('password_recovery', 'registration')), "
+            "created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(), used BOOLEAN DEFAULT FALSE, "
+            "FOREIGN KEY (user_id) REFERENCES users(uuid) ON DELETE CASCADE)"
+        )
+        conn.execute("CREATE INDEX idx_pins_user_id ON pins(user_id)")
+        conn.execute("CREATE INDEX idx_pins_pin_code ON pins(pin_code)")
+        conn.execute("INSERT INTO pins (user_id, pin_code, pin_type, created_at, used) VALUES "
+                     "(%s, '1', 'registration', NOW() - INTERVAL '90 days', TRUE), "
+                     "(%s, '2', 'password_recovery', NOW(), FALSE)", (user_id, user_id))
+
+        assert pin_partitions.migrate(conn, ahead=2, retention=30) is True
+        assert pin_partitions.migrate(conn) is False
+
+        assert conn.execute("SELECT pin_code FROM pins").fetchall() == [("2",)]
+        assert conn.execute("SELECT user_id FROM verified_users").fetchall() == [(user_id,)]
+        assert pin_partitions.partition_name(today()) in pin_partitions.partitions(conn)[0]
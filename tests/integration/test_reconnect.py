@@ -0,0 +1,69 @@
+"""
+Reconnection against a local PostgreSQL (benchmarks/postgres.py with initdb/pg_ctl
+binaries): the server is killed while threads keep reading, and the repository comes back
+on its own once the server is up again, without restarting the process.
+"""
+
+import threading
+import time
+
+import psycopg
+import pytest
+
+from benchmarks.postgres import _conninfo, _pg_bin, local_server_down, throwaway_postgres
+from infrastructure.persistence.users_repository import UsersRepository
+
+pytestmark = pytest.mark.skipif(
+    not (_pg_bin("initdb") and _pg_bin("pg_ctl")),
+    reason="needs PostgreSQL server binaries (the server is killed and restarted)",
+)
+
+
+def test_reads_fail_fast_while_down_and_recover_after_restart():
+    with throwaway_postgres() as config:
+        repository = UsersRepository(_conninfo(config))
+        repository.breaker.base = repository.breaker.cap = 0.05
+        repository.insert_user({"name": "Ana", "surname": "P", "password": "pw", "email": "ana@example.com",
+                                "status": "active", "role": "student", "notification": True})
+        user = repository.get_user_with_email("ana@example.com")
+
+        phase = ["up"]
+        outcomes = []  # (phase, ok, seconds)
+        stop = threading.Event()
+
+        def load():
+            while not stop.is_set():
+                start = time.monotonic()
+                try:
+                    ok = repository.get_user(user.uuid) is not None
+                except (RuntimeError, psycopg.Error):
+                    ok = False
+                outcomes.append((phase[0], ok, time.monotonic() - start))
+                time.sleep(0.005)
+
+        threads = [threading.Thread(target=load) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        try:
+            time.sleep(0.3)
+            with local_server_down(config):
+                phase[0] = "down"
+                time.sleep(1)
+            phase[0] = "restarted"
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline and not any(p == "restarted" and ok for p, ok, _ in outcomes):
+                time.sleep(0.05)
+            time.sleep(0.3)
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            repository.close()
+
+    assert all(ok for p, ok, _ in outcomes if p == "up")
+    down = [(ok, seconds) for p, ok, seconds in outcomes if p == "down"]
+    assert down and not any(ok for ok, _ in down)
+    # The breaker fails the calls at once instead of waiting on connects.
+    assert sorted(seconds for _, seconds in down)[len(down) // 2] < 0.1
+    recovered = [ok for p, ok, _ in outcomes if p == "restarted"][-20:]
+    assert recovered and all(recovered)
@@ -0,0 +1,69 @@
+"""
+USERS_REPOSITORY=sharded against three local PostgreSQL servers (benchmarks/postgres.py:
+local initdb/pg_ctl binaries or Docker). The first one holds the directory and starts as
+the only shard, as a migration from a single database would.
+"""
+
+import collections
+import contextlib
+import shutil
+
+import psycopg
+import pytest
+
+import reshard_users
+from benchmarks.postgres import _conninfo, _pg_bin, throwaway_postgres
+from infrastructure.persistence.sharded_users_repository import ShardedUsersRepository
+from infrastructure.persistence.sharding import ShardDirectory, SlotMap
+from infrastructure.persistence.users_repository import UsersRepository
+
+pytestmark = pytest.mark.skipif(
+    not ((_pg_bin("initdb") and _pg_bin("pg_ctl")) or shutil.which("docker")),
+    reason="needs PostgreSQL server binaries or Docker",
+)
+
+USERS = 300
+
+
+@pytest.fixture(scope="module")
+def servers():
+    with contextlib.ExitStack() as stack:
+        yield [_conninfo(stack.enter_context(throwaway_postgres())) for _ in range(3)]
+
+
+def new_user(i):
+    return {"name": "Ana", "surname": f"N{i}", "password": "pw", "email": f"user{i}@example.com",
+            "status": "active", "role": "teacher" if i % 3 == 0 else "student"}
+
+
+def test_migrate_rebalance_and_serve(servers):
+    legacy = UsersRepository(servers[0])
+    for i in range(USERS):
+        legacy.insert_user(new_user(i))
+    names = ["s0", "s1", "s2"]
+    conns = {name: psycopg.connect(conninfo, autocommit=True) for name, conninfo in zip(names, servers)}
+    with psycopg.connect(servers[0], autocommit=True) as directory:
+        reshard_users.init(directory, conns, first="s0")
+        reshard_users.rebalance(directory, conns, batch=256, wait=0, dry_run=False)
+        owners = reshard_users.owners_of(directory)
+    counts = {name: conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] for name, conn in conns.items()}
+    for conn in conns.values():
+        conn.close()
+
+    assert sorted(collections.Counter(owners.values()).values()) == [341, 341, 342]
+    assert sum(counts.values()) == USERS and min(counts.values()) > USERS / 6
+
+    directory = ShardDirectory(servers[0])
+    repository = ShardedUsersRepository(
+        directory, {name: UsersRepository(conninfo) for name, conninfo in zip(names, servers)}, SlotMap(directory)
+    )
+    assert len(repository.get_all_users()) == USERS
+    assert len(repository.get_active_teachers()) == USERS // 3
+    user = repository.get_user_with_email("user7@example.com")
+    assert repository.get_user(user.uuid).surname == "N7"
+
+    repository.insert_user(new_user(USERS))
+    created = repository.get_user_with_email(f"user{USERS}@example.com")
+    repository.create_pin(created.uuid, "1234", "registration")
+    assert repository.validate_and_use_pin(created.email, "1234", "registration") is True
+    repository.close()
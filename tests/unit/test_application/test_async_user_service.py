@@ -0,0 +1,70 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+pytest.importorskip("psycopg_pool")  # requirements.txt: skipped where it is not installed
+
+from application.async_user_service import AsyncUserService
+
+
+@pytest.fixture
+def user_service():
+    mock_repo = AsyncMock()
+    mock_google = AsyncMock()
+    mock_email = MagicMock()
+    service = AsyncUserService(mock_repo, mock_google, mock_email)
+    return service, mock_repo, mock_google, mock_email
+
+
+def test_create(user_service):
+    service, repo, *_ = user_service
+    repo.get_user_with_email.return_value = {"email": "test@example.com"}
+
+    result = asyncio.run(service.create({"email": "test@example.com"}))
+
+    repo.insert_user.assert_awaited_once_with({"email": "test@example.com"})
+    assert result["email"] == "test@example.com"
+
+
+def test_initiate_password_recovery_sends_email(user_service):
+    service, repo, _, email = user_service
+    repo.get_user_with_email.return_value = MagicMock(uuid="123")
+    repo.get_active_pin.return_value = None
+    email.send_pin_email.return_value = True
+
+    result = asyncio.run(service.initiate_password_recovery("test@example.com"))
+
+    assert result["code"] == 200
+    repo.create_pin.assert_awaited_once()
+    email.send_pin_email.assert_called_once()
+    assert email.send_pin_email.call_args.kwargs["is_registration"] is False
+
+
+def test_initiate_password_recovery_with_active_pin(user_service):
+    service, repo, _, email = user_service
+    repo.get_user_with_email.return_value = MagicMock(uuid="123")
+    repo.get_active_pin.return_value = ("1234", "now")
+
+    result = asyncio.run(service.initiate_password_recovery("test@example.com"))
+
+    assert result["code"] == 429
+    email.send_pin_email.assert_not_called()
+
+
+def test_validate_registration_pin_activates_user(user_service):
+    service, repo, *_ = user_service
+    repo.get_user_with_email.return_value = MagicMock()
+    repo.validate_and_use_pin.return_value = True
+
+    result = asyncio.run(service.validate_registration_pin("test@example.com", "1234"))
+
+    assert result["code"] == 200
+    repo.activate_user.assert_awaited_once_with("test@example.com")
+
+
+def test_update_status_failure_raises(user_service):
+    service, repo, *_ = user_service
+    repo.update_status.return_value = False
+
+    with pytest.raises(ValueError):
+        asyncio.run(service.update_status("123", "inactive"))
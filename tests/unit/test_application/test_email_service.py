@@ -29,7 +29,7 @@ def test_send_pin_email_success(mock_smtp, mock_logger, email_service):
         email_service.smtp_password
     )
     mock_server.send_message.assert_called_once()
-    mock_logger.info.assert_called_once_with("Email sent to test@example.com")
+    mock_logger.info.assert_called_once_with("Email sent to %s", "test@example.com")
     assert result is True
 
 
@@ -44,3 +44,16 @@ def test_send_pin_email_failure(mock_smtp, mock_logger, email_service):
 
     mock_logger.error.assert_called_once()
     assert result is False
+
+
+@patch("application.email_service.smtplib.SMTP")
+def test_send_pin_email_without_starttls(mock_smtp, monkeypatch):
+    monkeypatch.setenv("SMTP_STARTTLS", "false")
+    mock_server = MagicMock()
+    mock_smtp.return_value.__enter__.return_value = mock_server
+
+    result = EmailService().send_pin_email("test@example.com", "123456", is_registration=True)
+
+    mock_server.starttls.assert_not_called()
+    mock_server.send_message.assert_called_once()
+    assert result is True
@@ -0,0 +1,51 @@
+import asyncio
+import threading
+
+from application import flows
+
+
+def flow(load, hash_password):
+    try:
+        user = yield load("ana@example.com")
+    except LookupError:
+        return "missing"
+    hashed = yield flows.blocking(hash_password, user)
+    return hashed
+
+
+def test_run_sends_each_result_back():
+    assert flows.run(flow(lambda email: email.split("@")[0], str.upper)) == "ANA"
+
+
+def test_run_throws_blocking_errors_into_the_flow():
+    def missing(user):
+        raise LookupError(user)
+
+    def failed():
+        try:
+            yield flows.blocking(missing, "ana")
+        except LookupError:
+            return "handled"
+
+    assert flows.run(failed()) == "handled"
+
+
+def test_run_async_awaits_calls_and_runs_blocking_work_in_a_thread():
+    threads = []
+
+    async def load(email):
+        return email.split("@")[0]
+
+    def hash_password(user):
+        threads.append(threading.current_thread())
+        return user.upper()
+
+    assert asyncio.run(flows.run_async(flow(load, hash_password))) == "ANA"
+    assert threads[0] is not threading.main_thread()
+
+
+def test_run_async_throws_errors_into_the_flow():
+    async def load(email):
+        raise LookupError(email)
+
+    assert asyncio.run(flows.run_async(flow(load, str.upper))) == "missing"
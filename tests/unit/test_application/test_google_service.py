@@ -52,8 +52,8 @@ def test_get_user_info(google_service):
     assert user_info["name"] == "Test User"
 
 
-@patch("application.google_service.id_token.verify_oauth2_token")
-@patch("application.google_service.requests.Request")
+@patch("google.oauth2.id_token.verify_oauth2_token")
+@patch("google.auth.transport.requests.Request")
 def test_verify_google_token_valid(mock_request, mock_verify, google_service):
     mock_verify.return_value = {
         "email": "test@gmail.com",
@@ -71,8 +71,8 @@ def test_verify_google_token_valid(mock_request, mock_verify, google_service):
     assert result["google_id"] == "google-id-123"
 
 
-@patch("application.google_service.id_token.verify_oauth2_token")
-@patch("application.google_service.requests.Request")
+@patch("google.oauth2.id_token.verify_oauth2_token")
+@patch("google.auth.transport.requests.Request")
 def test_verify_google_token_invalid_email(mock_request, mock_verify, google_service):
     mock_verify.return_value = {
         "email": "test@gmail.com",
@@ -83,8 +83,32 @@ def test_verify_google_token_invalid_email(mock_request, mock_verify, google_ser
     assert result is None
 
 
-@patch("application.google_service.id_token.verify_oauth2_token", side_effect=ValueError("Invalid Token"))
-@patch("application.google_service.requests.Request")
+@patch("google.oauth2.id_token.verify_oauth2_token", side_effect=ValueError("Invalid Token"))
+@patch("google.auth.transport.requests.Request")
 def test_verify_google_token_raises_exception(mock_request, mock_verify, google_service):
     result = google_service.verify_google_token("broken.token")
     assert result is None
+
+
+def test_oauth_registered_on_first_use_only(mock_oauth):
+    service = GoogleService(mock_oauth)
+    mock_oauth.assert_not_called()
+
+    assert service.google is service.google
+
+    mock_oauth.assert_called_once()
+    mock_oauth.return_value.register.assert_called_once()
+
+
+@patch("google.oauth2.id_token.verify_token")
+@patch("google.auth.transport.requests.Request")
+def test_verify_google_token_with_custom_certs_url(mock_request, mock_verify, google_service):
+    google_service.certs_url = "http://127.0.0.1:8025/certs"
+    mock_verify.return_value = {"email": "test@gmail.com", "email_verified": True, "sub": "1"}
+
+    result = google_service.verify_google_token("token")
+
+    mock_verify.assert_called_once_with(
+        "token", mock_request(), audience="fake-client-id", certs_url="http://127.0.0.1:8025/certs"
+    )
+    assert result["email"] == "test@gmail.com"
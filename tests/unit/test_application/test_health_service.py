@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from application.health_service import AsyncHealthService, HealthService
+
+
+@pytest.fixture
+def repository():
+    repository = MagicMock()
+    repository.missing_schema_columns.return_value = []
+    repository.open_connections = 2
+    return repository
+
+
+def test_liveness_does_not_touch_the_database(repository):
+    body, code = HealthService(repository).liveness()
+
+    assert (body, code) == ({"status": "ok"}, 200)
+    repository.ping.assert_not_called()
+
+
+def test_ready(repository):
+    body, code = HealthService(repository).readiness()
+
+    assert code == 200
+    assert body["status"] == "ok"
+    assert body["checks"]["schema"] == {"status": "ok"}
+    assert body["checks"]["connections"]["open"] == 2
+
+
+def test_database_down_is_unavailable(repository):
+    repository.ping.side_effect = RuntimeError("Database connection error.")
+
+    body, code = HealthService(repository).readiness()
+
+    assert code == 503
+    assert body["checks"]["database"]["status"] == "unavailable"
+    repository.missing_schema_columns.assert_not_called()
+
+
+def test_pending_migration_is_unavailable(repository):
+    repository.missing_schema_columns.return_value = ["users.id_biometric"]
+
+    body, code = HealthService(repository).readiness()
+
+    assert code == 503
+    assert body["checks"]["schema"]["missing_columns"] == ["users.id_biometric"]
+
+
+def test_slow_database_is_degraded_but_ready(repository, monkeypatch):
+    monkeypatch.setenv("READINESS_SLOW_MS", "-1")
+
+    body, code = HealthService(repository).readiness()
+
+    assert code == 200
+    assert body["status"] == "degraded"
+
+
+def test_result_is_cached(repository):
+    service = HealthService(repository)
+
+    service.readiness()
+    service.readiness()
+
+    repository.ping.assert_called_once()
+
+
+def test_schema_is_checked_once(repository, monkeypatch):
+    monkeypatch.setenv("READINESS_CACHE_SECONDS", "0")
+    service = HealthService(repository)
+
+    service.readiness()
+    service.readiness()
+
+    assert repository.ping.call_count == 2
+    repository.missing_schema_columns.assert_called_once()
+
+
+def test_async_saturated_pool_is_degraded():
+    repository = MagicMock()
+    repository.ping = AsyncMock()
+    repository.missing_schema_columns = AsyncMock(return_value=[])
+    repository.pool_stats.return_value = {"pool_size": 4, "pool_available": 0, "requests_waiting": 3}
+
+    body, code = asyncio.run(AsyncHealthService(repository).readiness())
+
+    assert code == 200
+    assert body["status"] == "degraded"
+    assert body["checks"]["pool"]["waiting"] == 3
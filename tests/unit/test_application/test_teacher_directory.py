@@ -0,0 +1,101 @@
+import threading
+import time
+from unittest.mock import MagicMock
+
+from application import teacher_directory as teacher_directory_module
+from application.teacher_directory import TeacherDirectory
+from application.user_service import UserService
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def encode(teachers):
+    return ",".join(teachers).encode()
+
+
+def test_snapshot_is_served_until_too_stale():
+    clock = Clock()
+    directory = TeacherDirectory(lambda: ["ana", "bob"], encode, max_staleness=30, clock=clock)
+    directory._thread = MagicMock()  # no background thread: rebuilt by hand
+
+    assert directory.snapshot() is None
+    directory.rebuild()
+    snapshot = directory.snapshot()
+    assert snapshot.body == b"ana,bob" and snapshot.teachers == 2 and snapshot.etag
+
+    clock.now += 31
+    assert directory.snapshot() is None
+
+
+def test_failed_rebuild_keeps_the_previous_snapshot():
+    load = MagicMock(side_effect=[["ana"], RuntimeError("Database connection error.")])
+    directory = TeacherDirectory(load, encode, clock=Clock())
+    directory._thread = MagicMock()
+
+    directory.rebuild()
+    first = directory.snapshot()
+    directory.rebuild()
+
+    assert directory.snapshot() is first
+
+
+def test_same_teachers_keep_the_same_etag():
+    directory = TeacherDirectory(lambda: ["ana"], encode, clock=Clock())
+    directory._thread = MagicMock()
+
+    directory.rebuild()
+    etag = directory.snapshot().etag
+    directory.rebuild()
+
+    assert directory.snapshot().etag == etag
+
+
+def test_change_rebuilds_in_the_background_while_readers_keep_the_old_snapshot():
+    teachers = [["ana"]]
+    loading = threading.Event()
+    release = threading.Event()
+
+    def load():
+        if len(teachers) > 1:
+            loading.set()
+            release.wait(2)
+        return teachers[-1]
+
+    directory = TeacherDirectory(load, encode, refresh=60)
+    deadline = time.monotonic() + 2
+    while directory.snapshot() is None and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert directory.snapshot().body == b"ana"
+
+    teachers.append(["ana", "bob"])
+    directory.changed()
+    assert loading.wait(2)
+    assert directory.snapshot().body == b"ana"  # the reader does not wait for the rebuild
+
+    release.set()
+    while directory.snapshot().body != b"ana,bob" and time.monotonic() < deadline + 2:
+        time.sleep(0.001)
+    assert directory.snapshot().body == b"ana,bob"
+    directory.close()
+
+
+def test_changes_in_the_service_trigger_a_rebuild():
+    directory = MagicMock()
+    service = UserService(MagicMock(), MagicMock(), MagicMock(), teacher_directory=directory)
+
+    service.update_status("123", "blocked")
+    service.delete("123")
+    service.create({"email": "teacher@example.com"})
+
+    assert directory.changed.call_count == 3
+
+
+def test_disabled_by_env(monkeypatch):
+    monkeypatch.setattr(teacher_directory_module, "ENABLED", False)
+    assert teacher_directory_module.create_teacher_directory(MagicMock(), encode) is None
@@ -1,3 +1,6 @@
+import threading
+import time
+
 import pytest
 from unittest.mock import MagicMock
 
@@ -218,19 +221,73 @@ def test_get_active_teachers_returns_users(user_service):
     assert result == expected_teachers
     repo.get_active_teachers.assert_called_once()
 
+
+def test_concurrent_teacher_reads_share_one_query(user_service):
+    service, repo, *_ = user_service
+    release = threading.Event()
+    repo.get_active_teachers.side_effect = lambda: release.wait(2) and ["teacher"]
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(service.get_active_teachers())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 2
+    while service._teachers_flight.in_flight() == 0 or next(iter(service._teachers_flight._flights.values())).waiters < 3:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+    release.set()
+    for thread in threads:
+        thread.join(2)
+
+    assert results == [["teacher"]] * 4
+    repo.get_active_teachers.assert_called_once()
+
+
+def test_reads_needing_a_newer_lsn_do_not_join_the_flight(user_service):
+    from infrastructure.persistence import read_your_writes
+
+    service, repo, *_ = user_service
+    release = threading.Event()
+    repo.get_user.side_effect = lambda uuid: release.wait(2) and uuid
+    results = []
+
+    def read(token):
+        read_your_writes.begin(token)
+        results.append(service.get_specific_users("u1"))
+
+    leader = threading.Thread(target=read, args=(None,))
+    leader.start()
+    deadline = time.monotonic() + 2
+    while service._user_flight.in_flight() == 0:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+    follower = threading.Thread(target=read, args=("0/10",))  # a token from another worker
+    follower.start()
+    while service._user_flight.in_flight() < 2:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+    release.set()
+    for thread in (leader, follower):
+        thread.join(2)
+
+    assert results == ["u1", "u1"]
+    assert repo.get_user.call_count == 2
+
 def test_validate_recovery_pin_valid(user_service):
     service, repo, *_= user_service
-    repo.get_user_with_email.return_value = {"email": "test@example.com"}
+    repo.get_user_with_email.return_value = MagicMock(uuid="123", email="test@example.com")
     repo.validate_and_use_pin.return_value = True
 
     result = service.validate_recovery_pin("test@example.com", "1234")
 
     assert result["code"] == 200
     assert "PIN validated" in result["message"]
+    repo.validate_and_use_pin.assert_called_once_with(email="test@example.com", pin_code="1234", pin_type="password_recovery")
 
 def test_validate_recovery_pin_invalid_pin(user_service):
     service, repo, *_= user_service
-    repo.get_user_with_email.return_value = {"email": "test@example.com"}
+    repo.get_user_with_email.return_value = MagicMock(uuid="123", email="test@example.com")
     repo.validate_and_use_pin.return_value = False
 
     result = service.validate_recovery_pin("test@example.com", "wrongpin")
@@ -262,3 +319,47 @@ def test_update_biometric_id_failure(user_service):
 #     result = service.login_biometric(None, None)
 #     assert result["user"] is None
 #     assert "required" in result["message"]
+
+
+def test_pins_go_to_the_pin_store_when_given():
+    repo, email, store = MagicMock(), MagicMock(), MagicMock()
+    service = UserService(repo, MagicMock(), email, pin_store=store)
+    repo.get_user_with_email.return_value = MagicMock(uuid="123", email="test@example.com")
+    store.get_active_pin.return_value = None
+    store.validate_and_use_pin.return_value = True
+
+    assert service.initiate_registration_confirmation("test@example.com")["code"] == 200
+    assert service.validate_registration_pin("test@example.com", "1234")["code"] == 200
+
+    store.create_pin.assert_called_once()
+    store.validate_and_use_pin.assert_called_once_with("123", email="test@example.com", pin_code="1234", pin_type="registration")
+    repo.create_pin.assert_not_called()
+    repo.validate_and_use_pin.assert_not_called()
+
+
+def test_an_empty_pin_store_is_used():
+    from infrastructure.persistence.pin_store import TtlPinStore
+
+    pin_store = TtlPinStore(MagicMock())  # no PINs yet: len() == 0
+
+    assert UserService(MagicMock(), MagicMock(), MagicMock(), pin_store=pin_store).pin_store is pin_store
+
+
+def test_bulk_import_needs_the_pins_in_the_repository():
+    from infrastructure.persistence.pin_store import TtlPinStore
+
+    repo = MagicMock()
+
+    assert UserService(repo, MagicMock(), MagicMock()).can_import_bulk()
+    assert not UserService(repo, MagicMock(), MagicMock(), pin_store=TtlPinStore(repo)).can_import_bulk()
+
+
+def test_create_users_does_not_log_the_password(user_service, monkeypatch):
+    service, repo, *_ = user_service
+    repo.get_user_with_email.side_effect = [None, {"email": "test@test.com"}]
+    logged = []
+    monkeypatch.setattr("application.user_service.logger.info", lambda event, *args: logged.append((event, args)))
+
+    service.create_users({"email": "test@test.com", "password": "secret"})
+
+    assert logged and all("secret" not in repr(args) for _, args in logged)
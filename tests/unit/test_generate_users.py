@@ -0,0 +1,50 @@
+import uuid
+
+import generate_users
+
+
+def test_same_seed_same_rows():
+    profile = generate_users.Profile()
+
+    assert generate_users.chunk_rows(profile, 7, 0, 200) == generate_users.chunk_rows(profile, 7, 0, 200)
+    assert generate_users.chunk_rows(profile, 7, 0, 200) != generate_users.chunk_rows(profile, 8, 0, 200)
+
+
+def test_rows_match_the_copy_columns():
+    users, locations, pins = generate_users.chunk_rows(generate_users.Profile(), 1, 100, 50)
+
+    user = users[0].rstrip("\n").split("\t")
+    assert len(user) == 9
+    assert uuid.UUID(user[0]).version == 4
+    assert user[4] == "user100@synthetic.classconnect.com"
+    assert all(len(row.split("\t")) == 3 for row in locations)
+    assert {row.split("\t")[3] for row in pins} <= {"registration", "password_recovery"}
+    assert {row.split("\t")[1] for row in pins} <= {row.split("\t")[0] for row in users}
+
+
+def test_profile_mix_is_respected():
+    profile = generate_users.Profile(
+        roles={"teacher": 1.0}, statuses={"active": 0.5, "disabled": 0.5}, notification=0.0,
+        biometric=0.0, locations=0.0, pins=0,
+    )
+
+    users, locations, pins = generate_users.chunk_rows(profile, 3, 0, 2000)
+
+    columns = [row.rstrip("\n").split("\t") for row in users]
+    assert {column[6] for column in columns} == {"teacher"}
+    assert 800 < sum(column[5] == "active" for column in columns) < 1200
+    assert {column[7] for column in columns} == {"f"}
+    assert {column[8] for column in columns} == {"\\N"}
+    assert locations == []
+    assert len(pins) == len(users)
+
+
+def test_locations_are_clustered():
+    profile = generate_users.Profile(locations=1.0, clusters=[(-34.6, -58.4, 1.0, 5.0)])
+
+    _users, locations, _pins = generate_users.chunk_rows(profile, 3, 0, 500)
+
+    for row in locations:
+        _uuid, latitude, longitude = row.split("\t")
+        assert abs(float(latitude) + 34.6) < 0.5
+        assert abs(float(longitude) + 58.4) < 0.5
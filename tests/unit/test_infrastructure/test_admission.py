@@ -0,0 +1,156 @@
+import threading
+import time
+import uuid
+
+import pytest
+
+from infrastructure import admission as admission_module
+from infrastructure.admission import PRIORITY, Admission, parse_per_class
+from presentation import http_admission
+
+
+def make(max_in_flight=2, limits=None, queues=None, max_wait=0.5):
+    limits = {route_class: max_in_flight for route_class in PRIORITY} | (limits or {})
+    queues = {route_class: 2 for route_class in PRIORITY} | (queues or {})
+    return Admission(max_in_flight, limits, queues, max_wait=max_wait)
+
+
+def queue_in_background(admission, route_class, results):
+    def run():
+        results.append((route_class, admission.acquire(route_class)))
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    deadline = time.monotonic() + 2
+    while len(admission._waiting[route_class]) == 0 and thread.is_alive() and time.monotonic() < deadline:
+        time.sleep(0.001)
+    return thread
+
+
+def test_parse_per_class():
+    assert parse_per_class("auth=8, bulk=0", lambda route_class: 2) == {
+        "auth": 8, "admin": 2, "writes": 2, "reads": 2, "bulk": 0,
+    }
+    with pytest.raises(ValueError):
+        parse_per_class("listings=3", lambda route_class: 2)
+
+
+def test_class_limit_then_queue_then_shed():
+    admission = make(max_in_flight=4, limits={"reads": 1}, queues={"reads": 0}, max_wait=0.01)
+
+    assert admission.acquire("reads") is None
+    assert admission.acquire("reads") == "queue_full"
+    # Other classes are not affected by the reads limit.
+    assert admission.acquire("auth") is None
+    assert admission.in_flight()[("reads",)] == 1
+
+    admission.release("reads")
+    assert admission.acquire("reads") is None
+
+
+def test_waiter_times_out():
+    admission = make(max_in_flight=1, max_wait=0.01)
+    assert admission.acquire("reads") is None
+
+    assert admission.acquire("reads") == "timeout"
+    assert not admission._waiting["reads"]
+
+
+def test_freed_slot_goes_to_auth_before_reads():
+    admission = make(max_in_flight=1, max_wait=2)
+    assert admission.acquire("bulk") is None
+    results = []
+    threads = [queue_in_background(admission, "reads", results), queue_in_background(admission, "auth", results)]
+
+    admission.release("bulk")
+    threads[1].join(2)
+    assert results == [("auth", None)]
+    admission.release("auth")
+    threads[0].join(2)
+    assert results == [("auth", None), ("reads", None)]
+
+
+def test_create_is_disabled_by_env(monkeypatch):
+    monkeypatch.setattr(admission_module, "ENABLED", False)
+    assert admission_module.create(4) is None
+
+
+def test_default_limits_keep_a_slot_for_auth(monkeypatch):
+    for name in ("ADMISSION_MAX_IN_FLIGHT", "ADMISSION_LIMITS", "ADMISSION_QUEUES"):
+        monkeypatch.delenv(name, raising=False)
+
+    admission = Admission.from_env(threads=8)
+
+    assert admission.max_in_flight == 4
+    assert admission.limits == {"auth": 4, "admin": 2, "writes": 3, "reads": 3, "bulk": 1}
+    # Queued requests hold threads: one class alone leaves threads free to shed the rest.
+    assert admission.queues["reads"] == 2
+
+
+def test_every_route_has_a_class(app):
+    classes = {rule.rule: http_admission.classify(next(iter(rule.methods - {"HEAD", "OPTIONS"})), rule.rule)
+               for rule in app.url_map.iter_rules()}
+
+    assert classes["/health/ready"] is None and classes["/metrics"] is None
+    assert classes["/users/teachers"] == "reads"
+    assert classes["/users/bulk"] == "bulk"
+    assert classes["/users/<uuid:user_id>/location"] == "writes"
+    assert classes["/users/<uuid:user_id>/notification"] == "writes"
+    assert classes["/users/<uuid:user_id>/biometric"] == "writes"
+    rules = {(method, rule.rule) for rule in app.url_map.iter_rules() for method in rule.methods}
+    assert http_admission.AUTH | http_admission.ADMIN | http_admission.WRITES | http_admission.BULK <= rules
+
+
+def test_shed_request_gets_503_with_retry_after(app, monkeypatch):
+    from app import user_controller
+
+    full = make(max_in_flight=1, queues={"reads": 0})
+    full.acquire("reads")
+    monkeypatch.setattr(app, "full_dispatch_request", app.full_dispatch_request)
+    http_admission.init_app(app, full)
+    monkeypatch.setattr(user_controller, "get_specific_users", lambda uuid: {"response": {}, "code_status": 200})
+
+    response = app.test_client().get(f"/users/{uuid.uuid4()}")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert response.get_json()["title"] == "Service Unavailable"
+
+
+def test_database_overload_and_outage_get_503_with_retry_after(app, monkeypatch):
+    from app import user_controller
+    from infrastructure.persistence.circuit_breaker import DatabaseUnavailable
+    from infrastructure.persistence.db_limiter import DbOverloaded
+
+    for error in (DbOverloaded("No database slot for get_user"), DatabaseUnavailable("Database connection error.")):
+        def get_specific_users(uuid, error=error):
+            raise error
+
+        monkeypatch.setattr(user_controller, "get_specific_users", get_specific_users)
+
+        response = app.test_client().get(f"/users/{uuid.uuid4()}")
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert response.get_json()["title"] == "Service Unavailable"
+
+
+def test_streamed_response_keeps_its_slot_until_closed(app, monkeypatch):
+    from flask import Response
+
+    from app import user_controller
+
+    admission = make(max_in_flight=4)
+    monkeypatch.setattr(app, "full_dispatch_request", app.full_dispatch_request)
+    http_admission.init_app(app, admission)
+    monkeypatch.setattr(user_controller, "is_session_valid", lambda: None)
+    monkeypatch.setattr(user_controller, "export_users", lambda request: {
+        "response": Response(iter([b"uuid\n"]), mimetype="text/csv"), "code_status": 200,
+    })
+
+    response = app.test_client().get("/users/export")
+    assert response.get_data() == b"uuid\n"
+    assert admission.in_flight()[("bulk",)] == 1
+
+    response.close()
+    assert admission.in_flight()[("bulk",)] == 0
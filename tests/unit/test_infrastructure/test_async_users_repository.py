@@ -0,0 +1,105 @@
+import asyncio
+import uuid
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+pytest.importorskip("psycopg_pool")  # requirements.txt: skipped where it is not installed
+
+from domain.user import User
+from infrastructure.persistence import users_queries
+from infrastructure.persistence.async_users_repository import AsyncUsersRepository
+
+
+@pytest.fixture
+def repository():
+    with patch("infrastructure.persistence.async_base_entity.AsyncConnectionPool"):
+        repository = AsyncUsersRepository()
+        repository.fetchone = AsyncMock()
+        repository.fetchall = AsyncMock()
+        repository.execute = AsyncMock()
+        yield repository
+
+
+def _row(user_uuid, **extra):
+    return ({
+        "uuid": str(user_uuid),
+        "name": "Juan",
+        "surname": "Perez",
+        "password": "hashed",
+        "email": "juan.perez@gmail.com",
+        "status": "active",
+        "role": "teacher",
+        "location": {"latitude": 45.04, "longitude": -75.00},
+        **extra,
+    },)
+
+
+def test_pool_is_not_opened_on_construction():
+    with patch("infrastructure.persistence.async_base_entity.AsyncConnectionPool") as mock_pool:
+        AsyncUsersRepository()
+
+    assert mock_pool.call_args.kwargs["open"] is False
+
+
+def test_get_all_users_returns_domain_users(repository):
+    user_uuid = uuid.uuid4()
+    repository.fetchall.return_value = [_row(user_uuid)]
+
+    users = asyncio.run(repository.get_all_users())
+
+    repository.fetchall.assert_awaited_once_with(users_queries.GET_ALL_USERS)
+    assert isinstance(users[0], User)
+    assert users[0].uuid == str(user_uuid)
+    assert users[0].location.latitude == 45.04
+
+
+def test_get_user_not_found(repository):
+    repository.fetchone.return_value = None
+
+    assert asyncio.run(repository.get_user(uuid.uuid4())) is None
+
+
+def test_insert_user_hashes_password(repository):
+    with patch("infrastructure.persistence.users_repository.generate_password_hash", return_value="hashed"):
+        asyncio.run(repository.insert_user({
+            "name": "Juan", "surname": "Perez", "password": "1234",
+            "email": "juan@gmail.com", "status": "active", "role": "student",
+        }))
+
+    repository.execute.assert_awaited_once_with(
+        users_queries.INSERT_USER,
+        ("Juan", "Perez", "hashed", "juan@gmail.com", "active", "student", True),
+    )
+
+
+def test_validate_and_use_pin(repository):
+    repository.fetchone.return_value = ("pin-id",)
+
+    assert asyncio.run(repository.validate_and_use_pin("a@b.com", "1234", "registration")) is True
+
+
+def test_update_notification_returns_uuid(repository):
+    user_uuid = uuid.uuid4()
+    repository.fetchone.return_value = (user_uuid,)
+
+    assert asyncio.run(repository.update_notification(user_uuid, False)) == user_uuid
+
+
+def test_fetchone_borrows_a_pool_connection():
+    with patch("infrastructure.persistence.async_base_entity.AsyncConnectionPool"):
+        repository = AsyncUsersRepository()
+
+    cursor = MagicMock()
+    cursor.fetchone = AsyncMock(return_value=("row",))
+    conn = MagicMock()
+    conn.execute = AsyncMock(return_value=cursor)
+    connection_cm = MagicMock()
+    connection_cm.__aenter__ = AsyncMock(return_value=conn)
+    connection_cm.__aexit__ = AsyncMock(return_value=False)
+    repository.pool.connection.return_value = connection_cm
+
+    row = asyncio.run(repository.fetchone("SELECT 1", ("x",)))
+
+    assert row == ("row",)
+    conn.execute.assert_awaited_once_with("SELECT 1", ("x",))
+    connection_cm.__aexit__.assert_awaited_once()
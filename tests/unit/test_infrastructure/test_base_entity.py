@@ -1,14 +1,17 @@
+import threading
+import time
 import pytest
 from unittest.mock import patch, MagicMock
 import psycopg
 
-from infrastructure.persistence.base_entity import BaseEntity
+from infrastructure.persistence.base_entity import BaseEntity, reads, writes
+from infrastructure.persistence.circuit_breaker import CONNECT_TIMEOUT, CircuitBreaker, DatabaseUnavailable
 
 
 @patch("infrastructure.persistence.base_entity.psycopg.connect")
 @patch("infrastructure.persistence.base_entity.DatabaseConfig")
 def test_init_success(mock_config_class, mock_connect):
-    mock_conn = MagicMock()
+    mock_conn = MagicMock(closed=False)
     mock_cursor = MagicMock()
     mock_connect.return_value = mock_conn
     mock_conn.cursor.return_value = mock_cursor
@@ -18,27 +21,30 @@ def test_init_success(mock_config_class, mock_connect):
     mock_config_class.return_value = mock_config
 
     entity = BaseEntity()
+    mock_connect.assert_not_called()  # lazy: no connection at construction
 
-    mock_connect.assert_called_once_with("fake-db-url")
     assert entity.conn == mock_conn
     assert entity.cursor == mock_cursor
+    mock_connect.assert_called_once_with("fake-db-url", connect_timeout=CONNECT_TIMEOUT)
 
 
 @patch("infrastructure.persistence.base_entity.psycopg.connect", side_effect=psycopg.OperationalError("Connection failed"))
 @patch("infrastructure.persistence.base_entity.DatabaseConfig")
-def test_connect_with_retries_failure(mock_config_class, mock_connect):
+def test_connect_failure_is_a_single_attempt(mock_config_class, mock_connect):
     mock_config = MagicMock()
     mock_config.connection_strings = "fake-db-url"
     mock_config_class.return_value = mock_config
 
+    entity = BaseEntity()
     with pytest.raises(RuntimeError, match="Database connection error."):
-        BaseEntity()
+        entity.warm_up()
+    assert mock_connect.call_count == 1
 
 
 @patch("infrastructure.persistence.base_entity.psycopg.connect")
 @patch("infrastructure.persistence.base_entity.DatabaseConfig")
 def test_commit_calls_cursor_commit(mock_config_class, mock_connect):
-    mock_conn = MagicMock()
+    mock_conn = MagicMock(closed=False)
     mock_cursor = MagicMock()
     mock_connect.return_value = mock_conn
     mock_conn.cursor.return_value = mock_cursor
@@ -56,7 +62,7 @@ def test_commit_calls_cursor_commit(mock_config_class, mock_connect):
 @patch("infrastructure.persistence.base_entity.psycopg.connect")
 @patch("infrastructure.persistence.base_entity.DatabaseConfig")
 def test_del_closes_resources(mock_config_class, mock_connect):
-    mock_conn = MagicMock()
+    mock_conn = MagicMock(closed=False)
     mock_cursor = MagicMock()
     mock_connect.return_value = mock_conn
     mock_conn.cursor.return_value = mock_cursor
@@ -66,7 +72,162 @@ def test_del_closes_resources(mock_config_class, mock_connect):
     mock_config_class.return_value = mock_config
 
     entity = BaseEntity()
+    entity.warm_up()
     del entity  # trigger __del__
 
     mock_cursor.close.assert_called_once()
     mock_conn.close.assert_called_once()
+
+
+@patch("infrastructure.persistence.base_entity.psycopg.connect")
+@patch("infrastructure.persistence.base_entity.DatabaseConfig")
+def test_each_thread_gets_its_own_connection(mock_config_class, mock_connect):
+    mock_connect.side_effect = lambda *_, **__: MagicMock(closed=False)
+
+    entity = BaseEntity()
+    main_conn = entity.conn
+
+    other = {}
+    thread = threading.Thread(target=lambda: other.update(conn=entity.conn, cursor=entity.cursor))
+    thread.start()
+    thread.join()
+
+    assert other["conn"] is not main_conn
+    assert other["cursor"] is other["conn"].cursor.return_value
+    assert entity.conn is main_conn
+    assert entity.open_connections == 2
+
+
+@patch("infrastructure.persistence.base_entity.psycopg.connect")
+@patch("infrastructure.persistence.base_entity.DatabaseConfig")
+def test_close_closes_all_connections(mock_config_class, mock_connect):
+    mock_conn = MagicMock(closed=False)
+    mock_connect.return_value = mock_conn
+
+    entity = BaseEntity()
+    entity.warm_up()
+    entity.close()
+
+    mock_conn.close.assert_called_once()
+    assert entity.open_connections == 0
+
+
+@patch("infrastructure.persistence.base_entity.psycopg.connect")
+@patch("infrastructure.persistence.base_entity.DatabaseConfig")
+def test_reset_after_fork_reconnects_without_closing_inherited(mock_config_class, mock_connect):
+    inherited, fresh = MagicMock(closed=False), MagicMock(closed=False)
+    mock_connect.side_effect = [inherited, fresh]
+
+    entity = BaseEntity()
+    entity.warm_up()
+    entity.reset_after_fork()
+
+    assert entity.conn is fresh
+    inherited.close.assert_not_called()
+
+
+@patch("infrastructure.persistence.base_entity.psycopg.connect", side_effect=psycopg.OperationalError("down"))
+@patch("infrastructure.persistence.base_entity.DatabaseConfig")
+def test_ping_makes_a_single_connection_attempt(mock_config_class, mock_connect):
+    entity = BaseEntity()
+
+    with pytest.raises(RuntimeError):
+        entity.ping()
+
+    mock_connect.assert_called_once()
+
+
+@patch("infrastructure.persistence.base_entity.psycopg.connect")
+@patch("infrastructure.persistence.base_entity.DatabaseConfig")
+def test_closed_connection_is_replaced_on_next_use(mock_config_class, mock_connect):
+    lost, fresh = MagicMock(closed=False), MagicMock(closed=False)
+    mock_connect.side_effect = [lost, fresh]
+    entity = BaseEntity()
+    entity.warm_up()
+
+    lost.closed = True
+
+    assert entity.conn is fresh
+    assert entity.open_connections == 1
+
+
+@patch("infrastructure.persistence.base_entity.psycopg.connect", side_effect=psycopg.OperationalError("down"))
+@patch("infrastructure.persistence.base_entity.DatabaseConfig")
+def test_open_breaker_fails_fast_without_connecting(mock_config_class, mock_connect):
+    entity = BaseEntity()
+    entity.breaker.close()
+    entity.breaker = CircuitBreaker("primary", MagicMock(side_effect=psycopg.OperationalError("down")), failures=2,
+                                    base=60, cap=60)
+
+    for _ in range(2):
+        with pytest.raises(DatabaseUnavailable):
+            entity.warm_up()
+    assert entity.breaker.is_open
+    with pytest.raises(DatabaseUnavailable, match="unavailable"):
+        entity.warm_up()
+
+    assert mock_connect.call_count == 2
+    entity.close()
+    assert not entity.breaker.is_open
+
+
+def test_breaker_closes_when_the_background_probe_gets_through():
+    attempts = []
+
+    def probe():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise psycopg.OperationalError("still down")
+
+    breaker = CircuitBreaker("primary", probe, failures=1, base=0.001, cap=0.001)
+    breaker.failure(psycopg.OperationalError("down"))
+    assert breaker.is_open
+
+    deadline = time.monotonic() + 2
+    while breaker.is_open and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert not breaker.is_open
+    assert len(attempts) == 2
+
+
+class Entity(BaseEntity):
+    @reads
+    def read(self):
+        self.cursor.execute("SELECT 1")
+        return self.cursor.fetchone()
+
+    @writes
+    def write(self):
+        self.cursor.execute("UPDATE users SET status = 'active'")
+
+
+def lost_connection():
+    conn = MagicMock(closed=False)
+
+    def drop(*args):
+        conn.closed = True
+        raise psycopg.OperationalError("server closed the connection unexpectedly")
+
+    conn.cursor.return_value.execute.side_effect = drop
+    return conn
+
+
+@patch("infrastructure.persistence.base_entity.psycopg.connect")
+@patch("infrastructure.persistence.base_entity.DatabaseConfig")
+def test_read_is_retried_on_a_new_connection(mock_config_class, mock_connect):
+    fresh = MagicMock(closed=False)
+    fresh.cursor.return_value.fetchone.return_value = (1,)
+    mock_connect.side_effect = [lost_connection(), fresh]
+
+    assert Entity().read() == (1,)
+
+
+@patch("infrastructure.persistence.base_entity.psycopg.connect")
+@patch("infrastructure.persistence.base_entity.DatabaseConfig")
+def test_write_is_not_retried(mock_config_class, mock_connect):
+    mock_connect.side_effect = [lost_connection(), MagicMock(closed=False)]
+    entity = Entity()
+
+    with pytest.raises(psycopg.OperationalError):
+        entity.write()
+    assert mock_connect.call_count == 1
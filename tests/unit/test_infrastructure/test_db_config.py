@@ -22,3 +22,22 @@ def test_database_config_connection_string():
         )
 
         assert conn_str == expected
+
+
+def test_database_config_replica_connection_strings():
+    fake_env = {
+        "DB_NAME": "test_db",
+        "DB_USER": "test_user",
+        "DB_HOST": "primary",
+        "DB_PASSWORD": "test_pass",
+        "DB_PORT": "5432",
+        "DB_REPLICA_HOSTS": "replica-a, replica-b:6432",
+    }
+
+    with patch.dict(os.environ, fake_env):
+        replicas = DatabaseConfig().replica_connection_strings
+
+    assert replicas == [
+        "dbname=test_db user=test_user host=replica-a password=test_pass port=5432",
+        "dbname=test_db user=test_user host=replica-b password=test_pass port=6432",
+    ]
@@ -0,0 +1,147 @@
+import threading
+
+import psycopg
+import pytest
+
+from infrastructure.persistence import db_limiter, deadlines
+from infrastructure.persistence.db_limiter import AimdLimiter, DbOverloaded, limited_methods
+from infrastructure.persistence.deadlines import DeadlineExceeded
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def make(initial=4, clock=None, max_wait=0.01):
+    return AimdLimiter(initial=initial, min_limit=1, max_limit=8, max_wait=max_wait, tolerance=2.0, slack=0.0,
+                       backoff=0.5, clock=clock or Clock())
+
+
+def call(limiter, latency, name="get_user", failed=False):
+    started = limiter.acquire(name)
+    limiter.clock.now += latency
+    limiter.release(name, started, failed)
+
+
+def test_limit_grows_while_in_use_and_fast():
+    limiter = make(initial=2)
+    for _ in range(2):
+        limiter.acquire("get_user")
+    limiter.clock.now += 0.01
+    limiter.release("get_user", 100.0)
+    limiter.release("get_user", 100.0)
+
+    # The second release ran with one call in flight: under half the limit.
+    assert limiter._limit == pytest.approx(2.5)
+    assert limiter.limit == 2
+
+
+def test_idle_limiter_does_not_grow():
+    limiter = make(initial=4)
+    for _ in range(10):
+        call(limiter, 0.01)
+
+    assert limiter.limit == 4
+
+
+def test_slow_calls_cut_the_limit_once_per_round_trip():
+    limiter = make(initial=8)
+    call(limiter, 0.01)
+
+    slow = [limiter.acquire("get_user") for _ in range(3)]
+    limiter.clock.now += 0.5
+    for started in slow:
+        limiter.release("get_user", started)
+    assert limiter.limit == 4
+
+    call(limiter, 0.5)
+    assert limiter.limit == 2
+
+
+def test_latency_is_compared_per_method():
+    limiter = make(initial=4)
+    call(limiter, 0.01, "get_user")
+    call(limiter, 0.3, "get_all_users")
+
+    assert limiter.limit == 4
+
+
+def test_database_errors_cut_the_limit():
+    limiter = make(initial=4)
+    call(limiter, 0.001, failed=True)
+
+    assert limiter.limit == 2
+
+
+def test_no_slot_within_max_wait_raises():
+    limiter = AimdLimiter(initial=1, max_wait=0.01)
+    limiter.acquire("get_user")
+
+    with pytest.raises(DbOverloaded):
+        limiter.acquire("get_user")
+    assert limiter.in_flight == 1
+
+
+def test_wait_for_a_slot_ends_at_the_request_deadline():
+    limiter = AimdLimiter(initial=1, max_wait=2)
+    limiter.acquire("get_user")
+
+    token = deadlines.begin(0.02)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            limiter.acquire("get_user")
+        assert deadlines.current().exceeded
+    finally:
+        deadlines.end(token)
+    assert limiter.in_flight == 1
+
+
+def test_released_slot_wakes_a_waiter():
+    limiter = AimdLimiter(initial=1, max_wait=2)
+    started = limiter.acquire("get_user")
+    admitted = threading.Event()
+    waiter = threading.Thread(target=lambda: (limiter.acquire("get_user"), admitted.set()))
+    waiter.start()
+
+    limiter.release("get_user", started)
+    waiter.join(2)
+    assert admitted.is_set()
+
+
+def test_limited_methods_share_the_slot_of_the_outer_call():
+    limiter = AimdLimiter(initial=1, max_wait=0.01)
+
+    @limited_methods(limiter)
+    class Repository:
+        def update_user(self):
+            return self.get_user()
+
+        def get_user(self):
+            return limiter.in_flight
+
+        def fail(self):
+            raise psycopg.OperationalError("server closed the connection")
+
+    assert Repository().update_user() == 1
+    assert limiter.in_flight == 0
+    with pytest.raises(psycopg.OperationalError):
+        Repository().fail()
+    assert limiter.in_flight == 0
+
+
+def test_disabled_limiter_leaves_the_class_alone():
+    class Repository:
+        def get_user(self):
+            return None
+
+    method = Repository.get_user
+    assert limited_methods(None)(Repository).get_user is method
+
+
+def test_create_is_disabled_by_env(monkeypatch):
+    monkeypatch.setattr(db_limiter, "ENABLED", False)
+    assert db_limiter.create() is None
@@ -0,0 +1,169 @@
+import threading
+import time
+import uuid
+from unittest.mock import MagicMock
+
+import psycopg
+import pytest
+
+from infrastructure.persistence import deadlines
+from infrastructure.persistence.deadlines import DeadlineExceeded, deadline_methods
+from presentation import http_deadlines
+
+
+@deadline_methods
+class Repository:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def slow_query(self):
+        conn = deadlines.track(self.conn)
+        cancelled = threading.Event()
+        conn.cancel_safe.side_effect = lambda timeout: cancelled.set()
+        if not cancelled.wait(2):
+            return "finished"
+        raise psycopg.errors.QueryCanceled("canceling statement due to user request")
+
+    def fast_query(self):
+        deadlines.starting(self.conn)
+        return "rows"
+
+    def write_then_commit(self, pause):
+        deadlines.starting(self.conn).execute("UPDATE users SET status = 'blocked'")
+        time.sleep(pause)  # the deadline passes between the statement and the commit
+        deadlines.track(self.conn).commit()
+        return "written"
+
+    def write_then_fail(self):
+        deadlines.starting(self.conn).execute("UPDATE users SET status = 'blocked'")
+        raise ValueError("unexpected row")
+
+
+@pytest.fixture
+def deadline():
+    def begin(seconds):
+        tokens.append(deadlines.begin(seconds))
+        return deadlines.current()
+
+    tokens = []
+    yield begin
+    for token in reversed(tokens):
+        deadlines.end(token)
+
+
+def test_statement_past_the_deadline_is_cancelled(deadline):
+    conn = MagicMock()
+    request_deadline = deadline(0.05)
+
+    with pytest.raises(DeadlineExceeded):
+        Repository(conn).slow_query()
+
+    conn.cancel_safe.assert_called_once()
+    conn.rollback.assert_called_once()
+    assert request_deadline.exceeded
+    assert deadlines.cancelled_statements.values()[("slow_query",)] >= 1
+
+
+def test_call_after_the_deadline_does_not_reach_the_database(deadline):
+    conn = MagicMock()
+    request_deadline = deadline(-1)
+
+    with pytest.raises(DeadlineExceeded):
+        Repository(conn).fast_query()
+
+    assert request_deadline.exceeded
+    conn.assert_not_called()
+
+
+def test_finished_calls_are_never_cancelled(deadline):
+    conn = MagicMock()
+    deadline(0.02)
+
+    assert Repository(conn).fast_query() == "rows"
+    time.sleep(0.05)
+
+    conn.cancel_safe.assert_not_called()
+
+
+def test_slow_cancel_does_not_hold_up_other_calls(deadline):
+    stuck = MagicMock()
+    cancelling = threading.Event()
+    release = threading.Event()
+
+    def slow_cancel(timeout):
+        cancelling.set()
+        release.wait(2)
+
+    stuck.cancel_safe.side_effect = slow_cancel
+    call = deadlines.watchdog.watch(deadline(0.01))
+    call.conn = stuck
+    try:
+        assert cancelling.wait(2)
+        started = time.monotonic()
+        deadline(5)
+        assert Repository(MagicMock()).fast_query() == "rows"
+        assert time.monotonic() - started < 0.5
+    finally:
+        release.set()
+        deadlines.watchdog.unwatch(call)  # returns once its cancel is done
+    assert call.cancelled and call.cancelling.is_set()
+
+
+def test_deadline_passing_before_the_commit_still_commits(deadline):
+    conn = MagicMock()
+    deadline(0.02)
+
+    assert Repository(conn).write_then_commit(0.05) == "written"
+
+    conn.commit.assert_called_once()
+
+
+def test_failed_call_rolls_back_its_transaction(deadline):
+    conn = MagicMock()
+    deadline(5)
+
+    with pytest.raises(ValueError):
+        Repository(conn).write_then_fail()
+
+    conn.rollback.assert_called_once()
+
+
+def test_without_a_deadline_calls_run_untouched():
+    conn = MagicMock()
+    assert deadlines.current() is None
+
+    assert Repository(conn).fast_query() == "rows"
+
+
+def test_budget_uses_the_shorter_of_header_and_route_default():
+    now = time.time()
+
+    assert http_deadlines.budget("GET", "/users") == 5
+    assert http_deadlines.budget("GET", "/users", str((now + 1) * 1000)) == pytest.approx(1, abs=0.1)
+    assert http_deadlines.budget("GET", "/users", str((now + 60) * 1000)) == 5
+    assert http_deadlines.budget("GET", "/users", "soon") == 5
+    assert http_deadlines.budget("GET", "/users/export") is None
+    assert http_deadlines.budget("GET", "/health/ready", str(now * 1000)) is None
+
+
+def test_request_past_its_deadline_gets_504(app):
+    past = str((time.time() - 1) * 1000)
+
+    response = app.test_client().get(f"/users/{uuid.uuid4()}", headers={"X-Request-Deadline": past})
+
+    assert response.status_code == 504
+    assert response.get_json()["title"] == "Gateway Timeout"
+
+
+def test_cancelled_database_work_turns_the_error_into_504(app, monkeypatch):
+    from app import user_controller
+
+    def get_specific_users(uuid):
+        deadlines.current().exceeded = True  # as a repository call that ran out of time
+        return {"response": {"title": "Internal Server Error"}, "code_status": 500}
+
+    monkeypatch.setattr(user_controller, "get_specific_users", get_specific_users)
+
+    response = app.test_client().get(f"/users/{uuid.uuid4()}")
+
+    assert response.status_code == 504
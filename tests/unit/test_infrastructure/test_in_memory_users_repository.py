@@ -0,0 +1,263 @@
+import datetime
+import gzip
+import json
+import uuid
+from unittest.mock import patch
+
+import psycopg
+import pytest
+
+from app_factory import AppFactory
+from domain.user import User
+from infrastructure.persistence.in_memory_users_repository import InMemoryUsersRepository, PIN_TTL
+
+
+class Clock:
+    def __init__(self):
+        self.now = datetime.datetime(2025, 6, 1, tzinfo=datetime.timezone.utc)
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def repository(clock):
+    with patch("infrastructure.persistence.users_repository.generate_password_hash", side_effect=lambda p: f"hashed-{p}"):
+        yield InMemoryUsersRepository(clock=clock)
+
+
+def new_user(email="juan@example.com", role="student", status="active"):
+    return {"name": "Juan", "surname": "Pérez", "password": "secret", "email": email, "status": status, "role": role}
+
+
+def test_insert_and_get_user(repository):
+    repository.insert_user(new_user())
+
+    user = repository.get_user_with_email("juan@example.com")
+
+    assert isinstance(user, User)
+    assert user.password == "hashed-secret"
+    assert repository.get_user(user.uuid).email == "juan@example.com"
+    assert repository.get_user(uuid.UUID(user.uuid)).email == "juan@example.com"
+    assert repository.check_email("juan@example.com") == uuid.UUID(user.uuid)
+    assert repository.get_user(uuid.uuid4()) is None
+    assert repository.get_user_with_email("nobody@example.com") is None
+    assert repository.check_email("nobody@example.com") is None
+
+
+def test_location_upsert_and_foreign_key(repository):
+    repository.insert_user(new_user())
+    user = repository.get_user_with_email("juan@example.com")
+
+    repository.set_location({"uuid": user.uuid, "latitude": 1.0, "longitude": 2.0})
+    repository.set_location({"uuid": user.uuid, "latitude": -34.6, "longitude": -58.4})
+
+    location = repository.get_user(user.uuid).location
+    assert (location.latitude, location.longitude) == (-34.6, -58.4)
+    with pytest.raises(psycopg.errors.ForeignKeyViolation):
+        repository.set_location({"uuid": uuid.uuid4(), "latitude": 0, "longitude": 0})
+
+
+def test_active_teachers_and_updates(repository):
+    repository.insert_user(new_user("t1@example.com", role="teacher"))
+    repository.insert_user(new_user("t2@example.com", role="teacher"))
+    repository.insert_user(new_user("s1@example.com"))
+    t2 = repository.get_user_with_email("t2@example.com")
+
+    assert repository.update_status(t2.uuid, "disabled") is True
+    assert [user.email for user in repository.get_active_teachers()] == ["t1@example.com"]
+    assert repository.update_notification(t2.uuid, False) == uuid.UUID(t2.uuid)
+    assert repository.update_notification(uuid.uuid4(), False) is None
+    assert repository.update_biometric_id(t2.uuid, "bio-1") is True
+    assert repository.get_user(t2.uuid).id_biometric == "bio-1"
+
+
+def test_delete_cascades(repository):
+    repository.insert_user(new_user())
+    user = repository.get_user_with_email("juan@example.com")
+    repository.set_location({"uuid": user.uuid, "latitude": 1.0, "longitude": 2.0})
+    repository.create_pin(user.uuid, "1234", "registration")
+
+    repository.delete_users(user.uuid)
+
+    assert repository.get_all_users() == []
+    assert repository.get_user_with_email("juan@example.com") is None
+    assert repository.has_used_pin(user.uuid) is False
+    with pytest.raises(psycopg.errors.ForeignKeyViolation):
+        repository.create_pin(user.uuid, "1234", "registration")
+
+
+def test_pins_expire_after_ttl(repository, clock):
+    repository.insert_user(new_user())
+    user = repository.get_user_with_email("juan@example.com")
+    repository.create_pin(user.uuid, "1234", "registration")
+
+    assert repository.get_active_pin(user.uuid, "registration") == ("1234", clock.now)
+    assert repository.pin_in_progress(user.uuid) is True
+    assert repository.pin_expired(user.uuid) is False
+
+    clock.now += PIN_TTL + datetime.timedelta(seconds=1)
+
+    assert repository.get_active_pin(user.uuid, "registration") is None
+    assert repository.pin_in_progress(user.uuid) is False
+    assert repository.pin_expired(user.uuid) is True
+    assert repository.validate_and_use_pin("juan@example.com", "1234", "registration") is False
+
+
+def test_validate_and_use_pin_once(repository):
+    repository.insert_user(new_user())
+    user = repository.get_user_with_email("juan@example.com")
+    repository.create_pin(user.uuid, "1234", "registration")
+
+    assert repository.validate_and_use_pin("juan@example.com", "9999", "registration") is False
+    assert repository.validate_and_use_pin("juan@example.com", "1234", "password_recovery") is False
+    assert repository.validate_and_use_pin("juan@example.com", "1234", "registration") is True
+    assert repository.validate_and_use_pin("juan@example.com", "1234", "registration") is False
+    assert repository.has_used_pin(user.uuid) is True
+
+
+def test_factory_selects_engine(monkeypatch):
+    monkeypatch.setenv("USERS_REPOSITORY", "memory")
+    assert isinstance(AppFactory.create_users_repository(), InMemoryUsersRepository)
+
+    monkeypatch.setenv("USERS_REPOSITORY", "mongo")
+    with pytest.raises(ValueError):
+        AppFactory.create_users_repository()
+
+
+def test_signup_flow_without_database(app, monkeypatch):
+    """Routes + controller + service + serialization over the in-memory engine."""
+    monkeypatch.setenv("USERS_REPOSITORY", "memory")
+    controller = AppFactory.create(lambda: None)
+    monkeypatch.setattr("app.user_controller", controller)
+    sent = {}
+    monkeypatch.setattr(
+        controller.user_service.email_service, "send_pin_email",
+        lambda recipient_email, pin_code, is_registration: sent.update({recipient_email: pin_code}) or True,
+    )
+    client = app.test_client()
+
+    created = client.post("/users", json=new_user("ana@example.com"))
+    confirm = client.post("/users/ana@example.com/confirm-registration")
+    validated = client.put("/users/ana@example.com/confirm-registration", json={"pin": sent["ana@example.com"]})
+    login = client.post("/users/login", json={"email": "ana@example.com", "password": "secret"})
+    wrong = client.post("/users/login", json={"email": "ana@example.com", "password": "other"})
+
+    assert created.status_code == 201
+    assert confirm.status_code == 200
+    assert validated.status_code == 200
+    assert login.status_code == 200
+    assert login.get_json()["data"]["uuid"] == created.get_json()["data"]["uuid"]
+    assert wrong.status_code == 403
+
+
+def test_insert_users_bulk_merge_rules(repository, clock):
+    repository.insert_user(new_user("taken@example.com"))
+    repository.insert_user(new_user("pending@example.com"))
+    pending = repository.get_user_with_email("pending@example.com")
+    repository.create_pin(pending.uuid, "1234", "registration")
+    updated = {**new_user("pending@example.com", role="teacher"), "password": "new"}
+
+    results = repository.insert_users_bulk([new_user("new@example.com"), updated, new_user("taken@example.com")])
+
+    created = repository.get_user_with_email("new@example.com")
+    assert results == [("created", created.uuid), ("updated", pending.uuid), ("exists", None)]
+    assert repository.get_user(pending.uuid).role == "teacher"
+    assert repository.get_user(pending.uuid).password == "hashed-new"
+
+
+def test_insert_users_bulk_considers_only_the_first_user_with_the_email(repository):
+    repository.insert_user(new_user("shared@example.com"))
+    second = uuid.uuid4()
+    repository.insert_user(new_user("shared@example.com"), second)
+    repository.create_pin(second, "1234", "registration")  # only the second one is unconfirmed
+
+    results = repository.insert_users_bulk([new_user("shared@example.com", role="teacher")])
+
+    assert results == [("exists", None)]
+    assert repository.get_user(second).role != "teacher"
+
+
+def test_bulk_endpoint(app, monkeypatch):
+    monkeypatch.setenv("USERS_REPOSITORY", "memory")
+    monkeypatch.setenv("FLASK_ENV", "testing")
+    controller = AppFactory.create(lambda: None)
+    monkeypatch.setattr("app.user_controller", controller)
+    client = app.test_client()
+    client.post("/users", json=new_user("taken@example.com"))
+    ndjson = "\n".join([
+        '{"name": "Ana", "surname": "Gomez", "password": "pw", "email": "ana@example.com", "role": "student", "status": "active"}',
+        "not json",
+        '{"name": "Ana", "surname": "Gomez", "password": "pw", "email": "ana@example.com", "role": "student", "status": "active"}',
+        '{"name": "Root", "surname": "Admin", "password": "pw", "email": "root@example.com", "role": "admin", "status": "active"}',
+        '{"name": "Juan", "surname": "Perez", "password": "pw", "email": "taken@example.com", "role": "student", "status": "active"}',
+        '{"name": "Eva", "surname": "Diaz", "email": "eva@example.com", "role": "student", "status": "active"}',
+        "",
+    ])
+
+    response = client.post("/users/bulk", data=ndjson, content_type="application/x-ndjson")
+    as_json = client.post("/users/bulk", json=[new_user("bea@example.com")])
+    not_a_list = client.post("/users/bulk", json={"users": []})
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body["data"] == {"created": 1, "invalid": 3, "duplicate": 1, "exists": 1}
+    assert [result["status"] for result in body["results"]] == [
+        "created", "invalid", "duplicate", "invalid", "exists", "invalid",
+    ]
+    assert body["results"][0]["uuid"] == str(controller.user_service.user_repository.check_email("ana@example.com"))
+    assert as_json.get_json()["data"] == {"created": 1}
+    assert not_a_list.status_code == 400
+
+
+def test_bulk_endpoint_needs_a_session(app, monkeypatch):
+    monkeypatch.setenv("USERS_REPOSITORY", "memory")
+    monkeypatch.setenv("FLASK_ENV", "production")
+    controller = AppFactory.create(lambda: None)
+    monkeypatch.setattr("app.user_controller", controller)
+
+    response = app.test_client().post("/users/bulk", json=[new_user("ana@example.com")])
+
+    assert response.status_code == 401
+    assert controller.user_service.user_repository.check_email("ana@example.com") is None
+
+
+def test_export_endpoint(app, monkeypatch):
+    monkeypatch.setenv("USERS_REPOSITORY", "memory")
+    monkeypatch.setenv("FLASK_ENV", "testing")
+    controller = AppFactory.create(lambda: None)
+    monkeypatch.setattr("app.user_controller", controller)
+    client = app.test_client()
+    client.post("/users", json=new_user("ana@example.com"))
+    client.post("/users", json=new_user("juan@example.com", role="teacher"))
+
+    # Buffered: the response is closed (and its admission slot released) once read.
+    csv_export = client.get("/users/export", buffered=True)
+    ndjson_export = client.get("/users/export?format=ndjson&columns=email,password&gzip=true", buffered=True)
+    unknown = client.get("/users/export?columns=email,pin_code")
+
+    lines = csv_export.get_data().decode().splitlines()
+    assert csv_export.mimetype == "text/csv"
+    assert lines[0] == "uuid,name,surname,email,status,role,notification,latitude,longitude"
+    assert len(lines) == 3
+    assert ndjson_export.mimetype == "application/gzip"
+    rows = [json.loads(line) for line in gzip.decompress(ndjson_export.get_data()).splitlines()]
+    assert [row["email"] for row in rows] == ["ana@example.com", "juan@example.com"]
+    assert set(rows[0]) == {"email", "password"}
+    assert unknown.status_code == 400
+
+
+def test_mark_pin_verified(repository):
+    repository.insert_user(new_user())
+    user = repository.get_user_with_email("juan@example.com")
+
+    repository.mark_pin_verified(user.uuid)
+
+    assert repository.has_used_pin(user.uuid) is True
+    with pytest.raises(psycopg.errors.ForeignKeyViolation):
+        repository.mark_pin_verified(uuid.uuid4())
@@ -0,0 +1,42 @@
+import pytest
+from unittest.mock import MagicMock
+
+from infrastructure import lifecycle
+
+
+@pytest.fixture(autouse=True)
+def clean_hooks(monkeypatch):
+    monkeypatch.setattr(lifecycle, "_before_fork", [])
+    monkeypatch.setattr(lifecycle, "_after_fork", [])
+    monkeypatch.setattr(lifecycle, "_on_shutdown", [])
+
+
+def test_hooks_run_in_registration_order():
+    calls = []
+    lifecycle.after_fork(lambda: calls.append("first"))
+    lifecycle.after_fork(lambda: calls.append("second"))
+
+    lifecycle.run_after_fork()
+
+    assert calls == ["first", "second"]
+
+
+def test_failing_hook_does_not_stop_the_others():
+    ok = MagicMock()
+    lifecycle.before_fork(MagicMock(side_effect=RuntimeError("boom")))
+    lifecycle.before_fork(ok)
+
+    lifecycle.run_before_fork()
+
+    ok.assert_called_once()
+
+
+def test_shutdown_hooks_only_run_on_shutdown():
+    hook = MagicMock()
+    lifecycle.on_shutdown(hook)
+
+    lifecycle.run_after_fork()
+    hook.assert_not_called()
+
+    lifecycle.run_shutdown()
+    hook.assert_called_once()
@@ -0,0 +1,129 @@
+import asyncio
+import os
+import threading
+import uuid
+from unittest.mock import MagicMock
+
+import pytest
+
+from infrastructure import lifecycle, metrics
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    # Metrics created by a test register in a throwaway list.
+    monkeypatch.setattr(metrics, "_registry", [])
+    return metrics._registry
+
+
+def test_counter_sums_every_thread(registry):
+    counter = metrics.Counter("test_total", "Test counter.", ("method",))
+
+    def work():
+        for _ in range(1000):
+            counter.inc("get")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.values() == {("get",): 4000}
+
+
+def test_gauge_inc_and_dec(registry):
+    gauge = metrics.Gauge("test_in_flight", "Test gauge.", ("route",))
+
+    gauge.inc("/users")
+    gauge.inc("/users")
+    gauge.dec("/users")
+
+    assert gauge.values() == {("/users",): 1}
+
+
+def test_histogram_render(registry):
+    histogram = metrics.Histogram("test_seconds", "Test histogram.", ("method",), buckets=(0.1, 1.0))
+
+    histogram.observe(0.05, "get")
+    histogram.observe(0.5, "get")
+    histogram.observe(5, "get")
+
+    pid = os.getpid()
+    text = metrics.render()
+    assert "# TYPE test_seconds histogram" in text
+    assert f'test_seconds_bucket{{method="get",pid="{pid}",le="0.1"}} 1' in text
+    assert f'test_seconds_bucket{{method="get",pid="{pid}",le="1.0"}} 2' in text
+    assert f'test_seconds_bucket{{method="get",pid="{pid}",le="+Inf"}} 3' in text
+    assert f'test_seconds_sum{{method="get",pid="{pid}"}} 5.55' in text
+    assert f'test_seconds_count{{method="get",pid="{pid}"}} 3' in text
+
+
+def test_label_values_are_escaped(registry):
+    counter = metrics.Counter("test_total", "Test counter.", ("route",))
+    counter.inc('a"b\\c\n')
+
+    assert 'route="a\\"b\\\\c\\n"' in metrics.render()
+
+
+def test_callback_gauge_failure_renders_no_samples(registry):
+    metrics.CallbackGauge("test_pool", "Test callback.", MagicMock(side_effect=RuntimeError("down")))
+
+    assert metrics.render() == "# HELP test_pool Test callback.\n# TYPE test_pool gauge\n"
+
+
+def test_reset_runs_after_fork(registry):
+    counter = metrics.Counter("test_total", "Test counter.")
+    counter.inc()
+
+    assert metrics.reset in lifecycle._after_fork
+    metrics.reset()
+
+    assert counter.values() == {}
+
+
+def test_timed_methods_sync_and_async(registry):
+    duration = metrics.Histogram("test_query_seconds", "Test.", ("method",))
+    errors = metrics.Counter("test_query_errors_total", "Test.", ("method",))
+
+    @metrics.timed_methods(duration, errors)
+    class Repository:
+        def get(self):
+            return "user"
+
+        def fail(self):
+            raise ValueError("boom")
+
+        async def get_async(self):
+            return "async user"
+
+        def _private(self):
+            return "not timed"
+
+    repository = Repository()
+    assert repository.get() == "user"
+    assert asyncio.run(repository.get_async()) == "async user"
+    assert repository._private() == "not timed"
+    with pytest.raises(ValueError):
+        repository.fail()
+
+    counts = {key: sum(values[:-1]) for key, values in duration.values().items()}
+    assert counts == {("get",): 1, ("get_async",): 1, ("fail",): 1}
+    assert errors.values() == {("fail",): 1}
+
+
+def test_metrics_endpoint(app, monkeypatch):
+    from app import user_controller
+
+    monkeypatch.setattr(user_controller, "get_specific_users", lambda uuid: {"response": {}, "code_status": 200})
+    client = app.test_client()
+    client.get(f"/users/{uuid.uuid4()}")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    body = response.get_data(as_text=True)
+    assert 'users_http_request_duration_seconds_count{method="GET",route="/users/<uuid:uuid>",status="200"' in body
+    assert "users_http_requests_in_flight" in body
+    assert "users_db_connections_open" in body
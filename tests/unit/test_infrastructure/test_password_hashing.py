@@ -0,0 +1,23 @@
+import threading
+
+from infrastructure import password_hashing
+
+
+def test_hash_many_keeps_order_and_uses_pool():
+    threads = set()
+
+    def hash_one(password):
+        threads.add(threading.current_thread().name)
+        return f"hashed-{password}"
+
+    passwords = [str(i) for i in range(20)]
+
+    assert password_hashing.hash_many(hash_one, passwords) == [f"hashed-{p}" for p in passwords]
+    assert all(name.startswith("password-hash") for name in threads)
+
+
+def test_hash_many_single_password_runs_inline():
+    assert password_hashing.hash_many(lambda p: threading.current_thread().name, ["x"]) == [
+        threading.current_thread().name
+    ]
+    assert password_hashing.hash_many(str.upper, []) == []
@@ -0,0 +1,46 @@
+import datetime
+
+from infrastructure.persistence.pin_partitions import day_start, parse_bounds, partition_name, plan
+
+TODAY = datetime.date(2026, 10, 19)
+
+
+def days(start, end):
+    return {partition_name(day): (day_start(day), day_start(day + datetime.timedelta(days=1)))
+            for day in (start + datetime.timedelta(days=n) for n in range((end - start).days))}
+
+
+def test_parse_bounds():
+    bounds = parse_bounds("FOR VALUES FROM ('2026-10-19 00:00:00+00') TO ('2026-10-20 00:00:00+00')")
+    assert bounds == (day_start(TODAY), day_start(TODAY + datetime.timedelta(days=1)))
+    assert parse_bounds("FOR VALUES FROM (MINVALUE) TO ('2026-10-20 00:00:00+00')")[0] is None
+    assert parse_bounds("DEFAULT") is None
+
+
+def test_plan_creates_the_whole_window_on_an_empty_table():
+    to_create, to_drop = plan({}, TODAY, ahead=7, retention=30)
+
+    assert to_create[0] == TODAY - datetime.timedelta(days=30)
+    assert to_create[-1] == TODAY + datetime.timedelta(days=7)
+    assert len(to_create) == 38 and to_drop == []
+
+
+def test_plan_rolls_the_window_forward():
+    existing = days(TODAY - datetime.timedelta(days=32), TODAY + datetime.timedelta(days=7))
+
+    to_create, to_drop = plan(existing, TODAY, ahead=7, retention=30)
+
+    assert to_create == [TODAY + datetime.timedelta(days=7)]
+    assert to_drop == ["pins_20260917", "pins_20260918"]
+
+
+def test_plan_skips_days_covered_by_a_wider_partition():
+    existing = {"pins_legacy": (None, day_start(TODAY + datetime.timedelta(days=1)))}
+
+    to_create, to_drop = plan(existing, TODAY, ahead=2, retention=3)
+
+    assert to_create == [TODAY + datetime.timedelta(days=1), TODAY + datetime.timedelta(days=2)]
+    assert to_drop == []
+    # Once its newest row is older than the retention it is dropped as any other.
+    assert plan(existing, TODAY + datetime.timedelta(days=4), ahead=0, retention=3)[1] == ["pins_legacy"]
+
@@ -0,0 +1,145 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from infrastructure.persistence.pin_store import (
+    ExpiryWheel,
+    RepositoryPinStore,
+    TtlPinStore,
+    create_pin_store,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def repository():
+    repository = MagicMock()
+    repository.has_used_pin.return_value = False
+    return repository
+
+
+@pytest.fixture
+def store(repository, clock):
+    return TtlPinStore(repository, ttl=600, retention=3600, clock=clock)
+
+
+def test_wheel_returns_keys_once_their_tick_has_passed():
+    wheel = ExpiryWheel(now=0, slots=8, resolution=1.0)
+    wheel.schedule("a", 2.5)
+    wheel.schedule("b", 20.0)  # more than one round away
+
+    assert wheel.advance(2.9) == []
+    assert wheel.advance(3.0) == ["a"]
+    assert wheel.advance(19.5) == []
+    assert wheel.advance(100.0) == ["b"]
+
+
+def test_pin_is_valid_for_the_ttl_and_used_once(store, clock, repository):
+    store.create_pin("u1", "1234", "password_recovery")
+
+    assert store.get_active_pin("u1", "password_recovery") is not None
+    assert store.validate_and_use_pin("u1", "a@example.com", "0000", "password_recovery") is False
+    assert store.validate_and_use_pin("u1", "a@example.com", "1234", "password_recovery") is True
+    assert store.validate_and_use_pin("u1", "a@example.com", "1234", "password_recovery") is False
+    assert store.get_active_pin("u1", "password_recovery") is None
+    assert store.has_used_pin("u1") is True
+    repository.mark_pin_verified.assert_called_once_with("u1")
+
+    store.create_pin("u2", "5678", "password_recovery")
+    clock.now += 600
+    assert store.validate_and_use_pin("u2", "b@example.com", "5678", "password_recovery") is False
+
+
+def test_expired_pins_are_freed(store, clock):
+    store.create_pin("u1", "1234", "password_recovery")
+    store.create_pin("u2", "5678", "registration")
+    clock.now += 602
+
+    store.get_active_pin("u3", "registration")
+    assert len(store) == 1  # the registration PIN is kept for pin_expired
+    clock.now += 3600
+    store.get_active_pin("u3", "registration")
+    assert len(store) == 0
+
+
+def test_registration_in_progress_then_expired(store, clock):
+    store.create_pin("u1", "1234", "registration")
+    assert store.pin_in_progress("u1") is True
+    assert store.pin_expired("u1") is False
+
+    clock.now += 601
+    assert store.pin_in_progress("u1") is False
+    assert store.pin_expired("u1") is True
+
+    clock.now += 3600
+    assert store.pin_expired("u1") is False
+
+
+def test_only_the_verified_outcome_is_written(store, repository):
+    store.create_pin("u1", "1234", "registration")
+    repository.create_pin.assert_not_called()
+
+    assert store.validate_and_use_pin("u1", "a@example.com", "1234", "registration") is True
+    repository.mark_pin_verified.assert_called_once_with("u1")
+
+
+def test_pin_is_kept_when_the_verification_cannot_be_written(store, repository):
+    repository.mark_pin_verified.side_effect = RuntimeError("Database connection error.")
+    store.create_pin("u1", "1234", "registration")
+
+    with pytest.raises(RuntimeError):
+        store.validate_and_use_pin("u1", "a@example.com", "1234", "registration")
+
+    assert "u1" not in store._verified
+    repository.mark_pin_verified.side_effect = None
+    assert store.validate_and_use_pin("u1", "a@example.com", "1234", "registration") is True
+
+
+def test_has_used_pin_falls_back_to_the_repository(store, repository):
+    repository.has_used_pin.return_value = True
+
+    assert store.has_used_pin("verified-before") is True
+    repository.has_used_pin.assert_called_once_with("verified-before")
+
+
+def test_invalidate_all_pins_counts_as_used(store):
+    store.create_pin("u1", "1234", "password_recovery")
+    store.invalidate_all_pins("u1")
+
+    assert store.get_active_pin("u1", "password_recovery") is None
+    assert store.has_used_pin("u1") is True
+
+
+def test_create_pin_store_by_env(monkeypatch, repository):
+    assert isinstance(create_pin_store(repository), RepositoryPinStore)
+    monkeypatch.setenv("PIN_STORE", "memory")
+    assert isinstance(create_pin_store(repository), TtlPinStore)
+    monkeypatch.setenv("PIN_STORE", "redis")
+    with pytest.raises(ValueError):
+        create_pin_store(repository)
+
+
+def test_verified_users_are_freed_after_the_retention(store, clock, repository):
+    store.create_pin("u1", "1234", "registration")
+    store.validate_and_use_pin("u1", "a@example.com", "1234", "registration")
+    assert store.has_used_pin("u1") is True
+
+    clock.now += 3600 + 2
+    store.get_active_pin("u2", "registration")  # advances the wheel
+
+    repository.has_used_pin.return_value = True  # written when it verified
+    assert "u1" not in store._verified
+    assert store.has_used_pin("u1") is True
+    repository.has_used_pin.assert_called_once_with("u1")
@@ -0,0 +1,105 @@
+import collections
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from infrastructure import profiler
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+@pytest.fixture
+def busy_thread():
+    stop = threading.Event()
+    thread = threading.Thread(target=busy_loop, args=(stop,))
+    thread.start()
+    yield thread
+    stop.set()
+    thread.join()
+
+
+def test_sample_stacks_sees_working_threads(busy_thread):
+    stacks, samples = profiler.sample_stacks(0.2, interval=0.005)
+
+    assert samples > 0
+    assert any(stack[-1].startswith("busy_loop (test_profiler.py:") for stack in stacks)
+
+
+def test_parked_threads_are_skipped_unless_asked():
+    stop = threading.Event()
+    parked = threading.Thread(target=stop.wait, name="parked")
+    parked.start()
+    try:
+        idle, _ = profiler.sample_stacks(0.05, interval=0.005)
+        with_idle, _ = profiler.sample_stacks(0.05, interval=0.005, include_idle=True)
+    finally:
+        stop.set()
+        parked.join()
+
+    assert not any("wait (threading.py" in frame for stack in idle for frame in stack)
+    assert any("wait (threading.py" in frame for stack in with_idle for frame in stack)
+
+
+def test_only_one_profile_at_a_time():
+    with profiler._running:
+        with pytest.raises(profiler.ProfilerBusy):
+            profiler.sample_stacks(0.01)
+        with pytest.raises(profiler.ProfilerBusy):
+            profiler.memory_diff(0.01)
+
+
+def test_render_collapsed():
+    stacks = collections.Counter({("main", "handle", "query"): 3, ("main", "idle"): 5})
+
+    assert profiler.render_collapsed(stacks) == "main;idle 5\nmain;handle;query 3\n"
+
+
+def test_memory_diff_reports_growth():
+    leak = []
+
+    def allocate():
+        time.sleep(0.05)
+        leak.append(bytearray(512 * 1024))
+
+    thread = threading.Thread(target=allocate)
+    thread.start()
+    result = profiler.memory_diff(0.2, top=5)
+    thread.join()
+
+    assert result["total_diff_kb"] >= 512
+    assert result["top"][0]["file"].endswith("test_profiler.py")
+
+
+def test_profile_endpoint_requires_admin_session(app, monkeypatch):
+    monkeypatch.setenv("FLASK_ENV", "production")
+
+    response = app.test_client().get("/debug/profile?seconds=0.01")
+
+    assert response.status_code == 401
+
+
+def test_profile_endpoint_returns_collapsed_stacks(app, monkeypatch):
+    monkeypatch.setenv("FLASK_ENV", "testing")
+    stacks = collections.Counter({("main", "handle"): 2})
+
+    with patch("infrastructure.profiler.sample_stacks", return_value=(stacks, 2)) as sample:
+        response = app.test_client().get("/debug/profile?seconds=5&interval_ms=20")
+
+    sample.assert_called_once_with(5.0, interval=0.02, include_idle=False)
+    assert response.status_code == 200
+    assert response.get_data(as_text=True) == "main;handle 2\n"
+    assert response.headers["Content-Disposition"] == "attachment; filename=profile.folded"
+
+
+def test_profile_endpoint_busy(app, monkeypatch):
+    monkeypatch.setenv("FLASK_ENV", "testing")
+
+    with patch("infrastructure.profiler.memory_diff", side_effect=profiler.ProfilerBusy()):
+        response = app.test_client().get("/debug/profile?mode=memory")
+
+    assert response.status_code == 409
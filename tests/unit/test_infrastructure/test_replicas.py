@@ -0,0 +1,219 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import psycopg
+import pytest
+from flask import Flask
+
+from presentation import http_read_your_writes
+
+from infrastructure.persistence import read_your_writes
+from infrastructure.persistence.base_entity import BaseEntity, reads, writes
+from infrastructure.persistence.replicas import Replica, ReplicaRouter
+
+
+class FakeReplica(Replica):
+    """Replica whose probe returns fixed values instead of querying."""
+
+    def __init__(self, name, replay_lsn, lag=0.0):
+        super().__init__(name, "fake")
+        self.status = (replay_lsn, lag)
+        self.probes = 0
+        self.cursor_mock = MagicMock()
+
+    @property
+    def conn(self):
+        return MagicMock(closed=False, broken=False)
+
+    @property
+    def cursor(self):
+        return self.cursor_mock
+
+    def probe(self, now):
+        self.probes += 1
+        self.replay_lsn, self.lag = self.status
+        self.checked_at = now
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lsn_token_round_trip():
+    assert read_your_writes.parse_lsn("16/B374D848") == (0x16 << 32) | 0xB374D848
+    assert read_your_writes.format_lsn(read_your_writes.parse_lsn("16/B374D848")) == "16/B374D848"
+    assert read_your_writes.parse_lsn("garbage") == 0
+    assert read_your_writes.parse_lsn(None) == 0
+
+    read_your_writes.begin("0/10", None, "0/20")
+    assert read_your_writes.required_lsn() == 0x20
+    read_your_writes.wrote(0x30)
+    assert read_your_writes.required_lsn() == 0x30
+    assert read_your_writes.written() == 0x30
+
+
+def test_router_skips_lagging_down_and_behind_replicas():
+    clock = Clock()
+    fresh = FakeReplica("fresh", replay_lsn=500)
+    lagging = FakeReplica("lagging", replay_lsn=900, lag=30.0)
+    behind = FakeReplica("behind", replay_lsn=100)
+    down = FakeReplica("down", replay_lsn=1000)
+    down.down = True
+    router = ReplicaRouter([fresh, lagging, behind, down], max_lag=5, check_interval=1, clock=clock)
+
+    assert router.choose(required_lsn=400) is fresh
+    assert router.choose(required_lsn=600) is None
+    assert down.probes == 0
+    assert router.lag_by_replica()[("down",)] == -1
+
+
+def test_router_reprobes_a_replica_behind_the_token():
+    clock = Clock()
+    replica = FakeReplica("r", replay_lsn=100)
+    router = ReplicaRouter([replica], max_lag=5, check_interval=1, clock=clock)
+    router.choose()
+    replica.status = (200, 0.0)
+
+    assert router.choose(required_lsn=200) is None  # probed this instant
+    clock.now += 0.1
+    assert router.choose(required_lsn=200) is replica
+
+
+def test_router_balances_by_load():
+    clock = Clock()
+    busy = FakeReplica("busy", replay_lsn=1)
+    idle = FakeReplica("idle", replay_lsn=1)
+    busy.in_flight = 10
+    router = ReplicaRouter([busy, idle], max_lag=5, check_interval=1, clock=clock)
+
+    assert {router.choose().name for _ in range(20)} == {"idle"}
+
+
+def test_dropping_a_connection_keeps_the_other_threads_ones():
+    with patch("infrastructure.persistence.replicas.psycopg.connect", side_effect=lambda *a, **kw: MagicMock()):
+        replica = Replica("r", "host=replica")
+        other = []
+        thread = threading.Thread(target=lambda: other.append(replica.conn))
+        thread.start()
+        thread.join(2)
+        broken = replica.conn
+
+        replica.drop_connection()
+
+        broken.close.assert_called_once()
+        assert replica._connections == other
+        assert replica.conn is not broken
+        other[0].close.assert_not_called()
+
+
+def test_down_replica_is_probed_in_the_background():
+    attempts = []
+
+    def connect(*args, **kwargs):
+        attempts.append(threading.current_thread().name)
+        if len(attempts) < 2:
+            raise psycopg.OperationalError("connection refused")
+        return MagicMock()
+
+    replica = Replica("r", "host=replica")
+    router = ReplicaRouter([replica], clock=Clock())
+    with patch("infrastructure.persistence.replicas.CHECK_SECONDS", 0.001), \
+            patch("infrastructure.persistence.replicas.DOWN_SECONDS", 0.01), \
+            patch("infrastructure.persistence.replicas.psycopg.connect", side_effect=connect):
+        replica.mark_down(psycopg.OperationalError("terminating connection"))
+        assert router.choose() is None  # no probe from the request thread
+        deadline = time.monotonic() + 2
+        while replica.down and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+    assert not replica.down
+    assert set(attempts) == {"replica-probe-r"}
+    replica.close()
+
+
+class Entity(BaseEntity):
+    @reads
+    def read(self):
+        self.cursor.execute("SELECT")
+        return self.cursor
+
+    @writes
+    def write(self):
+        self.cursor.execute("UPDATE")
+        self.conn.commit()
+        return self.read()
+
+
+@pytest.fixture
+def primary_cursor():
+    conn = MagicMock()
+    conn.cursor.return_value.fetchone.return_value = ("0/50",)
+    with patch("infrastructure.persistence.base_entity.psycopg.connect", return_value=conn):
+        yield conn.cursor.return_value
+
+
+@pytest.fixture
+def entity(primary_cursor):
+    entity = Entity()
+    entity.replicas = ReplicaRouter([FakeReplica("replica-0", replay_lsn=0x40)], clock=Clock())
+    read_your_writes.begin()
+    return entity
+
+
+def test_reads_go_to_replica_until_own_write(entity, primary_cursor):
+    replica = entity.replicas.replicas[0]
+
+    assert entity.read() is replica.cursor
+    assert entity.write() is primary_cursor  # the read back stays on the primary
+    assert read_your_writes.written() == 0x50
+    assert entity.read() is primary_cursor  # replica at 0/40 has not replayed 0/50
+    replica.status = (0x50, 0.0)
+    entity.replicas.clock.now += 1
+    assert entity.read() is replica.cursor
+
+
+def test_read_retried_on_primary_when_replica_fails(entity, primary_cursor):
+    replica = entity.replicas.replicas[0]
+    replica.cursor_mock.execute.side_effect = psycopg.OperationalError("terminating connection")
+
+    assert entity.read() is primary_cursor
+
+
+def test_without_replicas_nothing_changes(primary_cursor):
+    entity = Entity()
+    read_your_writes.begin()
+
+    assert entity.replicas is None
+    assert entity.write() is primary_cursor
+    assert read_your_writes.written() == 0
+
+
+def test_every_write_moves_the_process_generation_on(primary_cursor):
+    entity = Entity()
+    before = read_your_writes.generation()
+
+    entity.write()
+
+    assert read_your_writes.generation() > before
+
+
+def test_token_travels_in_session_and_header():
+    app = Flask(__name__)
+    app.secret_key = "test"
+    http_read_your_writes.init_app(app, MagicMock(replicas=object()))
+    seen = []
+    app.add_url_rule("/write", "write", lambda: read_your_writes.wrote(0x1A0) or "ok", methods=["POST"])
+    app.add_url_rule("/read", "read", lambda: seen.append(read_your_writes.required_lsn()) or "ok")
+    client = app.test_client()
+
+    written = client.post("/write")
+    client.get("/read")
+    client.get("/read", headers={"X-LSN": "0/1B0"})
+
+    assert written.headers["X-LSN"] == "0/1A0"
+    assert seen == [0x1A0, 0x1B0]
@@ -0,0 +1,134 @@
+import uuid
+from unittest.mock import patch
+
+import pytest
+
+from infrastructure.persistence.in_memory_users_repository import InMemoryUsersRepository
+from infrastructure.persistence.sharded_users_repository import ShardedUsersRepository
+from infrastructure.persistence.sharding import SLOTS, ShardMoving, SlotMap, slot_of
+
+
+class FakeDirectory:
+    """ShardDirectory over dicts."""
+
+    def __init__(self, owners):
+        self.owners = owners
+        self.moving = set()
+        self.emails = {}  # uuid -> email, in insertion order
+
+    def slots(self):
+        return [(slot, shard, "moving" if slot in self.moving else "active") for slot, shard in enumerate(self.owners)]
+
+    def lookup_email(self, email):
+        return [user_id for user_id, indexed in self.emails.items() if indexed == email]
+
+    def lookup_emails(self, emails):
+        result = {}
+        for user_id, email in self.emails.items():
+            if email in emails:
+                result.setdefault(email, []).append(user_id)
+        return result
+
+    def add_emails(self, pairs):
+        for user_id, email in pairs:
+            self.emails[str(user_id)] = email
+
+    def remove_email(self, user_id):
+        self.emails.pop(str(user_id), None)
+
+
+def new_user(email, role="student"):
+    return {"name": "Ana", "surname": "Gómez", "password": "secret", "email": email, "status": "active", "role": role}
+
+
+@pytest.fixture
+def directory():
+    return FakeDirectory(["a" if slot < SLOTS // 2 else "b" for slot in range(SLOTS)])
+
+
+@pytest.fixture
+def repository(directory):
+    with patch("infrastructure.persistence.users_repository.generate_password_hash", side_effect=lambda p: f"hashed-{p}"):
+        shards = {"a": InMemoryUsersRepository(), "b": InMemoryUsersRepository()}
+        yield ShardedUsersRepository(directory, shards, SlotMap(directory, refresh=0, move_wait=0))
+
+
+def owner(user_id):
+    return "a" if slot_of(user_id) < SLOTS // 2 else "b"
+
+
+def test_slot_of_uses_the_first_32_bits():
+    assert slot_of("00000400-0000-4000-8000-000000000000") == 0
+    assert slot_of(uuid.UUID("000003ff-ffff-4fff-bfff-ffffffffffff")) == SLOTS - 1
+
+
+def test_users_live_on_the_shard_of_their_uuid(repository):
+    for i in range(20):
+        repository.insert_user(new_user(f"user{i}@example.com", role="teacher" if i % 2 else "student"))
+
+    for name, shard in repository.shards.items():
+        assert all(owner(user.uuid) == name for user in shard.get_all_users())
+    assert {len(shard.get_all_users()) for shard in repository.shards.values()} != {0}
+
+    users = repository.get_all_users()
+    assert len(users) == 20
+    assert [user.uuid for user in users] == sorted(user.uuid for user in users)
+    assert len(repository.get_active_teachers()) == 10
+
+    user = repository.get_user_with_email("user3@example.com")
+    assert repository.get_user(user.uuid).email == "user3@example.com"
+    assert repository.check_email("user3@example.com") == uuid.UUID(user.uuid)
+    assert repository.get_user_with_email("nobody@example.com") is None
+
+
+def test_email_flows_and_pins(repository):
+    repository.insert_user(new_user("ana@example.com"))
+    user = repository.get_user_with_email("ana@example.com")
+    repository.create_pin(user.uuid, "1234", "registration")
+
+    assert repository.pin_in_progress(user.uuid) is True
+    assert repository.validate_and_use_pin("ana@example.com", "1234", "registration") is True
+    assert repository.has_used_pin(user.uuid) is True
+    assert repository.update_user_password("ana@example.com", "new") is True
+    assert repository.get_user(user.uuid).password == "hashed-new"
+    assert repository.update_user_password("nobody@example.com", "new") is False
+
+    repository.delete_users(user.uuid)
+
+    assert repository.get_user_with_email("ana@example.com") is None
+    assert repository.directory.emails == {}
+
+
+def test_failed_insert_is_not_indexed(repository):
+    with patch.object(InMemoryUsersRepository, "insert_user", side_effect=RuntimeError("shard down")):
+        with pytest.raises(RuntimeError):
+            repository.insert_user(new_user("ana@example.com"))
+
+    assert repository.check_email("ana@example.com") is None
+
+
+def test_bulk_insert_across_shards(repository):
+    repository.insert_user(new_user("taken@example.com"))
+    users = [new_user(f"bulk{i}@example.com") for i in range(10)] + [new_user("taken@example.com")]
+
+    results = repository.insert_users_bulk(users)
+
+    assert [status for status, _ in results] == ["created"] * 10 + ["exists"]
+    assert len(repository.get_all_users()) == 11
+    for (_, user_id), user in zip(results[:10], users):
+        assert repository.get_user_with_email(user["email"]).uuid == user_id
+
+
+def test_listings_skip_copies_of_slots_being_moved(repository, directory):
+    repository.insert_user(new_user("ana@example.com"))
+    user = repository.get_user_with_email("ana@example.com")
+    source = owner(user.uuid)
+    destination = "b" if source == "a" else "a"
+    repository.shards[destination].insert_user(new_user("ana@example.com"), user.uuid)  # copied, not yet flipped
+
+    assert len(repository.get_all_users()) == 1
+
+    directory.moving.add(slot_of(user.uuid))
+    with pytest.raises(ShardMoving):
+        repository.update_status(user.uuid, "disabled")
+    assert repository.get_user(user.uuid).status == "active"  # reads keep going to the source
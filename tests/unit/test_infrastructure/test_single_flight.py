@@ -0,0 +1,134 @@
+import threading
+import time
+
+import pytest
+
+from infrastructure.persistence import deadlines
+from infrastructure.persistence.deadlines import DeadlineExceeded
+from infrastructure.single_flight import SingleFlight
+
+
+def start_followers(flight, key, compute, count):
+    results = []
+
+    def run():
+        try:
+            results.append(flight.do(key, compute))
+        except Exception as e:
+            results.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def wait_for_followers(flight, key, count):
+    deadline = time.monotonic() + 2
+    while flight._flights[key].waiters < count and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def test_concurrent_callers_share_one_computation():
+    flight = SingleFlight("teachers", enabled=True)
+    release = threading.Event()
+    computed = []
+
+    def compute():
+        computed.append(1)
+        release.wait(2)
+        return ["teacher"]
+
+    leader, results = start_followers(flight, "k", compute, 1)
+    while not computed:
+        time.sleep(0.001)
+    followers, follower_results = start_followers(flight, "k", compute, 3)
+    wait_for_followers(flight, "k", 3)
+    release.set()
+    for thread in leader + followers:
+        thread.join(2)
+
+    assert computed == [1]
+    assert results + follower_results == [["teacher"]] * 4
+    assert results[0] is follower_results[0]
+    assert flight.in_flight() == 0
+
+
+def test_followers_get_the_leaders_exception():
+    flight = SingleFlight("user", enabled=True)
+    release = threading.Event()
+
+    def compute():
+        release.wait(2)
+        raise RuntimeError("Database connection error.")
+
+    leader, results = start_followers(flight, "k", compute, 1)
+    while "k" not in flight._flights:
+        time.sleep(0.001)
+    followers, follower_results = start_followers(flight, "k", compute, 2)
+    wait_for_followers(flight, "k", 2)
+    release.set()
+    for thread in leader + followers:
+        thread.join(2)
+
+    assert all(isinstance(result, RuntimeError) for result in results + follower_results)
+
+
+def test_each_flight_runs_again_once_landed():
+    flight = SingleFlight("user", enabled=True)
+    counter = iter(range(10))
+
+    assert flight.do("k", lambda: next(counter)) == 0
+    assert flight.do("k", lambda: next(counter)) == 1
+    assert flight.do("other", lambda: next(counter)) == 2
+
+
+def test_disabled_runs_every_call():
+    flight = SingleFlight("user", enabled=False)
+
+    with pytest.raises(ValueError):
+        flight.do("k", lambda: int("x"))
+    assert flight.in_flight() == 0
+
+
+def test_followers_run_again_when_the_leader_runs_out_of_time():
+    flight = SingleFlight("user", enabled=True)
+    release = threading.Event()
+    computed = []
+
+    def compute():
+        computed.append(1)
+        if len(computed) == 1:
+            release.wait(2)
+            raise DeadlineExceeded("Request deadline exceeded in get_user")
+        return "user"
+
+    leader, results = start_followers(flight, "k", compute, 1)
+    while not computed:
+        time.sleep(0.001)
+    followers, follower_results = start_followers(flight, "k", compute, 2)
+    wait_for_followers(flight, "k", 2)
+    release.set()
+    for thread in leader + followers:
+        thread.join(2)
+
+    assert isinstance(results[0], DeadlineExceeded)
+    assert follower_results == ["user", "user"]
+
+
+def test_follower_waits_no_longer_than_its_deadline():
+    flight = SingleFlight("teachers", enabled=True)
+    release = threading.Event()
+    leader, _ = start_followers(flight, "k", lambda: release.wait(2), 1)
+    while "k" not in flight._flights:
+        time.sleep(0.001)
+
+    token = deadlines.begin(0.02)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            flight.do("k", lambda: "never")
+        assert deadlines.current().exceeded
+    finally:
+        deadlines.end(token)
+        release.set()
+        leader[0].join(2)
@@ -0,0 +1,154 @@
+import asyncio
+import uuid
+from unittest.mock import MagicMock
+
+import pytest
+
+from infrastructure import tracing
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture
+def buffer():
+    exporter = tracing.add_exporter(tracing.RingBufferExporter(100))
+    yield exporter
+    tracing.remove_exporter(exporter)
+
+
+def test_parse_traceparent():
+    assert tracing.parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01") == (TRACE_ID, PARENT_ID)
+    assert tracing.parse_traceparent("garbage") is None
+    assert tracing.parse_traceparent(f"00-{'0' * 32}-{PARENT_ID}-01") is None
+    assert tracing.parse_traceparent(f"ff-{TRACE_ID}-{PARENT_ID}-01") is None
+
+
+def test_nested_spans_share_the_trace(buffer):
+    with tracing.span("root", traceparent=f"00-{TRACE_ID}-{PARENT_ID}-01") as root:
+        with tracing.span("child", table="users") as child:
+            pass
+
+    assert root.trace_id == TRACE_ID
+    assert root.parent_id == PARENT_ID
+    assert child.trace_id == TRACE_ID
+    assert child.parent_id == root.span_id
+    assert child.attributes == {"table": "users"}
+    assert [s.name for s in buffer.spans] == ["child", "root"]
+    assert tracing.current_span() is None
+
+
+def test_span_records_error(buffer):
+    with pytest.raises(ValueError):
+        with tracing.span("failing"):
+            raise ValueError("boom")
+
+    assert buffer.spans[0].error == "ValueError: boom"
+    assert buffer.spans[0].duration_ms is not None
+
+
+def test_span_follows_asyncio_to_thread(buffer):
+    def in_thread():
+        with tracing.span("thread"):
+            pass
+
+    async def main():
+        with tracing.span("root") as root:
+            await asyncio.to_thread(in_thread)
+        return root
+
+    root = asyncio.run(main())
+
+    assert buffer.spans[0].parent_id == root.span_id
+
+
+def test_traced_methods(buffer):
+    @tracing.traced_methods
+    class Service:
+        def send(self):
+            return "sent"
+
+        async def fetch(self):
+            return "fetched"
+
+        def _private(self):
+            return "not traced"
+
+    service = Service()
+    assert service.send() == "sent"
+    assert asyncio.run(service.fetch()) == "fetched"
+    assert service._private() == "not traced"
+
+    assert [s.name for s in buffer.spans] == ["Service.send", "Service.fetch"]
+
+
+def test_ring_buffer_groups_traces_newest_first():
+    exporter = tracing.RingBufferExporter(3)
+    for name in ("a", "b", "c", "d"):
+        exporter.on_end(tracing.Span(name, name * 32, None, {}))
+
+    traces = exporter.traces(limit=2)
+
+    assert [t["trace_id"] for t in traces] == ["d" * 32, "c" * 32]
+    assert len(exporter.spans) == 3
+
+
+def test_broken_exporter_does_not_fail_the_span():
+    exporter = MagicMock()
+    exporter.on_end.side_effect = RuntimeError("exporter down")
+    tracing.add_exporter(exporter)
+    try:
+        with tracing.span("ok"):
+            pass
+    finally:
+        tracing.remove_exporter(exporter)
+
+
+def test_new_relic_exporter_only_inside_a_transaction():
+    agent = MagicMock()
+    exporter = tracing.NewRelicExporter(agent)
+    outside = tracing.Span("outside", TRACE_ID, None, {})
+    agent.current_transaction.return_value = None
+    exporter.on_start(outside)
+    assert outside.bridge is None
+
+    inside = tracing.Span("inside", TRACE_ID, None, {})
+    agent.current_transaction.return_value = MagicMock()
+    exporter.on_start(inside)
+    trace = inside.bridge
+    exporter.on_end(inside)
+
+    agent.FunctionTrace.assert_called_once_with("inside", group="Span")
+    trace.__exit__.assert_called_once_with(None, None, None)
+
+
+def test_new_relic_exporter_needs_config(monkeypatch):
+    monkeypatch.delenv("NEW_RELIC_CONFIG_FILE", raising=False)
+
+    assert tracing.new_relic_exporter() is None
+
+
+def test_request_root_span_and_debug_endpoint(app, monkeypatch):
+    from app import user_controller
+
+    monkeypatch.setenv("FLASK_ENV", "testing")
+    monkeypatch.setattr(user_controller, "get_specific_users", lambda uuid: {"response": {}, "code_status": 200})
+    client = app.test_client()
+    trace_id = uuid.uuid4().hex
+
+    response = client.get(f"/users/{uuid.uuid4()}", headers={"traceparent": f"00-{trace_id}-{PARENT_ID}-01"})
+    assert response.headers["X-Trace-Id"] == trace_id
+
+    traces = client.get("/debug/traces?limit=50").get_json()["traces"]
+    trace = next(t for t in traces if t["trace_id"] == trace_id)
+    assert trace["spans"][0]["name"] == "GET /users/<uuid:uuid>"
+    assert trace["spans"][0]["parent_id"] == PARENT_ID
+    assert trace["spans"][0]["attributes"] == {"status": 200}
+
+
+def test_debug_endpoint_requires_session(app, monkeypatch):
+    monkeypatch.setenv("FLASK_ENV", "production")
+
+    response = app.test_client().get("/debug/traces")
+
+    assert response.status_code == 401
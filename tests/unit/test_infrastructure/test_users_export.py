@@ -0,0 +1,47 @@
+import gzip
+import json
+
+import pytest
+
+from infrastructure.persistence import users_export
+
+
+def test_parse_columns_defaults_exclude_credentials():
+    assert users_export.parse_columns(None) == users_export.DEFAULT_COLUMNS
+    assert "password" not in users_export.DEFAULT_COLUMNS
+    assert "id_biometric" not in users_export.DEFAULT_COLUMNS
+    assert users_export.parse_columns("uuid, email,password") == ["uuid", "email", "password"]
+    with pytest.raises(ValueError):
+        users_export.parse_columns("uuid,pin_code")
+
+
+def test_copy_query():
+    csv_query = users_export.copy_query(["uuid", "latitude"], "csv")
+    ndjson_query = users_export.copy_query(["uuid", "latitude"], "ndjson")
+
+    assert csv_query.startswith("COPY (SELECT u.uuid AS uuid, l.latitude AS latitude FROM users u LEFT JOIN")
+    assert "HEADER true" in csv_query
+    assert "JSON_BUILD_OBJECT('uuid', u.uuid, 'latitude', l.latitude)::text" in ndjson_query
+    with pytest.raises(ValueError):
+        users_export.copy_query(["uuid"], "xml")
+
+
+def test_buffered_and_gzipped():
+    rows = [f"row {i}\n".encode() for i in range(1000)]
+
+    chunks = list(users_export.buffered(rows, size=100))
+
+    assert b"".join(chunks) == b"".join(rows)
+    assert all(len(chunk) >= 100 for chunk in chunks[:-1])
+    assert gzip.decompress(b"".join(users_export.gzipped(iter(chunks)))) == b"".join(rows)
+
+
+def test_render_rows_like_copy():
+    rows = [{"uuid": "u1", "email": "a@example.com", "notification": True, "latitude": None}]
+    columns = ["uuid", "email", "notification", "latitude"]
+
+    csv_bytes = b"".join(users_export.render_rows(rows, columns, "csv"))
+    ndjson_bytes = b"".join(users_export.render_rows(rows, columns, "ndjson"))
+
+    assert csv_bytes == b"uuid,email,notification,latitude\nu1,a@example.com,t,\n"
+    assert json.loads(ndjson_bytes) == rows[0]
@@ -20,10 +20,10 @@ def uuid_2():
 
 @pytest.fixture
 def mock_db_connection_and_cursor():
-    mock_conn = MagicMock()
+    mock_conn = MagicMock(closed=False)
     mock_cursor = MagicMock()
     mock_conn.cursor.return_value = mock_cursor
-    with patch("infrastructure.persistence.base_entity.BaseEntity.connect_with_retries", return_value=mock_conn):
+    with patch("infrastructure.persistence.base_entity.BaseEntity.connect", return_value=mock_conn):
         yield mock_conn, mock_cursor
 
 @pytest.fixture
@@ -182,7 +182,7 @@ def test_delete_user(users_repository, mock_db_connection_and_cursor, uuid_1):
     )
 
 def test_get_active_teachers(users_repository, mock_db_connection_and_cursor, uuid_1, uuid_2):
-    _, mock_cursor = mock_db_connection_and_cursor
+    mock_conn, mock_cursor = mock_db_connection_and_cursor
     mock_cursor.fetchall.return_value = [
         ({
             "uuid": str(uuid_1),
@@ -209,6 +209,7 @@ def test_get_active_teachers(users_repository, mock_db_connection_and_cursor, uu
     teachers = users_repository.get_active_teachers()
 
     mock_cursor.execute.assert_called_once()
+    mock_conn.commit.assert_called_once()  # no idle transaction left on the directory's connection
     assert isinstance(teachers, list)
     assert len(teachers) == 2
     assert all(isinstance(t, User) for t in teachers)
@@ -268,6 +269,46 @@ def test_invalidate_all_pins(users_repository, mock_db_connection_and_cursor, uu
     )
     mock_conn.commit.assert_called_once()
 
+def test_has_used_pin_checks_verified_users_and_ends_the_transaction(users_repository, mock_db_connection_and_cursor, uuid_1):
+    mock_conn, mock_cursor = mock_db_connection_and_cursor
+    mock_cursor.fetchone.return_value = (1,)
+
+    assert users_repository.has_used_pin(uuid_1) is True
+
+    query, params = mock_cursor.execute.call_args.args
+    assert "FROM verified_users" in query
+    assert params == {"user_id": str(uuid_1)}
+    mock_conn.commit.assert_called_once()
+
+def test_get_active_pin_ends_the_transaction(users_repository, mock_db_connection_and_cursor, uuid_1):
+    mock_conn, mock_cursor = mock_db_connection_and_cursor
+    mock_cursor.fetchone.return_value = ("1234", "2026-10-19 10:00:00")
+
+    assert users_repository.get_active_pin(uuid_1, "registration") == ("1234", "2026-10-19 10:00:00")
+
+    mock_conn.commit.assert_called_once()
+
+def test_pin_expired_checks_expired_registrations(users_repository, mock_db_connection_and_cursor, uuid_1):
+    mock_conn, mock_cursor = mock_db_connection_and_cursor
+    mock_cursor.fetchone.return_value = (1,)
+
+    assert users_repository.pin_expired(uuid_1) is True
+
+    query, params = mock_cursor.execute.call_args.args
+    assert "FROM expired_registrations" in query
+    assert params == {"user_id": str(uuid_1)}
+    mock_conn.commit.assert_called_once()
+
+def test_mark_pin_verified(users_repository, mock_db_connection_and_cursor, uuid_1):
+    mock_conn, mock_cursor = mock_db_connection_and_cursor
+
+    users_repository.mark_pin_verified(uuid_1)
+
+    query, params = mock_cursor.execute.call_args.args
+    assert query.startswith("INSERT INTO verified_users")
+    assert params == (str(uuid_1),)
+    mock_conn.commit.assert_called_once()
+
 def test_activate_user(users_repository, mock_db_connection_and_cursor):
     mock_conn, mock_cursor = mock_db_connection_and_cursor
     mock_cursor.fetchone.return_value = ("user-uuid",)
@@ -296,3 +337,75 @@ def test_update_notification_failure(users_repository, mock_db_connection_and_cu
     result = users_repository.update_notification("user123", True)
 
     assert result is None
+
+
+def test_missing_schema_columns(users_repository, mock_db_connection_and_cursor):
+    _, mock_cursor = mock_db_connection_and_cursor
+    rows = [
+        (table, column)
+        for table, columns in {
+            "users": ["uuid", "name", "surname", "password", "email", "status", "role", "notification"],
+            "user_locations": ["uuid", "latitude", "longitude"],
+            "pins": ["pin_id", "user_id", "pin_code", "pin_type", "created_at", "used"],
+            "verified_users": ["user_id", "verified_at"],
+            "expired_registrations": ["user_id", "expired_at"],
+        }.items()
+        for column in columns
+    ]
+    mock_cursor.fetchall.return_value = rows
+
+    assert users_repository.missing_schema_columns() == ["users.id_biometric"]
+
+
+def test_insert_users_bulk(users_repository, mock_db_connection_and_cursor, password_hash, uuid_1, uuid_2):
+    mock_conn, mock_cursor = mock_db_connection_and_cursor
+    copy = mock_cursor.copy.return_value.__enter__.return_value
+    users = [
+        {"name": "Ana", "surname": "Gomez", "password": "a", "email": "ana@example.com", "status": "active", "role": "student"},
+        {"name": "Juan", "surname": "Perez", "password": "b", "email": "juan@example.com", "status": "active", "role": "teacher"},
+        {"name": "Eva", "surname": "Diaz", "password": "c", "email": "eva@example.com", "status": "active", "role": "student"},
+    ]
+    mock_cursor.fetchall.side_effect = [[(1, uuid_1)], [(uuid_2, "ana@example.com")]]
+
+    results = users_repository.insert_users_bulk(users)
+
+    assert results == [("created", str(uuid_2)), ("updated", str(uuid_1)), ("exists", None)]
+    copy.write_row.assert_any_call((0, None, "Ana", "Gomez", "hashed-password", "ana@example.com", "active", "student", True))
+    assert copy.write_row.call_count == 3
+    update = next(call.args[0] for call in mock_cursor.execute.call_args_list if "UPDATE users u" in call.args[0])
+    assert "FROM expired_registrations" in update  # registrations whose PIN partition was dropped
+    mock_conn.commit.assert_called_once()
+
+
+def test_insert_users_bulk_rolls_back(users_repository, mock_db_connection_and_cursor, password_hash):
+    mock_conn, mock_cursor = mock_db_connection_and_cursor
+    mock_cursor.fetchall.side_effect = RuntimeError("connection lost")
+
+    with pytest.raises(RuntimeError):
+        users_repository.insert_users_bulk([{"name": "Ana", "surname": "Gomez", "password": "a",
+                                             "email": "ana@example.com", "status": "active", "role": "student"}])
+
+    mock_conn.rollback.assert_called_once()
+    mock_conn.commit.assert_not_called()
+
+
+def test_export_users_streams_copy_on_own_connection(users_repository, mock_db_connection_and_cursor):
+    mock_conn, _ = mock_db_connection_and_cursor
+    copy = mock_conn.cursor.return_value.__enter__.return_value.copy.return_value.__enter__.return_value
+    copy.__iter__.return_value = iter([b"uuid,email\n", b"u1,a@example.com\n"])
+
+    stream = users_repository.export_users(["uuid", "email"], "csv")
+
+    assert b"".join(stream) == b"uuid,email\nu1,a@example.com\n"
+    mock_conn.close.assert_called_once()
+
+
+def test_abandoned_export_closes_its_connection(users_repository, mock_db_connection_and_cursor):
+    mock_conn, _ = mock_db_connection_and_cursor
+
+    stream = users_repository.export_users(["uuid", "email"], "csv")
+    mock_conn.cursor.return_value.__enter__.return_value.copy.assert_called_once()  # started before streaming
+    stream.close()  # the response is closed before the first chunk
+    stream.close()
+
+    mock_conn.close.assert_called_once()
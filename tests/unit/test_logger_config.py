@@ -0,0 +1,175 @@
+import io
+import json
+import logging
+import threading
+
+import structlog
+
+import logger_config
+
+
+class SlowStream(io.BytesIO):
+    """Blocks writes until released, like a stdout pipe nobody is reading."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def write(self, data):
+        self.release.wait(5)
+        return super().write(data)
+
+
+def test_truncate_values(monkeypatch):
+    monkeypatch.setattr(logger_config, "MAX_VALUE_LENGTH", 10)
+
+    event = logger_config.truncate_values(None, "info", {"event": "x" * 25, "count": 3})
+
+    assert event == {"event": "xxxxxxxxxx... [15 more chars]", "count": 3}
+
+
+def test_render_json_handles_any_value():
+    line = logger_config.render_json(None, "info", {"event": "hi", "value": object.__new__(type("Opaque", (), {}))})
+
+    assert json.loads(line)["event"] == "hi"
+
+
+def test_background_writer_writes_every_line_on_drain():
+    stream = io.BytesIO()
+    writer = logger_config.BackgroundWriter(stream)
+
+    for i in range(100):
+        writer.write(f"{i}\n".encode())
+    writer.drain()
+
+    assert stream.getvalue().splitlines() == [str(i).encode() for i in range(100)]
+
+
+def test_background_writer_drops_instead_of_blocking():
+    stream = SlowStream()
+    writer = logger_config.BackgroundWriter(stream, max_queue_size=5)
+
+    for i in range(50):
+        writer.write(b"line\n")  # never blocks, even with stdout stuck
+    stream.release.set()
+    writer.drain()
+
+    lines = stream.getvalue().splitlines()
+    assert json.loads(lines[-1])["event"] == "Log lines dropped (queue full)"
+    assert len(lines) - 1 + json.loads(lines[-1])["dropped"] == 50
+
+
+def test_synchronous_writer():
+    stream = io.BytesIO()
+    writer = logger_config.BackgroundWriter(stream, asynchronous=False)
+
+    writer.write(b"now\n")
+
+    assert stream.getvalue() == b"now\n"
+
+
+def test_reset_after_fork_starts_a_new_writer_thread():
+    stream = io.BytesIO()
+    writer = logger_config.BackgroundWriter(stream)
+    old_thread = writer._thread
+
+    writer.reset_after_fork()
+    writer.write(b"child\n")
+    writer.drain()
+
+    assert writer._thread is not old_thread
+    assert stream.getvalue() == b"child\n"
+
+
+def test_disabled_level_does_not_format_arguments():
+    class Exploding:
+        def __str__(self):
+            raise AssertionError("formatted")
+
+    logger = structlog.wrap_logger(
+        logger_config.QueueLogger(logger_config.BackgroundWriter(io.BytesIO(), asynchronous=False)),
+        wrapper_class=structlog.make_filtering_bound_logger("info"),
+    )
+
+    logger.debug("users is %s", Exploding())
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_sampler_keeps_first_n_then_one_in_m():
+    sampler = logger_config.Sampler(first=3, every=5, window=60, clock=FakeClock())
+
+    rates = [sampler.allow("error", "%s %s - %s: %s", "/users/login")[0] for _ in range(13)]
+
+    assert rates == [1, 1, 1, None, None, None, None, 5, None, None, None, None, 5]
+
+
+def test_sampler_keys_by_event_and_route():
+    sampler = logger_config.Sampler(first=1, every=100, window=60, clock=FakeClock())
+
+    assert sampler.allow("info", "users is %s", "/users")[0] == 1
+    assert sampler.allow("info", "users is %s", "/users/admin")[0] == 1
+    assert sampler.allow("info", "users is %s", "/users")[0] is None
+
+
+def test_sampler_reports_suppressed_when_window_closes():
+    clock = FakeClock()
+    sampler = logger_config.Sampler(first=1, every=100, window=10, clock=clock)
+    for _ in range(4):
+        sampler.allow("warning", "Token invalid: %s", "/users/authorize")
+
+    clock.now = 11
+    rate, summaries = sampler.allow("info", "another event %s", None)
+
+    assert rate == 1
+    assert summaries == [
+        ("warning", {"sampled_event": "Token invalid: %s", "route": "/users/authorize", "suppressed": 3, "window_seconds": 10})
+    ]
+    assert ("Token invalid: %s", "/users/authorize") not in sampler._windows
+
+
+def test_sampler_rules_override_by_prefix():
+    sampler = logger_config.Sampler(first=100, every=100, window=60, rules={"PIN generated": {"first": 1, "every": 2}}, clock=FakeClock())
+
+    rates = [sampler.allow("info", "PIN generated for %s: %s", None)[0] for _ in range(3)]
+
+    assert rates == [1, None, 2]
+
+
+def test_sampled_logger_formats_only_kept_events():
+    stream = io.BytesIO()
+    sampler = logger_config.Sampler(first=1, every=1000, window=60, clock=FakeClock())
+    logger = structlog.wrap_logger(
+        logger_config.QueueLogger(logger_config.BackgroundWriter(stream, asynchronous=False)),
+        processors=[logger_config.render_json],
+        wrapper_class=logger_config.make_sampled_bound_logger(logging.INFO, sampler),
+    )
+
+    logger.debug("disabled %s", "x")
+    logger.info("users is %s", 1)
+    logger.info("users is %s", 2)
+
+    assert [json.loads(line)["event"] for line in stream.getvalue().splitlines()] == ["users is 1"]
+
+
+def test_sampled_logger_keeps_warnings_and_errors_by_default():
+    stream = io.BytesIO()
+    sampler = logger_config.Sampler(first=1, every=1000, window=60, clock=FakeClock())
+    logger = structlog.wrap_logger(
+        logger_config.QueueLogger(logger_config.BackgroundWriter(stream, asynchronous=False)),
+        processors=[logger_config.render_json],
+        wrapper_class=logger_config.make_sampled_bound_logger(logging.INFO, sampler),
+    )
+
+    for attempt in range(3):
+        logger.warning("Token invalid: %s", attempt)
+        logger.error("Login failed: %s", attempt)
+
+    assert len(stream.getvalue().splitlines()) == 6
+    assert sampler._windows == {}
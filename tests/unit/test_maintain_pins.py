@@ -0,0 +1,12 @@
+import re
+
+import maintain_pins
+
+
+def test_pin_queries_get_the_parameters_their_placeholders_need():
+    for name, (query, params) in maintain_pins.PIN_QUERIES.items():
+        named = set(re.findall(r"%\((\w+)\)s", query))
+        if named:
+            assert isinstance(params, dict) and named <= params.keys(), name
+        else:
+            assert len(params) == query.count("%s"), name
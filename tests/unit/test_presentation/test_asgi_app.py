@@ -0,0 +1,148 @@
+import uuid
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+# The ASGI app's dependencies (requirements.txt): skipped where they are not installed.
+pytest.importorskip("psycopg_pool")
+pytest.importorskip("starlette")
+pytest.importorskip("httpx")
+
+from starlette.testclient import TestClient
+from werkzeug.security import generate_password_hash
+
+import asgi_app
+
+
+@pytest.fixture
+def mock_user():
+    user = MagicMock()
+    user.uuid = str(uuid.uuid4())
+    user.name = "Test"
+    user.surname = "User"
+    user.password = generate_password_hash("password")
+    user.email = "user.test@gmail.com"
+    user.status = "active"
+    user.role = "student"
+    user.location = None
+    user.notification = True
+    user.id_biometric = None
+    return user
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = AsyncMock()
+    monkeypatch.setattr(asgi_app.user_controller, "user_service", service)
+    return service
+
+
+@pytest.fixture
+def client():
+    # Without the context manager the lifespan (pool opening) does not run.
+    return TestClient(asgi_app.users_asgi_app)
+
+
+def test_health(client):
+    response = client.get("/health")
+
+    assert response.status_code == 200
+    assert response.text == '{"status":"ok"}\n'
+
+
+def test_request_span_continues_traceparent(client, service, monkeypatch):
+    monkeypatch.setenv("FLASK_ENV", "testing")
+    trace_id = uuid.uuid4().hex
+    service.get_active_teachers.return_value = []
+
+    response = client.get("/users/teachers", headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"})
+    assert response.headers["x-trace-id"] == trace_id
+
+    traces = client.get("/debug/traces?limit=50").json()["traces"]
+    trace = next(t for t in traces if t["trace_id"] == trace_id)
+    assert trace["spans"][0]["name"] == "GET get_active_teachers"
+    assert trace["spans"][0]["attributes"] == {"status": 200}
+
+
+def test_get_active_teachers(client, service, mock_user):
+    service.get_active_teachers.return_value = [mock_user]
+
+    response = client.get("/users/teachers")
+
+    assert response.status_code == 200
+    assert response.json()["data"][0]["email"] == "user.test@gmail.com"
+
+
+def test_get_specific_user_not_found(client, service, monkeypatch):
+    monkeypatch.setenv("FLASK_ENV", "testing")
+    service.get_specific_users.return_value = None
+
+    response = client.get(f"/users/{uuid.uuid4()}")
+
+    assert response.status_code == 404
+    assert response.json()["title"] == "User not found"
+
+
+def test_get_users_requires_admin_session(client, service, monkeypatch):
+    monkeypatch.setenv("FLASK_ENV", "production")
+
+    response = client.get("/users")
+
+    assert response.status_code == 401
+    service.get_users.assert_not_called()
+
+
+def test_login_user(client, service, mock_user):
+    service.mail_exists.return_value = mock_user
+    service.user_is_validated.return_value = True
+    service.get_specific_users.return_value = mock_user
+
+    response = client.post("/users/login", json={"email": mock_user.email, "password": "password"})
+
+    assert response.status_code == 200
+    assert response.headers["set-cookie"].startswith("session=")
+
+
+def test_login_user_wrong_password(client, service, mock_user):
+    service.mail_exists.return_value = mock_user
+    service.user_is_validated.return_value = True
+    service.get_specific_users.return_value = mock_user
+
+    response = client.post("/users/login", json={"email": mock_user.email, "password": "wrong"})
+
+    assert response.status_code == 403
+
+
+def test_create_user_rejects_admin_role(client, service):
+    response = client.post("/users", json={"role": "admin"})
+
+    assert response.status_code == 403
+    service.create.assert_not_called()
+
+
+def test_validate_recovery_pin_requires_pin(client, service):
+    response = client.put("/users/a@b.com/password-recovery", json={})
+
+    assert response.status_code == 400
+    assert response.json() == {"error": "Se requiere el campo 'pin'"}
+
+
+def test_delete_returns_empty_204(client, service, mock_user, monkeypatch):
+    monkeypatch.setenv("FLASK_ENV", "testing")
+    service.get_specific_users.return_value = mock_user
+
+    response = client.delete(f"/users/{mock_user.uuid}")
+
+    assert response.status_code == 204
+    assert response.content == b""
+    service.delete.assert_awaited_once()
+
+
+def test_update_notification_serializes_uuid(client, service, mock_user):
+    user_id = uuid.uuid4()
+    service.get_specific_users.return_value = mock_user
+    service.update_notification.return_value = user_id
+
+    response = client.put(f"/users/{user_id}/notification", json={"notification": False})
+
+    assert response.status_code == 200
+    assert response.json() == {"data": {"uuid": str(user_id)}}
@@ -40,7 +40,7 @@ def controller(mock_user):
 
 @pytest.fixture
 def mock_error_json(monkeypatch):
-    monkeypatch.setattr("presentation.user_controller.get_error_json", lambda *args, **kwargs: {"error": "mocked error"})
+    monkeypatch.setattr("presentation.user_flows.get_error", lambda *args, **kwargs: {"error": "mocked error"})
 
 @pytest.fixture
 def mock_controller():
@@ -154,6 +154,7 @@ def test_get_active_teachers_returns_serialized_list(app, controller):
     mock_service = MagicMock()
     mock_teacher1 = MagicMock()
     mock_teacher2 = MagicMock()
+    mock_service.teacher_snapshot.return_value = None  # no directory snapshot yet: query
     mock_service.get_active_teachers.return_value = [mock_teacher1, mock_teacher2]
 
     controller.user_service = mock_service
@@ -302,7 +303,7 @@ def test_initiate_password_recovery_exception(controller, mock_error_json):
     result = controller.initiate_password_recovery("test@example.com")
     
     assert result["code_status"] == 500
-    assert "mocked error" in result["response"]["error"]
+    assert "mocked error" in result["response"].json["error"]
 
 
 def test_validate_recovery_pin_success_message(controller):
@@ -327,7 +328,7 @@ def test_validate_recovery_pin_exception(controller, mock_error_json):
     result = controller.validate_recovery_pin("test@example.com", "1234")
     
     assert result["code_status"] == 500
-    assert "mocked error" in result["response"]["error"]
+    assert "mocked error" in result["response"].json["error"]
 
 
 def test_update_password_success_message(controller):
@@ -352,7 +353,7 @@ def test_update_password_exception(controller, mock_error_json):
     result = controller.update_password("test@example.com", "newpass")
     
     assert result["code_status"] == 500
-    assert "mocked error" in result["response"]["error"]
+    assert "mocked error" in result["response"].json["error"]
 
 
 def test_initiate_registration_confirmation_success(controller):
@@ -369,7 +370,7 @@ def test_initiate_registration_confirmation_exception(controller, mock_error_jso
     result = controller.initiate_registration_confirmation("test@example.com")
     
     assert result["code_status"] == 500
-    assert "mocked error" in result["response"]["error"]
+    assert "mocked error" in result["response"].json["error"]
 
 def test_validate_registration_pin_success_message(controller, mock_user):
     controller.user_service.validate_registration_pin.return_value = {"message": "PIN valid", "code": 200, "user": mock_user}
@@ -385,7 +386,7 @@ def test_validate_registration_pin_exception(controller, mock_error_json):
     result = controller.validate_registration_pin("test@example.com", "1234")
     
     assert result["code_status"] == 500
-    assert "mocked error" in result["response"]["error"]
+    assert "mocked error" in result["response"].json["error"]
 
 def test_set_location_missing_data(controller):
     request = MagicMock()
@@ -912,3 +913,39 @@ def test_update_biometric_id_success(controller):
 
 #     assert result["code_status"] == 400
 #     assert "required" in result["response"].json["error"]
+
+
+def test_get_active_teachers_serves_the_directory_snapshot(app, controller, mock_user):
+    from application.teacher_directory import Snapshot
+
+    body = controller.encode_teachers([mock_user])
+    controller.user_service.teacher_snapshot.return_value = Snapshot(body, "abc123", 1, 0.0)
+
+    with app.test_request_context():
+        fresh = controller.get_active_teachers(Request(EnvironBuilder().get_environ()))
+        cached = controller.get_active_teachers(Request(EnvironBuilder(headers={"If-None-Match": '"abc123"'}).get_environ()))
+
+    assert fresh["code_status"] == 200
+    assert fresh["response"].get_data() == body
+    assert fresh["response"].headers["ETag"] == '"abc123"'
+    assert cached["code_status"] == 304
+    controller.user_service.get_active_teachers.assert_not_called()
+
+
+def test_encode_teachers_matches_jsonify(app, controller, mock_user):
+    from flask import jsonify
+
+    with app.test_request_context():
+        expected = jsonify({"data": [controller._serialize_user(mock_user)]}).get_data()
+
+    assert controller.encode_teachers([mock_user]) == expected
+
+
+def test_bulk_is_rejected_with_pins_in_memory(app, controller):
+    controller.user_service.can_import_bulk.return_value = False
+
+    with app.test_request_context():
+        response = controller.create_users_bulk(MagicMock())
+
+    assert response["code_status"] == 501
+    controller.user_service.create_bulk.assert_not_called()
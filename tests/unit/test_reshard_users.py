@@ -0,0 +1,32 @@
+import collections
+
+import reshard_users
+
+
+def apply(owners, moves):
+    owners = dict(owners)
+    for slot, source, destination in moves:
+        assert owners[slot] == source
+        owners[slot] = destination
+    return owners
+
+
+def test_plan_spreads_slots_evenly_with_minimal_moves():
+    owners = {slot: "a" for slot in range(reshard_users.SLOTS)}
+
+    moves = reshard_users.plan(owners, ["a", "b", "c"])
+    owners = apply(owners, moves)
+
+    assert sorted(collections.Counter(owners.values()).values()) == [341, 341, 342]
+    assert len(moves) == 682
+    assert reshard_users.plan(owners, ["a", "b", "c"]) == []
+    # A fourth shard takes a quarter, from the others only.
+    assert len(reshard_users.plan(owners, ["a", "b", "c", "d"])) == 256
+
+
+def test_plan_drains_removed_shards():
+    owners = {slot: ("a" if slot % 2 else "b") for slot in range(reshard_users.SLOTS)}
+
+    owners = apply(owners, reshard_users.plan(owners, ["a"]))
+
+    assert set(owners.values()) == {"a"}